@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+pgvector indexes for the embedding columns of the letta database.
+setup_letta_db.sh only enables the extension, so every archival memory search is an
+exact sequential scan over all of an agent's passages, on the same server that writes
+LiteLLM's spend logs.
+
+Stock Letta cannot be indexed. It declares archival_passages.embedding and
+source_passages.embedding as vector(4096) (its MAX_EMBEDDING_DIM) and zero-pads every
+embedding to that width (384-dim local-bge-small-en-v1-5 vectors are stored as 16 KiB),
+while pgvector's HNSW and IVFFlat indexes take at most 2000 dimensions (4000 as
+halfvec). An index over a cast or subvector of the column would not serve Letta's
+ORDER BY embedding <=> :query either. install therefore reports those columns and exits
+with an error when nothing could be indexed; status marks them. The indexes apply to a
+Letta build whose columns are declared 2000 dimensions or narrower.
+
+  install   HNSW (default) or IVFFlat index on each vector column Letta created, built
+            CONCURRENTLY so Letta keeps writing, with cosine ops (Letta's search orders by
+            cosine distance); then sets hnsw.ef_search / ivfflat.probes for the database
+  tune      only the search-time setting: ALTER DATABASE ... SET hnsw.ef_search / ivfflat.probes
+  status    vector columns, their indexes and sizes, the search settings, and the memory
+            they need next to shared_buffers / maintenance_work_mem (live values and what
+            postgresql/postgresql.conf sets)
+  drop      the indexes created by install
+
+Letta creates its tables on first start, so run install after that, and again when a
+new version adds vector columns (existing indexes are skipped). ef_search / lists /
+probes trade recall for latency: measure with perf/pgvector_bench.py.
+
+Usage:
+    python letta_vector_index.py install [--method ivfflat] [--ef-search 100] [--maintenance-work-mem 1GB]
+    python letta_vector_index.py tune --ef-search 100
+    python letta_vector_index.py status
+    python letta_vector_index.py drop [--table archival_passages]
+"""
+
+import argparse
+import math
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from spend_log_partitions import format_bytes, psql, query_rows, quote
+
+DEFAULT_DSN = os.environ.get("LETTA_DATABASE_URL", "postgresql://postgres@localhost:5432/letta")
+CONF_FILE = Path(__file__).resolve().parent.parent / "postgresql" / "postgresql.conf"
+INDEX_PREFIX = "letta_vec_"
+MAX_INDEX_DIMS = 2000
+# the width Letta declares its embedding columns with and pads every vector to
+LETTA_EMBEDDING_DIMS = 4096
+# cosine distance (<=>), the operator Letta's passage search orders by
+OPCLASS = "vector_cosine_ops"
+HNSW_DEFAULTS = {"m": 16, "ef_construction": 64}
+DEFAULT_EF_SEARCH = 40
+# PostgreSQL's defaults, for settings postgresql.conf leaves commented out
+SERVER_DEFAULTS = {"shared_buffers": "128MB", "maintenance_work_mem": "64MB", "work_mem": "4MB",
+                   "effective_cache_size": "4GB"}
+MEMORY_SETTINGS = ("shared_buffers", "maintenance_work_mem", "work_mem", "effective_cache_size")
+SIZE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kMGT]?B)?\s*$")
+SIZE_UNITS = {None: 8192, "B": 1, "kB": 1024, "MB": 2**20, "GB": 2**30, "TB": 2**40}
+
+
+def parse_size(value):
+    """'128MB' -> bytes; a bare number counts 8 KiB blocks, as shared_buffers does"""
+    match = SIZE_RE.match(str(value))
+    if not match:
+        return None
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def default_lists(rows):
+    """pgvector's guidance for IVFFlat lists: rows / 1000 up to 1M rows, sqrt(rows) beyond"""
+    return max(1, rows // 1000 if rows <= 1_000_000 else int(math.sqrt(rows)))
+
+
+def default_probes(lists):
+    return max(1, int(math.sqrt(lists)))
+
+
+def index_name(table, column):
+    return f"{INDEX_PREFIX}{table}_{column}"[:63]
+
+
+def index_sql(table, column, method, options, name=None, concurrently=True):
+    """CREATE INDEX statement for a vector column; options: m / ef_construction or lists"""
+    with_clause = ", ".join(f"{key} = {value}" for key, value in options.items())
+    return (f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS "
+            f"{quote(name or index_name(table, column))} ON {quote(table)} "
+            f"USING {method} ({quote(column)} {OPCLASS})" + (f" WITH ({with_clause})" if with_clause else "") + ";\n")
+
+
+def run_sql_notices(dsn, sql):
+    """Run a script, returning psql's NOTICE/WARNING output (pgvector reports build memory there)"""
+    result = subprocess.run(psql(dsn), input=sql, text=True, capture_output=True)
+    if result.returncode != 0:
+        sys.exit(f"psql failed: {result.stderr.strip()}")
+    return [line for line in result.stderr.splitlines() if line.strip()]
+
+
+def pgvector_version(dsn):
+    rows = query_rows(dsn, "SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    if not rows:
+        sys.exit("pgvector is not enabled in this database; run setup_letta_db.sh")
+    return tuple(int(part) for part in re.findall(r"\d+", rows[0][0])[:3])
+
+
+def vector_columns(dsn, table=None):
+    """[(table, column, declared dims or None, estimated rows, table bytes)] of the vector columns"""
+    only = f"AND c.relname = '{table}'" if table else ""
+    rows = query_rows(dsn, f"""
+        SELECT c.relname, a.attname, nullif(a.atttypmod, -1), greatest(c.reltuples, 0)::bigint,
+               pg_total_relation_size(c.oid)
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE a.atttypid = 'vector'::regtype AND NOT a.attisdropped AND a.attnum > 0
+          AND c.relkind IN ('r', 'p') AND n.nspname = current_schema() {only}
+        ORDER BY 1, 2""")
+    return [(t, col, int(dims) if dims else None, int(estimate), int(size)) for t, col, dims, estimate, size in rows]
+
+
+def vector_indexes(dsn):
+    """[(index, table, method, definition, bytes)] of the HNSW / IVFFlat indexes"""
+    rows = query_rows(dsn, """
+        SELECT i.relname, t.relname, am.amname, pg_get_indexdef(i.oid), pg_relation_size(i.oid)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        JOIN pg_am am ON am.oid = i.relam
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        WHERE am.amname IN ('hnsw', 'ivfflat') AND n.nspname = current_schema()
+        ORDER BY 2, 1""")
+    return [(name, table, method, definition, int(size)) for name, table, method, definition, size in rows]
+
+
+def server_settings(dsn, names=MEMORY_SETTINGS + ("hnsw.ef_search", "ivfflat.probes")):
+    """Live values (current_setting, so database-level ALTERs show); None when unset"""
+    values = query_rows(dsn, "SELECT " + ", ".join(f"current_setting('{name}', true)" for name in names))[0]
+    return {name: value or None for name, value in zip(names, values)}
+
+
+def conf_settings(path=CONF_FILE):
+    """Uncommented name = value lines of the repo's postgresql.conf"""
+    settings = {}
+    try:
+        for line in Path(path).read_text().splitlines():
+            line = line.split("#", 1)[0].strip()
+            if "=" in line:
+                name, value = (part.strip() for part in line.split("=", 1))
+                settings[name] = value.strip("'")
+    except OSError:
+        pass
+    return settings
+
+
+def print_memory(dsn, index_bytes, build_bytes=None):
+    """
+    HNSW/IVFFlat indexes are only fast while cached: compare their size with the memory
+    settings, and the graph an HNSW build holds (build_bytes) with maintenance_work_mem
+    """
+    live = server_settings(dsn)
+    conf = conf_settings()
+    print(f"\n{'setting':<22} {'live':>10}  postgresql/postgresql.conf")
+    for name in MEMORY_SETTINGS:
+        configured = conf.get(name, f"not set (default {SERVER_DEFAULTS[name]})")
+        print(f"{name:<22} {live.get(name) or '-':>10}  {configured}")
+    shared = parse_size(live.get("shared_buffers") or SERVER_DEFAULTS["shared_buffers"])
+    maintenance = parse_size(live.get("maintenance_work_mem") or SERVER_DEFAULTS["maintenance_work_mem"])
+    print(f"\nvector indexes {format_bytes(index_bytes)} = {index_bytes / shared * 100:.0f}% of shared_buffers "
+          f"({format_bytes(shared)}), which the spend-log tables and indexes share")
+    if index_bytes > shared / 2:
+        print(f"  searches will read from the OS page cache or disk; shared_buffers >= "
+              f"{format_bytes(2 * index_bytes)} keeps them in Postgres' own cache")
+    if build_bytes and build_bytes > maintenance:
+        print(f"  an HNSW build needs ~{format_bytes(build_bytes)} of maintenance_work_mem "
+              f"(set to {format_bytes(maintenance)}): builds past it are several times slower; "
+              f"install --maintenance-work-mem raises it for the build only")
+
+
+def unindexable(dims):
+    """Why pgvector cannot index a column declared with dims, or None"""
+    if dims is None:
+        return "declared as vector without a width"
+    if dims > MAX_INDEX_DIMS:
+        return (f"declared as vector({dims}){' (stock Letta)' if dims == LETTA_EMBEDDING_DIMS else ''}; "
+                f"pgvector indexes at most {MAX_INDEX_DIMS} dimensions")
+    return None
+
+
+def column_indexes(indexes, table, column):
+    """The entries of vector_indexes() on table.column"""
+    pattern = re.compile(rf'USING \w+ \("?{re.escape(column)}"? ')
+    return [index for index in indexes if index[1] == table and pattern.search(index[3])]
+
+
+# --- install / tune / drop --------------------------------------------------------------------------------
+
+def search_settings_sql(method, ef_search=None, probes=None):
+    """Database-level search setting: new connections (Letta's pool after a restart) pick it up"""
+    name, value = ("hnsw.ef_search", ef_search) if method == "hnsw" else ("ivfflat.probes", probes)
+    if value is None:
+        return ""
+    return (f"DO $$ BEGIN EXECUTE format('ALTER DATABASE %I SET {name} = {int(value)}', current_database()); "
+            f"END $$;\n")
+
+
+def install(args):
+    version = pgvector_version(args.dsn)
+    if args.method == "hnsw" and version < (0, 5):
+        sys.exit(f"HNSW needs pgvector 0.5 or later (installed: {'.'.join(map(str, version))}); use --method ivfflat")
+    columns = vector_columns(args.dsn, args.table)
+    if not columns:
+        sys.exit("no vector columns found; start Letta once so it creates its tables")
+    existing = {name for name, *_ in vector_indexes(args.dsn)}
+    lists_used = []
+    skipped = []
+    for table, column, dims, rows, size in columns:
+        name = index_name(table, column)
+        if name in existing:
+            print(f"  {table}.{column}: {name} exists")
+            continue
+        reason = unindexable(dims)
+        if reason:
+            print(f"  {table}.{column}: skipped, {reason}")
+            skipped.append(f"{table}.{column}")
+            continue
+        if args.method == "hnsw":
+            options = {"m": args.m, "ef_construction": args.ef_construction}
+        else:
+            lists = args.lists or default_lists(rows)
+            lists_used.append(lists)
+            options = {"lists": lists}
+            if rows < lists * 10:
+                print(f"  {table}.{column}: only ~{rows} rows for {lists} lists; IVFFlat clusters are trained on "
+                      f"the rows present at build time, rebuild once the table has grown")
+        sql = (f"SET maintenance_work_mem = '{args.maintenance_work_mem}';\n"
+               f"SET max_parallel_maintenance_workers = {args.workers};\n"
+               + index_sql(table, column, args.method, options, name))
+        if args.dry_run:
+            print(sql, end="")
+            continue
+        print(f"  {table}.{column}: building {args.method} {options} over ~{rows} rows ({format_bytes(size)}) ...")
+        start = time.perf_counter()
+        for notice in run_sql_notices(args.dsn, sql):
+            print(f"    {notice}")
+        built = int(query_rows(args.dsn, f"SELECT pg_relation_size('{quote(name)}'::regclass)")[0][0])
+        print(f"    {format_bytes(built)} in {time.perf_counter() - start:.1f}s")
+    if len(skipped) == len(columns):
+        sys.exit(f"nothing indexed: none of the {len(columns)} vector columns can take a pgvector index, so "
+                 f"Letta's searches stay sequential scans. Letta declares its embedding columns as "
+                 f"vector({LETTA_EMBEDDING_DIMS}); only a build with columns of at most {MAX_INDEX_DIMS} "
+                 f"dimensions can be indexed")
+    if skipped:
+        print(f"  not indexed, still sequential scans: {', '.join(skipped)}")
+    probes = args.probes or (default_probes(max(lists_used)) if lists_used else None)
+    sql = search_settings_sql(args.method, args.ef_search, probes)
+    if args.dry_run:
+        print(sql, end="")
+    elif sql:
+        run_sql_notices(args.dsn, sql)
+        print(f"Search setting for new connections: "
+              + (f"hnsw.ef_search = {args.ef_search}" if args.method == "hnsw" else f"ivfflat.probes = {probes}")
+              + " (restart Letta so its pooled connections pick it up)")
+
+
+def tune(args):
+    if args.ef_search is None and args.probes is None:
+        sys.exit("give --ef-search and/or --probes")
+    sql = search_settings_sql("hnsw", ef_search=args.ef_search) + search_settings_sql("ivfflat", probes=args.probes)
+    run_sql_notices(args.dsn, sql)
+    settings = server_settings(args.dsn, ("hnsw.ef_search", "ivfflat.probes"))
+    print(f"hnsw.ef_search = {settings['hnsw.ef_search'] or DEFAULT_EF_SEARCH}, "
+          f"ivfflat.probes = {settings['ivfflat.probes'] or 1} for new connections")
+
+
+def drop(args):
+    names = [name for name, table, *_ in vector_indexes(args.dsn)
+             if name.startswith(INDEX_PREFIX) and (not args.table or table == args.table)]
+    for name in names:
+        run_sql_notices(args.dsn, f"DROP INDEX CONCURRENTLY IF EXISTS {quote(name)};\n")
+        print(f"dropped {name}")
+    if not names:
+        print("no indexes created by install")
+
+
+# --- status -----------------------------------------------------------------------------------------------
+
+def status(args):
+    version = pgvector_version(args.dsn)
+    print(f"pgvector {'.'.join(map(str, version))} ({args.dsn})")
+    columns = vector_columns(args.dsn)
+    indexes = vector_indexes(args.dsn)
+    print(f"\n{'vector column':<40} {'dims':>6} {'rows (est.)':>12} {'table':>10}  index")
+    print("=" * 100)
+    pending = 0
+    blocked = 0
+    for table, column, dims, rows, size in columns:
+        covering = column_indexes(indexes, table, column)
+        reason = unindexable(dims)
+        if not covering and not reason:
+            # what an HNSW index would take: the vectors plus 2 * m neighbour ids each at layer 0
+            pending += rows * (4 * dims + 8 * 2 * HNSW_DEFAULTS["m"])
+        blocked += bool(reason)
+        described = [f"{name} ({method}, {format_bytes(index_bytes)})" for name, _, method, _, index_bytes in covering]
+        print(f"{table + '.' + column:<40} {dims or '-':>6} {rows:>12} {format_bytes(size):>10}  "
+              f"{', '.join(described) or ('none: cannot be indexed' if reason else 'none: sequential scans')}")
+    if not columns:
+        print("(no vector columns; Letta creates its tables on first start)")
+    if blocked:
+        print(f"\n{blocked} column(s) cannot be indexed: pgvector indexes at most {MAX_INDEX_DIMS} dimensions, and "
+              f"Letta declares its embedding columns as vector({LETTA_EMBEDDING_DIMS}), padding every vector to it. "
+              f"Their searches stay sequential scans.")
+    settings = server_settings(args.dsn)
+    print(f"\nhnsw.ef_search = {settings['hnsw.ef_search'] or DEFAULT_EF_SEARCH}, "
+          f"ivfflat.probes = {settings['ivfflat.probes'] or 1}")
+    index_bytes = sum(index[4] for index in indexes)
+    print_memory(args.dsn, index_bytes + pending, build_bytes=pending or None)
+    if pending:
+        print(f"  (includes ~{format_bytes(pending)} estimated for the columns not indexed yet)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pgvector indexes for the letta database")
+    parser.add_argument("--dsn", default=DEFAULT_DSN, help="Postgres URL (default: $LETTA_DATABASE_URL or letta)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("install", help="index the vector columns and set the search parameter")
+    command.add_argument("--method", choices=("hnsw", "ivfflat"), default="hnsw")
+    command.add_argument("--table", help="only this table")
+    command.add_argument("--m", type=int, default=HNSW_DEFAULTS["m"], help="HNSW neighbours per node")
+    command.add_argument("--ef-construction", type=int, default=HNSW_DEFAULTS["ef_construction"],
+                         help="HNSW build-time candidate list")
+    command.add_argument("--ef-search", type=int, help=f"HNSW search candidate list (pgvector: {DEFAULT_EF_SEARCH})")
+    command.add_argument("--lists", type=int, help="IVFFlat clusters (default: rows/1000, sqrt(rows) past 1M)")
+    command.add_argument("--probes", type=int, help="IVFFlat clusters searched (default: sqrt(lists))")
+    command.add_argument("--maintenance-work-mem", default="1GB",
+                         help="for the build only; an HNSW graph that outgrows it builds much slower")
+    command.add_argument("--workers", type=int, default=2, help="max_parallel_maintenance_workers for the build")
+    command.add_argument("--dry-run", action="store_true", help="print the SQL only")
+    command.set_defaults(func=install)
+
+    command = commands.add_parser("tune", help="set hnsw.ef_search / ivfflat.probes for the database")
+    command.add_argument("--ef-search", type=int)
+    command.add_argument("--probes", type=int)
+    command.set_defaults(func=tune)
+
+    command = commands.add_parser("status", help="vector columns, indexes, settings and memory")
+    command.set_defaults(func=status)
+
+    command = commands.add_parser("drop", help="drop the indexes created by install")
+    command.add_argument("--table", help="only this table")
+    command.set_defaults(func=drop)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Content-addressed prompt store for the LiteLLM_SpendLogs table in mylitellm.
+Agent clients resend their whole history every turn, so with store_prompts_in_spend_logs
+each row repeats every earlier message of the session (in proxy_server_request.messages,
+and in messages for realtime calls): the same text is written to the heap, the WAL and
+every backup over and over.
+
+A trigger on the table stores each message body once in prompt_store.blobs, keyed by the
+sha256 of its jsonb text and compressed by TOAST (lz4 where the server supports it), and
+leaves {"litellm_prompt_refs": [digest, ...]} in the row, in message order.
+prompt_store.expand(value) rebuilds the original value on read: litellm_hooks.prompt_store
+does that for the UI's request view, spend_log_partitions.py for its archives.
+
+  install    create the prompt_store schema, its functions and the trigger (idempotent)
+  migrate    pack existing rows, one --window-hours slice of "startTime" per transaction
+             (resumable: packed rows are skipped), then VACUUM so the space is reused
+  report     message text the rows reference vs what the store holds on disk
+  gc         delete blobs no row references any more (run after archiving partitions)
+  uninstall  drop the trigger, expand every row back inline and drop the schema
+
+The store lives in its own schema so Prisma's schema push, which manages public, leaves it
+alone. The trigger is defined on the parent when the table is partitioned, so partitions
+created later inherit it; spend_log_partitions.py convert carries it over to the new table.
+
+Usage:
+    python prompt_store.py install
+    python prompt_store.py migrate [--window-hours 6] [--vacuum-full]
+    python prompt_store.py report [--since 2026-01-01]
+    python prompt_store.py gc
+    python prompt_store.py uninstall
+"""
+
+import argparse
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from spend_log_partitions import DEFAULT_DSN, LOCK_TIMEOUT, TABLE, format_bytes, query_rows, quote, relkind, run_sql
+
+SCHEMA = "prompt_store"
+TRIGGER = "prompt_store_pack"
+REFS_KEY = "litellm_prompt_refs"
+# proxy_server_request keys holding a message list (chat completions, responses API)
+REQUEST_KEYS = ("messages", "input")
+# a blob's last_seen is refreshed at most this often when a new row references it (gc keeps twice that)
+TOUCH_INTERVAL = "1 hour"
+
+INSTALL_SQL = f"""
+BEGIN;
+CREATE SCHEMA IF NOT EXISTS {SCHEMA};
+
+CREATE TABLE IF NOT EXISTS {SCHEMA}.blobs (
+    digest bytea PRIMARY KEY,
+    body jsonb NOT NULL,
+    bytes integer NOT NULL,
+    last_seen timestamptz NOT NULL DEFAULT now()
+) WITH (toast_tuple_target = 128);
+
+-- compress bodies down to a few hundred bytes, with lz4 when the server is built with it
+DO $$ BEGIN
+    EXECUTE 'ALTER TABLE {SCHEMA}.blobs ALTER COLUMN body SET COMPRESSION lz4';
+EXCEPTION WHEN OTHERS THEN
+    RAISE NOTICE 'lz4 is not available (%), blobs use the default TOAST compression', SQLERRM;
+END $$;
+
+-- a message list -> {{"{REFS_KEY}": [sha256 hex, ...]}}; anything else is returned as is
+CREATE OR REPLACE FUNCTION {SCHEMA}.pack(messages jsonb) RETURNS jsonb
+LANGUAGE plpgsql AS $$
+DECLARE
+    refs jsonb;
+BEGIN
+    IF jsonb_typeof(messages) IS DISTINCT FROM 'array' OR messages = '[]' THEN
+        RETURN messages;
+    END IF;
+    WITH items AS (
+        SELECT m.ord, m.body, sha256(convert_to(m.body::text, 'UTF8')) AS digest
+        FROM jsonb_array_elements(messages) WITH ORDINALITY AS m(body, ord)
+    ), stored AS (
+        -- digest order: concurrent inserts of the same new messages take their locks in one order
+        INSERT INTO {SCHEMA}.blobs AS b (digest, body, bytes)
+        SELECT DISTINCT ON (digest) digest, body, octet_length(body::text) FROM items ORDER BY digest
+        ON CONFLICT (digest) DO UPDATE SET last_seen = now()
+            WHERE b.last_seen < now() - interval '{TOUCH_INTERVAL}'
+    )
+    SELECT jsonb_agg(encode(digest, 'hex') ORDER BY ord) INTO refs FROM items;
+    RETURN jsonb_build_object('{REFS_KEY}', refs);
+END $$;
+
+CREATE OR REPLACE FUNCTION {SCHEMA}.unpack(refs jsonb) RETURNS jsonb
+LANGUAGE sql STABLE AS $$
+    SELECT coalesce(jsonb_agg(b.body ORDER BY r.ord), '[]')
+    FROM jsonb_array_elements_text(refs -> '{REFS_KEY}') WITH ORDINALITY AS r(digest, ord)
+    LEFT JOIN {SCHEMA}.blobs b ON b.digest = decode(r.digest, 'hex')
+$$;
+
+-- a messages or proxy_server_request value with its message lists restored
+CREATE OR REPLACE FUNCTION {SCHEMA}.expand(value jsonb) RETURNS jsonb
+LANGUAGE plpgsql STABLE AS $$
+DECLARE
+    key text;
+BEGIN
+    IF jsonb_typeof(value) IS DISTINCT FROM 'object' THEN
+        RETURN value;
+    END IF;
+    IF value ? '{REFS_KEY}' THEN
+        RETURN {SCHEMA}.unpack(value);
+    END IF;
+    FOREACH key IN ARRAY ARRAY{list(REQUEST_KEYS)} LOOP
+        IF jsonb_typeof(value -> key) = 'object' AND value -> key ? '{REFS_KEY}' THEN
+            value := jsonb_set(value, ARRAY[key], {SCHEMA}.unpack(value -> key));
+        END IF;
+    END LOOP;
+    RETURN value;
+END $$;
+
+-- digests a messages or proxy_server_request value references
+CREATE OR REPLACE FUNCTION {SCHEMA}.refs(value jsonb) RETURNS SETOF text
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT jsonb_array_elements_text(v -> '{REFS_KEY}')
+    FROM (VALUES (value), {", ".join(f"(value -> '{key}')" for key in REQUEST_KEYS)}) AS t(v)
+    WHERE jsonb_typeof(v) = 'object'
+$$;
+
+CREATE OR REPLACE FUNCTION {SCHEMA}.spend_logs_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    key text;
+BEGIN
+    NEW.messages := {SCHEMA}.pack(NEW.messages);
+    IF jsonb_typeof(NEW.proxy_server_request) = 'object' THEN
+        FOREACH key IN ARRAY ARRAY{list(REQUEST_KEYS)} LOOP
+            IF jsonb_typeof(NEW.proxy_server_request -> key) = 'array' THEN
+                NEW.proxy_server_request := jsonb_set(NEW.proxy_server_request, ARRAY[key],
+                                                      {SCHEMA}.pack(NEW.proxy_server_request -> key));
+            END IF;
+        END LOOP;
+    END IF;
+    RETURN NEW;
+END $$;
+
+SET LOCAL lock_timeout = '{LOCK_TIMEOUT}';
+DROP TRIGGER IF EXISTS {TRIGGER} ON {quote(TABLE)};
+CREATE TRIGGER {TRIGGER} BEFORE INSERT OR UPDATE OF messages, proxy_server_request ON {quote(TABLE)}
+    FOR EACH ROW EXECUTE FUNCTION {SCHEMA}.spend_logs_trigger();
+COMMIT;
+"""
+
+# rows still holding message lists inline, and rows holding references
+UNPACKED = " OR ".join(
+    ["(jsonb_typeof(messages) = 'array' AND messages <> '[]')"]
+    + [f"(jsonb_typeof(proxy_server_request -> '{key}') = 'array' AND proxy_server_request -> '{key}' <> '[]')"
+       for key in REQUEST_KEYS])
+PACKED = " OR ".join(
+    [f"messages ? '{REFS_KEY}'"] + [f"proxy_server_request -> '{key}' ? '{REFS_KEY}'" for key in REQUEST_KEYS])
+# one row per digest a spend-log row references (alias l)
+ROW_REFS = (f"CROSS JOIN LATERAL (SELECT {SCHEMA}.refs(l.messages) AS digest "
+            f"UNION ALL SELECT {SCHEMA}.refs(l.proxy_server_request)) r")
+
+
+def installed(dsn):
+    return query_rows(dsn, f"SELECT to_regclass('{SCHEMA}.blobs') IS NOT NULL")[0][0] == "t"
+
+
+def require_installed(dsn):
+    if not installed(dsn):
+        sys.exit("the prompt store is not installed; run `install` first")
+
+
+def table_bytes(dsn):
+    """Size of the spend-log table with its TOAST and indexes, all partitions included"""
+    return int(query_rows(dsn, f"SELECT coalesce(sum(pg_total_relation_size(relid)), 0) "
+                               f"FROM pg_partition_tree('{quote(TABLE)}')")[0][0])
+
+
+def update_in_windows(dsn, assignments, predicate, window_hours, label):
+    """
+    Run an UPDATE over the rows matching predicate, one "startTime" window per
+    transaction so locks and WAL stay bounded; returns the number of rows updated.
+    """
+    bounds = query_rows(dsn, f'SELECT min("startTime"), max("startTime") FROM {quote(TABLE)} WHERE {predicate}')
+    if not bounds or not bounds[0][0]:
+        return 0
+    start, last = (datetime.fromisoformat(value) for value in bounds[0])
+    window = timedelta(hours=window_hours)
+    total, began = 0, time.perf_counter()
+    while start <= last:
+        end = start + window
+        rows = int(query_rows(dsn, f"""
+            WITH updated AS (
+                UPDATE {quote(TABLE)} SET {assignments}
+                WHERE "startTime" >= '{start.isoformat()}' AND "startTime" < '{end.isoformat()}' AND ({predicate})
+                RETURNING 1)
+            SELECT count(*) FROM updated""")[0][0])
+        total += rows
+        if rows:
+            elapsed = time.perf_counter() - began
+            print(f"  {label} {rows:>7} rows from {start:%Y-%m-%d %H:%M}  ({total} total, {total / elapsed:.0f} rows/s)")
+        start = end
+    return total
+
+
+def install(args):
+    if relkind(args.dsn, TABLE) is None:
+        sys.exit(f"{TABLE} not found; start the proxy once so Prisma creates it")
+    run_sql(args.dsn, INSTALL_SQL)
+    print(f"Prompt store installed: new {TABLE} rows store message references. "
+          "Run `migrate` to pack existing rows.")
+
+
+def migrate(args):
+    require_installed(args.dsn)
+    before = table_bytes(args.dsn)
+    print(f"Packing {TABLE} ({format_bytes(before)}) ...")
+    start = time.perf_counter()
+    rows = update_in_windows(args.dsn, "messages = messages, proxy_server_request = proxy_server_request",
+                             UNPACKED, args.window_hours, "packed")
+    print(f"{rows} rows packed in {time.perf_counter() - start:.1f}s")
+    if not rows:
+        return
+    # plain VACUUM makes the space reusable for new rows; FULL rewrites the table and returns
+    # it to the filesystem, but holds an exclusive lock while doing so
+    run_sql(args.dsn, f"VACUUM ({'FULL, ' if args.vacuum_full else ''}ANALYZE) {quote(TABLE)};\n")
+    after = table_bytes(args.dsn)
+    print(f"{TABLE}: {format_bytes(before)} -> {format_bytes(after)}"
+          + ("" if args.vacuum_full else " (freed pages are reused by new rows; --vacuum-full to shrink the files)"))
+    report(args)
+
+
+def report(args):
+    require_installed(args.dsn)
+    since = f"WHERE l.\"startTime\" >= '{args.since.isoformat()}'" if getattr(args, "since", None) else ""
+    rows, references, referenced, missing = (int(value) for value in query_rows(args.dsn, f"""
+        SELECT count(DISTINCT l.request_id), count(r.digest), coalesce(sum(b.bytes), 0),
+               count(r.digest) FILTER (WHERE b.digest IS NULL)
+        FROM {quote(TABLE)} l {ROW_REFS}
+        LEFT JOIN {SCHEMA}.blobs b ON b.digest = decode(r.digest, 'hex')
+        {since}""")[0])
+    blobs, unique, stored = (int(value) for value in query_rows(args.dsn, f"""
+        SELECT count(*), coalesce(sum(bytes), 0), pg_total_relation_size('{SCHEMA}.blobs')
+        FROM {SCHEMA}.blobs""")[0])
+    unpacked = int(query_rows(args.dsn, f"SELECT count(*) FROM {quote(TABLE)} WHERE {UNPACKED}")[0][0])
+
+    print(f"{'Rows with message references':<34} {rows:>12}" + (f"  (since {args.since})" if since else ""))
+    print(f"{'Message references':<34} {references:>12}  {format_bytes(referenced):>10} of message text")
+    print(f"{'Unique messages stored':<34} {blobs:>12}  {format_bytes(unique):>10} raw, "
+          f"{format_bytes(stored)} on disk with index")
+    if referenced:
+        print(f"{'Deduplication':<34} {referenced / max(unique, 1):>11.1f}x")
+        print(f"{'Compression (TOAST)':<34} {unique / max(stored, 1):>11.1f}x")
+        saved = referenced - stored
+        print(f"{'Saved':<34} {format_bytes(saved):>12}  ({saved / referenced:.1%} of the text the rows reference)")
+    print(f"{TABLE + ' on disk':<34} {format_bytes(table_bytes(args.dsn)):>12}")
+    if unpacked:
+        print(f"{'Rows still inline':<34} {unpacked:>12}  (run `migrate`)")
+    if missing:
+        print(f"{'References without a blob':<34} {missing:>12}  (blobs deleted while still referenced)")
+
+
+def gc(args):
+    """
+    Delete blobs that no row references. A row inserted while this runs either refreshed
+    its blobs' last_seen or found them refreshed within TOUCH_INTERVAL, so blobs seen
+    within twice that are kept.
+    """
+    require_installed(args.dsn)
+    start = time.perf_counter()
+    deleted, freed = query_rows(args.dsn, f"""
+        BEGIN;
+        CREATE TEMP TABLE live ON COMMIT DROP AS
+            SELECT DISTINCT decode(r.digest, 'hex') AS digest FROM {quote(TABLE)} l {ROW_REFS};
+        CREATE INDEX ON live (digest);
+        WITH deleted AS (
+            DELETE FROM {SCHEMA}.blobs b
+            WHERE b.last_seen < now() - 2 * interval '{TOUCH_INTERVAL}'
+              AND NOT EXISTS (SELECT 1 FROM live WHERE live.digest = b.digest)
+            RETURNING b.bytes)
+        SELECT count(*), coalesce(sum(bytes), 0) FROM deleted;
+        COMMIT;""")[-1]
+    print(f"Deleted {deleted} unreferenced blobs ({format_bytes(int(freed))} of message text) "
+          f"in {time.perf_counter() - start:.1f}s")
+    run_sql(args.dsn, f"VACUUM ANALYZE {SCHEMA}.blobs;\n")
+
+
+def uninstall(args):
+    if not installed(args.dsn):
+        print("The prompt store is not installed")
+        return
+    run_sql(args.dsn, f"SET lock_timeout = '{LOCK_TIMEOUT}';\nDROP TRIGGER IF EXISTS {TRIGGER} ON {quote(TABLE)};\n")
+    print(f"Trigger dropped; expanding {TABLE} rows ...")
+    rows = update_in_windows(args.dsn, f"messages = {SCHEMA}.expand(messages), "
+                                       f"proxy_server_request = {SCHEMA}.expand(proxy_server_request)",
+                             PACKED, args.window_hours, "expanded")
+    run_sql(args.dsn, f"DROP SCHEMA {SCHEMA} CASCADE;\n")
+    print(f"{rows} rows expanded, {SCHEMA} schema dropped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-addressed prompt store for LiteLLM_SpendLogs")
+    parser.add_argument("--dsn", default=DEFAULT_DSN, help="Postgres URL (default: $DATABASE_URL or mylitellm)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("install", help="create the store and the trigger")
+    command.set_defaults(func=install)
+
+    command = commands.add_parser("migrate", help="pack existing rows")
+    command.add_argument("--window-hours", type=float, default=6, help='"startTime" hours per transaction')
+    command.add_argument("--vacuum-full", action="store_true", help="rewrite the table afterwards (exclusive lock)")
+    command.set_defaults(func=migrate)
+
+    command = commands.add_parser("report", help="space saved")
+    command.add_argument("--since", type=date.fromisoformat, help="only rows from this day (YYYY-MM-DD)")
+    command.set_defaults(func=report)
+
+    command = commands.add_parser("gc", help="delete unreferenced blobs")
+    command.set_defaults(func=gc)
+
+    command = commands.add_parser("uninstall", help="expand rows back inline and drop the store")
+    command.add_argument("--window-hours", type=float, default=6, help='"startTime" hours per transaction')
+    command.set_defaults(func=uninstall)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
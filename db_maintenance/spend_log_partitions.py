@@ -0,0 +1,610 @@
+#!/usr/bin/env python3
+"""
+Daily range partitions and archival for the LiteLLM_SpendLogs table in mylitellm.
+With store_prompts_in_spend_logs every row carries a whole prompt and response,
+so the table grows by gigabytes a day and the UI analytics queries slow down.
+
+  convert   one-time migration of the table to native range partitions by day on
+            "startTime" (stop the proxy first; it holds an exclusive lock while copying)
+  maintain  pre-creates the next days' partitions, moves rows out of the DEFAULT
+            partition, detaches partitions past --retention-days and exports each one
+            with COPY to <archive-dir>/LiteLLM_SpendLogs_pYYYYMMDD.ndjson.zst (or
+            .parquet through the duckdb CLI), then drops it once the row count matches
+  status    partitions, sizes and archive totals
+  query     SQL over the archives through the duckdb CLI, as a `spend_logs` view
+  scan      ndjson rows from the .ndjson.zst archives filtered by date/field, no duckdb needed
+
+Partition names and bounds match LiteLLM's own SpendLogsPartitionManager
+(general_settings.use_spend_logs_partitioning). That manager drops expired partitions
+without exporting them, so keep maximum_spend_logs_retention_period (if set) longer
+than --retention-days. The partitioned table's primary key is (request_id, "startTime");
+rp.sh sets DISABLE_SCHEMA_UPDATE so Prisma's schema push does not try to revert it, and
+runs `migrate` instead:
+
+  migrate   applies LiteLLM's pending Prisma migrations (litellm_proxy_extras) with
+            `prisma migrate deploy`, refusing any that touch the spend-log primary key,
+            and records the LiteLLM version the schema is at; fails when the migrations
+            cannot be found and the version differs from the recorded one
+
+Usage:
+    python spend_log_partitions.py convert [--dry-run] [--keep-old]
+    python spend_log_partitions.py migrate [--dry-run] [--migrations-dir DIR]
+    python spend_log_partitions.py maintain --retention-days 14 [--format parquet]
+    python spend_log_partitions.py status
+    python spend_log_partitions.py query "SELECT model, count(*), sum(spend) FROM spend_logs GROUP BY 1" --since 2026-01-01
+    python spend_log_partitions.py scan --since 2026-01-01 --until 2026-01-08 --where model=gpt-4o
+"""
+
+import argparse
+import importlib.metadata
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+DEFAULT_DSN = os.environ.get("DATABASE_URL", "postgresql://postgres@localhost:5432/mylitellm")
+# db-backup writes its dumps to the directory it is run from; the archives sit next to them
+DEFAULT_ARCHIVE_DIR = os.environ.get("SPEND_LOG_ARCHIVE_DIR", "./spend_logs_archive")
+TABLE = "LiteLLM_SpendLogs"
+DEFAULT_PARTITION = f"{TABLE}_default"
+OLD_TABLE = f"{TABLE}_unpartitioned"
+PARTITION_RE = re.compile(rf"^{TABLE}_p(\d{{8}})$")
+BOUNDS_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+MANIFEST = "manifest.jsonl"
+# table comment recording the LiteLLM version whose migrations the partitioned table has
+SCHEMA_COMMENT = "spend_log_partitions: litellm "
+# a migration that re-keys the spend-log table would undo the partitioned primary key
+KEY_CHANGE_RE = re.compile(rf'"{TABLE}_pkey"|ALTER TABLE "{TABLE}"[^;]*PRIMARY KEY', re.S)
+LOCK_TIMEOUT = "10s"
+# COPY csv with control-character quote/delimiter: JSON text never contains them raw,
+# so row_to_json output comes through unescaped, one document per line
+COPY_JSON_OPTIONS = "FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02'"
+
+
+def quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def partition_name(day):
+    return f"{TABLE}_p{day.strftime('%Y%m%d')}"
+
+
+def partition_day(name):
+    """Start date of a daily partition from its name, or None"""
+    match = PARTITION_RE.match(name)
+    return datetime.strptime(match.group(1), "%Y%m%d").date() if match else None
+
+
+def parse_bounds(bound_expr):
+    """(from, to) dates of "FOR VALUES FROM ('...') TO ('...')"; None for DEFAULT or unparseable"""
+    match = BOUNDS_RE.search(bound_expr or "")
+    if not match:
+        return None
+    try:
+        return tuple(datetime.fromisoformat(value).date() for value in match.groups())
+    except ValueError:
+        return None
+
+
+def format_bytes(n):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024:
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}TiB"
+
+
+# --- psql -------------------------------------------------------------------------------------------------
+
+def psql(dsn, *args):
+    return ["psql", dsn, "-X", "-q", "-v", "ON_ERROR_STOP=1", *args]
+
+
+def run_sql(dsn, sql):
+    """Run a script; psql's errors go straight to stderr"""
+    result = subprocess.run(psql(dsn), input=sql, text=True)
+    if result.returncode != 0:
+        sys.exit(f"psql failed (exit {result.returncode})")
+
+
+def query_rows(dsn, sql):
+    """Rows of a query as lists of strings (NULL -> '')"""
+    result = subprocess.run(psql(dsn, "-A", "-t", "-F", "\t", "-c", sql), capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"psql failed: {result.stderr.strip()}")
+    return [line.split("\t") for line in result.stdout.splitlines() if line]
+
+
+def relkind(dsn, table):
+    rows = query_rows(dsn, f"""
+        SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relname = '{table}' AND n.nspname = current_schema()""")
+    return rows[0][0] if rows else None
+
+
+def attached_partitions(dsn):
+    """[(name, (from, to) or None, estimated rows, bytes)] of the partitioned table"""
+    rows = query_rows(dsn, f"""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), greatest(c.reltuples, 0)::bigint,
+               pg_total_relation_size(c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        JOIN pg_namespace n ON n.oid = p.relnamespace
+        WHERE p.relname = '{TABLE}' AND n.nspname = current_schema()
+        ORDER BY c.relname""")
+    return [(name, parse_bounds(bound), int(estimate), int(size)) for name, bound, estimate, size in rows]
+
+
+def detached_partitions(dsn):
+    """Daily partition tables that are no longer attached: detached but not yet exported"""
+    rows = query_rows(dsn, f"""
+        SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind = 'r' AND n.nspname = current_schema()
+          AND c.relname ~ '^{TABLE}_p[0-9]{{8}}$'
+          AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)
+        ORDER BY 1""")
+    return [row[0] for row in rows]
+
+
+# --- convert ----------------------------------------------------------------------------------------------
+
+def convert_sql(first_day, last_day, primary_key, indexes, views=(), keep_old=False, triggers=()):
+    """
+    Migration script: rename the table, create the partitioned parent and one partition
+    per day (plus DEFAULT), copy the rows, then build the primary key and the original
+    indexes on the parent so each partition gets its own. Dependent views (LiteLLM's
+    spend views, which the proxy only creates on an empty table) are re-pointed, and
+    triggers (prompt_store.py's) are recreated on the parent after the copy.
+    """
+    parent, old = quote(TABLE), quote(OLD_TABLE)
+    lines = [
+        "BEGIN;",
+        f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}';",
+        f"LOCK TABLE {parent} IN ACCESS EXCLUSIVE MODE;",
+        f"ALTER TABLE {parent} RENAME TO {old};",
+    ]
+    if primary_key:
+        lines.append(f"ALTER TABLE {old} RENAME CONSTRAINT {quote(primary_key)} TO {quote(primary_key + '_old')};")
+    for name, _ in indexes:
+        lines.append(f"ALTER INDEX {quote(name)} RENAME TO {quote(name + '_old')};")
+    lines.append(f"CREATE TABLE {parent} (LIKE {old} INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING STORAGE "
+                 f"INCLUDING COMMENTS) PARTITION BY RANGE (\"startTime\");")
+    day = first_day
+    while day <= last_day:
+        lines.append(f"CREATE TABLE {quote(partition_name(day))} PARTITION OF {parent} "
+                     f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}');")
+        day += timedelta(days=1)
+    lines += [
+        f"CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {parent} DEFAULT;",
+        f"INSERT INTO {parent} SELECT * FROM {old};",
+        f"DO $$ BEGIN IF (SELECT count(*) FROM {parent}) <> (SELECT count(*) FROM {old}) "
+        "THEN RAISE EXCEPTION 'row count mismatch after copy'; END IF; END $$;",
+        # a partitioned table's unique keys must include the partition column
+        f"ALTER TABLE {parent} ADD CONSTRAINT {quote(primary_key or TABLE + '_pkey')} "
+        "PRIMARY KEY (request_id, \"startTime\");",
+    ]
+    lines += [definition.rstrip(";") + ";" for _, definition in indexes]
+    lines += [definition.rstrip(";") + ";" for _, definition in triggers]
+    for name, kind, definition in views:
+        if kind == "m":
+            lines += [f"DROP MATERIALIZED VIEW {quote(name)};",
+                      f"CREATE MATERIALIZED VIEW {quote(name)} AS {definition.rstrip().rstrip(';')};"]
+        else:
+            lines.append(f"CREATE OR REPLACE VIEW {quote(name)} AS {definition.rstrip().rstrip(';')};")
+    if not keep_old:
+        lines.append(f"DROP TABLE {old};")
+    lines += ["COMMIT;", f"ANALYZE {parent};"]
+    return "\n".join(lines) + "\n"
+
+
+def convert(args):
+    kind = relkind(args.dsn, TABLE)
+    if kind is None:
+        sys.exit(f"{TABLE} not found; start the proxy once so Prisma creates it")
+    if kind == "p":
+        print(f"{TABLE} is already partitioned")
+        return
+    if relkind(args.dsn, OLD_TABLE) is not None:
+        sys.exit(f"{OLD_TABLE} exists from an earlier --keep-old conversion; drop it first")
+    rows = query_rows(args.dsn, f"""
+        SELECT conname FROM pg_constraint
+        WHERE conrelid = '{quote(TABLE)}'::regclass AND contype = 'p'""")
+    primary_key = rows[0][0] if rows else None
+    indexes = [tuple(row) for row in query_rows(args.dsn, f"""
+        SELECT i.relname, pg_get_indexdef(i.oid)
+        FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = '{quote(TABLE)}'::regclass AND NOT x.indisprimary
+        ORDER BY 1""")]
+    # hex-encoded: view definitions span lines
+    views = [(name, kind, bytes.fromhex(definition).decode()) for name, kind, definition in query_rows(args.dsn, f"""
+        SELECT DISTINCT v.relname, v.relkind, encode(convert_to(pg_get_viewdef(v.oid), 'UTF8'), 'hex')
+        FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        JOIN pg_class v ON v.oid = r.ev_class
+        WHERE d.classid = 'pg_rewrite'::regclass AND d.refobjid = '{quote(TABLE)}'::regclass
+          AND v.oid <> d.refobjid""")]
+    triggers = [tuple(row) for row in query_rows(args.dsn, f"""
+        SELECT tgname, pg_get_triggerdef(oid) FROM pg_trigger
+        WHERE tgrelid = '{quote(TABLE)}'::regclass AND NOT tgisinternal
+        ORDER BY 1""")]
+    first = query_rows(args.dsn, f'SELECT min("startTime")::date FROM {quote(TABLE)}')
+    today = datetime.now(timezone.utc).date()
+    first_day = date.fromisoformat(first[0][0]) if first and first[0][0] else today
+    sql = convert_sql(first_day, today + timedelta(days=args.ahead), primary_key, indexes, views, args.keep_old,
+                      triggers)
+    if args.dry_run:
+        print(sql, end="")
+        return
+    print(f"Converting {TABLE}: {(today - first_day).days + 1 + args.ahead} daily partitions from {first_day} ...")
+    start = time.perf_counter()
+    run_sql(args.dsn, sql)
+    record_schema_version(args.dsn)
+    print(f"Done in {time.perf_counter() - start:.1f}s. Set DISABLE_SCHEMA_UPDATE=True for the proxy and apply "
+          "LiteLLM upgrades with `migrate` (rp.sh does both when the table is partitioned); Prisma's schema push "
+          "would otherwise try to restore the old key.")
+
+
+# --- migrate ----------------------------------------------------------------------------------------------
+
+def litellm_version():
+    """The pinned LiteLLM version (flake.nix exports it), else the installed one"""
+    if os.environ.get("LITELLM_TARGET_VERSION"):
+        return os.environ["LITELLM_TARGET_VERSION"]
+    try:
+        return importlib.metadata.version("litellm")
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def recorded_schema_version(dsn):
+    rows = query_rows(dsn, f"SELECT obj_description('{quote(TABLE)}'::regclass, 'pg_class')")
+    comment = rows[0][0] if rows else ""
+    return comment[len(SCHEMA_COMMENT):] if comment.startswith(SCHEMA_COMMENT) else None
+
+
+def record_schema_version(dsn):
+    version = litellm_version()
+    if version:
+        run_sql(dsn, f"COMMENT ON TABLE {quote(TABLE)} IS '{SCHEMA_COMMENT}{version.replace(chr(39), '')}';")
+
+
+def find_migrations_dir(path=None):
+    """LiteLLM's Prisma migrations: --migrations-dir, else the litellm_proxy_extras package"""
+    if path:
+        return Path(path)
+    try:
+        import litellm_proxy_extras
+    except ImportError:
+        return None
+    return Path(litellm_proxy_extras.__file__).parent / "migrations"
+
+
+def pending_migrations(dsn, migrations_dir):
+    """[(name, touches the primary key)] of the migrations not yet applied, in order"""
+    if relkind(dsn, "_prisma_migrations") is None:
+        sys.exit("_prisma_migrations not found: this database was created without Prisma migrations; "
+                 "start the proxy once on an unpartitioned table so LiteLLM baselines it")
+    applied = {row[0] for row in query_rows(
+        dsn, "SELECT migration_name FROM _prisma_migrations WHERE finished_at IS NOT NULL")}
+    pending = []
+    for path in sorted(p for p in migrations_dir.iterdir() if (p / "migration.sql").is_file()):
+        if path.name not in applied:
+            pending.append((path.name, bool(KEY_CHANGE_RE.search((path / "migration.sql").read_text()))))
+    return pending
+
+
+def migrate(args):
+    """
+    Apply LiteLLM's migrations to a database whose spend-log table is partitioned. Prisma's
+    startup push is disabled there (DISABLE_SCHEMA_UPDATE), so a LiteLLM upgrade's schema
+    changes would otherwise never reach the database.
+    """
+    if relkind(args.dsn, TABLE) != "p":
+        print(f"{TABLE} is not partitioned; the proxy applies its own migrations")
+        return
+    version, recorded = litellm_version(), recorded_schema_version(args.dsn)
+    migrations_dir = find_migrations_dir(args.migrations_dir)
+    if migrations_dir is None or not migrations_dir.is_dir():
+        if version and recorded == version:
+            print(f"Schema recorded at litellm {version}; LiteLLM's migrations not found, nothing to check")
+            return
+        sys.exit(f"LiteLLM is {version or 'unknown'} but the partitioned schema was migrated for "
+                 f"{recorded or 'an unrecorded version'}, and LiteLLM's migrations (litellm_proxy_extras) were not "
+                 "found. Run this from the proxy's environment or pass --migrations-dir.")
+    pending = pending_migrations(args.dsn, migrations_dir)
+    if args.dry_run:
+        print("\n".join(f"{name}{' (changes the primary key)' if key else ''}" for name, key in pending)
+              or "No pending migrations")
+        return
+    conflicts = [name for name, touches_key in pending if touches_key]
+    if conflicts:
+        sys.exit(f"Pending LiteLLM migrations change the {TABLE} primary key: {', '.join(conflicts)}. Apply them "
+                 "by hand without the key change, then mark them applied with "
+                 f"`prisma migrate resolve --applied <name> --schema {migrations_dir.parent / 'schema.prisma'}`.")
+    if pending:
+        print(f"Applying {len(pending)} LiteLLM migration(s): {', '.join(name for name, _ in pending)}")
+        result = subprocess.run(
+            ["prisma", "migrate", "deploy", "--schema", str(migrations_dir.parent / "schema.prisma")],
+            env=dict(os.environ, DATABASE_URL=args.dsn))
+        if result.returncode != 0:
+            sys.exit(f"prisma migrate deploy failed (exit {result.returncode})")
+    if version and version != recorded:
+        record_schema_version(args.dsn)
+    print(f"{TABLE} schema up to date{f' with litellm {version}' if version else ''}")
+
+
+# --- maintain ---------------------------------------------------------------------------------------------
+
+def ensure_partition_sql(day):
+    """
+    Create one daily partition, moving any rows for that day out of DEFAULT first
+    (attaching a range DEFAULT already holds rows for would fail).
+    """
+    name, parent, default = quote(partition_name(day)), quote(TABLE), quote(DEFAULT_PARTITION)
+    lower, upper = day.isoformat(), (day + timedelta(days=1)).isoformat()
+    return "\n".join([
+        "BEGIN;",
+        f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}';",
+        f"CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING STORAGE);",
+        f"WITH moved AS (DELETE FROM {default} WHERE \"startTime\" >= '{lower}' AND \"startTime\" < '{upper}' "
+        f"RETURNING *) INSERT INTO {name} SELECT * FROM moved;",
+        f"ALTER TABLE {parent} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}');",
+        "COMMIT;",
+    ]) + "\n"
+
+
+def ensure_partitions(dsn, ahead):
+    """Partitions for today + ahead days and for any day that has rows in DEFAULT"""
+    attached = {name for name, *_ in attached_partitions(dsn)}
+    detached = set(detached_partitions(dsn))
+    today = datetime.now(timezone.utc).date()
+    days = {today + timedelta(days=i) for i in range(ahead + 1)}
+    if DEFAULT_PARTITION in attached:
+        days |= {date.fromisoformat(row[0]) for row in query_rows(
+            dsn, f'SELECT DISTINCT "startTime"::date FROM {quote(DEFAULT_PARTITION)}')}
+    created = []
+    for day in sorted(days):
+        name = partition_name(day)
+        if name in attached:
+            continue
+        if name in detached:
+            print(f"  {name} is detached and not yet exported; rows for {day} stay in DEFAULT")
+            continue
+        run_sql(dsn, ensure_partition_sql(day))
+        created.append(name)
+    return created
+
+
+def export_partition(dsn, name, archive_dir, fmt, zstd_level):
+    """COPY a detached partition to the archive; returns (path, rows) once verified"""
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    expected = int(query_rows(dsn, f"SELECT count(*) FROM {quote(name)}")[0][0])
+    ndjson = archive_dir / f"{name}.ndjson.zst"
+    partial = ndjson.with_name(ndjson.name + ".part")
+    rows = f"SELECT row_to_json(t) FROM {quote(name)} t"
+    if query_rows(dsn, "SELECT to_regprocedure('prompt_store.expand(jsonb)') IS NOT NULL")[0][0] == "t":
+        # rows packed by prompt_store.py: archive the messages themselves, not references
+        rows = (f"SELECT to_jsonb(t) || jsonb_build_object('messages', prompt_store.expand(t.messages), "
+                f"'proxy_server_request', prompt_store.expand(t.proxy_server_request)) FROM {quote(name)} t")
+    copy = f"COPY ({rows}) TO STDOUT WITH ({COPY_JSON_OPTIONS})"
+    lines = 0
+    with open(partial, "wb") as out:
+        reader = subprocess.Popen(psql(dsn, "-c", copy), stdout=subprocess.PIPE)
+        writer = subprocess.Popen(["zstd", "-q", "-T0", f"-{zstd_level}", "-c"], stdin=subprocess.PIPE, stdout=out)
+        while chunk := reader.stdout.read(1 << 20):
+            lines += chunk.count(b"\n")
+            writer.stdin.write(chunk)
+        writer.stdin.close()
+        if reader.wait() != 0 or writer.wait() != 0:
+            partial.unlink(missing_ok=True)
+            raise RuntimeError(f"export of {name} failed (psql {reader.returncode}, zstd {writer.returncode})")
+    if lines != expected:
+        partial.unlink(missing_ok=True)
+        raise RuntimeError(f"export of {name} wrote {lines} rows, expected {expected}")
+    if fmt == "parquet":
+        path = archive_dir / f"{name}.parquet"
+        # maximum_depth=1 keeps messages/response/metadata as JSON values instead of inferring structs
+        duckdb(f"COPY (SELECT * FROM read_json('{partial}', format='newline_delimited', compression='zstd', "
+               f"maximum_depth=1)) TO '{path}' (FORMAT parquet, COMPRESSION zstd)")
+        written = int(duckdb(f"SELECT count(*) FROM read_parquet('{path}')", "-list", "-noheader").strip())
+        partial.unlink()
+        if written != expected:
+            path.unlink(missing_ok=True)
+            raise RuntimeError(f"parquet export of {name} has {written} rows, expected {expected}")
+    else:
+        path = ndjson
+        partial.rename(path)
+    return path, expected
+
+
+def archive(dsn, retention_days, archive_dir, fmt, zstd_level):
+    """Detach partitions older than the retention window, export and drop them"""
+    cutoff = datetime.now(timezone.utc).date() - timedelta(days=retention_days)
+    for name, bounds, _, _ in attached_partitions(dsn):
+        if bounds is not None and bounds[1] <= cutoff and PARTITION_RE.match(name):
+            run_sql(dsn, f"SET lock_timeout = '{LOCK_TIMEOUT}';\n"
+                         f"ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)};\n")
+            print(f"  detached {name}")
+    archived = []
+    for name in detached_partitions(dsn):
+        start = time.perf_counter()
+        try:
+            path, rows = export_partition(dsn, name, archive_dir, fmt, zstd_level)
+        except RuntimeError as e:
+            print(f"  {e}; {name} kept for the next run")
+            continue
+        size = path.stat().st_size
+        day = partition_day(name)
+        with open(archive_dir / MANIFEST, "a") as manifest:
+            manifest.write(json.dumps({
+                "partition": name, "from": day.isoformat(), "to": (day + timedelta(days=1)).isoformat(),
+                "rows": rows, "file": path.name, "bytes": size,
+                "archived_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }) + "\n")
+        run_sql(dsn, f"DROP TABLE {quote(name)};\n")
+        print(f"  archived {name}: {rows} rows -> {path} ({format_bytes(size)}, {time.perf_counter() - start:.1f}s)")
+        archived.append(name)
+    return archived
+
+
+def maintain(args):
+    if relkind(args.dsn, TABLE) != "p":
+        sys.exit(f"{TABLE} is not partitioned; run `convert` first")
+    if args.format == "parquet" and not shutil.which("duckdb"):
+        sys.exit("--format parquet needs the duckdb CLI")
+    print(f"Spend-log partitions ({args.dsn})")
+    created = ensure_partitions(args.dsn, args.ahead)
+    print(f"  {len(created)} partition(s) created" + (f": {', '.join(created)}" if created else ""))
+    archived = archive(args.dsn, args.retention_days, Path(args.archive_dir), args.format, args.zstd_level)
+    print(f"  {len(archived)} partition(s) archived to {args.archive_dir}")
+
+
+# --- status -----------------------------------------------------------------------------------------------
+
+def status(args):
+    kind = relkind(args.dsn, TABLE)
+    if kind != "p":
+        print(f"{TABLE} is {'not partitioned' if kind else 'missing'}")
+        return
+    partitions = attached_partitions(args.dsn)
+    print(f"{'partition':<32} {'range':<25} {'rows (est.)':>12} {'size':>10}")
+    print("=" * 82)
+    for name, bounds, rows, size in partitions:
+        span = f"{bounds[0]} .. {bounds[1]}" if bounds else "DEFAULT"
+        print(f"{name:<32} {span:<25} {rows:>12} {format_bytes(size):>10}")
+    print(f"{'total':<32} {'':<25} {sum(p[2] for p in partitions):>12} "
+          f"{format_bytes(sum(p[3] for p in partitions)):>10}")
+    recorded = recorded_schema_version(args.dsn)
+    print(f"\nSchema migrated for litellm {recorded or '(unrecorded; run migrate)'}")
+    pending = detached_partitions(args.dsn)
+    if pending:
+        print(f"\nDetached, awaiting export: {', '.join(pending)}")
+    archive_dir = Path(args.archive_dir)
+    files = archive_files(archive_dir)
+    if files:
+        print(f"\nArchive {archive_dir}: {len(files)} file(s), {format_bytes(sum(f.stat().st_size for f in files))}, "
+              f"{partition_day(archive_stem(files[0]))} .. {partition_day(archive_stem(files[-1]))}")
+
+
+# --- archive queries --------------------------------------------------------------------------------------
+
+def archive_stem(path):
+    return path.name.split(".", 1)[0]
+
+
+def archive_files(archive_dir, since=None, until=None):
+    """Archive files whose day lies in [since, until], oldest first"""
+    files = []
+    for path in sorted(Path(archive_dir).glob(f"{TABLE}_p*")):
+        day = partition_day(archive_stem(path))
+        if day is None or not path.name.endswith((".ndjson.zst", ".parquet")):
+            continue
+        if (since and day < since) or (until and day > until):
+            continue
+        files.append(path)
+    return files
+
+
+def duckdb(sql, *options):
+    result = subprocess.run(["duckdb", *options, "-c", sql], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"duckdb failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+def spend_logs_view(files):
+    """duckdb view over the archive files (ndjson.zst and parquet can be mixed)"""
+    ndjson = [str(f) for f in files if f.name.endswith(".ndjson.zst")]
+    parquet = [str(f) for f in files if f.name.endswith(".parquet")]
+    parts = []
+    if ndjson:
+        parts.append(f"SELECT * FROM read_json({ndjson!r}, format='newline_delimited', compression='zstd', "
+                     "maximum_depth=1, union_by_name=true)")
+    if parquet:
+        parts.append(f"SELECT * FROM read_parquet({parquet!r}, union_by_name=true)")
+    return "CREATE VIEW spend_logs AS " + " UNION ALL BY NAME ".join(parts) + ";"
+
+
+def query(args):
+    if not shutil.which("duckdb"):
+        sys.exit("query needs the duckdb CLI; `scan` filters .ndjson.zst archives without it")
+    files = archive_files(args.archive_dir, args.since, args.until)
+    if not files:
+        sys.exit(f"no archives in {args.archive_dir} for that range")
+    try:
+        print(duckdb(spend_logs_view(files) + "\n" + args.sql, f"-{args.output}"), end="")
+    except RuntimeError as e:
+        sys.exit(str(e))
+
+
+def scan(args):
+    """Stream archived rows as ndjson, filtered by startTime and field=value"""
+    filters = [w.split("=", 1) for w in args.where]
+    since = args.since.isoformat() if args.since else None
+    until = (args.until + timedelta(days=1)).isoformat() if args.until else None
+    for path in archive_files(args.archive_dir, args.since, args.until):
+        if not path.name.endswith(".ndjson.zst"):
+            print(f"skipping {path.name}: parquet archives need `query`", file=sys.stderr)
+            continue
+        with subprocess.Popen(["zstd", "-dcq", str(path)], stdout=subprocess.PIPE, text=True) as reader:
+            for line in reader.stdout:
+                row = json.loads(line)
+                start = row.get("startTime") or ""
+                if (since and start < since) or (until and start >= until):
+                    continue
+                if all(str(row.get(field)) == value for field, value in filters):
+                    sys.stdout.write(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daily partitions and archival for LiteLLM_SpendLogs")
+    parser.add_argument("--dsn", default=DEFAULT_DSN, help="Postgres URL (default: $DATABASE_URL or mylitellm)")
+    parser.add_argument("--archive-dir", default=DEFAULT_ARCHIVE_DIR,
+                        help="archive directory (default: $SPEND_LOG_ARCHIVE_DIR or ./spend_logs_archive)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("convert", help="migrate the table to daily range partitions")
+    command.add_argument("--ahead", type=int, default=7, help="days of partitions to create beyond today")
+    command.add_argument("--dry-run", action="store_true", help="print the migration SQL only")
+    command.add_argument("--keep-old", action="store_true", help=f"keep the original table as {OLD_TABLE}")
+    command.set_defaults(func=convert)
+
+    command = commands.add_parser("migrate", help="apply LiteLLM's pending schema migrations to the partitioned table")
+    command.add_argument("--dry-run", action="store_true", help="list the pending migrations only")
+    command.add_argument("--migrations-dir", help="LiteLLM's Prisma migrations (default: from litellm_proxy_extras)")
+    command.set_defaults(func=migrate)
+
+    command = commands.add_parser("maintain", help="create upcoming partitions, archive expired ones")
+    command.add_argument("--ahead", type=int, default=7, help="days of partitions to keep ready beyond today")
+    command.add_argument("--retention-days", type=int, default=14, help="days kept in Postgres")
+    command.add_argument("--format", choices=("ndjson", "parquet"), default="ndjson")
+    command.add_argument("--zstd-level", type=int, default=9)
+    command.set_defaults(func=maintain)
+
+    command = commands.add_parser("status", help="partitions, sizes and archive totals")
+    command.set_defaults(func=status)
+
+    for name, func, help_text in (("query", query, "SQL over the archives (duckdb)"),
+                                  ("scan", scan, "archived rows as ndjson, no duckdb needed")):
+        command = commands.add_parser(name, help=help_text)
+        if name == "query":
+            command.add_argument("sql", help="SQL over the `spend_logs` view")
+            command.add_argument("--output", choices=("box", "csv", "json", "markdown"), default="box")
+        else:
+            command.add_argument("--where", action="append", default=[], metavar="FIELD=VALUE")
+        command.add_argument("--since", type=date.fromisoformat, help="first day (YYYY-MM-DD)")
+        command.add_argument("--until", type=date.fromisoformat, help="last day, inclusive")
+        command.set_defaults(func=func)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Live cache observability daemon.
+Subscribes to Redis keyevent notifications (set/hset/expired/evicted/del) and to the
+per-request events published by litellm_hooks.cache_events, then streams a per-model,
+per-key-prefix log of hit/miss/store/expire/evict events with rolling hit-rate windows.
+Unlike diffing the global keyspace_hits/keyspace_misses counters, other Redis clients
+(rate limiter, spend/budget keys) cannot pollute the numbers.
+
+Usage:
+    python redis_cache_events.py [--url redis://localhost:6379/0] [--windows 60,300] [--log events.jsonl]
+"""
+
+import argparse
+import json
+import signal
+import sys
+import time
+from collections import Counter, OrderedDict, defaultdict, deque
+from pathlib import Path
+
+from redis_cache_inspector import get_connection, key_prefix
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from litellm_hooks.common import CACHE_EVENTS_CHANNEL as CHANNEL
+
+# E = keyevent channels, g = generic (del/expire), $ = string, h = hash, x = expired, e = evicted
+NOTIFY_FLAGS = "Eg$hxe"
+CACHE_PREFIXES = ("<hash>", "litellm_semantic_cache_index")
+KEYEVENTS = {"set": "store", "hset": "store", "expired": "expire", "evicted": "evict", "del": "delete"}
+# How long a miss waits for its cache write (semantic entries are keyed independently of the request)
+STORE_MATCH_WINDOW = 10.0
+MAX_TRACKED_KEYS = 200000
+
+
+class RollingWindow:
+    """Hit/miss counts and latencies over the last `seconds`"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.events = deque()
+
+    def add(self, t, hit, latency):
+        self.events.append((t, hit, latency))
+        self.expire(t)
+
+    def expire(self, now):
+        while self.events and now - self.events[0][0] > self.seconds:
+            self.events.popleft()
+
+    def hit_rate(self):
+        if not self.events:
+            return None
+        return sum(1 for _, hit, _ in self.events if hit) / len(self.events)
+
+
+class CacheEventTracker:
+    """Correlates proxy request events with keyspace notifications"""
+
+    def __init__(self, windows=(60, 300), prefixes=CACHE_PREFIXES, log_file=None, quiet=False):
+        self.window_sizes = windows
+        self.windows = defaultdict(lambda: [RollingWindow(w) for w in self.window_sizes])
+        self.prefixes = set(prefixes)
+        self.counts = defaultdict(Counter)  # (model, prefix) -> event counts
+        self.latency = defaultdict(lambda: {"hit": [0, 0.0], "miss": [0, 0.0]})
+        self.key_owner = OrderedDict()  # cache key -> model that stored it
+        self.pending_misses = deque()  # (t, model, cache_key) awaiting their store
+        self.log_file = log_file
+        self.quiet = quiet
+
+    def emit(self, t, kind, model, prefix, key, extra=""):
+        """Write one event to stdout and the optional JSONL log"""
+        model = model or "?"
+        self.counts[(model, prefix)][kind] += 1
+        if not self.quiet:
+            rates = " ".join(
+                f"{w.seconds}s:{'-' if w.hit_rate() is None else f'{w.hit_rate() * 100:.0f}%'}"
+                for w in self.windows[model]
+            )
+            stamp = time.strftime("%H:%M:%S", time.localtime(t))
+            print(f"{stamp} {kind.upper():<7} {model[:32]:<32} {prefix[:28]:<28} {(key or '')[:16]:<16} "
+                  f"{extra:<18} hit-rate {rates}")
+        if self.log_file:
+            self.log_file.write(json.dumps({"t": t, "event": kind, "model": model, "prefix": prefix,
+                                            "key": key, "detail": extra}) + "\n")
+            self.log_file.flush()
+
+    def remember(self, key, model):
+        self.key_owner[key] = model
+        self.key_owner.move_to_end(key)
+        while len(self.key_owner) > MAX_TRACKED_KEYS:
+            self.key_owner.popitem(last=False)
+
+    def on_request(self, event):
+        """Per-request event from litellm_hooks.cache_events"""
+        t, model, key = event["t"], event.get("model"), event.get("cache_key")
+        if event.get("error"):
+            self.emit(t, "error", model, "-", key, event["error"][:18])
+            return
+        hit = event.get("cache_hit", False)
+        latency = event.get("latency") or 0.0
+        for window in self.windows[model]:
+            window.add(t, hit, latency)
+        bucket = self.latency[model]["hit" if hit else "miss"]
+        bucket[0] += 1
+        bucket[1] += latency
+        if not hit:
+            self.pending_misses.append((t, model, key))
+        self.emit(t, "hit" if hit else "miss", model, key_prefix(key) if key else "-", key, f"{latency:.3f}s")
+
+    def on_keyevent(self, t, event, key):
+        """Keyevent notification for one key"""
+        kind = KEYEVENTS.get(event)
+        prefix = key_prefix(key)
+        if kind is None or prefix not in self.prefixes:
+            return
+        model = self.key_owner.get(key)
+        if kind == "store":
+            model = self._match_store(t, key) or model
+            if model:
+                self.remember(key, model)
+        else:
+            self.key_owner.pop(key, None)
+        self.emit(t, kind, model, prefix, key)
+
+    def _match_store(self, t, key):
+        """Attribute a cache write to the miss that caused it: exact key match, else the oldest recent miss"""
+        while self.pending_misses and t - self.pending_misses[0][0] > STORE_MATCH_WINDOW:
+            self.pending_misses.popleft()
+        for i, (_, model, cache_key) in enumerate(self.pending_misses):
+            if cache_key == key:
+                del self.pending_misses[i]
+                return model
+        if self.pending_misses:
+            return self.pending_misses.popleft()[1]
+        return None
+
+    def print_summary(self):
+        """Per-model latency savings and per-model/prefix event totals"""
+        print("\n=== Cache Attribution Summary ===")
+        for model, lat in sorted(self.latency.items()):
+            hits, hit_time = lat["hit"]
+            misses, miss_time = lat["miss"]
+            total = hits + misses
+            line = f"{model}: {hits}/{total} hits ({hits / total * 100:.1f}%)" if total else f"{model}: no requests"
+            if hits and misses:
+                saved = hits * (miss_time / misses - hit_time / hits)
+                line += f", avg miss {miss_time / misses:.3f}s vs hit {hit_time / hits:.3f}s, ~{saved:.1f}s saved"
+            print(f"  {line}")
+        print("\nEvents by model / key prefix:")
+        for (model, prefix), counts in sorted(self.counts.items()):
+            detail = ", ".join(f"{k}={v}" for k, v in sorted(counts.items()))
+            print(f"  {model[:32]:<32} {prefix[:28]:<28} {detail}")
+
+
+def enable_notifications(conn):
+    """Turn on the keyspace notification classes we need; returns the previous setting"""
+    config = {_decode(k): _decode(v) for k, v in conn.config_get("notify-keyspace-events").items()}
+    previous = config.get("notify-keyspace-events", "")
+    wanted = "".join(sorted(set(previous) | set(NOTIFY_FLAGS)))
+    conn.config_set("notify-keyspace-events", wanted)
+    return previous, wanted
+
+
+def _decode(value):
+    return value.decode("utf-8", errors="replace") if isinstance(value, bytes) else value
+
+
+def run(conn, tracker, db=0):
+    """Blocking event loop over the pub/sub connection"""
+    pubsub = conn.pubsub(ignore_subscribe_messages=True)
+    pubsub.psubscribe(f"__keyevent@{db}__:*")
+    pubsub.subscribe(CHANNEL)
+    while True:
+        message = pubsub.get_message(timeout=1.0)
+        if message is None:
+            continue
+        channel = _decode(message["channel"])
+        data = _decode(message["data"])
+        if channel == CHANNEL:
+            try:
+                tracker.on_request(json.loads(data))
+            except (ValueError, KeyError):
+                continue
+        else:
+            tracker.on_keyevent(time.time(), channel.rsplit(":", 1)[-1], data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request cache hit attribution via keyspace notifications")
+    parser.add_argument("--url", help="Redis URL (default: $REDIS_URL or redis://localhost:6379/0)")
+    parser.add_argument("--db", type=int, default=0)
+    parser.add_argument("--windows", default="60,300", help="rolling hit-rate windows in seconds")
+    parser.add_argument("--prefixes", default=",".join(CACHE_PREFIXES), help="key prefixes treated as cache entries")
+    parser.add_argument("--log", help="append every event as JSONL to this file")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary on exit")
+    parser.add_argument("--keep-notifications", action="store_true",
+                        help="leave notify-keyspace-events enabled on exit")
+    args = parser.parse_args()
+
+    conn = get_connection(args.url)
+    log_file = open(args.log, "a") if args.log else None
+    tracker = CacheEventTracker(
+        windows=[int(w) for w in args.windows.split(",") if w],
+        prefixes=[p for p in args.prefixes.split(",") if p],
+        log_file=log_file,
+        quiet=args.quiet,
+    )
+    previous, wanted = enable_notifications(conn)
+    print("LiteLLM Cache Event Monitor (Ctrl-C to stop)")
+    print(f"notify-keyspace-events: '{previous}' -> '{wanted}'; listening on {CHANNEL}")
+    print("=" * 70)
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        run(conn, tracker, args.db)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        if not args.keep_notifications:
+            conn.config_set("notify-keyspace-events", previous)
+        if log_file:
+            log_file.close()
+        tracker.print_summary()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Redis cache inspector for the LiteLLM cache.
+Walks the keyspace with incremental SCAN and batches TTL/TYPE/MEMORY USAGE
+lookups into pipelines, so large caches are inspected without `KEYS *`
+blocking Redis for every proxy sharing it.
+
+Usage:
+    python redis_cache_inspector.py [--url redis://localhost:6379/0] [--match 'pattern'] [--count 1000]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+DEFAULT_REDIS_URL = "redis://localhost:6379/0"
+
+# Upper bounds (seconds, exclusive) of the TTL histogram buckets
+TTL_BUCKETS = [
+    (10, "<10s"),
+    (60, "10s-1m"),
+    (300, "1m-5m"),
+    (900, "5m-15m"),
+    (3600, "15m-1h"),
+    (86400, "1h-1d"),
+]
+TTL_NO_EXPIRY = "no expiry"
+TTL_OVERFLOW = ">=1d"
+
+HEX_KEY = re.compile(r"^[0-9a-f]{32,}$")
+
+
+def get_connection(url=None):
+    """Open a Redis connection (--url, then REDIS_URL, then localhost:6379)"""
+    if redis is None:
+        print("The 'redis' package is required: poetry run pip install redis")
+        sys.exit(1)
+    return redis.Redis.from_url(url or os.environ.get("REDIS_URL", DEFAULT_REDIS_URL))
+
+
+def key_prefix(key):
+    """Group a key by its first ':' segment; bare hash keys are LiteLLM exact-match cache entries"""
+    if isinstance(key, bytes):
+        key = key.decode("utf-8", errors="replace")
+    if ":" in key:
+        return key.split(":", 1)[0]
+    if HEX_KEY.match(key):
+        return "<hash>"
+    return key
+
+
+def ttl_bucket(ttl):
+    """Label for the TTL histogram bucket containing ttl"""
+    if ttl < 0:
+        return TTL_NO_EXPIRY
+    for upper, label in TTL_BUCKETS:
+        if ttl < upper:
+            return label
+    return TTL_OVERFLOW
+
+
+class CacheStats:
+    """Running aggregate of a keyspace walk"""
+
+    def __init__(self):
+        self.keys = 0
+        self.vanished = 0
+        self.types = Counter()
+        self.ttl_histogram = Counter()
+        self.ttl_min = None
+        self.ttl_max = None
+        self.ttl_sum = 0
+        self.ttl_count = 0
+        self.bytes_by_prefix = defaultdict(int)
+        self.keys_by_prefix = Counter()
+        self.samples = []
+
+    def add(self, key, ttl, key_type, memory):
+        """Fold one key's TTL/TYPE/MEMORY USAGE into the aggregate"""
+        if ttl == -2 or key_type == "none":
+            # expired or deleted between SCAN and the pipeline
+            self.vanished += 1
+            return
+        self.keys += 1
+        self.types[key_type] += 1
+        self.ttl_histogram[ttl_bucket(ttl)] += 1
+        if ttl >= 0:
+            self.ttl_min = ttl if self.ttl_min is None else min(self.ttl_min, ttl)
+            self.ttl_max = ttl if self.ttl_max is None else max(self.ttl_max, ttl)
+            self.ttl_sum += ttl
+            self.ttl_count += 1
+        prefix = key_prefix(key)
+        self.keys_by_prefix[prefix] += 1
+        self.bytes_by_prefix[prefix] += memory or 0
+        if len(self.samples) < 5 and ttl > 0:
+            self.samples.append((key, ttl))
+
+    @property
+    def total_bytes(self):
+        return sum(self.bytes_by_prefix.values())
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def scan_cache_entries(conn, match="*", count=1000, stats=None):
+    """
+    Walk the keyspace with SCAN, pipelining TTL/TYPE/MEMORY USAGE per batch.
+    Yields the running CacheStats after every batch so callers can stream progress.
+    """
+    stats = stats or CacheStats()
+    cursor = 0
+    while True:
+        cursor, keys = conn.scan(cursor=cursor, match=match, count=count)
+        if keys:
+            pipe = conn.pipeline(transaction=False)
+            for key in keys:
+                pipe.ttl(key)
+                pipe.type(key)
+                pipe.memory_usage(key)
+            results = pipe.execute(raise_on_error=False)
+            for i, key in enumerate(keys):
+                ttl, key_type, memory = results[3 * i:3 * i + 3]
+                if isinstance(ttl, Exception):
+                    continue
+                if isinstance(memory, Exception):
+                    memory = None
+                stats.add(key, ttl, _decode(key_type), memory)
+            yield stats
+        if cursor == 0:
+            break
+
+
+def get_config(conn, pattern="*"):
+    """CONFIG GET as a dict"""
+    return {_decode(k): _decode(v) for k, v in conn.config_get(pattern).items()}
+
+
+def get_info_stats(conn):
+    """INFO stats as a dict"""
+    return conn.info("stats")
+
+
+def format_bytes(n):
+    """Human readable byte count"""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(n) < 1024 or unit == "GiB":
+            return f"{n:.0f}B" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+
+
+def print_progress(stats, started):
+    """One-line running summary"""
+    elapsed = time.time() - started
+    rate = stats.keys / elapsed if elapsed > 0 else 0
+    print(f"\r  scanned {stats.keys} keys, {format_bytes(stats.total_bytes)} "
+          f"({rate:.0f} keys/s)", end="", flush=True)
+
+
+def print_report(stats):
+    """Print the aggregate TTL histogram, type breakdown and bytes per prefix"""
+    print(f"\nTotal Redis keys: {stats.keys}")
+    if stats.vanished:
+        print(f"Keys expired/deleted during scan: {stats.vanished}")
+    print(f"Total memory (MEMORY USAGE): {format_bytes(stats.total_bytes)}")
+
+    print("\nType breakdown:")
+    for key_type, n in stats.types.most_common():
+        print(f"  {key_type:<12} {n}")
+
+    print("\nTTL histogram:")
+    for label in [TTL_NO_EXPIRY] + [b[1] for b in TTL_BUCKETS] + [TTL_OVERFLOW]:
+        if stats.ttl_histogram[label]:
+            print(f"  {label:<10} {stats.ttl_histogram[label]}")
+    if stats.ttl_count:
+        print(f"TTL range: {stats.ttl_min}s to {stats.ttl_max}s")
+        print(f"Average TTL: {stats.ttl_sum / stats.ttl_count:.1f}s")
+
+    print("\nBytes per key prefix:")
+    for prefix, n in sorted(stats.bytes_by_prefix.items(), key=lambda kv: -kv[1]):
+        keys = stats.keys_by_prefix[prefix]
+        print(f"  {prefix[:40]:<40} {keys:>8} keys {format_bytes(n):>10} "
+              f"({format_bytes(n / keys) if keys else '0B'}/key)")
+
+    if stats.samples:
+        print("\nSample cache keys:")
+        for key, ttl in stats.samples:
+            print(f"  {_decode(key)[:50]}... -> TTL: {ttl}s")
+
+
+def inspect_cache(conn, match="*", count=1000, progress=True):
+    """Walk the keyspace, streaming progress, and return the final CacheStats"""
+    started = time.time()
+    stats = CacheStats()
+    for stats in scan_cache_entries(conn, match=match, count=count, stats=stats):
+        if progress:
+            print_progress(stats, started)
+    if progress:
+        print()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--url", help=f"Redis URL (default: $REDIS_URL or {DEFAULT_REDIS_URL})")
+    parser.add_argument("--match", default="*", help="SCAN MATCH pattern")
+    parser.add_argument("--count", type=int, default=1000, help="SCAN COUNT hint / pipeline batch size")
+    args = parser.parse_args()
+
+    conn = get_connection(args.url)
+    print("LiteLLM Redis Cache Inspector")
+    print("=" * 50)
+    stats = inspect_cache(conn, match=args.match, count=args.count)
+    print_report(stats)
+
+
+if __name__ == "__main__":
+    main()
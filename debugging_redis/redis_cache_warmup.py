@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+Semantic cache warm-up from historical traffic.
+After a postgres-reset or a Redis restart the redis-semantic cache starts empty and
+the first hours of agent traffic pay full LLM latency. This replays past successful
+completions into the index instead: prompt/response pairs are read from
+LiteLLM_SpendLogs in mylitellm (needs store_prompts_in_spend_logs) or from a
+litellm_hooks.traffic_capture capture (with bodies: true), prompts are embedded in
+large batches through the proxy's /v1/embeddings (same embedding model as the
+cache, and embedding_memo sees them), and entries are loaded with redisvl's
+pipelined bulk writes.
+
+The spend-log source is lossy: LiteLLM shortens every string longer than
+MAX_STRING_LENGTH_PROMPT_IN_DB (2048 characters by default) to its head and tail
+around a "litellm_truncated" note, in both proxy_server_request and response, and
+masks credential-like values as REDACTED_BY_LITELM. Such a row no longer holds the
+prompt a live request would send, nor the whole answer, so rows carrying either
+marker are skipped (reported as lossy). Agent traffic with long histories is mostly
+skipped for that reason; raise MAX_STRING_LENGTH_PROMPT_IN_DB on the proxy, or warm
+from a traffic_capture capture, which keeps bodies whole.
+
+Entries land exactly where live lookups look for them:
+  - the index LiteLLM would open (including its _isolated fallback), with the
+    vector_index_params vector field when that hook is configured,
+  - the scope key the request was logged with (the spend log's cache_key column;
+    recomputed with litellm's Cache.get_cache_key when absent),
+  - prefix_cache's history-chain key and tail-only prompt for long conversations,
+    when that hook is configured.
+With adaptive_ttl configured, a prompt seen n times in the history is stored as if
+it had n - 1 hits (TTL and LFU score), and the budget is trimmed as it fills;
+otherwise entries get cache_params.ttl (--ttl overrides both).
+
+Progress is checkpointed in Redis (cache_warmup:progress) after every page, so an
+interrupted run resumes where it stopped, and a Redis restart, which empties the
+cache, also starts the next warm-up from the beginning. --rate caps the entries
+written per second so live traffic keeps the embedder and Redis.
+
+Usage:
+    python redis_cache_warmup.py [--since 2026-10-01] [--rate 200]
+    python redis_cache_warmup.py --jsonl captures/ --ttl 3600
+    python redis_cache_warmup.py --restart --limit 50000 --base-url http://localhost:4000
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+import httpx
+
+WRAPPER_DIR = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(WRAPPER_DIR), str(WRAPPER_DIR / "db_maintenance"), str(WRAPPER_DIR / "perf")]
+from loadgen import read_jsonl
+from redis_cache_inspector import format_bytes, get_connection
+from spend_log_partitions import DEFAULT_DSN, TABLE, query_rows, quote
+
+CONFIG_FILE = WRAPPER_DIR / "proxy_server_config-local-example.yaml"
+DEFAULT_BASE_URL = os.environ.get("LITELLM_BASE_URL", "http://localhost:4000")
+DEFAULT_API_KEY = os.environ.get("LITELLM_API_KEY", "sk-1234")
+PROGRESS_KEY = "cache_warmup:progress"
+# spend-log cache_key when the request bypassed the cache
+CACHE_OFF = "Cache OFF"
+# notes LiteLLM leaves in spend-log payloads it truncated or credential-masked
+LOSSY_MARKERS = ("litellm_truncated", "REDACTED_BY_LITELM")
+# call types whose responses the semantic cache stores
+CALL_TYPES = ("acompletion", "completion")
+# request and capture fields that are not completion parameters (the scope key is computed without them)
+NON_PARAMS = ("messages", "metadata", "litellm_metadata", "proxy_server_request", "response", "timestamp",
+              "cache_key", "api_key", "team_id", "organization_id", "id", "call_type", "deployment", "status",
+              "cache_hit", "latency", "ttft", "prompt_tokens", "completion_tokens", "message_hashes", "error")
+
+
+def load_config(path):
+    import yaml
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+
+# --- sources ----------------------------------------------------------------------------------------------
+
+def spend_log_pages(dsn, after=None, since=None, page_size=1000):
+    """
+    Successful, uncached completions in ("startTime", request_id) order, a page at a time.
+    Yields (records, checkpoint); keyset pagination rides the (startTime, request_id) index.
+    """
+    packed = query_rows(dsn, "SELECT to_regprocedure('prompt_store.expand(jsonb)') IS NOT NULL")[0][0] == "t"
+    # rows packed by db_maintenance/prompt_store.py hold message references, not the messages
+    request = "prompt_store.expand(proxy_server_request)" if packed else "proxy_server_request"
+    call_types = ", ".join(f"'{c}'" for c in CALL_TYPES)
+    filters = [f"call_type IN ({call_types})", "coalesce(status, 'success') = 'success'",
+               "coalesce(cache_hit, '') <> 'True'", "response IS NOT NULL", "response <> '{}'::jsonb"]
+    if since:
+        filters.append(f"\"startTime\" >= '{since.isoformat()}'")
+    while True:
+        where = list(filters)
+        if after:
+            start, request_id = (value.replace("'", "''") for value in after)
+            where.append(f"(\"startTime\", request_id) > ('{start}'::timestamp, '{request_id}')")
+        rows = query_rows(dsn, f"""
+            SELECT jsonb_build_object(
+                       'request', {request}, 'response', response, 'model', coalesce(nullif(model_group, ''), model),
+                       'cache_key', cache_key, 'api_key', api_key, 'team_id', team_id,
+                       'organization_id', organization_id)::text,
+                   "startTime"::text, request_id
+            FROM {quote(TABLE)} WHERE {' AND '.join(where)}
+            ORDER BY "startTime", request_id LIMIT {page_size}""")
+        if not rows:
+            return
+        records = []
+        for payload, _, _ in rows:
+            row = json.loads(payload)
+            body = row.pop("request") or {}
+            records.append(dict(body, **{k: v for k, v in row.items() if v not in (None, "")}))
+        after = rows[-1][1:]
+        yield records, list(after)
+        if len(rows) < page_size:
+            return
+
+
+def jsonl_pages(path, after=None, page_size=1000):
+    """Records of a capture file or directory, a page at a time; the checkpoint is the record count"""
+    skip = after or 0
+    records = []
+    count = 0
+    for count, record in enumerate(read_jsonl(path), 1):
+        if count <= skip:
+            continue
+        records.append(record)
+        if len(records) == page_size:
+            yield records, count
+            records = []
+    if records:
+        yield records, count
+
+
+# --- entries ----------------------------------------------------------------------------------------------
+
+class EntryBuilder:
+    """Scope key and prompt of a logged request, as the live semantic cache would compute them"""
+
+    def __init__(self, config):
+        from litellm import Cache
+
+        settings = config.get("litellm_settings") or {}
+        params = settings.get("cache_params") or {}
+        if params.get("type") != "redis-semantic":
+            sys.exit("cache_params.type is not redis-semantic: there is no semantic cache to warm")
+        self.cache = Cache(**params)
+        self.backend = self.cache.cache
+        self.embedding_model = params.get("redis_semantic_cache_embedding_model")
+        self.prefix = None
+        callbacks = settings.get("callbacks") or []
+        if any(str(c).startswith("litellm_hooks.prefix_cache") for c in callbacks):
+            from litellm_hooks.prefix_cache import DEFAULT_MIN_MESSAGES, DEFAULT_TAIL_MAX_CHARS, DEFAULT_TAIL_TURNS, \
+                PrefixCacheKeys
+            prefix_params = settings.get("prefix_cache_params") or {}
+            self.prefix = PrefixCacheKeys(
+                None,
+                tail_turns=int(prefix_params.get("tail_turns", DEFAULT_TAIL_TURNS)),
+                min_messages=int(prefix_params.get("min_messages", DEFAULT_MIN_MESSAGES)),
+                tail_max_chars=int(prefix_params.get("tail_max_chars", DEFAULT_TAIL_MAX_CHARS)),
+                skip_system=bool(params.get("skip_system_message_in_cache_key")),
+            )
+        self.lossy = 0
+
+    @staticmethod
+    def is_lossy(record):
+        """True when LiteLLM truncated or masked part of the logged request or response"""
+        payload = json.dumps([record.get("messages"), record.get("response"),
+                              {k: v for k, v in record.items() if k not in NON_PARAMS}], default=str)
+        return any(marker in payload for marker in LOSSY_MARKERS)
+
+    def scope_key(self, record):
+        """The logged cache key, else Cache.get_cache_key over the request's params and tenant"""
+        key = record.get("cache_key")
+        if key and key != CACHE_OFF:
+            return key
+        metadata = dict(record.get("metadata") or {}, model_group=record.get("model"))
+        for field, column in (("user_api_key", "api_key"), ("user_api_key_team_id", "team_id"),
+                              ("user_api_key_org_id", "organization_id")):
+            if record.get(column):
+                metadata[field] = record[column]
+        params = {k: v for k, v in record.items() if k not in NON_PARAMS}
+        return self.cache.get_cache_key(**params, messages=record.get("messages"), metadata=metadata)
+
+    def entry(self, record):
+        """
+        (scope key, prompt, embedding input, cached value, history chain), or None when the
+        record cannot be cached; the chain is prefix_cache's ("" for unsplit conversations)
+        """
+        messages = record.get("messages")
+        response = record.get("response")
+        if not messages or not response or not record.get("model"):
+            return None
+        # captures also hold failures and cache hits (the spend-log query leaves them out)
+        if record.get("status", "success") != "success" or record.get("cache_hit") is True:
+            return None
+        if record.get("call_type", CALL_TYPES[0]) not in CALL_TYPES:
+            return None
+        if self.is_lossy(record):
+            self.lossy += 1
+            return None
+        key = self.scope_key(record)
+        history = ""
+        if self.prefix is not None:
+            key, kwargs, history = self.prefix.rewrite(key, {"messages": messages})
+            messages = kwargs["messages"]
+        prompt = self.backend._get_prompt_from_kwargs(messages=messages)
+        if not prompt:
+            return None
+        if not isinstance(response, str):
+            response = json.dumps(response)
+        # the value LiteLLM's Cache.async_add_cache hands the backend, str()-ed as the backend stores it
+        value = str({"timestamp": time.time(), "response": response})
+        return key, prompt, self.backend._embedding_input(prompt, None), value, history
+
+
+class Embedder:
+    """Batched /v1/embeddings calls through the proxy"""
+
+    def __init__(self, base_url, model, api_key, batch_size=256):
+        self.client = httpx.Client(base_url=base_url.rstrip("/"), timeout=600,
+                                   headers={"Authorization": f"Bearer {api_key}"})
+        self.model = model
+        self.batch_size = batch_size
+        self.seconds = 0.0
+        self.count = 0
+
+    def embed(self, texts):
+        vectors = []
+        started = time.monotonic()
+        for start in range(0, len(texts), self.batch_size):
+            response = self.client.post("/v1/embeddings",
+                                        json={"model": self.model, "input": texts[start:start + self.batch_size]})
+            response.raise_for_status()
+            vectors.extend(d["embedding"] for d in sorted(response.json()["data"], key=lambda d: d["index"]))
+        self.seconds += time.monotonic() - started
+        self.count += len(texts)
+        return vectors
+
+
+# --- loading ----------------------------------------------------------------------------------------------
+
+class Warmup:
+    """Writes entries into the semantic index and keeps the adaptive_ttl accounting in step"""
+
+    def __init__(self, builder, embedder, conn, ttl=None, adaptive=None, write_batch=500, rate=None):
+        from redisvl.extensions.llmcache import SemanticCache
+        from redisvl.utils.vectorize import CustomTextVectorizer
+
+        self.builder = builder
+        self.embedder = embedder
+        self.conn = conn
+        backend = builder.backend
+        # same construction (and schema-mismatch fallback) as RedisSemanticCache._build_llmcache,
+        # with the batch embedder standing in for the proxy's router
+        vectorizer = CustomTextVectorizer(lambda text: embedder.embed([text])[0],
+                                          embed_many=lambda texts, **_: embedder.embed(texts))
+        self.llmcache = backend._init_semantic_cache(SemanticCache, backend._index_name, backend._redis_url,
+                                                     vectorizer)
+        self.ttl = ttl
+        self.adaptive = adaptive
+        self.write_batch = write_batch
+        self.rate = rate
+        # (scope key, prompt) digest -> [redis key, occurrences] for entries written by this run
+        self.seen = {}
+        # digests whose adaptive_ttl accounting is not written yet
+        self.dirty = []
+        self.rows = 0
+        self.written = 0
+        self.repeats = 0
+        self.skipped = 0
+        self.evicted = 0
+        self.write_seconds = 0.0
+        self.throttled = 0.0
+        self._bucket_start = time.monotonic()
+        self._bucket_used = 0
+
+    def load_page(self, records):
+        """Embed and write the page's new entries; repeats of earlier ones only bump their count"""
+        self.rows += len(records)
+        fresh = {}
+        for record in records:
+            entry = self.builder.entry(record)
+            if entry is None:
+                self.skipped += 1
+                continue
+            digest = hashlib.sha256(f"{entry[0]}\0{entry[1]}".encode()).digest()
+            if digest in self.seen:
+                self.seen[digest][1] += 1
+                self.dirty.append(digest)
+                self.repeats += 1
+            elif digest in fresh:
+                fresh[digest][0] = entry  # the newest response wins
+                fresh[digest][1] += 1
+                self.repeats += 1
+            else:
+                fresh[digest] = [entry, 1]
+        new = list(fresh.items())
+        for start in range(0, len(new), self.write_batch):
+            chunk = new[start:start + self.write_batch]
+            self._throttle(len(chunk))
+            vectors = self.embedder.embed([entry[2] for _, (entry, _) in chunk])
+            self._write(chunk, vectors)
+
+    def _write(self, chunk, vectors):
+        from redisvl.extensions.llmcache.schema import CacheEntry
+
+        field = self.builder.backend.CACHE_KEY_FIELD_NAME
+        dtype = self.llmcache._vectorizer.dtype
+        # prefix_cache keeps histories apart by the chain in the entry's metadata
+        data = [CacheEntry(prompt=prompt, response=value, prompt_vector=vector, filters={field: key},
+                           metadata={"prefix_chain": history} if history else None).to_dict(dtype)
+                for (_, ((key, prompt, _, value, history), _)), vector in zip(chunk, vectors)]
+        started = time.monotonic()
+        ttl = self.adaptive.policy.initial_ttl if self.adaptive else self.ttl
+        # SearchIndex.load pipelines the HSETs (and EXPIREs) write_batch at a time
+        keys = self.llmcache._index.load(data, id_field="entry_id", ttl=ttl, batch_size=self.write_batch)
+        for (digest, (_, count)), redis_key in zip(chunk, keys):
+            self.seen[digest] = [redis_key, count]
+            self.dirty.append(digest)
+        self.write_seconds += time.monotonic() - started
+        self.written += len(keys)
+
+    def checkpoint(self, field, position):
+        """
+        One pipeline per page: the adaptive TTL/LFU state of every entry written or repeated,
+        then the checkpoint, so a resumed run never skips a page it has not accounted for.
+        """
+        from litellm_hooks.adaptive_ttl import BORN_KEY, EXPIRY_KEY, FREQ_KEY, HITS_KEY, SIZES_KEY, STATS_KEY, \
+            STORE_SCRIPT
+
+        started = time.monotonic()
+        pipe = self.conn.pipeline(transaction=False)
+        stores = 0
+        if self.adaptive:
+            now = time.time()
+            for digest in dict.fromkeys(self.dirty):
+                redis_key, count = self.seen[digest]
+                # stored as if the history's repeats had been hits: extended TTL, raised LFU score
+                pipe.eval(STORE_SCRIPT, 7, redis_key, FREQ_KEY, EXPIRY_KEY, SIZES_KEY, HITS_KEY, BORN_KEY, STATS_KEY,
+                          self.ttl or self.adaptive.policy.ttl(count - 1), now)
+                stores += 1
+                if count > 1:
+                    pipe.hset(HITS_KEY, redis_key, count - 1)
+                    pipe.zincrby(FREQ_KEY, count - 1, redis_key)
+        pipe.hset(PROGRESS_KEY, field, json.dumps(position))
+        pipe.execute()
+        self.dirty = []
+        if stores and float(self.conn.hget(STATS_KEY, "bytes") or 0) > self.adaptive.max_bytes:
+            self.trim()
+        self.write_seconds += time.monotonic() - started
+
+    def trim(self):
+        """adaptive_ttl's sweep and LFU eviction down to 95% of its budget"""
+        from litellm_hooks.adaptive_ttl import BORN_KEY, EXPIRY_KEY, FREQ_KEY, HITS_KEY, SIZES_KEY, STATS_KEY, \
+            SWEEP_BATCH, TRIM_SCRIPT
+
+        max_bytes = self.adaptive.max_bytes
+        _, evicted = self.conn.eval(TRIM_SCRIPT, 6, FREQ_KEY, EXPIRY_KEY, SIZES_KEY, HITS_KEY, BORN_KEY, STATS_KEY,
+                                    time.time(), max_bytes, int(max_bytes * 0.95), SWEEP_BATCH)
+        self.evicted += evicted
+
+    def _throttle(self, entries):
+        """Token bucket over entries written: sleep until the batch fits under --rate"""
+        if not self.rate:
+            return
+        self._bucket_used += entries
+        wait = self._bucket_used / self.rate - (time.monotonic() - self._bucket_start)
+        if wait > 0:
+            time.sleep(wait)
+            self.throttled += wait
+
+
+def used_memory(conn):
+    return int(conn.info("memory").get("used_memory", 0))
+
+
+def print_report(warmup, elapsed, memory_delta, source):
+    embedder = warmup.embedder
+    print(f"\nSemantic cache warm-up from {source}")
+    print("=" * 60)
+    print(f"{'rows read':<24} {warmup.rows}")
+    print(f"{'entries written':<24} {warmup.written}")
+    print(f"{'repeats folded':<24} {warmup.repeats} (counted as hits)" if warmup.adaptive else
+          f"{'repeats folded':<24} {warmup.repeats}")
+    print(f"{'rows skipped':<24} {warmup.skipped - warmup.builder.lossy} (no prompt, response or model)")
+    print(f"{'rows skipped as lossy':<24} {warmup.builder.lossy} (truncated or masked by LiteLLM)")
+    if warmup.adaptive:
+        print(f"{'evicted over budget':<24} {warmup.evicted}")
+    print(f"{'embedding':<24} {embedder.seconds:.1f}s, "
+          f"{embedder.count / embedder.seconds if embedder.seconds else 0:.0f} prompts/s")
+    print(f"{'redis writes':<24} {warmup.write_seconds:.1f}s, "
+          f"{warmup.written / warmup.write_seconds if warmup.write_seconds else 0:.0f} entries/s")
+    print(f"{'throttled (--rate)':<24} {warmup.throttled:.1f}s")
+    print(f"{'total':<24} {elapsed:.1f}s, {warmup.written / elapsed if elapsed else 0:.0f} entries/s, "
+          f"{warmup.rows / elapsed if elapsed else 0:.0f} rows/s")
+    print(f"{'redis memory':<24} {'+' if memory_delta >= 0 else '-'}{format_bytes(abs(memory_delta))}"
+          + (f" ({format_bytes(memory_delta / warmup.written)}/entry)" if warmup.written else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm the redis-semantic cache from historical traffic")
+    parser.add_argument("--config", default=os.environ.get("LITELLM_CONFIG", str(CONFIG_FILE)))
+    parser.add_argument("--dsn", default=DEFAULT_DSN, help="mylitellm connection string (spend-log source)")
+    parser.add_argument("--jsonl", help="read a requests.jsonl capture (file or traffic_capture directory) instead")
+    parser.add_argument("--since", type=date.fromisoformat, help="spend logs from this day on (YYYY-MM-DD)")
+    parser.add_argument("--limit", type=int, help="stop after this many rows")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL, help="proxy (or mock) serving /v1/embeddings")
+    parser.add_argument("--api-key", default=DEFAULT_API_KEY)
+    parser.add_argument("--page-size", type=int, default=2000, help="rows read (and checkpointed) at a time")
+    parser.add_argument("--embed-batch", type=int, default=256, help="prompts per /v1/embeddings call")
+    parser.add_argument("--write-batch", type=int, default=500, help="entries per Redis pipeline")
+    parser.add_argument("--rate", type=float, default=200.0,
+                        help="max entries written per second (0: unlimited); leaves room for live traffic")
+    parser.add_argument("--ttl", type=int, help="entry TTL in seconds (default: adaptive_ttl_params or cache_params)")
+    parser.add_argument("--restart", action="store_true", help="ignore the saved progress and start over")
+    args = parser.parse_args()
+
+    # the hooks imported below read their settings from the config the proxy runs with
+    os.environ["LITELLM_CONFIG"] = str(Path(args.config).resolve())
+    config = load_config(args.config)
+    settings = config.get("litellm_settings") or {}
+    builder = EntryBuilder(config)
+    conn = get_connection(builder.backend._redis_url)
+
+    adaptive = None
+    if any(str(c).startswith("litellm_hooks.adaptive_ttl") for c in settings.get("callbacks") or []):
+        from litellm_hooks.adaptive_ttl import DEFAULT_GROWTH, DEFAULT_INITIAL_TTL, DEFAULT_MAX_BYTES, \
+            DEFAULT_MAX_TTL, AdaptiveTTLPolicy, AdaptiveTTLStore
+        params = settings.get("adaptive_ttl_params") or {}
+        policy = AdaptiveTTLPolicy(int(params.get("initial_ttl", DEFAULT_INITIAL_TTL)),
+                                   int(params.get("max_ttl", DEFAULT_MAX_TTL)),
+                                   float(params.get("growth", DEFAULT_GROWTH)))
+        adaptive = AdaptiveTTLStore(policy, max_bytes=int(params.get("max_bytes", DEFAULT_MAX_BYTES)))
+    ttl = args.ttl or (None if adaptive else (settings.get("cache_params") or {}).get("ttl"))
+    if any(str(c).startswith("litellm_hooks.vector_index") for c in settings.get("callbacks") or []):
+        # create (or recreate) the index with the vector field the proxy will expect
+        from litellm_hooks.vector_index import index_params, install_on
+        install_on(builder.backend, index_params(settings.get("vector_index_params") or {}))
+
+    embedder = Embedder(args.base_url, builder.embedding_model, args.api_key, args.embed_batch)
+    warmup = Warmup(builder, embedder, conn, ttl=ttl, adaptive=adaptive, write_batch=args.write_batch,
+                    rate=args.rate)
+
+    if args.jsonl:
+        field = f"jsonl:{Path(args.jsonl).resolve()}"
+        source = args.jsonl
+    else:
+        field = f"spend_logs:{args.dsn.rsplit('/', 1)[-1]}"
+        source = f"{TABLE} ({args.dsn.rsplit('/', 1)[-1]})"
+    if args.restart:
+        conn.hdel(PROGRESS_KEY, field)
+    saved = conn.hget(PROGRESS_KEY, field)
+    after = json.loads(saved) if saved else None
+    if after:
+        print(f"resuming {source} after {after} (--restart to start over)")
+    pages = (jsonl_pages(args.jsonl, after, args.page_size) if args.jsonl
+             else spend_log_pages(args.dsn, after, args.since, args.page_size))
+
+    memory_before = used_memory(conn)
+    started = time.monotonic()
+    try:
+        for records, position in pages:
+            partial = args.limit and len(records) > args.limit - warmup.rows
+            if partial:
+                records = records[:args.limit - warmup.rows]
+            warmup.load_page(records)
+            # a page cut short by --limit is redone in full next time (entry ids are stable, so no duplicates)
+            warmup.checkpoint(field, after if partial else position)
+            after = position
+            elapsed = time.monotonic() - started
+            print(f"\r  {warmup.rows} rows, {warmup.written} entries, {warmup.written / elapsed:.0f} entries/s",
+                  end="", flush=True)
+            if args.limit and warmup.rows >= args.limit:
+                break
+    except KeyboardInterrupt:
+        print("\ninterrupted; the next run resumes after the last completed page")
+    print()
+    print_report(warmup, time.monotonic() - started, used_memory(conn) - memory_before, source)
+
+
+if __name__ == "__main__":
+    main()
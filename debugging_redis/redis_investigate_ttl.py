@@ -4,143 +4,78 @@ Direct Redis TTL investigation to understandLiteLLM cache behavior.
 This will check actual Redis settings and LiteLLm cache configuration.
 """
 
-import subprocess
-import json
 
-def get_redis_config():
+from redis_cache_inspector import (
+    get_config,
+    get_connection,
+    get_info_stats,
+    inspect_cache,
+    print_report,
+)
+
+def get_redis_config(conn):
     """Get Redis server configuration"""
     print("=== Redis Server Configuration ===")
     
     try:
-        # Get all config values
-        result = subprocess.run(['redis-cli', 'config', 'get', '*'], capture_output=True, text=True)
-        if result.returncode == 0:
-            lines = result.stdout.strip().split('\n')
-            
-            # Look for cache-related settings
-            ttl_settings = []
-            maxmemory = None
-            
-            for i in range(0, len(lines), 2):
-                if i + 1 < len(lines):
-                    key = lines[i].strip()
-                    value = lines[i + 1].strip()
-                    
-                    if 'maxmemory' in key.lower():
-                        maxmemory = value
-                    elif 'ttl' in key.lower() or 'expire' in key.lower():
-                        ttl_settings.append(f"{key}: {value}")
-            
-            print(f"Max Memory: {maxmemory or 'unlimited'}")
-            print("\nTTL/Expiry Settings:")
-            for setting in ttl_settings:
-                print(f"  {setting}")
+        config = get_config(conn)
+        
+        # Look for cache-related settings
+        ttl_settings = []
+        maxmemory = None
+        
+        for key, value in config.items():
+            if 'maxmemory' in key.lower():
+                maxmemory = value
+            elif 'ttl' in key.lower() or 'expire' in key.lower():
+                ttl_settings.append(f"{key}: {value}")
+        
+        print(f"Max Memory: {maxmemory or 'unlimited'}")
+        print("\nTTL/Expiry Settings:")
+        for setting in ttl_settings:
+            print(f"  {setting}")
                 
     except Exception as e:
         print(f"Error getting Redis config: {e}")
 
-def get_current_cache_stats():
+def get_current_cache_stats(conn):
     """Get current cache statistics"""
     print("\n=== Current Cache Statistics ===")
     
     try:
-        result = subprocess.run(['redis-cli', 'info', 'stats'], capture_output=True, text=True)
-        if result.returncode == 0:
-            lines = result.stdout.strip().split('\n')
-            
-            stats = {}
-            for line in lines:
-                if ':' in line and not line.startswith('#'):
-                    key, value = line.split(':', 1)
-                    stats[key] = int(value) if value.isdigit() else value
-            
-            print(f"Keyspace hits: {stats.get('keyspace_hits', 0)}")
-            print(f"Keyspace misses: {stats.get('keyspace_misses', 0)}")
-            print(f"Total commands processed: {stats.get('total_commands_processed', 0)}")
-            
-            if stats.get('keyspace_hits', 0) > 0:
-                hit_rate = (stats['keyspace_hits'] / (stats.get('keyspace_hits', 0) + stats.get('keyspace_misses', 1))) * 100
-                print(f"Cache hit rate: {hit_rate:.2f}%")
+        stats = get_info_stats(conn)
+        
+        print(f"Keyspace hits: {stats.get('keyspace_hits', 0)}")
+        print(f"Keyspace misses: {stats.get('keyspace_misses', 0)}")
+        print(f"Total commands processed: {stats.get('total_commands_processed', 0)}")
+        
+        if stats.get('keyspace_hits', 0) > 0:
+            hit_rate = (stats['keyspace_hits'] / (stats.get('keyspace_hits', 0) + stats.get('keyspace_misses', 1))) * 100
+            print(f"Cache hit rate: {hit_rate:.2f}%")
             
     except Exception as e:
         print(f"Error getting cache stats: {e}")
 
-def check_cache_entries():
-    """Check existing cache entries and their TTLs"""
+def check_cache_entries(conn):
+    """Check existing cache entries and their TTLs (SCAN + pipelined TTL/TYPE/MEMORY USAGE)"""
     print("\n=== Cache Entries Analysis ===")
     
     try:
-        # Get all keys
-        result = subprocess.run(['redis-cli', 'keys', '*'], capture_output=True, text=True)
-        if result.returncode == 0:
-            keys = result.stdout.strip().split('\n') if result.stdout.strip() else []
-            
-            print(f"Total Redis keys: {len(keys)}")
-            
-            # Check TTLs for all keys
-            ttl_values = []
-            cache_keys = []
-            
-            for key in keys:
-                try:
-                    # Get TTL
-                    ttl_result = subprocess.run(['redis-cli', 'ttl', key], capture_output=True, text=True)
-                    if ttl_result.returncode == 0:
-                        ttl = int(ttl_result.stdout.strip())
-                        
-                        # Only consider positive TTLs (not -1 permanent or -2 expired)
-                        if ttl > 0:
-                            ttl_values.append(ttl)
-                            
-                            # Check if key might be a cache entry
-                            try:
-                                type_result = subprocess.run(['redis-cli', 'type', key], capture_output=True, text=True)
-                                if type_result.returncode == 0 and 'string' in type_result.stdout.strip():
-                                    cache_keys.append(key)
-                            except:
-                                pass
-                                
-                except Exception as e:
-                    continue
-            
-            print(f"Cache-related keys (with TTL > 0): {len(cache_keys)}")
-            
-            if ttl_values:
-                print(f"TTL range: {min(ttl_values)}s to {max(ttl_values)}s")
-                print(f"Average TTL: {sum(ttl_values) / len(ttl_values):.1f}s")
-                print(f"Most common TTL: {max(set(ttl_values), key=ttl_values.count)}s")
-            
-            # Show a sample of cache keys with their TTLs
-            if cache_keys and len(cache_keys) <= 10:
-                print("\nSample cache keys:")
-                for key in cache_keys[:5]:
-                    try:
-                        ttl_result = subprocess.run(['redis-cli', 'ttl', key], capture_output=True, text=True)
-                        if ttl_result.returncode == 0:
-                            print(f"  {key[:50]}... -> TTL: {ttl_result.stdout.strip()}s")
-                    except:
-                        pass
+        stats = inspect_cache(conn)
+        print_report(stats)
                         
     except Exception as e:
         print(f"Error checking cache entries: {e}")
 
-def analyze_ttl_behavior():
+def analyze_ttl_behavior(conn):
     """Analyze what TTL might be causing the issue"""
     print("\n=== TTL Behavior Analysis ===")
     
     # Check default Redis expiry behavior
     try:
-        result = subprocess.run(['redis-cli', 'config', 'get', 'default-ttl'], capture_output=True, text=True)
-        if result.result == 0:
-            print(f"Default TTL: {result.stdout.strip().split()[1] or 'unlimited'}")
-    except:
-        pass
-    
-    try:
-        result = subprocess.run(['redis-cli', 'config', 'get', 'maxmemory-policy'], capture_output=True, text=True)
-        if result.returncode == 0:
-            print(f"Maxmemory policy: {result.stdout.strip().split()[1] or 'none'}")
-    except:
+        config = get_config(conn, 'maxmemory-policy')
+        print(f"Maxmemory policy: {config.get('maxmemory-policy') or 'none'}")
+    except Exception:
         pass
     
     print("\nPossible causes of short TTLs:")
@@ -190,10 +125,11 @@ if __name__ == "__main__":
     print("LiteLLM Redis Cache TTL Investigation")
     print("=" * 50)
     
-    get_redis_config()
-    get_current_cache_stats() 
-    check_cache_entries()
-    analyze_ttl_behavior()
+    conn = get_connection()
+    get_redis_config(conn)
+    get_current_cache_stats(conn)
+    check_cache_entries(conn)
+    analyze_ttl_behavior(conn)
     check_litellm_cache_settings()
     
     print("\n" + "=" * 50)
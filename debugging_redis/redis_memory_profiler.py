@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Memory footprint profiler for the redis-semantic cache.
+Samples FT.INFO for the semantic cache vector index and MEMORY USAGE over a SCAN
+sample of cache entries, then projects steady-state RAM as a function of request
+rate and the cache_params ttl, warning when a projection exceeds the budget.
+
+Usage:
+    python redis_memory_profiler.py [--budget 512MiB] [--rates 0.1,1,5,10] [--miss-rate 0.7]
+"""
+
+import argparse
+import re
+import sys
+from pathlib import Path
+
+from redis_cache_inspector import format_bytes, get_connection, scan_cache_entries
+
+CONFIG_FILE = Path(__file__).resolve().parent.parent / "proxy_server_config-local-example.yaml"
+# LiteLLM's RedisSemanticCache index name and key prefix
+SEMANTIC_INDEX = "litellm_semantic_cache_index"
+SIZE_UNITS = {"": 1, "b": 1, "k": 2**10, "kb": 2**10, "kib": 2**10, "m": 2**20, "mb": 2**20, "mib": 2**20,
+              "g": 2**30, "gb": 2**30, "gib": 2**30}
+
+
+def parse_size(value):
+    """'512MiB' / '2g' / '1048576' -> bytes"""
+    match = re.fullmatch(r"\s*([\d.]+)\s*([a-zA-Z]*)\s*", str(value))
+    if not match or match.group(2).lower() not in SIZE_UNITS:
+        raise argparse.ArgumentTypeError(f"invalid size: {value}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).lower()])
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _pairs(values):
+    """Flat [k1, v1, k2, v2, ...] reply -> dict (nested lists left as-is)"""
+    return {_decode(values[i]): values[i + 1] for i in range(0, len(values) - 1, 2)}
+
+
+def _float(value):
+    try:
+        return float(_decode(value))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def get_index_info(conn, index=SEMANTIC_INDEX):
+    """FT.INFO summary: docs, vector/inverted/doc-table sizes (bytes) and vector dimension"""
+    try:
+        info = _pairs(conn.execute_command("FT.INFO", index))
+    except Exception as e:
+        print(f"FT.INFO {index} failed ({e}); is the semantic cache index created?")
+        return None
+    size_fields = ("vector_index_sz_mb", "inverted_sz_mb", "doc_table_size_mb", "key_table_size_mb",
+                   "sortable_values_size_mb", "offset_vectors_sz_mb", "tag_overhead_sz_mb", "text_overhead_sz_mb")
+    sizes = {f[:-3]: _float(info.get(f)) * 2**20 for f in size_fields if f in info}
+    dim = None
+    for attribute in info.get("attributes") or []:
+        fields = _pairs(attribute)
+        if _decode(fields.get("type")) == "VECTOR":
+            dim = int(_float(fields.get("dim"))) or None
+            # RediSearch 2.8+ nests algorithm parameters under their own key
+            for key in ("algorithm", "data_type", "distance_metric"):
+                if key in fields:
+                    sizes.setdefault("_" + key, _decode(fields[key]))
+    return {
+        "num_docs": int(_float(info.get("num_docs"))),
+        "index_bytes": sum(v for k, v in sizes.items() if not k.startswith("_")),
+        "sizes": sizes,
+        "dim": dim,
+    }
+
+
+def sample_entries(conn, match, limit):
+    """MEMORY USAGE over up to `limit` SCANned keys; returns CacheStats"""
+    stats = None
+    for stats in scan_cache_entries(conn, match=match, count=min(limit, 1000)):
+        if stats.keys >= limit:
+            break
+    return stats
+
+
+def cache_params(config_path=CONFIG_FILE):
+    """cache_params section of the proxy config (empty if unreadable)"""
+    try:
+        import yaml
+        with open(config_path) as f:
+            return (yaml.safe_load(f).get("litellm_settings") or {}).get("cache_params") or {}
+    except (ImportError, OSError, AttributeError):
+        return {}
+
+
+def project(bytes_per_entry, rate, miss_rate, ttl):
+    """Steady-state bytes: live entries = write rate x ttl (Little's law), write rate = rate x miss rate"""
+    return bytes_per_entry * rate * miss_rate * ttl
+
+
+def print_index_info(info):
+    print("=== Semantic Cache Index (FT.INFO) ===")
+    if not info:
+        return
+    print(f"Documents: {info['num_docs']}")
+    print(f"Vector dimension: {info['dim'] or 'unknown'}")
+    for key, value in sorted(info["sizes"].items()):
+        print(f"  {key.lstrip('_'):<22} {format_bytes(value) if not key.startswith('_') else value}")
+    print(f"Index memory total: {format_bytes(info['index_bytes'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory footprint profiler for the redis-semantic cache")
+    parser.add_argument("--url", help="Redis URL (default: $REDIS_URL or redis://localhost:6379/0)")
+    parser.add_argument("--index", default=SEMANTIC_INDEX, help="semantic cache index name")
+    parser.add_argument("--sample", type=int, default=2000, help="cache keys to sample with MEMORY USAGE")
+    parser.add_argument("--budget", type=parse_size, help="memory budget for the cache (e.g. 512MiB); default maxmemory")
+    parser.add_argument("--rates", default="0.1,0.5,1,5,10", help="request rates (req/s) to project")
+    parser.add_argument("--ttls", help="TTLs (s) to project; default the config ttl")
+    parser.add_argument("--miss-rate", type=float, default=1.0,
+                        help="fraction of requests that write a cache entry (1 - hit rate)")
+    parser.add_argument("--config", default=str(CONFIG_FILE))
+    args = parser.parse_args()
+
+    conn = get_connection(args.url)
+    params = cache_params(args.config)
+    ttls = [float(t) for t in args.ttls.split(",")] if args.ttls else [float(params.get("ttl") or 300)]
+    rates = [float(r) for r in args.rates.split(",") if r]
+
+    print("LiteLLM Semantic Cache Memory Profile")
+    print("=" * 70)
+    info = get_index_info(conn, args.index)
+    print_index_info(info)
+
+    print(f"\n=== Cache Entries (MEMORY USAGE, sample of {args.sample}) ===")
+    semantic = sample_entries(conn, f"{args.index}:*", args.sample)
+    exact = sample_entries(conn, "[0-9a-f]" * 8 + "*", args.sample)
+    per_entry = 0.0
+    for label, stats in (("semantic entries", semantic), ("exact-match entries", exact)):
+        if stats and stats.keys:
+            avg = stats.total_bytes / stats.keys
+            print(f"  {label:<20} {stats.keys:>6} sampled, avg {format_bytes(avg)}/entry")
+            per_entry = max(per_entry, avg)
+    if info and info["num_docs"]:
+        index_per_doc = info["index_bytes"] / info["num_docs"]
+        print(f"  index overhead       {format_bytes(index_per_doc)}/doc")
+        per_entry += index_per_doc
+    if not per_entry:
+        # nothing cached yet: estimate from the vector size alone (FLOAT32 in hash + index copy)
+        dim = (info or {}).get("dim") or 1536
+        per_entry = dim * 4 * 2 + 2048
+        print(f"  no entries sampled; estimating {format_bytes(per_entry)}/entry from dim {dim}")
+    print(f"Bytes per cache entry (entry + index): {format_bytes(per_entry)}")
+
+    memory = conn.info("memory")
+    budget = args.budget or int(memory.get("maxmemory") or 0)
+    print(f"\nRedis used_memory: {format_bytes(memory.get('used_memory', 0))}, "
+          f"budget: {format_bytes(budget) if budget else 'unset (use --budget or maxmemory)'}")
+
+    print(f"\n=== Steady-State Projection (miss rate {args.miss_rate:.2f}) ===")
+    print(f"{'req/s':>8} " + " ".join(f"{'ttl ' + str(int(t)) + 's':>14}" for t in ttls))
+    over = []
+    for rate in rates:
+        cells = []
+        for ttl in ttls:
+            projected = project(per_entry, rate, args.miss_rate, ttl)
+            flag = "!" if budget and projected > budget else " "
+            if flag == "!":
+                over.append((rate, ttl, projected))
+            cells.append(f"{format_bytes(projected):>13}{flag}")
+        print(f"{rate:>8g} " + " ".join(cells))
+
+    if over:
+        print(f"\nWARNING: {len(over)} projection(s) exceed the {format_bytes(budget)} budget (marked !), e.g. "
+              f"{over[0][0]:g} req/s at ttl {int(over[0][1])}s -> {format_bytes(over[0][2])}")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -23,36 +23,161 @@
 
           db-backup-script = pkgs.writeShellScriptBin "db-backup" ''
             #!/usr/bin/env bash
-            # Usage: db-backup [database_name]
-            # If database_name is provided, backs up only that database.
-            # If database_name is omitted, backs up ALL non-template databases.
+            # Usage: db-backup [-j jobs] [--skip-archived] [--incremental] [database_name ...]
+            # If database names are provided, backs up only those databases.
+            # If they are omitted, backs up ALL non-template databases.
+            #
+            # Each database is dumped to ./<db>-<timestamp>.dump in directory format: tables are
+            # dumped by parallel jobs and each table file is zstd-compressed as it is written.
+            # The databases (mylitellm, letta) are dumped concurrently and share the jobs.
+            #   -j N             total parallel jobs (default: CPU count)
+            #   --skip-archived  leave out spend-log data that exists elsewhere: the
+            #                    LiteLLM_SpendLogs_unpartitioned copy left by convert --keep-old, and
+            #                    detached partitions that db_maintenance/spend_log_partitions.py has
+            #                    exported (in its manifest) but not dropped yet. Archived partitions
+            #                    are normally dropped right after export, so attached partitions and
+            #                    detached ones still awaiting export are always dumped.
+            #   --incremental    in databases with LiteLLM_SpendLogs, dump everything except the
+            #                    spend logs, plus only the spend-log rows logged since the previous
+            #                    backup (spend_logs.csv.zst); db-restore replays the chain
+            # DB_BACKUP_COMPRESS overrides the compression (default zstd:3, needs pg_dump 16+).
+
+            JOBS=$(getconf _NPROCESSORS_ONLN 2>/dev/null || echo 4)
+            SKIP_ARCHIVED=false
+            INCREMENTAL=false
+            DATABASES=""
+            while [ $# -gt 0 ]; do
+              case "$1" in
+                -j) JOBS="$2"; shift 2 ;;
+                --skip-archived) SKIP_ARCHIVED=true; shift ;;
+                --incremental) INCREMENTAL=true; shift ;;
+                *) DATABASES="$DATABASES $1"; shift ;;
+              esac
+            done
 
             TIMESTAMP=$(date +%Y%m%d_%H%M%S)
+            COMPRESS="''${DB_BACKUP_COMPRESS:-zstd:3}"
+            ARCHIVE_MANIFEST="''${SPEND_LOG_ARCHIVE_DIR:-./spend_logs_archive}/manifest.jsonl"
+            # the proxy writes spend logs in batches: rows this close to the previous backup's
+            # newest row are dumped again, and db-restore skips the duplicates
+            OVERLAP="10 minutes"
 
-            if [ -n "$1" ]; then
-                DATABASES="$1"
-            else
+            if [ -z "$DATABASES" ]; then
                 # Fetch all databases except templates using unaligned output (-A) and tuples only (-t)
                 DATABASES=$(psql -U postgres -A -t -c "SELECT datname FROM pg_database WHERE datistemplate = false;")
             fi
+            set -- $DATABASES
+            if [ $# -eq 0 ]; then
+              printf "\033[1;31m❌ No databases to back up (is PostgreSQL running?)\033[0m\n"
+              exit 1
+            fi
+            DB_JOBS=$(( JOBS / $# ))
+            [ "$DB_JOBS" -lt 1 ] && DB_JOBS=1
 
             printf "\033[1;34m=== PostgreSQL Backup ===\033[0m\n"
+            printf "%s database(s), %s parallel jobs each, %s\n" "$#" "$DB_JOBS" "$COMPRESS"
+
+            backup_one() {
+                DB="$1"
+                BACKUP_DIR="./''${DB}-''${TIMESTAMP}.dump"
+                START=$(date +%s)
+                DB_BYTES=$(psql -U postgres -A -t -c "SELECT pg_database_size('$DB');")
+                HAS_SPEND_LOGS=$(psql -U postgres -d "$DB" -A -t -c "SELECT to_regclass('\"LiteLLM_SpendLogs\"') IS NOT NULL;")
+                MODE=full
+                EXCLUDE=()
+                SINCE=""
+                UNTIL=""
+
+                if [ "$HAS_SPEND_LOGS" = t ]; then
+                    if [ "$SKIP_ARCHIVED" = true ]; then
+                        EXCLUDE+=(--exclude-table-data='"LiteLLM_SpendLogs_unpartitioned"')
+                        if [ -f "$ARCHIVE_MANIFEST" ]; then
+                            # only tables still present and detached: an attached partition is live data
+                            DETACHED=$(psql -U postgres -d "$DB" -A -t -c "SELECT c.relname FROM pg_class c
+                                WHERE c.relkind = 'r' AND c.relname ~ '^LiteLLM_SpendLogs_p[0-9]{8}$'
+                                  AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid);")
+                            ARCHIVED=$(sed -E 's/.*"partition": "([^"]+)".*/\1/' "$ARCHIVE_MANIFEST")
+                            for PARTITION in $DETACHED; do
+                                if printf '%s\n' "$ARCHIVED" | grep -qxF "$PARTITION"; then
+                                    EXCLUDE+=(--exclude-table-data="\"$PARTITION\"")
+                                fi
+                            done
+                        fi
+                    fi
+                    if [ "$INCREMENTAL" = true ]; then
+                        PREVIOUS=$(ls -d ./"$DB"-*.dump 2>/dev/null | sort | tail -n 1)
+                        if [ -n "$PREVIOUS" ] && [ -f "$PREVIOUS/backup_info" ]; then
+                            SINCE=$(sed -n 's/^spend_logs_until=//p' "$PREVIOUS/backup_info")
+                        fi
+                        if [ -n "$SINCE" ]; then
+                            MODE=incremental
+                            EXCLUDE+=(--exclude-table-data='"LiteLLM_SpendLogs"*')
+                        else
+                            printf "%s: no previous backup with a spend-log watermark, taking a full backup\n" "$DB"
+                        fi
+                    fi
+                    # newest row before the dump starts: the next incremental continues from here
+                    UNTIL=$(psql -U postgres -d "$DB" -A -t -c "SELECT max(\"startTime\") FROM \"LiteLLM_SpendLogs\";")
+                    UNTIL="''${UNTIL:-$SINCE}"
+                fi
 
-            FAILURES=0
-            for DB in $DATABASES; do
-                BACKUP_FILE="./''${DB}-''${TIMESTAMP}.sql"
-                printf "Backing up database '\033[1;33m%s\033[0m' to '%s'...\n" "$DB" "$BACKUP_FILE"
+                printf "Backing up database '\033[1;33m%s\033[0m' to '%s' (%s)...\n" "$DB" "$BACKUP_DIR" "$MODE"
+                # partition data is loaded through the parent, so a restore does not depend on
+                # which daily partitions exist at the time
+                if ! pg_dump -U postgres -F d -j "$DB_JOBS" --compress="$COMPRESS" --load-via-partition-root \
+                        "''${EXCLUDE[@]}" -f "$BACKUP_DIR" "$DB"; then
+                    printf "\033[1;31m❌ Backup failed for: %s\033[0m\n" "$DB"
+                    return 1
+                fi
 
-                # Use pg_dump to create a plain SQL backup.
-                pg_dump -U postgres -F p "$DB" > "$BACKUP_FILE"
+                if [ "$MODE" = incremental ]; then
+                    set -o pipefail  # backup_one runs in its own subshell
+                    if ! psql -U postgres -d "$DB" -X -q -v ON_ERROR_STOP=1 -c "\copy (SELECT * FROM \"LiteLLM_SpendLogs\" WHERE \"startTime\" > timestamp '$SINCE' - interval '$OVERLAP') TO STDOUT WITH (FORMAT csv)" \
+                            | zstd -q -T0 -c > "$BACKUP_DIR/spend_logs.csv.zst"; then
+                        printf "\033[1;31m❌ Spend-log export failed for: %s\033[0m\n" "$DB"
+                        return 1
+                    fi
+                    printf "%s: spend logs since %s, %s KB compressed\n" "$DB" "$SINCE" "$(du -k "$BACKUP_DIR/spend_logs.csv.zst" | cut -f1)"
+                fi
+                {
+                    echo "database=$DB"
+                    echo "mode=$MODE"
+                    [ "$MODE" = incremental ] && echo "base=$PREVIOUS"
+                    [ -n "$UNTIL" ] && echo "spend_logs_until=$UNTIL"
+                } > "$BACKUP_DIR/backup_info"
+
+                SECONDS_TAKEN=$(( $(date +%s) - START ))
+                DUMP_KB=$(du -sk "$BACKUP_DIR" | cut -f1)
+                awk -v db="$DB" -v dir="$BACKUP_DIR" -v bytes="$DB_BYTES" -v kb="$DUMP_KB" -v s="$SECONDS_TAKEN" 'BEGIN {
+                    if (s < 1) s = 1
+                    printf "\033[1;32m✔ Backup successful: %s\033[0m  %.0f MB database -> %.0f MB in %ds (%.1f MB/s)\n",
+                        dir, bytes / 1048576, kb / 1024, s, bytes / 1048576 / s
+                }'
+                echo "$DB_BYTES" > "$BACKUP_DIR/.database_bytes"
+            }
+
+            WALL_START=$(date +%s)
+            PIDS=()
+            for DB in "$@"; do
+                backup_one "$DB" &
+                PIDS+=($!)
+            done
+            FAILURES=0
+            for PID in "''${PIDS[@]}"; do
+                wait "$PID" || FAILURES=1
+            done
 
-                if [ $? -eq 0 ]; then
-                  printf "\033[1;32m✔ Backup successful: %s\033[0m\n" "$BACKUP_FILE"
-                else
-                  printf "\033[1;31m❌ Backup failed for: %s\033[0m\n" "$DB"
-                  FAILURES=1
+            TOTAL_BYTES=0
+            for DB in "$@"; do
+                if [ -f "./''${DB}-''${TIMESTAMP}.dump/.database_bytes" ]; then
+                    TOTAL_BYTES=$(( TOTAL_BYTES + $(cat "./''${DB}-''${TIMESTAMP}.dump/.database_bytes") ))
+                    rm "./''${DB}-''${TIMESTAMP}.dump/.database_bytes"
                 fi
             done
+            awk -v bytes="$TOTAL_BYTES" -v s="$(( $(date +%s) - WALL_START ))" 'BEGIN {
+                if (s < 1) s = 1
+                printf "Total: %.0f MB of databases in %ds (%.1f MB/s)\n", bytes / 1048576, s, bytes / 1048576 / s
+            }'
 
             if [ "$FAILURES" -ne 0 ]; then
               exit 1
@@ -61,24 +186,50 @@
 
           db-restore-script = pkgs.writeShellScriptBin "db-restore" ''
             #!/usr/bin/env bash
-            # Usage: db-restore <backup_file_path> [target_database_name]
+            # Usage: db-restore [-j jobs] <backup_path> [target_database_name]
+            # backup_path is a directory-format dump from db-backup (<db>-<timestamp>.dump), restored
+            # with parallel pg_restore jobs, or a plain .sql file from the older db-backup.
+            # An incremental dump is restored with the backups it builds on: it provides the schema
+            # and all other data; the spend logs come from the full backup at the start of its
+            # chain, then from each incremental's spend_logs.csv.zst, oldest first.
             # If target_database_name is omitted, it attempts to infer it from the backup file name,
             # or defaults to 'mylitellm'.
 
-            BACKUP_FILE="$1"
+            JOBS=$(getconf _NPROCESSORS_ONLN 2>/dev/null || echo 4)
+            if [ "$1" = "-j" ]; then
+              JOBS="$2"
+              shift 2
+            fi
+
+            BACKUP_FILE="''${1%/}"
             if [ -z "$BACKUP_FILE" ]; then
               echo -e "\033[1;31m❌ Error: Backup file path is required.\033[0m"
-              echo "Usage: db-restore <backup_file_path> [target_database_name]"
+              echo "Usage: db-restore [-j jobs] <backup_path> [target_database_name]"
               exit 1
             fi
 
             # Attempt to infer DB name from common backup file naming convention
-            # e.g., mylitellm-20231027_103000.sql -> mylitellm
-            INFERRED_DB_NAME=$(basename "$BACKUP_FILE" | sed -E 's/-[0-9]{8}_[0-9]{6}\.sql$//; s/\.sql$//')
+            # e.g., mylitellm-20231027_103000.dump -> mylitellm
+            INFERRED_DB_NAME=$(basename "$BACKUP_FILE" | sed -E 's/-[0-9]{8}_[0-9]{6}\.(sql|dump)$//; s/\.(sql|dump)$//')
             TARGET_DB_NAME=''${2:-''${INFERRED_DB_NAME:-mylitellm}}
 
+            # incremental chain, oldest (the full backup) first
+            CHAIN=("$BACKUP_FILE")
+            if [ -d "$BACKUP_FILE" ]; then
+              while grep -q "^mode=incremental" "''${CHAIN[0]}/backup_info" 2>/dev/null; do
+                BASE=$(sed -n 's/^base=//p' "''${CHAIN[0]}/backup_info")
+                BASE="$(dirname "''${CHAIN[0]}")/$(basename "$BASE")"
+                if [ ! -d "$BASE" ]; then
+                  echo -e "\033[1;31m❌ Backup $BASE, which ''${CHAIN[0]} builds on, is missing.\033[0m"
+                  exit 1
+                fi
+                CHAIN=("$BASE" "''${CHAIN[@]}")
+              done
+            fi
+
             echo -e "\033[1;34m=== PostgreSQL Restore ===\033[0m"
             echo "Backup File: $BACKUP_FILE"
+            [ "''${#CHAIN[@]}" -gt 1 ] && echo "Incremental chain: ''${CHAIN[*]}"
             echo "Target Database: $TARGET_DB_NAME"
 
             read -p "This will drop and recreate the database '$TARGET_DB_NAME'. Are you sure? [y/N] " -n 1 -r
@@ -103,11 +254,41 @@
             fi
 
             echo "Restoring data into '$TARGET_DB_NAME'..."
-            # Use psql to restore from the SQL file.
-            psql -U postgres -d "$TARGET_DB_NAME" < "$BACKUP_FILE"
+            START=$(date +%s)
+            if [ -d "$BACKUP_FILE" ]; then
+              pg_restore -U postgres -j "$JOBS" -d "$TARGET_DB_NAME" "$BACKUP_FILE"
+              STATUS=$?
+              if [ "$STATUS" -eq 0 ] && [ "''${#CHAIN[@]}" -gt 1 ]; then
+                echo "Restoring spend logs from the full backup ''${CHAIN[0]}..."
+                LIST=$(mktemp)
+                pg_restore -l "''${CHAIN[0]}" | grep -E 'TABLE DATA .*LiteLLM_SpendLogs' > "$LIST"
+                pg_restore -U postgres -j "$JOBS" -d "$TARGET_DB_NAME" --data-only --disable-triggers -L "$LIST" "''${CHAIN[0]}"
+                STATUS=$?
+                rm -f "$LIST"
+                for INCREMENT in "''${CHAIN[@]:1}"; do
+                  [ "$STATUS" -eq 0 ] || break
+                  echo "Applying spend logs from $INCREMENT..."
+                  zstd -dc "$INCREMENT/spend_logs.csv.zst" | psql -U postgres -d "$TARGET_DB_NAME" -X -q -v ON_ERROR_STOP=1 \
+                    -c 'CREATE TEMP TABLE increment (LIKE "LiteLLM_SpendLogs")' \
+                    -c '\copy increment FROM pstdin WITH (FORMAT csv)' \
+                    -c 'INSERT INTO "LiteLLM_SpendLogs" SELECT * FROM increment ON CONFLICT DO NOTHING'
+                  STATUS=$?
+                done
+              fi
+            else
+              # Use psql to restore from the SQL file.
+              psql -U postgres -d "$TARGET_DB_NAME" < "$BACKUP_FILE"
+              STATUS=$?
+            fi
 
-            if [ $? -eq 0 ]; then
-              echo -e "\033[1;32m✔ Restore successful.\033[0m"
+            if [ "$STATUS" -eq 0 ]; then
+              DB_BYTES=$(psql -U postgres -A -t -c "SELECT pg_database_size('$TARGET_DB_NAME');")
+              BACKUP_KB=$(du -sk "''${CHAIN[@]}" | awk '{ kb += $1 } END { print kb }')
+              awk -v bytes="$DB_BYTES" -v kb="$BACKUP_KB" -v s="$(( $(date +%s) - START ))" 'BEGIN {
+                  if (s < 1) s = 1
+                  printf "\033[1;32m✔ Restore successful.\033[0m  %.0f MB backup -> %.0f MB database in %ds (%.1f MB/s)\n",
+                      kb / 1024, bytes / 1048576, s, bytes / 1048576 / s
+              }'
             else
               echo -e "\033[1;31m❌ Restore failed.\033[0m"
               exit 1
@@ -129,12 +310,16 @@
             echo "  postgres-info   : Status and connection info"
             echo "  postgres-reset  : Factory reset the database"
             echo "  postgres-logs   : Tail database logs"
-            echo "  db-backup       : Backup PostgreSQL databases"
-            echo "  db-restore      : Restore a PostgreSQL database from a backup file"
+            echo "  db-backup       : Backup PostgreSQL databases (parallel, zstd; --incremental, --skip-archived)"
+            echo "  db-restore      : Restore a PostgreSQL database from a backup (parallel pg_restore)"
+            echo "  python db_maintenance/spend_log_partitions.py status : Spend-log partitions and archives"
+            echo "  python db_maintenance/prompt_store.py report         : Space saved by the spend-log prompt store"
+            echo "  python db_maintenance/letta_vector_index.py status   : Letta embedding indexes and their memory"
             echo ""
             echo "Redis:"
             echo "  redis-info      : Status and connection info (not yet implemented)"
             echo "  redis-logs      : Tail Redis logs (not yet implemented)"
+            echo "  python debugging_redis/redis_cache_warmup.py : Refill the semantic cache from the spend logs (after a restart)"
             echo ""
             echo "LiteLLM Proxy:"
             echo "  To start the server, run: ./rp.sh"
@@ -206,6 +391,8 @@
               pgadmin4-desktopmode
               db-backup-script
               db-restore-script
+              zstd # spend-log archives (db_maintenance/spend_log_partitions.py)
+              duckdb # queries and parquet export for those archives
             ];
 
             LITELLM_TARGET_VERSION = litellmVer;
@@ -217,78 +404,172 @@
               export PGDATA="$WRAPPER_DIR/postgresql/data"
               export REDIS_DIR="$WRAPPER_DIR/redis/data" # Define REDIS_DIR
 
-              # 1. Resolve ZSH path
-              DETECTED_ZSH=$(zsh -i -c 'echo $ZSH' 2>/dev/null | head -n 1)
-              if [ -z "$DETECTED_ZSH" ]; then
-                DETECTED_ZSH=$(readlink -f "/etc/profiles/per-user/$USER/share/oh-my-zsh" 2>/dev/null)
-              fi
+              # Bootstrap phases run in parallel: Python sync (checkout -> poetry -> prisma),
+              # PostgreSQL, the Redis container and the zsh lookup. Steps record a fingerprint of
+              # their inputs in .devshell-state and are skipped while it is unchanged. Each phase's
+              # output is printed once all have finished, followed by the timing breakdown.
+              STATE_DIR="$WRAPPER_DIR/.devshell-state"
+              PHASE_DIR=$(mktemp -d)
+              mkdir -p "$STATE_DIR"
+              POETRY_GROUPS="dev,proxy-dev"
+              POETRY_EXTRAS="proxy extra_proxy caching"
+
+              now_ms() { local t="''${EPOCHREALTIME/[.,]/}"; echo $(( t / 1000 )); }
+              fingerprint() { sha256sum | cut -c1-16; }
+              unchanged() { [ "$(cat "$STATE_DIR/$1" 2>/dev/null)" = "$2" ]; } # step fingerprint
+              BOOT_START=$(now_ms)
+
+              # step NAME FINGERPRINT COMMAND...: run unless the fingerprint matches the last successful run
+              step() {
+                local name="$1" print="$2" start
+                shift 2
+                start=$(now_ms)
+                if [ -n "$print" ] && unchanged "$name" "$print"; then
+                  echo "$name $(( $(now_ms) - start )) unchanged" >> "$PHASE_DIR/steps"
+                  return 0
+                fi
+                "$@"
+                [ -n "$print" ] && echo "$print" > "$STATE_DIR/$name"
+                echo "$name $(( $(now_ms) - start )) ran" >> "$PHASE_DIR/steps"
+              }
+
+              # run_phase NAME FUNCTION: in the background; output and duration go to $PHASE_DIR
+              PHASE_PIDS=()
+              run_phase() {
+                echo "$1" >> "$PHASE_DIR/order"
+                (
+                  set +e
+                  start=$(now_ms)
+                  (set -e; "$2") > "$PHASE_DIR/$1.log" 2>&1
+                  status=$?
+                  echo "$(( $(now_ms) - start )) $status" > "$PHASE_DIR/$1.time"
+                ) &
+                PHASE_PIDS+=($!)
+              }
+
+              # 1. Resolve ZSH path (an interactive zsh startup: slow with oh-my-zsh)
+              detect_zsh() {
+                DETECTED_ZSH=$(zsh -i -c 'echo $ZSH' 2>/dev/null </dev/null | head -n 1)
+                if [ -z "$DETECTED_ZSH" ]; then
+                  DETECTED_ZSH=$(readlink -f "/etc/profiles/per-user/$USER/share/oh-my-zsh" 2>/dev/null)
+                fi
+                echo "$DETECTED_ZSH" > "$PHASE_DIR/zsh"
+              }
 
-              # 2. Sync LiteLLM
-              if [ -d "$LITELLM_DIR" ]; then
+              # 2. Sync LiteLLM, 3. Sync Python & Prisma
+              checkout_litellm() {
                 echo "--- Attempting to update LiteLLM to $LITELLM_TARGET_VERSION ---"
-                cd "$LITELLM_DIR" && git checkout "$LITELLM_TARGET_VERSION"
-              fi
-
-              # 3. Sync Python & Prisma
-              echo "--- Syncing Python Environment & Prisma ---"
-              (
+                git checkout "$LITELLM_TARGET_VERSION"
+              }
+              poetry_install() {
+                echo "--- Syncing Python Environment ---"
+                ${pkgs.poetry}/bin/poetry install --with "$POETRY_GROUPS" --extras "$POETRY_EXTRAS"
+              }
+              prisma_generate() {
+                echo "--- Generating Prisma client ---"
+                ${pkgs.poetry}/bin/poetry run prisma generate
+              }
+              sync_python() {
+                [ -d "$LITELLM_DIR" ] || return 0
                 cd "$LITELLM_DIR"
-                ${pkgs.poetry}/bin/poetry install --with dev,proxy-dev --extras "proxy extra_proxy caching" 2>/dev/null
-                ${pkgs.poetry}/bin/poetry run prisma generate 2>/dev/null
-              )
-              export PATH="$LITELLM_DIR/.venv/bin:$PATH"
+                # the commit the tag resolves to; empty when it is not fetched yet, so checkout runs and reports it
+                TARGET=$(git rev-parse -q --verify "$LITELLM_TARGET_VERSION^{commit}" || true)
+                # the checkout's fingerprint is whatever is checked out now, so a manual checkout is noticed
+                git rev-parse HEAD > "$STATE_DIR/litellm-checkout"
+                step litellm-checkout "$TARGET" checkout_litellm
+                PYTHON_PRINT=$( (echo "$POETRY_GROUPS $POETRY_EXTRAS"; cat poetry.lock pyproject.toml; ls .venv/bin/python) | fingerprint)
+                step poetry-install "$PYTHON_PRINT" poetry_install
+                # a reinstall can replace the prisma package, and with it the generated client
+                PRISMA_PRINT=$( (echo "$PYTHON_PRINT"; cat schema.prisma) | fingerprint)
+                step prisma-generate "$PRISMA_PRINT" prisma_generate
+              }
 
               # 4. DB Setup
-              if [ ! -d "$PGDATA" ]; then
-                echo "--- Initializing PostgreSQL data directory ---"
-                mkdir -p "$(dirname "$PGDATA")"
-                ${postgresql}/bin/initdb -D "$PGDATA" --auth-local=trust -U postgres --no-locale >/dev/null
-              fi
-              if ! ${postgresql}/bin/pg_ctl -D "$PGDATA" status > /dev/null 2>&1; then
-                echo "--- Starting PostgreSQL server ---"
-                ${postgresql}/bin/pg_ctl -D "$PGDATA" -l "$PGDATA/postgres.log" start >/dev/null
-                echo "--- PostgreSQL server started. ---"
-                ${postgresql}/bin/createdb -U postgres mylitellm 2>/dev/null || true
-              else
-                echo "--- PostgreSQL server already running. ---"
-              fi
+              start_postgres() {
+                if [ ! -d "$PGDATA" ]; then
+                  echo "--- Initializing PostgreSQL data directory ---"
+                  mkdir -p "$(dirname "$PGDATA")"
+                  ${postgresql}/bin/initdb -D "$PGDATA" --auth-local=trust -U postgres --no-locale >/dev/null
+                fi
+                if ! ${postgresql}/bin/pg_ctl -D "$PGDATA" status > /dev/null 2>&1; then
+                  echo "--- Starting PostgreSQL server ---"
+                  ${postgresql}/bin/pg_ctl -D "$PGDATA" -l "$PGDATA/postgres.log" start >/dev/null
+                  echo "--- PostgreSQL server started. ---"
+                  ${postgresql}/bin/createdb -U postgres mylitellm 2>/dev/null || true
+                else
+                  echo "--- PostgreSQL server already running. ---"
+                fi
+              }
 
               # Redis 8 Stack Setup
-              echo "--- Checking Redis Stack Status ---"
-              
-              if command -v container &> /dev/null; then
-                  container system start # TODO: better error handling
-                  # Capture the inspect output
-                  STATUS=$(container inspect litellm-redis 2>/dev/null)
-                  echo "\STATUS: $STATUS"
-                  # Explicitly check for "[]" which means "Not Found"
-                  if [ "$STATUS" = "[]" ] || [ -z "$STATUS" ]; then
-                      echo "--- Starting Redis Stack Container (Search/JSON enabled) ---"
-                      container run -d --name litellm-redis -p 6379:6379 redis/redis-stack-server:latest
-                  else
-                      echo "--- Redis Container is already running ---"
-                  fi
-              else
-                  echo -e "\033[1;31mWarning: 'container' tool not found. Redis may not be running!\033[0m"
-                  echo -e "   Manual install dependency on:"
-                  echo -e "   https://github.com/apple/container"
-                  exit 1
-              fi
+              start_redis() {
+                echo "--- Checking Redis Stack Status ---"
+                if command -v container &> /dev/null; then
+                    container system start # TODO: better error handling
+                    # Capture the inspect output
+                    STATUS=$(container inspect litellm-redis 2>/dev/null)
+                    # Explicitly check for "[]" which means "Not Found"
+                    if [ "$STATUS" = "[]" ] || [ -z "$STATUS" ]; then
+                        echo "--- Starting Redis Stack Container (Search/JSON enabled) ---"
+                        container run -d --name litellm-redis -p 6379:6379 redis/redis-stack-server:latest
+                    else
+                        echo "--- Redis Container is already running ---"
+                    fi
+                else
+                    echo -e "\033[1;31mWarning: 'container' tool not found. Redis may not be running!\033[0m"
+                    echo -e "   Manual install dependency on:"
+                    echo -e "   https://github.com/apple/container"
+                    return 1
+                fi
 
-              # 4. Connection Health Check
-              echo -n "Waiting for Redis connection..."
-              MAX_RETRIES=10
-              COUNT=0
-              until redis-cli -p 6379 ping >/dev/null 2>&1; do
-                 sleep 1
-                 echo -n "."
-                 COUNT=$((COUNT+1))
-                 if [ $COUNT -ge $MAX_RETRIES ]; then
-                    echo -e "\n\033[1;31mFailed to connect to Redis. Is the container running?\033[0m"
-                    break
-                 fi
+                # Connection Health Check: every 100ms for up to 10s
+                echo -n "Waiting for Redis connection..."
+                COUNT=0
+                until redis-cli -p 6379 ping >/dev/null 2>&1; do
+                   sleep 0.1
+                   COUNT=$((COUNT+1))
+                   if [ $COUNT -ge 100 ]; then
+                      echo -e "\n\033[1;31mFailed to connect to Redis. Is the container running?\033[0m"
+                      return 0
+                   fi
+                done
+                echo " Connected to Redis!"
+              }
+
+              run_phase python sync_python
+              run_phase postgres start_postgres
+              run_phase redis start_redis
+              run_phase zsh detect_zsh
+              for PID in "''${PHASE_PIDS[@]}"; do
+                wait "$PID" || true
               done
-              echo " Connected to Redis!"
+
+              FAILED=""
+              TIMINGS=""
+              while read -r PHASE; do
+                cat "$PHASE_DIR/$PHASE.log"
+                read -r MS STATUS < "$PHASE_DIR/$PHASE.time" || { MS=0; STATUS=1; }
+                [ "$STATUS" -ne 0 ] && FAILED="$FAILED $PHASE"
+                TIMINGS="$TIMINGS$(printf '  %-18s %6d ms' "$PHASE" "$MS")\n"
+                if [ "$PHASE" = python ] && [ -f "$PHASE_DIR/steps" ]; then
+                  while read -r STEP MS RESULT; do
+                    TIMINGS="$TIMINGS$(printf '    %-16s %6d ms  %s' "$STEP" "$MS" "$RESULT")\n"
+                  done < "$PHASE_DIR/steps"
+                fi
+              done < "$PHASE_DIR/order"
+              DETECTED_ZSH=$(cat "$PHASE_DIR/zsh" 2>/dev/null || true)
+              BOOT_MS=$(( $(now_ms) - BOOT_START ))
+              echo "--- Startup timing ---"
+              echo -ne "$TIMINGS"
+              printf '  %-18s %6d ms\n' total "$BOOT_MS"
+              # one line per startup, to spot regressions over time
+              echo "$(date +%Y-%m-%dT%H:%M:%S) total=$BOOT_MS $(echo -ne "$TIMINGS" | awk '{ printf "%s=%s ", $1, $2 }')" >> "$STATE_DIR/timings.log"
+              rm -rf "$PHASE_DIR"
+              if [ -n "$FAILED" ]; then
+                echo -e "\033[1;31m❌ Startup failed in:$FAILED\033[0m"
+                exit 1
+              fi
+              export PATH="$LITELLM_DIR/.venv/bin:$PATH"
 
               # 5. Shell Handoff
               if [ -z "$IN_LITELLM_ZSH" ]; then
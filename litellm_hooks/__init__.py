@@ -0,0 +1,5 @@
+"""
+Proxy-side extensions for the LiteLLM proxy, loaded through `litellm_settings.callbacks`
+in the proxy config. rp.sh puts the wrapper directory on PYTHONPATH so the modules
+can import each other.
+"""
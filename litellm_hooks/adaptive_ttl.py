@@ -0,0 +1,319 @@
+"""
+Adaptive per-entry TTL for the redis-semantic cache, under a memory budget.
+
+cache_params.ttl gives every entry the same life, so popular answers expire while
+one-off answers hold memory for the full TTL. With this hook a new entry lives
+initial_ttl seconds, and every hit extends it to
+
+    min(max_ttl, initial_ttl * growth ** hits)
+
+Entries are tracked in Redis next to the semantic index, shared by all workers:
+an LFU sorted set with dynamic aging (a new entry starts at the score of the last
+eviction + 1, so old popularity fades), their MEMORY USAGE, and their expiry times.
+When the tracked bytes exceed max_bytes, the lowest-scoring entries are evicted down
+to 95% of the budget. Bookkeeping runs in Lua scripts, one round trip per store or
+hit, on the redisvl cache under LiteLLM's semantic backend, so it sees exactly the
+entries the index holds whatever other cache hooks are stacked above it. Hits the
+two_tier_cache LRU answers in process never reach redisvl; it reports them to
+AdaptiveTTLStore.hit with the entry key recorded here (entry_key), so hot entries
+still have their TTL extended and count in the stats.
+
+Enable in the proxy config, next to cache_params:
+
+    litellm_settings:
+      adaptive_ttl_params:
+        initial_ttl: 60
+        max_ttl: 86400
+        growth: 2
+        max_bytes: 268435456
+      callbacks:
+        - litellm_hooks.adaptive_ttl.proxy_handler_instance
+
+Hit rate, memory and hits a fixed cache_params.ttl would have missed:
+python -m litellm_hooks.adaptive_ttl. The same policy replayed offline against fixed
+TTLs: python perf/semantic_cache_sim.py --adaptive 60:86400
+"""
+
+import contextvars
+import logging
+import time
+
+import litellm
+from litellm.integrations.custom_logger import CustomLogger
+
+from litellm_hooks.common import (
+    async_redis, cache_params, expect_install, litellm_setting, on_llmcache, report_hooks_soon, sync_redis, wrap_method,
+)
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "adaptive_ttl"
+FREQ_KEY = f"{KEY_PREFIX}:lfu"
+EXPIRY_KEY = f"{KEY_PREFIX}:expiry"
+SIZES_KEY = f"{KEY_PREFIX}:bytes"
+HITS_KEY = f"{KEY_PREFIX}:hits"
+BORN_KEY = f"{KEY_PREFIX}:born"
+STATS_KEY = f"{KEY_PREFIX}:stats"
+DEFAULT_INITIAL_TTL = 60
+DEFAULT_MAX_TTL = 86400
+DEFAULT_GROWTH = 2.0
+DEFAULT_MAX_BYTES = 256 * 2**20
+DEFAULT_FIXED_TTL = 300
+# Redis key of the semantic entry the current lookup hit or the current store wrote
+entry_key = contextvars.ContextVar("adaptive_ttl_entry_key", default=None)
+# Sweep expired entries out of the accounting every N stores even when under budget
+TRIM_EVERY = 64
+SWEEP_BATCH = 1000
+
+# KEYS: entry, lfu, expiry, bytes, hits, born, stats   ARGV: ttl, now
+STORE_SCRIPT = """
+local size = redis.call('MEMORY', 'USAGE', KEYS[1]) or 0
+local ttl, now = tonumber(ARGV[1]), tonumber(ARGV[2])
+redis.call('EXPIRE', KEYS[1], ttl)
+local age = tonumber(redis.call('HGET', KEYS[7], 'age') or '0')
+redis.call('ZADD', KEYS[2], age + 1, KEYS[1])
+redis.call('ZADD', KEYS[3], now + ttl, KEYS[1])
+local previous = tonumber(redis.call('HGET', KEYS[4], KEYS[1]) or '0')
+redis.call('HSET', KEYS[4], KEYS[1], size)
+redis.call('HDEL', KEYS[5], KEYS[1])
+redis.call('HSET', KEYS[6], KEYS[1], now)
+redis.call('HINCRBY', KEYS[7], 'stores', 1)
+redis.call('HINCRBY', KEYS[7], 'bytes_stored', size)
+return redis.call('HINCRBY', KEYS[7], 'bytes', size - previous)
+"""
+
+# KEYS: entry, lfu, expiry, hits, born, stats   ARGV: initial_ttl, max_ttl, growth, now, fixed_ttl
+HIT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return -1 end
+local now = tonumber(ARGV[4])
+local hits = redis.call('HINCRBY', KEYS[4], KEYS[1], 1)
+redis.call('ZINCRBY', KEYS[2], 1, KEYS[1])
+redis.call('HINCRBY', KEYS[6], 'hits', 1)
+local born = tonumber(redis.call('HGET', KEYS[5], KEYS[1]) or ARGV[4])
+if now - born > tonumber(ARGV[5]) then
+  redis.call('HINCRBY', KEYS[6], 'hits_beyond_fixed_ttl', 1)
+end
+local ttl = math.min(tonumber(ARGV[2]), math.floor(tonumber(ARGV[1]) * tonumber(ARGV[3]) ^ math.min(hits, 64)))
+if ttl > redis.call('TTL', KEYS[1]) then
+  redis.call('EXPIRE', KEYS[1], ttl)
+  redis.call('ZADD', KEYS[3], now + ttl, KEYS[1])
+  redis.call('HINCRBY', KEYS[6], 'extensions', 1)
+end
+return ttl
+"""
+
+# KEYS: lfu, expiry, bytes, hits, born, stats   ARGV: now, max_bytes, target_bytes, sweep_batch
+TRIM_SCRIPT = """
+local function forget(key)
+  local size = tonumber(redis.call('HGET', KEYS[3], key) or '0')
+  redis.call('ZREM', KEYS[1], key)
+  redis.call('ZREM', KEYS[2], key)
+  redis.call('HDEL', KEYS[3], key)
+  redis.call('HDEL', KEYS[4], key)
+  redis.call('HDEL', KEYS[5], key)
+  return size
+end
+local freed, expired = 0, 0
+for _, key in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[4]))) do
+  if redis.call('EXISTS', key) == 0 then
+    freed = freed + forget(key)
+    expired = expired + 1
+  end
+end
+local bytes = redis.call('HINCRBY', KEYS[6], 'bytes', -freed)
+redis.call('HINCRBY', KEYS[6], 'expirations', expired)
+local evicted, evicted_bytes = 0, 0
+if bytes > tonumber(ARGV[2]) then
+  while bytes > tonumber(ARGV[3]) do
+    local victim = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    if #victim == 0 then break end
+    redis.call('UNLINK', victim[1])
+    local size = forget(victim[1])
+    redis.call('HSET', KEYS[6], 'age', victim[2])
+    bytes = bytes - size
+    evicted = evicted + 1
+    evicted_bytes = evicted_bytes + size
+  end
+  redis.call('HSET', KEYS[6], 'bytes', bytes)
+  redis.call('HINCRBY', KEYS[6], 'evictions', evicted)
+  redis.call('HINCRBY', KEYS[6], 'bytes_evicted', evicted_bytes)
+end
+return {expired, evicted}
+"""
+
+
+class AdaptiveTTLPolicy:
+    """TTL of an entry after a number of hits (shared with perf/semantic_cache_sim.py)"""
+
+    def __init__(self, initial_ttl=DEFAULT_INITIAL_TTL, max_ttl=DEFAULT_MAX_TTL, growth=DEFAULT_GROWTH):
+        self.initial_ttl = initial_ttl
+        self.max_ttl = max_ttl
+        self.growth = growth
+
+    def ttl(self, hits=0):
+        # the cap is reached long before 64 doublings; float ** int overflows past ~1000
+        return min(self.max_ttl, int(self.initial_ttl * self.growth ** min(int(hits), 64)))
+
+
+class AdaptiveTTLStore:
+    """Redis-side entry accounting: expiry extension on hits, LFU eviction over max_bytes"""
+
+    def __init__(self, policy, max_bytes=DEFAULT_MAX_BYTES, fixed_ttl=DEFAULT_FIXED_TTL, redis_client=None):
+        self.policy = policy
+        self.max_bytes = max_bytes
+        self.fixed_ttl = fixed_ttl
+        self._redis = redis_client
+        self.stores = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = async_redis()
+        return self._redis
+
+    async def stored(self, key):
+        """Account for a new entry; trims when the budget is exceeded"""
+        total = await self.redis.eval(STORE_SCRIPT, 7, key, FREQ_KEY, EXPIRY_KEY, SIZES_KEY, HITS_KEY, BORN_KEY,
+                                      STATS_KEY, self.policy.initial_ttl, time.time())
+        self.stores += 1
+        if total > self.max_bytes or self.stores % TRIM_EVERY == 0:
+            await self.trim()
+
+    async def hit(self, key):
+        """Extend a hit entry's TTL; returns the new TTL, or -1 when the entry is gone"""
+        self.hits += 1
+        return await self.redis.eval(HIT_SCRIPT, 6, key, FREQ_KEY, EXPIRY_KEY, HITS_KEY, BORN_KEY, STATS_KEY,
+                              self.policy.initial_ttl, self.policy.max_ttl, self.policy.growth, time.time(),
+                              self.fixed_ttl)
+
+    async def missed(self):
+        self.misses += 1
+        await self.redis.hincrby(STATS_KEY, "misses", 1)
+
+    async def trim(self):
+        """Drop expired entries from the accounting, then evict LFU entries down to 95% of max_bytes"""
+        expired, evicted = await self.redis.eval(
+            TRIM_SCRIPT, 6, FREQ_KEY, EXPIRY_KEY, SIZES_KEY, HITS_KEY, BORN_KEY, STATS_KEY,
+            time.time(), self.max_bytes, int(self.max_bytes * 0.95), SWEEP_BATCH)
+        self.evictions += evicted
+        if evicted:
+            logger.info("adaptive ttl: evicted %s semantic cache entries over the %s byte budget",
+                        evicted, self.max_bytes)
+        return expired, evicted
+
+
+def adaptive_astore(store, astore):
+    """redisvl SemanticCache.astore wrapper: initial TTL instead of cache_params.ttl, then accounting"""
+
+    async def wrapper(prompt, response, *args, **kwargs):
+        kwargs["ttl"] = store.policy.initial_ttl
+        key = await astore(prompt, response, *args, **kwargs)
+        entry_key.set(key)
+        try:
+            await store.stored(key)
+        except Exception as e:
+            logger.debug("adaptive ttl store accounting failed: %s", e)
+        return key
+
+    return wrapper
+
+
+def adaptive_acheck(store, acheck):
+    """redisvl SemanticCache.acheck wrapper: extends the best match's TTL"""
+
+    async def wrapper(*args, **kwargs):
+        results = await acheck(*args, **kwargs)
+        try:
+            if results and results[0].get("key"):
+                entry_key.set(results[0]["key"])
+                await store.hit(results[0]["key"])
+            else:
+                await store.missed()
+        except Exception as e:
+            logger.debug("adaptive ttl hit accounting failed: %s", e)
+        return results
+
+    return wrapper
+
+
+def wrap_llmcache(llmcache, store):
+    wrap_method(llmcache, "astore", lambda fn: adaptive_astore(store, fn), "adaptive_ttl")
+    wrap_method(llmcache, "acheck", lambda fn: adaptive_acheck(store, fn), "adaptive_ttl")
+    return llmcache
+
+
+def install(store):
+    """
+    Attach to the semantic backend's redisvl cache (built in __init__ by LiteLLM 1.80,
+    on the first lookup by later releases; see common.on_llmcache). Returns False until
+    litellm.cache exists; a cache that is not redis-semantic is reported once.
+    """
+    cache = getattr(litellm, "cache", None)
+    backend = getattr(cache, "cache", None)
+    if backend is None:
+        return False
+    if getattr(backend, "_adaptive_ttl", None) is store:
+        return True
+    if not on_llmcache(backend, lambda llmcache: wrap_llmcache(llmcache, store), "adaptive_ttl"):
+        logger.warning("adaptive ttl not installed: %s is not a redis-semantic cache", type(backend).__name__)
+        return True
+    backend._adaptive_ttl = store
+    logger.info("adaptive ttl installed: %ss initial, %ss max, %s byte budget",
+                store.policy.initial_ttl, store.policy.max_ttl, store.max_bytes)
+    return True
+
+
+class AdaptiveTTLHook(CustomLogger):
+    """Installs the adaptive expiry on the semantic cache before its first lookup"""
+
+    def __init__(self):
+        super().__init__()
+        expect_install("adaptive_ttl")
+        settings = litellm_setting("adaptive_ttl_params", {}) or {}
+        policy = AdaptiveTTLPolicy(
+            initial_ttl=int(settings.get("initial_ttl", DEFAULT_INITIAL_TTL)),
+            max_ttl=int(settings.get("max_ttl", DEFAULT_MAX_TTL)),
+            growth=float(settings.get("growth", DEFAULT_GROWTH)),
+        )
+        self.store = AdaptiveTTLStore(policy, max_bytes=int(settings.get("max_bytes", DEFAULT_MAX_BYTES)),
+                                      fixed_ttl=int(cache_params().get("ttl") or DEFAULT_FIXED_TTL))
+        self.installed = install(self.store)
+
+    async def async_pre_call_hook(self, user_api_key_dict, cache, data, call_type):
+        report_hooks_soon()
+        if not self.installed:
+            self.installed = install(self.store)
+        return data
+
+
+proxy_handler_instance = AdaptiveTTLHook()
+
+
+def main():
+    """Print the cross-worker counters kept in Redis"""
+    conn = sync_redis()
+    stats = {k.decode(): float(v) for k, v in conn.hgetall(STATS_KEY).items()}
+    lookups = stats.get("hits", 0) + stats.get("misses", 0)
+    print("Adaptive TTL Statistics")
+    print("=" * 40)
+    for name in ("hits", "misses", "stores", "extensions", "expirations", "evictions"):
+        print(f"{name:<22} {int(stats.get(name, 0))}")
+    if lookups:
+        print(f"{'hit rate':<22} {stats.get('hits', 0) / lookups * 100:.1f}%")
+        # hits on entries older than cache_params.ttl: misses under the fixed TTL
+        print(f"{'hits past fixed ttl':<22} {int(stats.get('hits_beyond_fixed_ttl', 0))} "
+              f"({stats.get('hits_beyond_fixed_ttl', 0) / lookups * 100:.1f}% of lookups)")
+    print(f"{'entries':<22} {conn.zcard(FREQ_KEY)}")
+    print(f"{'tracked MiB':<22} {stats.get('bytes', 0) / 2**20:.1f}")
+    print(f"{'evicted MiB':<22} {stats.get('bytes_evicted', 0) / 2**20:.1f}")
+    stores = stats.get("stores", 0)
+    if stores:
+        print(f"{'mean entry KiB':<22} {stats.get('bytes_stored', 0) / stores / 1024:.1f}")
+    print(f"{'as of':<22} {time.strftime('%Y-%m-%d %H:%M:%S')}")
+
+
+if __name__ == "__main__":
+    main()
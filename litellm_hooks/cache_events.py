@@ -0,0 +1,65 @@
+"""
+Publishes one compact JSON event per proxy request (model, cache hit, cache key,
+latency) to a Redis pub/sub channel, so debugging_redis/redis_cache_events.py can
+attribute keyspace notifications to individual requests.
+
+Enable in the proxy config:
+
+    litellm_settings:
+      callbacks: ["litellm_hooks.cache_events.proxy_handler_instance"]
+"""
+
+import json
+import logging
+import time
+
+from litellm.integrations.custom_logger import CustomLogger
+
+from litellm_hooks.common import CACHE_EVENTS_CHANNEL, async_redis
+
+logger = logging.getLogger(__name__)
+
+
+def request_event(kwargs, start_time, end_time, error=None):
+    """Event dict from a LiteLLM logging callback's kwargs"""
+    payload = kwargs.get("standard_logging_object") or {}
+    litellm_params = kwargs.get("litellm_params") or {}
+    return {
+        "t": time.time(),
+        "id": payload.get("id") or kwargs.get("litellm_call_id"),
+        "model": payload.get("model_group") or kwargs.get("model"),
+        "call_type": payload.get("call_type") or kwargs.get("call_type"),
+        "cache_hit": bool(payload.get("cache_hit") or kwargs.get("cache_hit")),
+        # same value LiteLLM returns in the x-litellm-cache-key response header
+        "cache_key": payload.get("cache_key") or litellm_params.get("preset_cache_key"),
+        "latency": (end_time - start_time).total_seconds() if start_time and end_time else None,
+        "error": error,
+    }
+
+
+class CacheEventPublisher(CustomLogger):
+    """Fire-and-forget PUBLISH of per-request cache outcomes"""
+
+    def __init__(self, channel=CACHE_EVENTS_CHANNEL):
+        super().__init__()
+        self.channel = channel
+        self._redis = None
+
+    async def _publish(self, event):
+        try:
+            if self._redis is None:
+                self._redis = async_redis()
+            await self._redis.publish(self.channel, json.dumps(event))
+        except Exception as e:
+            # observability must never fail a request
+            logger.debug("cache event publish failed: %s", e)
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        await self._publish(request_event(kwargs, start_time, end_time))
+
+    async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        error = str(kwargs.get("exception") or "error")[:200]
+        await self._publish(request_event(kwargs, start_time, end_time, error=error))
+
+
+proxy_handler_instance = CacheEventPublisher()
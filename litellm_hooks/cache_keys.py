@@ -0,0 +1,104 @@
+"""
+Normalized request hashing shared by the cache-layer hooks.
+Two requests get the same key when they would produce the same completion:
+same model, same messages (optionally ignoring system messages) and same
+output-affecting parameters.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+# Request parameters that change the completion; everything else (metadata, user, api keys) is ignored
+OUTPUT_PARAMS = (
+    "temperature", "top_p", "max_tokens", "max_completion_tokens", "n", "stop", "seed",
+    "tools", "tool_choice", "functions", "function_call", "response_format",
+    "frequency_penalty", "presence_penalty", "logit_bias", "reasoning_effort", "input",
+)
+
+
+def normalize_content(content):
+    """Strip surrounding whitespace from text content (string or content-part list)"""
+    if isinstance(content, str):
+        return content.strip()
+    if isinstance(content, list):
+        return [
+            dict(part, text=part["text"].strip()) if isinstance(part, dict) and isinstance(part.get("text"), str) else part
+            for part in content
+        ]
+    return content
+
+
+def normalize_message(message):
+    """Role/content/tool fields of a message, without None values"""
+    normalized = {k: v for k, v in message.items() if v is not None and k != "cache_control"}
+    if "content" in normalized:
+        normalized["content"] = normalize_content(normalized["content"])
+    return normalized
+
+
+def normalize_messages(messages, skip_system=False):
+    return [
+        normalize_message(m) for m in messages or []
+        if not (skip_system and m.get("role") == "system")
+    ]
+
+
+def request_cache_key(request, skip_system=False, namespace="req"):
+    """sha256 of model + normalized messages + output-affecting params"""
+    payload = {
+        "model": request.get("model"),
+        "messages": normalize_messages(request.get("messages"), skip_system),
+    }
+    for param in OUTPUT_PARAMS:
+        if request.get(param) is not None:
+            payload[param] = request[param]
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode())
+    return f"{namespace}:{digest.hexdigest()}"
+
+
+# Digests of recently seen messages: an agent's history repeats on every turn, so each
+# message is serialized and hashed once rather than once per request. Entries are keyed
+# on the content's length and str hash (cached on the string object) and a hash of the
+# other fields, so an entry stays ~200 bytes however long the message is. The memo is
+# used from the event loop and from token_counts' worker threads, hence the lock.
+_digests = OrderedDict()
+_digests_lock = threading.Lock()
+DIGEST_MEMO_SIZE = 65536
+
+
+def message_digest(message):
+    """blake2b of one normalized message; the unit the prefix chain is built from"""
+    content = message.get("content")
+    memo_key = None
+    if isinstance(content, str):
+        fields = tuple(sorted((k, str(v)) for k, v in message.items() if k != "content"))
+        memo_key = (len(content), hash(content), hash(fields))
+        with _digests_lock:
+            digest = _digests.get(memo_key)
+            if digest is not None:
+                _digests.move_to_end(memo_key)
+                return digest
+    encoded = json.dumps(normalize_message(message), sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.blake2b(encoded.encode(), digest_size=16).digest()
+    if memo_key is not None:
+        with _digests_lock:
+            _digests[memo_key] = digest
+            if len(_digests) > DIGEST_MEMO_SIZE:
+                _digests.popitem(last=False)
+    return digest
+
+
+def prefix_chain(messages, seed=b""):
+    """
+    Rolling hash over messages: chain_i = H(chain_{i-1} || digest(message_i)).
+    Each step hashes two 16-byte digests and message digests are memoized, so a
+    growing history is never re-serialized. Returns the chain value after every message.
+    """
+    chain = hashlib.blake2b(seed, digest_size=16).digest()
+    chains = []
+    for message in messages:
+        chain = hashlib.blake2b(chain + message_digest(message), digest_size=16).digest()
+        chains.append(chain)
+    return chains
@@ -0,0 +1,210 @@
+"""
+Helpers shared by the proxy hooks.
+"""
+
+import asyncio
+import datetime
+import logging
+import os
+import weakref
+
+logger = logging.getLogger(__name__)
+
+# Pub/sub channel for per-request cache outcomes (litellm_hooks.cache_events)
+CACHE_EVENTS_CHANNEL = "litellm:cache_events"
+# Seconds after the first request before report_hooks() runs; router hooks install on that request
+HOOK_REPORT_DELAY = 5.0
+
+# Hooks that patch LiteLLM, and what each has patched so far (for report_hooks)
+expected_hooks = set()
+installed_hooks = {}
+_report_scheduled = []
+
+
+def redis_kwargs():
+    """Connection settings LiteLLM itself uses for its Redis cache (REDIS_HOST / REDIS_PORT / REDIS_PASSWORD)"""
+    kwargs = {
+        "host": os.environ.get("REDIS_HOST", "localhost"),
+        "port": int(os.environ.get("REDIS_PORT", 6379)),
+    }
+    if os.environ.get("REDIS_PASSWORD"):
+        kwargs["password"] = os.environ["REDIS_PASSWORD"]
+    return kwargs
+
+
+def async_redis():
+    """redis.asyncio client on the proxy's Redis"""
+    import redis.asyncio
+    return redis.asyncio.Redis(**redis_kwargs())
+
+
+def sync_redis():
+    """Blocking redis client on the proxy's Redis"""
+    import redis
+    return redis.Redis(**redis_kwargs())
+
+
+def proxy_config_path():
+    """Path of the config the proxy was started with"""
+    try:
+        from litellm.proxy import proxy_server
+        if proxy_server.user_config_file_path:
+            return proxy_server.user_config_file_path
+    except ImportError:
+        pass
+    return os.environ.get("LITELLM_CONFIG")
+
+
+_proxy_config = None
+
+
+def proxy_config():
+    """The proxy config as a dict (read once)"""
+    global _proxy_config
+    if _proxy_config is None:
+        path = proxy_config_path()
+        if path and os.path.exists(path):
+            import yaml
+            with open(path) as f:
+                _proxy_config = yaml.safe_load(f) or {}
+        else:
+            return {}
+    return _proxy_config
+
+
+def litellm_setting(name, default=None):
+    """A litellm_settings entry from the proxy config; hook settings live there next to cache_params"""
+    value = (proxy_config().get("litellm_settings") or {}).get(name)
+    return default if value is None else value
+
+
+def cache_params():
+    """
+    The config's cache_params. Read from the file because LiteLLM only keeps what its
+    Cache class understands (e.g. skip_system_message_in_cache_key is dropped).
+    """
+    return litellm_setting("cache_params", {}) or {}
+
+
+def proxy_router():
+    """The proxy's llm_router (None until the model list has been loaded)"""
+    try:
+        from litellm.proxy import proxy_server
+    except ImportError:
+        return None
+    return proxy_server.llm_router
+
+
+def wrap_method(obj, name, wrapper_factory, tag):
+    """
+    Override obj.<name> on the instance with wrapper_factory(current_method).
+    Idempotent per tag, and hooks stack: each wraps whatever the previous one installed.
+    """
+    installed = obj.__dict__.setdefault("_litellm_hooks_wrapped", set())
+    if (name, tag) in installed:
+        return False
+    setattr(obj, name, wrapper_factory(getattr(obj, name)))
+    installed.add((name, tag))
+    mark_installed(tag, f"{getattr(obj, '__name__', type(obj).__name__)}.{name}")
+    return True
+
+
+def expect_install(tag):
+    """Declare that a configured hook patches LiteLLM, so report_hooks() notices when it has not"""
+    expected_hooks.add(tag)
+
+
+def mark_installed(tag, target):
+    """Record that a hook patched target (e.g. "Router.acompletion")"""
+    installed_hooks.setdefault(tag, set()).add(target)
+
+
+def report_hooks():
+    """
+    Log which hooks patched LiteLLM, and warn about those that have not: their LiteLLM
+    internals are missing or different in the running version. Returns the latter.
+    """
+    for tag in sorted(installed_hooks):
+        logger.info("hook %s installed on %s", tag, ", ".join(sorted(installed_hooks[tag])))
+    missing = sorted(expected_hooks - set(installed_hooks))
+    if missing:
+        logger.warning("hooks configured but not installed (check the LiteLLM version): %s", ", ".join(missing))
+    return missing
+
+
+def report_hooks_soon():
+    """Schedule report_hooks() once, HOOK_REPORT_DELAY seconds after the first request"""
+    if not _report_scheduled:
+        _report_scheduled.append(True)
+        asyncio.get_running_loop().call_later(HOOK_REPORT_DELAY, report_hooks)
+
+
+def on_llmcache(backend, apply, tag):
+    """
+    Run apply(llmcache) on a redis-semantic backend's redisvl SemanticCache; apply returns it.
+    LiteLLM 1.80 builds that cache in __init__; later releases build it on the first lookup
+    through _build_llmcache, which is wrapped until then. False when backend has no such cache.
+    """
+    if hasattr(type(backend), "_build_llmcache"):
+        if getattr(backend, "_llmcache", None) is not None:
+            apply(backend._llmcache)
+        else:
+            wrap_method(backend, "_build_llmcache", lambda build: lambda: apply(build()), tag)
+        return True
+    llmcache = getattr(backend, "llmcache", None)
+    if llmcache is None or not hasattr(llmcache, "acheck"):
+        return False
+    apply(llmcache)
+    return True
+
+
+def log_cache_hit(original_function, model, request, response, start_time, is_embedding=False):
+    """
+    Log a response served without an upstream call on the request's own logging object,
+    the way LiteLLM logs a cache hit: spend row at zero cost, budget accounting, cache
+    event. False when the request has no logging object (LiteLLM's internal calls).
+    """
+    logging_obj = request.get("litellm_logging_obj")
+    if logging_obj is None or response is None:
+        return False
+    from litellm.caching.caching_handler import LLMCachingHandler
+
+    hidden = getattr(response, "_hidden_params", None)
+    if isinstance(hidden, dict):
+        hidden["cache_hit"] = True
+    handler = LLMCachingHandler(original_function, request, start_time)
+    handler._update_litellm_logging_obj_environment(
+        logging_obj=logging_obj, model=model, kwargs=request, cached_result=response, is_async=True,
+        is_embedding=is_embedding, custom_llm_provider=(hidden or {}).get("custom_llm_provider"))
+    handler._async_log_cache_hit_on_callbacks(
+        logging_obj=logging_obj, cached_result=response, start_time=start_time,
+        end_time=datetime.datetime.now(), cache_hit=True)
+    return True
+
+
+def release_when_consumed(stream, release):
+    """
+    Call release() once a streaming response is exhausted, fails, or is garbage
+    collected (client disconnected mid-stream). The stream's class is swapped for a
+    subclass so isinstance checks on CustomStreamWrapper still hold.
+    """
+    done = []
+    loop = asyncio.get_running_loop()
+
+    def release_once():
+        if not done:
+            done.append(True)
+            release()
+
+    stream_class = type(stream)
+
+    async def __anext__(self):
+        try:
+            return await stream_class.__anext__(self)
+        except BaseException:
+            release_once()
+            raise
+
+    stream.__class__ = type(f"Tracked{stream_class.__name__}", (stream_class,), {"__anext__": __anext__})
+    weakref.finalize(stream, loop.call_soon_threadsafe, release_once)
+    return stream
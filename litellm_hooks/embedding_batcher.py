@@ -0,0 +1,236 @@
+"""
+Micro-batching of concurrent embedding requests.
+
+Letta (EMBED_MODEL=openai/local-bge-small-en-v1-5) sends many single-input
+/v1/embeddings calls, so per-call overhead dominates. This hook wraps the proxy
+router's aembedding: concurrent requests for the same model and output options are
+gathered for up to `window` seconds or `max_batch` inputs, sent upstream as one
+batched call, and each caller gets its own slice of the vectors (indices rebased,
+usage apportioned by input count). The batched call carries no caller's logging or
+metadata and is sent with LiteLLM's `no-log` flag, so it writes no spend row of its
+own; each caller's slice is logged on its own request's logging object, so spend,
+budgets and spend logs are charged once per caller.
+
+Only models listed under `models` are batched. Bedrock Titan v1 takes one text per
+call (LiteLLM loops over a list), so batching it saves nothing.
+
+Enable in the proxy config (list it before embedding_memo so memo hits never wait
+for a batch):
+
+    litellm_settings:
+      embedding_batcher_params:
+        window_ms: 5
+        max_batch: 64
+        models: [local-bge-small-en-v1-5]
+      callbacks:
+        - litellm_hooks.embedding_batcher.proxy_handler_instance
+
+Throughput against the mock upstream: python perf/embedding_batch_bench.py
+"""
+
+import asyncio
+import datetime
+import logging
+
+from litellm import EmbeddingResponse, Usage
+from litellm.integrations.custom_logger import CustomLogger
+
+from litellm_hooks.common import expect_install, litellm_setting, proxy_router, report_hooks_soon, wrap_method
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_MS = 5.0
+DEFAULT_MAX_BATCH = 64
+# Options that change the vectors; requests batch together only when these match
+BATCH_OPTIONS = ("dimensions", "encoding_format", "input_type")
+# Per-request routing overrides: such requests are sent on their own
+UNBATCHABLE_OPTIONS = ("api_key", "api_base", "api_version")
+# Per-caller request state, kept off a batched upstream call and logged per caller instead
+CALLER_OPTIONS = ("litellm_logging_obj", "litellm_call_id", "metadata", "litellm_metadata", "proxy_server_request",
+                  "user", "secret_fields")
+
+
+def log_slice(model, texts, kwargs, response, start_time):
+    """Log a caller's slice on the caller's own logging object, as LiteLLM logs an embedding call"""
+    logging_obj = kwargs.get("litellm_logging_obj")
+    if logging_obj is None:
+        return
+    try:
+        from litellm.litellm_core_utils.logging_worker import GLOBAL_LOGGING_WORKER
+
+        hidden = response._hidden_params
+        metadata = dict(kwargs.get("metadata") or {}, model_group=model)
+        logging_obj.update_environment_variables(
+            model=hidden.get("litellm_model_name") or model,
+            user=kwargs.get("user"),
+            optional_params={},
+            litellm_params={
+                "metadata": metadata,
+                "proxy_server_request": kwargs.get("proxy_server_request"),
+                "model_info": {"id": hidden.get("model_id")},
+                "api_base": hidden.get("api_base"),
+                "custom_llm_provider": hidden.get("custom_llm_provider"),
+            },
+            input=texts,
+        )
+        end_time = datetime.datetime.now()
+        GLOBAL_LOGGING_WORKER.ensure_initialized_and_enqueue(
+            async_coroutine=logging_obj.async_success_handler(result=response, start_time=start_time, end_time=end_time))
+        logging_obj.handle_sync_success_callbacks_for_async_calls(
+            result=response, start_time=start_time, end_time=end_time)
+    except Exception as e:
+        logger.warning("embedding batcher: could not log a batched request: %s", e)
+
+
+class Batch:
+    """
+    Inputs gathered for one upstream call. The first caller's kwargs are used for it, without
+    the per-caller options when the batch has several callers.
+    """
+
+    def __init__(self, args, kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        self.texts = []
+        self.callers = 0
+        self.future = asyncio.get_running_loop().create_future()
+        self.timer = None
+
+    def add(self, texts):
+        offset = len(self.texts)
+        self.texts.extend(texts)
+        self.callers += 1
+        return offset
+
+
+class EmbeddingBatcher:
+    """Gathers concurrent aembedding calls per (model, options) into batched upstream calls"""
+
+    def __init__(self, aembedding, window=DEFAULT_WINDOW_MS / 1000, max_batch=DEFAULT_MAX_BATCH, models=None):
+        self.aembedding = aembedding
+        self.window = window
+        self.max_batch = max_batch
+        self.models = set(models) if models is not None else None
+        self.pending = {}  # (model, options) -> Batch
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+
+    def batchable(self, model, input, kwargs):
+        if self.models is not None and model not in self.models:
+            return False
+        if any(kwargs.get(option) for option in UNBATCHABLE_OPTIONS):
+            return False
+        texts = [input] if isinstance(input, str) else input
+        return bool(texts) and len(texts) < self.max_batch and all(isinstance(t, str) for t in texts)
+
+    async def embed(self, model, input, *args, **kwargs):
+        if not self.batchable(model, input, kwargs):
+            return await self.aembedding(model, input, *args, **kwargs)
+        start_time = datetime.datetime.now()
+        texts = [input] if isinstance(input, str) else list(input)
+        key = (model,) + tuple(str(kwargs.get(option)) for option in BATCH_OPTIONS)
+        batch = self.pending.get(key)
+        if batch is not None and len(batch.texts) + len(texts) > self.max_batch:
+            self._flush(key, batch)
+            batch = None
+        if batch is None:
+            batch = Batch(args, kwargs)
+            self.pending[key] = batch
+            batch.timer = asyncio.get_running_loop().call_later(self.window, self._flush, key, batch)
+        offset = batch.add(texts)
+        self.requests += 1
+        if len(batch.texts) >= self.max_batch:
+            self._flush(key, batch)
+        response = await asyncio.shield(batch.future)
+        if batch.callers == 1:
+            return response  # sent with this caller's own kwargs, and logged by LiteLLM
+        response = self._slice(response, model, offset, len(texts), len(batch.texts), batch.callers)
+        log_slice(model, texts, kwargs, response, start_time)
+        return response
+
+    def _flush(self, key, batch):
+        if self.pending.get(key) is batch:
+            del self.pending[key]
+        if batch.timer is not None:
+            batch.timer.cancel()
+            batch.timer = None
+            asyncio.get_running_loop().create_task(self._send(key[0], batch))
+
+    async def _send(self, model, batch):
+        self.batches += 1
+        self.texts += len(batch.texts)
+        kwargs = batch.kwargs
+        try:
+            if batch.callers == 1:
+                response = await self.aembedding(model, batch.texts, *batch.args, **kwargs)
+            else:
+                # callers' slices are logged by log_slice; no-log keeps LiteLLM from logging the batch too
+                kwargs = {k: v for k, v in kwargs.items() if k not in CALLER_OPTIONS}
+                kwargs["no-log"] = True
+                response = await self.aembedding(model, batch.texts, *batch.args, **kwargs)
+        except Exception as e:
+            batch.future.set_exception(e)
+            batch.future.exception()  # retrieved by every caller; silence the unretrieved warning
+        else:
+            batch.future.set_result(response)
+
+    @staticmethod
+    def _slice(response, model, offset, count, total, callers):
+        """The caller's share of a batched response, re-indexed from 0"""
+        data = sorted(response.data, key=lambda d: d["index"])[offset:offset + count]
+        usage = getattr(response, "usage", None)
+        prompt_tokens = round((getattr(usage, "prompt_tokens", 0) or 0) * count / total)
+        hidden = dict(getattr(response, "_hidden_params", None) or {})
+        hidden["embedding_batch"] = {"inputs": total, "callers": callers}
+        # for the x-litellm-response-cost header; spend is charged when log_slice logs the slice
+        if "response_cost" in hidden and hidden["response_cost"]:
+            hidden["response_cost"] = hidden["response_cost"] * count / total
+        return EmbeddingResponse(
+            model=getattr(response, "model", None) or model,
+            data=[dict(d, index=i) for i, d in enumerate(data)],
+            usage=Usage(prompt_tokens=prompt_tokens, completion_tokens=0, total_tokens=prompt_tokens),
+            hidden_params=hidden,
+        )
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch": self.texts / self.batches if self.batches else 0.0,
+            "upstream_calls_saved": max(self.requests - self.batches, 0),
+        }
+
+
+class EmbeddingBatcherHook(CustomLogger):
+    """Wraps the proxy router's aembedding with the batcher once the router exists"""
+
+    def __init__(self):
+        super().__init__()
+        expect_install("embedding_batcher")
+        self.settings = litellm_setting("embedding_batcher_params", {}) or {}
+        self.batcher = None
+
+    def make_batcher(self, aembedding):
+        self.batcher = EmbeddingBatcher(
+            aembedding,
+            window=float(self.settings.get("window_ms", DEFAULT_WINDOW_MS)) / 1000,
+            max_batch=int(self.settings.get("max_batch", DEFAULT_MAX_BATCH)),
+            models=self.settings.get("models"),
+        )
+        return self.batcher.embed
+
+    def install(self):
+        router = proxy_router()
+        if router is not None and wrap_method(router, "aembedding", self.make_batcher, "embedding_batcher"):
+            logger.info("embedding batcher installed (window %.1f ms, max batch %s)",
+                        self.batcher.window * 1000, self.batcher.max_batch)
+
+    async def async_pre_call_hook(self, user_api_key_dict, cache, data, call_type):
+        report_hooks_soon()
+        self.install()
+        return data
+
+
+proxy_handler_instance = EmbeddingBatcherHook()
@@ -0,0 +1,243 @@
+"""
+Content-hash memoization of embeddings.
+
+Vectors are stored in Redis as float16 bytes under (model, normalized text hash),
+shared by all proxy workers, with LFU eviction tracked in a sorted set. The proxy
+router's aembedding is wrapped so both the /v1/embeddings path (e.g. Letta's
+archival memory via openai/local-bge-small-en-v1-5) and the redis-semantic cache's
+prompt embedding consult the memo first; only texts never seen before reach the
+provider, and partially memoized batches are trimmed to their misses. A request
+answered entirely from the memo is logged on its own logging object as a cache hit
+(zero cost), so it keeps its spend row and cache event.
+
+Enable in the proxy config:
+
+    litellm_settings:
+      embedding_memo_params:
+        max_entries: 200000
+        ttl: 604800
+      callbacks:
+        - litellm_hooks.embedding_memo.proxy_handler_instance
+
+Hit-rate counters: python -m litellm_hooks.embedding_memo
+"""
+
+import datetime
+import hashlib
+import logging
+import re
+import time
+import unicodedata
+
+import numpy as np
+from litellm import EmbeddingResponse, Usage
+from litellm.integrations.custom_logger import CustomLogger
+
+from litellm_hooks.common import (
+    async_redis, expect_install, litellm_setting, log_cache_hit, proxy_router, report_hooks_soon, sync_redis,
+    wrap_method,
+)
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "embmemo"
+FREQ_KEY = f"{KEY_PREFIX}:lfu"
+STATS_KEY = f"{KEY_PREFIX}:stats"
+DEFAULT_MAX_ENTRIES = 200000
+DEFAULT_TTL = 7 * 86400
+# Check the LFU set size every N stores rather than on every write
+TRIM_EVERY = 256
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """NFC, collapsed whitespace, stripped"""
+    return WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def memo_key(model, text, dimensions=None):
+    digest = hashlib.sha256(normalize_text(text).encode()).hexdigest()
+    suffix = f":{dimensions}" if dimensions else ""
+    return f"{KEY_PREFIX}:{model}{suffix}:{digest}"
+
+
+def encode_vector(vector):
+    """float16 bytes: a 1536-dim Titan vector is 3 KiB instead of ~30 KiB of JSON"""
+    return np.asarray(vector, dtype=np.float16).tobytes()
+
+
+def decode_vector(blob):
+    return np.frombuffer(blob, dtype=np.float16).astype(np.float32).tolist()
+
+
+class EmbeddingMemo:
+    """Redis-backed (model, text hash) -> float16 vector store with LFU eviction"""
+
+    def __init__(self, redis_client=None, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self._redis = redis_client
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.saved_calls = 0
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = async_redis()
+        return self._redis
+
+    async def get_many(self, keys):
+        """Vectors (or None) for keys, bumping LFU counts of the hits"""
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(key)
+        blobs = await pipe.execute()
+        vectors = [decode_vector(b) if b else None for b in blobs]
+        hits = [k for k, v in zip(keys, vectors) if v is not None]
+        self.hits += len(hits)
+        self.misses += len(keys) - len(hits)
+        pipe = self.redis.pipeline(transaction=False)
+        for key in hits:
+            pipe.zincrby(FREQ_KEY, 1, key)
+        pipe.hincrby(STATS_KEY, "hits", len(hits))
+        pipe.hincrby(STATS_KEY, "misses", len(keys) - len(hits))
+        await pipe.execute()
+        return vectors
+
+    async def set_many(self, items):
+        """Store (key, vector) pairs; new keys start with LFU count 1"""
+        if not items:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for key, vector in items:
+            pipe.set(key, encode_vector(vector), ex=self.ttl)
+            pipe.zadd(FREQ_KEY, {key: 1}, nx=True)
+        pipe.hincrby(STATS_KEY, "stores", len(items))
+        await pipe.execute()
+        before = self.stores
+        self.stores += len(items)
+        if before // TRIM_EVERY != self.stores // TRIM_EVERY:
+            await self.trim()
+
+    async def trim(self):
+        """Evict the least frequently used entries beyond max_entries (down to 95%)"""
+        size = await self.redis.zcard(FREQ_KEY)
+        if size <= self.max_entries:
+            return 0
+        victims = await self.redis.zpopmin(FREQ_KEY, size - int(self.max_entries * 0.95))
+        keys = [k for k, _ in victims]
+        if keys:
+            await self.redis.unlink(*keys)
+            await self.redis.hincrby(STATS_KEY, "evictions", len(keys))
+        self.evictions += len(keys)
+        return len(keys)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "saved_calls": self.saved_calls,
+        }
+
+
+def memoized_aembedding(memo, aembedding):
+    """Router.aembedding wrapper that serves memoized texts and forwards only the misses"""
+
+    async def wrapper(model, input, *args, **kwargs):
+        start_time = datetime.datetime.now()
+        texts = [input] if isinstance(input, str) else input
+        if not texts or not all(isinstance(t, str) for t in texts) or kwargs.get("encoding_format") == "base64":
+            # token-id inputs and base64 responses go straight through
+            return await aembedding(model, input, *args, **kwargs)
+        keys = [memo_key(model, t, kwargs.get("dimensions")) for t in texts]
+        try:
+            vectors = await memo.get_many(keys)
+        except Exception as e:
+            logger.debug("embedding memo lookup failed: %s", e)
+            return await aembedding(model, input, *args, **kwargs)
+
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if not missing:
+            memo.saved_calls += 1
+            response = EmbeddingResponse(
+                model=model,
+                data=[{"object": "embedding", "index": i, "embedding": v} for i, v in enumerate(vectors)],
+                usage=Usage(prompt_tokens=0, completion_tokens=0, total_tokens=0),
+                hidden_params={"embedding_memo": "hit", "response_cost": 0.0},
+            )
+            try:
+                log_cache_hit(aembedding, model, dict(kwargs, model=model, input=input), response, start_time,
+                              is_embedding=True)
+            except Exception as e:
+                logger.warning("embedding memo: could not log a memo hit: %s", e)
+            return response
+
+        partial = len(missing) < len(texts)
+        upstream_input = [texts[i] for i in missing] if partial else input
+        response = await aembedding(model, upstream_input, *args, **kwargs)
+        fresh = [d["embedding"] for d in sorted(response.data, key=lambda d: d["index"])]
+        try:
+            await memo.set_many([(keys[i], v) for i, v in zip(missing, fresh)])
+        except Exception as e:
+            logger.debug("embedding memo store failed: %s", e)
+        if not partial:
+            return response
+        for i, v in zip(missing, fresh):
+            vectors[i] = v
+        response.data = [{"object": "embedding", "index": i, "embedding": v} for i, v in enumerate(vectors)]
+        return response
+
+    return wrapper
+
+
+class EmbeddingMemoHook(CustomLogger):
+    """Wraps the proxy router's aembedding with the memo once the router exists"""
+
+    def __init__(self):
+        super().__init__()
+        expect_install("embedding_memo")
+        settings = litellm_setting("embedding_memo_params", {}) or {}
+        self.memo = EmbeddingMemo(
+            max_entries=int(settings.get("max_entries", DEFAULT_MAX_ENTRIES)),
+            ttl=int(settings.get("ttl", DEFAULT_TTL)),
+        )
+
+    def install(self):
+        router = proxy_router()
+        if router is not None and wrap_method(
+                router, "aembedding", lambda fn: memoized_aembedding(self.memo, fn), "embedding_memo"):
+            logger.info("embedding memo installed (max %s entries)", self.memo.max_entries)
+
+    async def async_pre_call_hook(self, user_api_key_dict, cache, data, call_type):
+        report_hooks_soon()
+        self.install()
+        return data
+
+
+proxy_handler_instance = EmbeddingMemoHook()
+
+
+def main():
+    """Print the cross-worker hit-rate counters kept in Redis"""
+    conn = sync_redis()
+    stats = {k.decode(): int(v) for k, v in conn.hgetall(STATS_KEY).items()}
+    lookups = stats.get("hits", 0) + stats.get("misses", 0)
+    print("Embedding Memo Statistics")
+    print("=" * 40)
+    for name in ("hits", "misses", "stores", "evictions"):
+        print(f"{name:<10} {stats.get(name, 0)}")
+    if lookups:
+        print(f"hit rate   {stats.get('hits', 0) / lookups * 100:.1f}%")
+    print(f"entries    {conn.zcard(FREQ_KEY)}")
+    print(f"as of      {time.strftime('%Y-%m-%d %H:%M:%S')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+Latency-aware routing between local and cloud deployments of the same model.
+
+Each routing group is an alias (declared in router_settings.model_group_alias so the
+proxy accepts it) whose members are existing model groups, e.g. the LM Studio and
+Bedrock deployments of qwen3-next-80b. Per request, every member's expected
+completion time is estimated as
+
+    queue wait + TTFT + expected output tokens / tokens per second
+
+where queue wait = in-flight requests / member concurrency x the member's own service
+time. TTFT and tokens/s are time-decaying averages of observed requests kept in
+Redis, and in-flight counts are shared across workers, so every worker sees the same
+busy GPU. Members within tie_tolerance of the fastest are tie-broken on expected
+cost. The decision is returned in the x-litellm-routed-deployment response header
+and appended to the latency_routing:decisions list in Redis.
+
+Enable in the proxy config:
+
+    router_settings:
+      model_group_alias:
+        qwen3-next-80b: local-qwen/qwen3-next-80b   # fallback target without the hook
+    litellm_settings:
+      latency_routing_params:
+        groups:
+          qwen3-next-80b:
+            local-qwen/qwen3-next-80b: {concurrency: 1, ttft: 2, tokens_per_s: 40}
+            bedrock-qwen-qwen3-next-80b-a3b: {concurrency: 16, ttft: 1, tokens_per_s: 80}
+      callbacks:
+        - litellm_hooks.latency_routing.proxy_handler_instance
+
+Current estimates and recent decisions: python -m litellm_hooks.latency_routing
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+import litellm
+from litellm.integrations.custom_logger import CustomLogger
+
+from litellm_hooks.common import (
+    async_redis, expect_install, litellm_setting, proxy_router, release_when_consumed, report_hooks_soon, sync_redis,
+    wrap_method,
+)
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "latency_routing"
+DECISIONS_KEY = f"{KEY_PREFIX}:decisions"
+DECISIONS_KEPT = 1000
+DEFAULT_HALF_LIFE = 120.0
+DEFAULT_TIE_TOLERANCE = 0.15
+DEFAULT_OUTPUT_TOKENS = 256
+# Priors for members without observations
+DEFAULT_TTFT = 1.0
+DEFAULT_TOKENS_PER_S = 50.0
+DEFAULT_CONCURRENCY = 1
+# In-flight counts are per worker with a heartbeat, so a dead worker's requests stop counting
+HEARTBEAT_INTERVAL = 30
+HEARTBEAT_STALE = 90
+STATS_TTL = 7 * 86400
+
+# Time-decaying average: a sample's weight grows with the time since the previous one
+EWMA_SCRIPT = """
+local old = redis.call('hmget', KEYS[1], ARGV[1], ARGV[1] .. ':t')
+local sample, now = tonumber(ARGV[2]), tonumber(ARGV[3])
+local value = sample
+if old[1] then
+  local weight = 1 - math.pow(0.5, (now - tonumber(old[2] or now)) / tonumber(ARGV[4]))
+  weight = math.max(weight, tonumber(ARGV[5]))
+  value = tonumber(old[1]) + weight * (sample - tonumber(old[1]))
+end
+redis.call('hset', KEYS[1], ARGV[1], value, ARGV[1] .. ':t', now)
+redis.call('expire', KEYS[1], ARGV[6])
+return tostring(value)
+"""
+# Lowest weight a new sample gets, so back-to-back requests still move the average
+MIN_SAMPLE_WEIGHT = 0.05
+
+
+def stats_key(member):
+    return f"{KEY_PREFIX}:stats:{member}"
+
+
+def inflight_key(member):
+    return f"{KEY_PREFIX}:inflight:{member}"
+
+
+def prompt_tokens_estimate(messages):
+    """~4 characters per token; only used to weigh cost, so precision does not matter"""
+    chars = 0
+    for message in messages or []:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+        chars += len(content or "")
+    return chars // 4
+
+
+def expected_seconds(stats, inflight, output_tokens):
+    """Queue wait + TTFT + generation time for one more request on a member"""
+    service = stats["ttft"] + output_tokens / max(stats["tokens_per_s"], 1e-3)
+    return inflight / max(stats["concurrency"], 1) * service + service
+
+
+def choose(estimates, tie_tolerance=DEFAULT_TIE_TOLERANCE):
+    """Fastest estimate; members within tie_tolerance of it are decided by cost, then time"""
+    fastest = min(e["expected"] for e in estimates)
+    close = [e for e in estimates if e["expected"] <= fastest * (1 + tie_tolerance)]
+    return min(close, key=lambda e: (e["cost"], e["expected"]))
+
+
+class LatencyRouter:
+    """Estimates per member from Redis, routing decisions, and observation updates"""
+
+    def __init__(self, settings=None, redis_client=None):
+        settings = settings or {}
+        self.groups = {alias: dict(members or {}) for alias, members in (settings.get("groups") or {}).items()}
+        self.half_life = float(settings.get("half_life", DEFAULT_HALF_LIFE))
+        self.tie_tolerance = float(settings.get("tie_tolerance", DEFAULT_TIE_TOLERANCE))
+        self.output_tokens = int(settings.get("default_output_tokens", DEFAULT_OUTPUT_TOKENS))
+        self.members = {m: opts or {} for members in self.groups.values() for m, opts in members.items()}
+        self.costs = {}  # member -> (input cost per token, output cost per token)
+        self.inflight = {m: 0 for m in self.members}  # this worker
+        self.worker = str(os.getpid())
+        self._redis = redis_client
+        self._heartbeat = None
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = async_redis()
+        return self._redis
+
+    def configure(self, model_list):
+        """Per-token costs of every member's deployment from LiteLLM's price map (0 for local models)"""
+        for deployment in model_list or []:
+            member = deployment.get("model_name")
+            if member not in self.members or member in self.costs:
+                continue
+            options = self.members[member]
+            try:
+                prompt_cost, completion_cost = litellm.cost_per_token(
+                    model=deployment["litellm_params"]["model"], prompt_tokens=1000, completion_tokens=1000)
+                costs = (prompt_cost / 1000, completion_cost / 1000)
+            except Exception:
+                costs = (0.0, 0.0)
+            self.costs[member] = (float(options.get("input_cost_per_token", costs[0])),
+                                  float(options.get("output_cost_per_token", costs[1])))
+        return self
+
+    async def estimates(self, alias, messages, kwargs):
+        """One Redis round trip: decayed stats and live in-flight counts for every member"""
+        members = list(self.groups[alias])
+        pipe = self.redis.pipeline(transaction=False)
+        for member in members:
+            pipe.hgetall(stats_key(member))
+            pipe.hgetall(inflight_key(member))
+        try:
+            replies = await pipe.execute()
+        except Exception as e:
+            logger.debug("latency routing stats unavailable: %s", e)
+            replies = [{}] * (2 * len(members))
+
+        now = time.time()
+        output_tokens = kwargs.get("max_tokens") or kwargs.get("max_completion_tokens") or self.output_tokens
+        output_tokens = min(int(output_tokens), self.output_tokens * 4)
+        prompt_tokens = prompt_tokens_estimate(messages)
+        estimates = []
+        for i, member in enumerate(members):
+            options = self.members[member]
+            observed = {k.decode(): v for k, v in replies[2 * i].items()}
+            stats = {
+                "ttft": float(observed.get("ttft") or options.get("ttft", DEFAULT_TTFT)),
+                "tokens_per_s": float(observed.get("tokens_per_s") or options.get("tokens_per_s", DEFAULT_TOKENS_PER_S)),
+                "concurrency": int(options.get("concurrency", DEFAULT_CONCURRENCY)),
+            }
+            inflight = self.inflight.get(member, 0)
+            for worker, value in replies[2 * i + 1].items():
+                count, _, updated = value.decode().partition(":")
+                if worker.decode() != self.worker and now - float(updated or 0) < HEARTBEAT_STALE:
+                    inflight += int(count)
+            input_cost, output_cost = self.costs.get(member, (0.0, 0.0))
+            estimates.append(dict(
+                stats, member=member, inflight=inflight,
+                expected=expected_seconds(stats, inflight, output_tokens),
+                cost=input_cost * prompt_tokens + output_cost * output_tokens,
+            ))
+        return estimates
+
+    async def _publish_inflight(self, member):
+        try:
+            await self.redis.hset(inflight_key(member), self.worker, f"{self.inflight[member]}:{time.time()}")
+        except Exception as e:
+            logger.debug("latency routing in-flight update failed: %s", e)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            for member, count in self.inflight.items():
+                if count:
+                    await self._publish_inflight(member)
+
+    def start(self, member):
+        self.inflight[member] += 1
+        if self._heartbeat is None:
+            self._heartbeat = asyncio.get_running_loop().create_task(self._heartbeat_loop())
+        asyncio.get_running_loop().create_task(self._publish_inflight(member))
+
+    def finish(self, member):
+        self.inflight[member] -= 1
+        asyncio.get_running_loop().create_task(self._publish_inflight(member))
+
+    async def record_decision(self, alias, chosen, estimates, kwargs):
+        decision = {
+            "t": time.time(),
+            "call_id": kwargs.get("litellm_call_id"),
+            "alias": alias,
+            "chosen": chosen["member"],
+            "estimates": {e["member"]: {"expected": round(e["expected"], 3), "inflight": e["inflight"],
+                                        "cost": round(e["cost"], 6)} for e in estimates},
+        }
+        logger.info("latency routing %s -> %s (%.1fs expected)", alias, chosen["member"], chosen["expected"])
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.lpush(DECISIONS_KEY, json.dumps(decision))
+            pipe.ltrim(DECISIONS_KEY, 0, DECISIONS_KEPT - 1)
+            pipe.hincrby(f"{KEY_PREFIX}:chosen:{alias}", chosen["member"], 1)
+            await pipe.execute()
+        except Exception as e:
+            logger.debug("latency routing decision not recorded: %s", e)
+
+    async def observe(self, member, ttft=None, tokens_per_s=None):
+        """Fold one request's TTFT / generation rate into the shared decaying averages"""
+        now = time.time()
+        try:
+            for field, sample in (("ttft", ttft), ("tokens_per_s", tokens_per_s)):
+                if sample is not None and sample > 0:
+                    await self.redis.eval(EWMA_SCRIPT, 1, stats_key(member), field, sample, now,
+                                          self.half_life, MIN_SAMPLE_WEIGHT, STATS_TTL)
+        except Exception as e:
+            logger.debug("latency routing observation failed: %s", e)
+
+    def wrap(self, acompletion):
+        """Router.acompletion wrapper that resolves routing-group aliases to a member"""
+
+        async def wrapper(model, messages, *args, **kwargs):
+            if model not in self.groups:
+                return await acompletion(model, messages, *args, **kwargs)
+            estimates = await self.estimates(model, messages, kwargs)
+            chosen = choose(estimates, self.tie_tolerance)
+            asyncio.get_running_loop().create_task(self.record_decision(model, chosen, estimates, kwargs))
+            # the other members, fastest first, are tried if the chosen one fails
+            order = [chosen] + sorted((e for e in estimates if e is not chosen), key=lambda e: e["expected"])
+            for attempt, estimate in enumerate(order):
+                member = estimate["member"]
+                self.start(member)
+                try:
+                    response = await acompletion(member, messages, *args, **kwargs)
+                except asyncio.CancelledError:
+                    self.finish(member)
+                    raise
+                except Exception:
+                    self.finish(member)
+                    if attempt == len(order) - 1:
+                        raise
+                    logger.warning("latency routing: %s failed, trying %s", member, order[attempt + 1]["member"])
+                    continue
+                hidden = getattr(response, "_hidden_params", None)
+                if isinstance(hidden, dict):
+                    hidden.setdefault("additional_headers", {})["x-litellm-routed-deployment"] = member
+                if kwargs.get("stream") and hasattr(response, "__anext__"):
+                    return release_when_consumed(response, lambda m=member: self.finish(m))
+                self.finish(member)
+                return response
+
+        return wrapper
+
+
+class LatencyRoutingHook(CustomLogger):
+    """Wraps the proxy router's acompletion and feeds observed latencies back into the estimates"""
+
+    def __init__(self):
+        super().__init__()
+        expect_install("latency_routing")
+        self.router = LatencyRouter(litellm_setting("latency_routing_params", {}) or {})
+        self.installed = False
+
+    def install(self):
+        router = proxy_router()
+        if router is None or self.installed:
+            return
+        self.installed = True
+        self.router.configure(router.model_list)
+        wrap_method(router, "acompletion", self.router.wrap, "latency_routing")
+        for alias, members in self.router.groups.items():
+            logger.info("latency routing group %s: %s", alias, ", ".join(members))
+
+    async def async_pre_call_hook(self, user_api_key_dict, cache, data, call_type):
+        report_hooks_soon()
+        self.install()
+        return data
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        payload = kwargs.get("standard_logging_object") or {}
+        member = payload.get("model_group")
+        if member not in self.router.members or payload.get("cache_hit"):
+            return
+        start, first, end = payload.get("startTime"), payload.get("completionStartTime"), payload.get("endTime")
+        tokens = payload.get("completion_tokens") or 0
+        if not (start and end):
+            return
+        if payload.get("stream") and first and start < first < end:
+            await self.router.observe(member, ttft=first - start, tokens_per_s=tokens / (end - first) if tokens else None)
+        elif tokens:
+            # non-streaming: only the total is known, so attribute what TTFT does not explain to generation
+            ttft = self.router.members[member].get("ttft", DEFAULT_TTFT)
+            await self.router.observe(member, tokens_per_s=tokens / max(end - start - ttft, 1e-3))
+
+
+proxy_handler_instance = LatencyRoutingHook()
+
+
+def main():
+    """Print the shared estimates and the most recent decisions"""
+    conn = sync_redis()
+    router = LatencyRouter(litellm_setting("latency_routing_params", {}) or {})
+    print("Latency Routing")
+    print("=" * 90)
+    now = time.time()
+    for alias, members in router.groups.items():
+        chosen = {k.decode(): int(v) for k, v in conn.hgetall(f"{KEY_PREFIX}:chosen:{alias}").items()}
+        print(f"\n{alias}")
+        print(f"  {'member':<36} {'ttft':>7} {'tok/s':>7} {'in flight':>9} {'chosen':>7}")
+        for member, options in members.items():
+            stats = {k.decode(): v.decode() for k, v in conn.hgetall(stats_key(member)).items()}
+            inflight = sum(
+                int(v.decode().partition(":")[0]) for v in conn.hgetall(inflight_key(member)).values()
+                if now - float(v.decode().partition(":")[2] or 0) < HEARTBEAT_STALE
+            )
+            ttft = float(stats.get("ttft") or (options or {}).get("ttft", DEFAULT_TTFT))
+            tps = float(stats.get("tokens_per_s") or (options or {}).get("tokens_per_s", DEFAULT_TOKENS_PER_S))
+            print(f"  {member:<36} {ttft:>6.2f}s {tps:>7.1f} {inflight:>9} {chosen.get(member, 0):>7}")
+    print("\nRecent decisions:")
+    for raw in conn.lrange(DECISIONS_KEY, 0, 9):
+        decision = json.loads(raw)
+        when = time.strftime("%H:%M:%S", time.localtime(decision["t"]))
+        others = ", ".join(f"{m} {e['expected']:.1f}s/{e['inflight']}q" for m, e in decision["estimates"].items())
+        print(f"  {when} {decision['alias']} -> {decision['chosen']}  ({others})")
+
+
+if __name__ == "__main__":
+    main()
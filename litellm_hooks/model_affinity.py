@@ -0,0 +1,375 @@
+"""
+Model-affinity scheduling for backends that serve several models from one process.
+
+LM Studio on localhost:1234 serves every local chat and embedding model in the config;
+interleaved requests make it unload and reload multi-GB weights between calls. This
+hook puts a scheduler per shared api_base in front of the router: requests queue per
+model, the backend keeps serving the currently loaded model while it has work, and
+a switch waits for in-flight requests to drain. A request that has waited max_wait
+seconds is served next regardless of model, and at most max_concurrency requests
+run against the backend at once.
+
+A request takes its slot only once LiteLLM's response cache has missed, so cache hits
+never wait behind generating requests. Enable in the proxy config (list it before the
+hooks that answer requests without a router call, so those stay outside the queue too):
+
+    litellm_settings:
+      model_affinity_params:
+        backends:
+          http://localhost:1234/v1: {max_concurrency: 2, max_wait: 30}
+      callbacks:
+        - litellm_hooks.model_affinity.proxy_handler_instance
+
+Without `backends`, every api_base shared by two or more models is scheduled with
+the defaults; `exclude_models` lists model groups that bypass the queue.
+
+The queues live in each proxy worker. With several workers (NUM_WORKERS, which rp.sh
+sets, or `workers` in the params) each worker gets max_concurrency / workers slots, at
+least one, so the backend still sees about max_concurrency requests; but every worker
+picks its loaded model on its own, so models can still interleave across workers.
+Queue depth and switch counts: python -m litellm_hooks.model_affinity
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from litellm.integrations.custom_logger import CustomLogger
+
+from litellm_hooks.common import (
+    async_redis, expect_install, litellm_setting, proxy_router, release_when_consumed, report_hooks_soon, sync_redis,
+    wrap_method,
+)
+
+logger = logging.getLogger(__name__)
+
+STATS_PREFIX = "model_affinity"
+DEFAULT_MAX_CONCURRENCY = 2
+DEFAULT_MAX_WAIT = 30.0
+# Seconds between stats exports per backend, and how long a dead worker's stats linger
+EXPORT_INTERVAL = 1.0
+EXPORT_TTL = 300
+
+# the pending slot of the router call running in this context
+_pending_slot = contextvars.ContextVar("model_affinity_pending_slot", default=None)
+
+
+class BackendScheduler:
+    """Per-backend queue that batches by model under a concurrency cap and a max-wait bound"""
+
+    def __init__(self, name, max_concurrency=DEFAULT_MAX_CONCURRENCY, max_wait=DEFAULT_MAX_WAIT, on_change=None):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.on_change = on_change
+        self.queues = {}  # model -> deque of (enqueued_at, future)
+        self.current_model = None
+        self.active = 0
+        self.switches = 0
+        self.dispatched = 0
+        self.forced = 0  # dispatches made out of affinity order because of max_wait
+        self.longest_wait = 0.0
+
+    @property
+    def queue_depth(self):
+        return sum(len(q) for q in self.queues.values())
+
+    def _pick(self, now):
+        """Model to serve next: an overdue head first, then the loaded model, then the oldest head"""
+        if not self.queues:
+            return None, False
+        oldest_model = min(self.queues, key=lambda m: self.queues[m][0][0])
+        if now - self.queues[oldest_model][0][0] >= self.max_wait:
+            return oldest_model, oldest_model != self.current_model
+        if self.current_model in self.queues:
+            return self.current_model, False
+        return oldest_model, False
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self.active < self.max_concurrency:
+            model, forced = self._pick(now)
+            if model is None:
+                break
+            if model != self.current_model:
+                if self.active:
+                    # drain the loaded model before switching; release() dispatches again
+                    break
+                if self.current_model is not None:
+                    self.switches += 1
+                self.forced += forced
+                self.current_model = model
+            queue = self.queues[model]
+            enqueued_at, future = queue.popleft()
+            if not queue:
+                del self.queues[model]
+            if future.done():
+                continue
+            self.active += 1
+            self.dispatched += 1
+            self.longest_wait = max(self.longest_wait, now - enqueued_at)
+            future.set_result(now - enqueued_at)
+        if self.on_change:
+            self.on_change(self)
+
+    async def acquire(self, model):
+        """Wait for a slot for model; returns the seconds spent queued"""
+        future = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(model, deque()).append((time.monotonic(), future))
+        self._dispatch()
+        try:
+            # the max-wait bound needs a timer: nothing else wakes the queue while one model keeps it busy
+            while not future.done():
+                await asyncio.wait([future], timeout=self.max_wait)
+                if not future.done():
+                    self._dispatch()
+            return future.result()
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                future.cancel()
+            raise
+
+    def release(self):
+        self.active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, model):
+        await self.acquire(model)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "active": self.active,
+            "current_model": self.current_model or "",
+            "switches": self.switches,
+            "dispatched": self.dispatched,
+            "forced": self.forced,
+            "longest_wait": round(self.longest_wait, 3),
+        }
+
+
+class PendingSlot:
+    """A router call's backend slot, taken when its first upstream attempt starts"""
+
+    def __init__(self, scheduler, upstream):
+        self.scheduler = scheduler
+        self.upstream = upstream
+        self.held = False
+
+    async def acquire(self):
+        if not self.held:
+            await self.scheduler.acquire(self.upstream)
+            self.held = True
+
+    def release(self):
+        if self.held:
+            self.held = False
+            self.scheduler.release()
+
+
+def served_from_cache(response):
+    """True when LiteLLM's cache lookup answered the whole request (CachingHandlerResponse)"""
+    if response is None:
+        return False
+    if response.cached_result is not None and response.final_embedding_cached_response is None:
+        return True
+    return bool(response.embedding_all_elements_cache_hit)
+
+
+def slot_after_cache_miss(get_cache):
+    """LLMCachingHandler._async_get_cache wrapper: a miss waits for the call's backend slot"""
+
+    async def wrapper(self, *args, **kwargs):
+        pending = _pending_slot.get()
+        # litellm calls made by the lookup itself (the semantic cache's embedding) take no slot
+        token = _pending_slot.set(None)
+        try:
+            response = await get_cache(self, *args, **kwargs)
+        finally:
+            _pending_slot.reset(token)
+        if pending is not None and not served_from_cache(response):
+            await pending.acquire()
+        return response
+
+    return wrapper
+
+
+def install_cache_gate():
+    """Patch LiteLLM's caching handler class once; False when this LiteLLM has no such hook point"""
+    try:
+        from litellm.caching.caching_handler import LLMCachingHandler
+    except ImportError:
+        return False
+    get_cache = LLMCachingHandler.__dict__.get("_async_get_cache")
+    if get_cache is None:
+        return False
+    if not getattr(get_cache, "_model_affinity", False):
+        wrapper = slot_after_cache_miss(get_cache)
+        wrapper._model_affinity = True
+        LLMCachingHandler._async_get_cache = wrapper
+    return True
+
+
+def backend_models(model_list):
+    """{api_base: {model_group: upstream model}} for the router's deployments"""
+    backends = {}
+    for deployment in model_list or []:
+        params = deployment.get("litellm_params") or {}
+        if params.get("api_base"):
+            backends.setdefault(params["api_base"].rstrip("/"), {})[deployment["model_name"]] = params.get("model")
+    return backends
+
+
+class ModelAffinity:
+    """Model group -> (scheduler, upstream model) routing plus stats export"""
+
+    def __init__(self, settings=None, redis_client=None):
+        settings = settings or {}
+        self.backend_settings = {k.rstrip("/"): v or {} for k, v in (settings.get("backends") or {}).items()}
+        self.exclude = set(settings.get("exclude_models") or [])
+        self.workers = max(int(settings.get("workers") or os.environ.get("NUM_WORKERS") or 1), 1)
+        self.schedulers = {}
+        self.groups = {}  # model group -> (scheduler, upstream model); upstream names group aliases of one model
+        self._redis = redis_client
+        self._exported = {}
+        # False: no cache hook point, so the slot covers the whole router call
+        self.after_cache = True
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = async_redis()
+        return self._redis
+
+    def configure(self, model_list):
+        for api_base, groups in backend_models(model_list).items():
+            if self.backend_settings:
+                if api_base not in self.backend_settings:
+                    continue
+            elif len(set(groups.values())) < 2:
+                continue
+            options = self.backend_settings.get(api_base, {})
+            scheduler = BackendScheduler(
+                api_base,
+                max_concurrency=max(int(options.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)) // self.workers, 1),
+                max_wait=float(options.get("max_wait", DEFAULT_MAX_WAIT)),
+                on_change=self._export,
+            )
+            self.schedulers[api_base] = scheduler
+            for group, upstream in groups.items():
+                if group not in self.exclude:
+                    self.groups[group] = (scheduler, upstream)
+        return self.schedulers
+
+    def _export(self, scheduler):
+        now = time.monotonic()
+        if now - self._exported.get(scheduler.name, 0) < EXPORT_INTERVAL:
+            return
+        self._exported[scheduler.name] = now
+        asyncio.get_running_loop().create_task(self._write_stats(scheduler))
+
+    async def _write_stats(self, scheduler):
+        key = f"{STATS_PREFIX}:{os.getpid()}:{scheduler.name}"
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hset(key, mapping=dict(scheduler.stats(), updated=time.time()))
+            pipe.expire(key, EXPORT_TTL)
+            await pipe.execute()
+        except Exception as e:
+            logger.debug("model affinity stats export failed: %s", e)
+
+    def wrap(self, call):
+        """
+        Router.acompletion / aembedding wrapper holding a backend slot for the upstream call.
+        The slot is taken after the cache misses (slot_after_cache_miss), and held across
+        the router's retries until the response, or its stream, is done.
+        """
+
+        async def wrapper(model, *args, **kwargs):
+            scheduled = self.groups.get(model)
+            if scheduled is None:
+                return await call(model, *args, **kwargs)
+            pending = PendingSlot(*scheduled)
+            if not self.after_cache:
+                await pending.acquire()
+            token = _pending_slot.set(pending)
+            try:
+                response = await call(model, *args, **kwargs)
+            except BaseException:
+                pending.release()
+                raise
+            finally:
+                _pending_slot.reset(token)
+            if pending.held and kwargs.get("stream") and hasattr(response, "__anext__"):
+                return release_when_consumed(response, pending.release)
+            pending.release()
+            return response
+
+        return wrapper
+
+
+class ModelAffinityHook(CustomLogger):
+    """Wraps the proxy router's acompletion and aembedding once the router exists"""
+
+    def __init__(self):
+        super().__init__()
+        expect_install("model_affinity")
+        self.affinity = ModelAffinity(litellm_setting("model_affinity_params", {}) or {})
+        self.installed = False
+
+    def install(self):
+        router = proxy_router()
+        if router is None or self.installed:
+            return
+        self.installed = True
+        schedulers = self.affinity.configure(router.model_list)
+        if schedulers and not install_cache_gate():
+            self.affinity.after_cache = False
+            logger.warning("model affinity: no LiteLLM cache hook point; cache hits queue for backend slots too")
+        for name in ("acompletion", "aembedding"):
+            wrap_method(router, name, self.affinity.wrap, "model_affinity")
+        for scheduler in schedulers.values():
+            logger.info("model affinity scheduling %s (max_concurrency=%s, max_wait=%ss)",
+                        scheduler.name, scheduler.max_concurrency, scheduler.max_wait)
+        if schedulers and self.affinity.workers > 1:
+            logger.warning("model affinity: %s workers schedule independently; max_concurrency is split between "
+                           "them and models can still interleave across workers (run one worker for strict affinity)",
+                           self.affinity.workers)
+
+    async def async_pre_call_hook(self, user_api_key_dict, cache, data, call_type):
+        report_hooks_soon()
+        self.install()
+        return data
+
+
+proxy_handler_instance = ModelAffinityHook()
+
+
+def main():
+    """Print every worker's exported scheduler state"""
+    conn = sync_redis()
+    print("Model Affinity Schedulers")
+    print("=" * 100)
+    print(f"{'worker':>8} {'backend':<28} {'queued':>6} {'active':>6} {'switches':>8} {'dispatched':>10} "
+          f"{'forced':>6} {'max wait':>8}  loaded model")
+    for key in sorted(conn.scan_iter(f"{STATS_PREFIX}:*")):
+        _, pid, backend = key.decode().split(":", 2)
+        s = {k.decode(): v.decode() for k, v in conn.hgetall(key).items()}
+        print(f"{pid:>8} {backend:<28} {s.get('queue_depth', 0):>6} {s.get('active', 0):>6} "
+              f"{s.get('switches', 0):>8} {s.get('dispatched', 0):>10} {s.get('forced', 0):>6} "
+              f"{float(s.get('longest_wait', 0)):>7.1f}s  {s.get('current_model', '')}")
+
+
+if __name__ == "__main__":
+    main()
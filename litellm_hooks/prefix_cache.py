@@ -0,0 +1,268 @@
+"""
+Prefix-aware semantic caching for long agent conversations.
+
+LiteLLM's redis-semantic cache embeds the whole conversation for every lookup, so
+with 260k-token agent contexts each turn embeds the entire history and never
+matches anything. In agent mode a conversation is split into
+
+- history: everything before the last `tail_turns` user turns, identified exactly
+  by a rolling hash chain (cache_keys.prefix_chain);
+- tail: the recent turns, the only text that is embedded for the similarity lookup.
+
+The history chain is folded into the semantic cache's scope key, so a semantic
+match is only possible between requests with an identical history (exact-prefix
+gate) and a similar tail. LiteLLM 1.80's vector lookup ignores that key, so the
+chain is also stored in each entry's redisvl metadata, and a lookup takes the best
+of the `candidates` nearest entries whose chain matches its own. Short conversations
+(fewer than min_messages) use the stock behaviour and never match an agent entry.
+
+The layer sits on the semantic backend (litellm.cache.cache), beneath the
+two_tier_cache LRU when that is installed, whose exact keys keep covering the
+whole conversation.
+
+Enable in the proxy config:
+
+    litellm_settings:
+      prefix_cache_params:
+        tail_turns: 1
+        min_messages: 4
+        candidates: 8
+      callbacks:
+        - litellm_hooks.prefix_cache.proxy_handler_instance
+"""
+
+import contextvars
+import logging
+
+import litellm
+from litellm.integrations.custom_logger import CustomLogger
+
+from litellm_hooks.cache_keys import normalize_messages, prefix_chain
+from litellm_hooks.common import (
+    cache_params, expect_install, litellm_setting, mark_installed, on_llmcache, report_hooks_soon, wrap_method,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TAIL_TURNS = 1
+DEFAULT_MIN_MESSAGES = 4
+# Longest tail text embedded, in characters (~2k tokens); the history is exact-matched anyway
+DEFAULT_TAIL_MAX_CHARS = 8000
+# Nearest entries fetched per lookup, of which those with the request's history chain are kept
+DEFAULT_CANDIDATES = 8
+
+# History chain (hex) of the request the backend is serving: "" for a short conversation,
+# None outside the prefix layer's get/set wrappers
+history_scope = contextvars.ContextVar("prefix_cache_history", default=None)
+
+
+def split_tail(messages, tail_turns=DEFAULT_TAIL_TURNS):
+    """Index where the last tail_turns user turns (and everything after them) begin"""
+    seen = 0
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i].get("role") == "user":
+            seen += 1
+            if seen == tail_turns:
+                return i
+    return 0
+
+
+def in_scope(hit, history):
+    """Whether a redisvl cache hit was stored for the same history chain"""
+    return ((hit.get("metadata") or {}).get("prefix_chain") or "") == history
+
+
+def scoped_store(store):
+    """redisvl SemanticCache.store/astore wrapper: records the history chain in the entry's metadata"""
+
+    def wrapper(prompt, response, *args, **kwargs):
+        history = history_scope.get()
+        if history:
+            kwargs["metadata"] = dict(kwargs.get("metadata") or {}, prefix_chain=history)
+        return store(prompt, response, *args, **kwargs)
+
+    return wrapper
+
+
+def scoped_check(check, candidates):
+    """redisvl SemanticCache.check wrapper: nearest entries with the request's history chain"""
+
+    def wrapper(*args, num_results=1, **kwargs):
+        history = history_scope.get()
+        if history is None:
+            return check(*args, num_results=num_results, **kwargs)
+        results = check(*args, num_results=max(num_results, candidates), **kwargs)
+        return [hit for hit in results if in_scope(hit, history)][:num_results]
+
+    return wrapper
+
+
+def scoped_acheck(acheck, candidates):
+    """redisvl SemanticCache.acheck wrapper, as scoped_check"""
+
+    async def wrapper(*args, num_results=1, **kwargs):
+        history = history_scope.get()
+        if history is None:
+            return await acheck(*args, num_results=num_results, **kwargs)
+        results = await acheck(*args, num_results=max(num_results, candidates), **kwargs)
+        return [hit for hit in results if in_scope(hit, history)][:num_results]
+
+    return wrapper
+
+
+def truncate_tail(tail, max_chars):
+    """Keep the end of the tail text: the newest content is what the lookup should match on"""
+    total = 0
+    kept = []
+    for message in reversed(tail):
+        content = message.get("content")
+        if isinstance(content, str) and total + len(content) > max_chars:
+            if max_chars > total:
+                kept.append(dict(message, content=content[total - max_chars:]))
+            break
+        total += len(content) if isinstance(content, str) else 0
+        kept.append(message)
+    return list(reversed(kept))
+
+
+class PrefixCacheKeys:
+    """Rewrites (key, messages) on the semantic backend's get/set methods for agent conversations"""
+
+    METHODS = ("get_cache", "async_get_cache", "set_cache", "async_set_cache")
+
+    def __init__(self, backend, tail_turns=DEFAULT_TAIL_TURNS, min_messages=DEFAULT_MIN_MESSAGES,
+                 tail_max_chars=DEFAULT_TAIL_MAX_CHARS, skip_system=False, candidates=DEFAULT_CANDIDATES):
+        self.backend = backend
+        self.tail_turns = tail_turns
+        self.candidates = candidates
+        self.min_messages = min_messages
+        self.tail_max_chars = tail_max_chars
+        self.skip_system = skip_system
+        self.lookups = 0
+        self.agent_lookups = 0
+        self.agent_hits = 0
+        self.history_messages = 0
+
+    def attach(self):
+        """
+        Wrap the backend methods. If the two-tier LRU is already attached, wrap the
+        methods it delegates to instead, so its exact keys still see full conversations.
+        The redisvl cache beneath is wrapped too, to keep histories apart in its lookups.
+        """
+        tiers = getattr(self.backend, "_two_tier_cache", None)
+        for name in self.METHODS:
+            if tiers is not None:
+                tiers._backend[name] = self._wrap(name, tiers._backend[name])
+            else:
+                setattr(self.backend, name, self._wrap(name, getattr(self.backend, name)))
+            mark_installed("prefix_cache", f"{type(self.backend).__name__}.{name}")
+        if not on_llmcache(self.backend, self.scope_llmcache, "prefix_cache"):
+            logger.warning("prefix cache: %s has no redisvl cache; histories are kept apart by the cache key only",
+                           type(self.backend).__name__)
+        self.backend._prefix_cache = self
+        return self
+
+    def scope_llmcache(self, llmcache):
+        wrap_method(llmcache, "store", scoped_store, "prefix_cache")
+        wrap_method(llmcache, "astore", scoped_store, "prefix_cache")
+        wrap_method(llmcache, "check", lambda fn: scoped_check(fn, self.candidates), "prefix_cache")
+        wrap_method(llmcache, "acheck", lambda fn: scoped_acheck(fn, self.candidates), "prefix_cache")
+        return llmcache
+
+    def rewrite(self, key, kwargs):
+        """
+        (key, kwargs, history) for the backend: history chain in the scope key, tail-only
+        messages; history is the chain's hex, or "" when the conversation is not split
+        """
+        messages = normalize_messages(kwargs.get("messages"), self.skip_system)
+        if len(messages) < self.min_messages:
+            return key, kwargs, ""
+        start = split_tail(messages, self.tail_turns)
+        if start == 0:
+            return key, kwargs, ""
+        history = prefix_chain(messages[:start])[-1].hex()
+        self.history_messages += start
+        tail = truncate_tail(messages[start:], self.tail_max_chars)
+        # shallow copy: metadata stays shared so the backend's semantic-similarity annotation still lands
+        return f"{key}:prefix:{history}", dict(kwargs, messages=tail), history
+
+    def _wrap(self, name, method):
+        is_get = name.endswith("get_cache")
+        if name.startswith("async_"):
+            async def wrapper(key, *args, **kwargs):
+                key, kwargs, history = self.rewrite(key, kwargs)
+                token = history_scope.set(history)
+                try:
+                    value = await method(key, *args, **kwargs)
+                finally:
+                    history_scope.reset(token)
+                if is_get:
+                    self._count(history, value)
+                return value
+        else:
+            def wrapper(key, *args, **kwargs):
+                key, kwargs, history = self.rewrite(key, kwargs)
+                token = history_scope.set(history)
+                try:
+                    value = method(key, *args, **kwargs)
+                finally:
+                    history_scope.reset(token)
+                if is_get:
+                    self._count(history, value)
+                return value
+        return wrapper
+
+    def _count(self, history, value):
+        self.lookups += 1
+        if history:
+            self.agent_lookups += 1
+            self.agent_hits += value is not None
+
+    def stats(self):
+        return {
+            "lookups": self.lookups,
+            "agent_lookups": self.agent_lookups,
+            "agent_hits": self.agent_hits,
+            "agent_hit_rate": self.agent_hits / self.agent_lookups if self.agent_lookups else 0.0,
+            "history_messages_not_embedded": self.history_messages,
+        }
+
+
+def install():
+    """Attach to litellm.cache's backend once it exists; returns the PrefixCacheKeys or None"""
+    cache = getattr(litellm, "cache", None)
+    if cache is None:
+        return None
+    existing = getattr(cache.cache, "_prefix_cache", None)
+    if existing is not None:
+        return existing
+    settings = litellm_setting("prefix_cache_params", {}) or {}
+    layer = PrefixCacheKeys(
+        cache.cache,
+        tail_turns=int(settings.get("tail_turns", DEFAULT_TAIL_TURNS)),
+        min_messages=int(settings.get("min_messages", DEFAULT_MIN_MESSAGES)),
+        tail_max_chars=int(settings.get("tail_max_chars", DEFAULT_TAIL_MAX_CHARS)),
+        skip_system=bool(cache_params().get("skip_system_message_in_cache_key")),
+        candidates=int(settings.get("candidates", DEFAULT_CANDIDATES)),
+    )
+    logger.info("prefix-aware cache keys installed (tail %s turn(s), from %s messages)",
+                layer.tail_turns, layer.min_messages)
+    return layer.attach()
+
+
+class PrefixCacheHook(CustomLogger):
+    """Installs the prefix-aware keys before the first request reaches the cache lookup"""
+
+    def __init__(self):
+        super().__init__()
+        expect_install("prefix_cache")
+        self.layer = install()
+
+    async def async_pre_call_hook(self, user_api_key_dict, cache, data, call_type):
+        report_hooks_soon()
+        if self.layer is None:
+            self.layer = install()
+        return data
+
+
+proxy_handler_instance = PrefixCacheHook()
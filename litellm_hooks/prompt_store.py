@@ -0,0 +1,193 @@
+"""
+Prompts from the content-addressed prompt store in the UI's request view.
+
+db_maintenance/prompt_store.py stores each spend-log message body once (prompt_store.blobs)
+and leaves {"litellm_prompt_refs": [digest, ...]} in LiteLLM_SpendLogs.messages and
+proxy_server_request.messages. This hook expands the references, with the database's
+prompt_store.expand(), before spend-log rows leave the proxy:
+
+- /spend/logs, /spend/logs/ui and /spend/logs/v2 (the UI's logs table): the routes'
+  endpoint functions are wrapped, with one expand query per page;
+- /spend/logs/ui/{request_id} on LiteLLM releases that serve it through
+  spend_management_endpoints._resolve_request_response_payload (1.80 has no such
+  resolver; the request view there reads the logs table's rows).
+
+Rows without references pass through untouched. Other readers of LiteLLM_SpendLogs
+(SQL, exports) see the references; use prompt_store.expand() there.
+
+Enable in the proxy config:
+
+    litellm_settings:
+      callbacks:
+        - litellm_hooks.prompt_store.proxy_handler_instance
+"""
+
+import json
+import logging
+
+from litellm.integrations.custom_logger import CustomLogger
+
+from litellm_hooks.common import expect_install, mark_installed, report_hooks_soon
+
+logger = logging.getLogger(__name__)
+
+REFS_KEY = "litellm_prompt_refs"
+# proxy_server_request keys the store packs (db_maintenance/prompt_store.py REQUEST_KEYS)
+REQUEST_KEYS = ("messages", "input")
+# Spend-log columns that may hold references
+SPEND_LOG_FIELDS = ("messages", "proxy_server_request")
+# Endpoints returning spend-log rows: /spend/logs and /spend/logs/ui (+ /v2)
+LISTING_ENDPOINTS = ("view_spend_logs", "ui_view_spend_logs")
+
+
+def has_refs(value):
+    """Whether a messages / proxy_server_request value (JSON text or parsed) holds references"""
+    if isinstance(value, str):
+        return REFS_KEY in value
+    if isinstance(value, dict):
+        return REFS_KEY in value or any(isinstance(value.get(key), dict) and REFS_KEY in value[key]
+                                        for key in REQUEST_KEYS)
+    return False
+
+
+async def expand(prisma_client, value):
+    """The value with its message references replaced by the stored messages"""
+    text = value if isinstance(value, str) else json.dumps(value)
+    rows = await prisma_client.db.query_raw("SELECT prompt_store.expand($1::jsonb) AS value", text)
+    expanded = rows[0]["value"]
+    return json.loads(expanded) if isinstance(expanded, str) else expanded  # query_raw returns jsonb as text
+
+
+async def expand_many(prisma_client, values):
+    """expand() over several values in one query"""
+    values = [json.loads(value) if isinstance(value, str) else value for value in values]
+    rows = await prisma_client.db.query_raw(
+        "SELECT prompt_store.expand(value) AS value"
+        " FROM jsonb_array_elements($1::jsonb) WITH ORDINALITY AS t(value, n) ORDER BY n", json.dumps(values))
+    return [json.loads(row["value"]) if isinstance(row["value"], str) else row["value"] for row in rows]
+
+
+def row_field(row, name):
+    return row.get(name) if isinstance(row, dict) else getattr(row, name, None)
+
+
+def with_fields(row, fields):
+    return dict(row, **fields) if isinstance(row, dict) else row.model_copy(update=fields)
+
+
+async def expand_spend_logs(prisma_client, result):
+    """A spend-log endpoint's result (a row, a list of rows, or a {"data": rows} page) with references expanded"""
+    page = isinstance(result, dict) and isinstance(result.get("data"), list)
+    rows = result["data"] if page else result if isinstance(result, list) else [result]
+    targets = [(i, name) for i, row in enumerate(rows) for name in SPEND_LOG_FIELDS if has_refs(row_field(row, name))]
+    if not targets:
+        return result
+    values = await expand_many(prisma_client, [row_field(rows[i], name) for i, name in targets])
+    updates = {}
+    for (i, name), value in zip(targets, values):
+        updates.setdefault(i, {})[name] = value
+    rows = [with_fields(row, updates[i]) if i in updates else row for i, row in enumerate(rows)]
+    if page:
+        return dict(result, data=rows)
+    return rows if isinstance(result, list) else rows[0]
+
+
+def expanding_endpoint(call):
+    """Route endpoint wrapper expanding the rows it returns"""
+
+    async def endpoint(**kwargs):
+        result = await call(**kwargs)
+        try:
+            from litellm.proxy.proxy_server import prisma_client
+            return await expand_spend_logs(prisma_client, result)
+        except Exception as e:
+            logger.warning("prompt store expansion failed for a spend-log listing: %s", e)
+            return result
+
+    endpoint._prompt_store = True
+    return endpoint
+
+
+def install_listings():
+    """
+    Wrap the spend-log listing routes; returns how many. FastAPI calls route.dependant.call
+    on every request, so the wrapper is set there (the module functions are already bound).
+    """
+    try:
+        from litellm.proxy.proxy_server import app
+        from litellm.proxy.spend_tracking import spend_management_endpoints as endpoints
+    except ImportError:
+        return 0
+    listings = {getattr(endpoints, name, None) for name in LISTING_ENDPOINTS} - {None}
+    wrapped = 0
+    for route in app.routes:
+        dependant = getattr(route, "dependant", None)
+        if getattr(route, "endpoint", None) in listings and dependant is not None:
+            if not getattr(dependant.call, "_prompt_store", False):
+                dependant.call = expanding_endpoint(dependant.call)
+                mark_installed("prompt_store", f"{route.path} endpoint")
+            wrapped += 1
+    return wrapped
+
+
+def install():
+    """
+    Wrap the spend-log listings and, where the proxy has it, the payload resolver;
+    returns False when neither could be wrapped
+    """
+    listings = install_listings()
+    try:
+        from litellm.proxy.spend_tracking import spend_management_endpoints as endpoints
+    except ImportError:
+        return False
+    original = getattr(endpoints, "_resolve_request_response_payload", None)
+    if original is None:
+        if listings:
+            logger.info("spend-log prompts are expanded from the prompt store in %s listing routes", listings)
+        else:
+            logger.warning("prompt store: this LiteLLM version has neither the spend-log listing routes nor "
+                           "_resolve_request_response_payload; references are not expanded")
+        return bool(listings)
+    if getattr(original, "_prompt_store", False):
+        return True
+
+    async def resolve(row, cold_storage_handler):
+        payload = await original(row, cold_storage_handler=cold_storage_handler)
+        if not (has_refs(payload.messages) or has_refs(payload.proxy_server_request)):
+            return payload
+        from litellm.proxy.proxy_server import prisma_client
+        try:
+            return payload._replace(
+                messages=await expand(prisma_client, payload.messages)
+                if has_refs(payload.messages) else payload.messages,
+                proxy_server_request=await expand(prisma_client, payload.proxy_server_request)
+                if has_refs(payload.proxy_server_request) else payload.proxy_server_request,
+            )
+        except Exception as e:
+            logger.warning("prompt store expansion failed for %s: %s", row.get("request_id"), e)
+            return payload
+
+    resolve._prompt_store = True
+    # the endpoint looks the resolver up in its module globals on every call
+    endpoints._resolve_request_response_payload = resolve
+    mark_installed("prompt_store", "spend_management_endpoints._resolve_request_response_payload")
+    logger.info("spend-log prompts are expanded from the prompt store")
+    return True
+
+
+class PromptStoreHook(CustomLogger):
+    """Installs the expanding resolver and listings; no per-request work once installed"""
+
+    def __init__(self):
+        super().__init__()
+        expect_install("prompt_store")
+        self.installed = install()
+
+    async def async_pre_call_hook(self, user_api_key_dict, cache, data, call_type):
+        report_hooks_soon()
+        if not self.installed:
+            self.installed = install()
+        return data
+
+
+proxy_handler_instance = PromptStoreHook()
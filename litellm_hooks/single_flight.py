@@ -0,0 +1,499 @@
+"""
+Single-flight coalescing of concurrent identical completions.
+
+A second identical request that arrives while the first is still generating always
+misses the cache (see debugging_redis/redis_test_cache_hit_theory.py). This hook wraps
+the proxy router's acompletion and keys in-flight requests on the normalized cache key:
+
+- within a worker, followers await the leader's result, or for streaming requests
+  replay the leader's stream chunk by chunk as it arrives;
+- across workers, the leader holds a short-lived Redis lock and, before releasing it,
+  stores its response under a result key next to the lock (result_ttl seconds); a
+  follower elsewhere waits for the release and answers from that key. LiteLLM's own
+  cache write is a background task that may land after the release, so the cache is
+  not what followers wait on. Without a result (the leader failed) they call upstream.
+
+Followers are logged on their own request's logging object as cache hits, so each
+still gets its spend row, budget accounting and cache event; a stream follower that
+disconnects is logged with what it had read. When the leader's client and every
+follower have gone, the shared stream is closed instead of being read to the end.
+
+Enable in the proxy config:
+
+    litellm_settings:
+      single_flight_params:
+        lock_ttl: 300
+        result_ttl: 30
+      callbacks:
+        - litellm_hooks.single_flight.proxy_handler_instance
+
+Saved upstream calls: python -m litellm_hooks.single_flight
+"""
+
+import asyncio
+import copy
+import datetime
+import json
+import logging
+import os
+import uuid
+import weakref
+
+from litellm.integrations.custom_logger import CustomLogger
+
+from litellm_hooks.cache_keys import request_cache_key
+from litellm_hooks.common import (
+    async_redis, cache_params, expect_install, litellm_setting, log_cache_hit, proxy_router, report_hooks_soon, sync_redis,
+    wrap_method,
+)
+
+logger = logging.getLogger(__name__)
+
+LOCK_PREFIX = "singleflight:lock"
+RESULT_PREFIX = "singleflight:result"
+STATS_KEY = "singleflight:stats"
+DEFAULT_LOCK_TTL = 300
+DEFAULT_RESULT_TTL = 30
+# compare-and-delete so a leader never releases a lock that expired and was re-taken
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end
+return 0
+"""
+
+
+class Subscription:
+    """One reader of a StreamFanout: its position, and the callback logging what it read"""
+
+    def __init__(self, on_complete=None):
+        self.position = 0
+        self.on_complete = on_complete
+        self.closed = False
+
+
+class StreamFanout:
+    """Consumes the leader's stream once and replays buffered chunks to every subscriber"""
+
+    def __init__(self, upstream, on_done=None):
+        self.upstream = upstream
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.abandoned = False
+        self.on_done = on_done
+        self.subscribers = 0
+        self.active = 0
+        self._cond = asyncio.Condition()
+        self._loop = asyncio.get_running_loop()
+        self.task = asyncio.create_task(self._pump())
+
+    async def _pump(self):
+        try:
+            async for chunk in self.upstream:
+                async with self._cond:
+                    self.chunks.append(chunk)
+                    self._cond.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.abandoned:
+                await self._close_upstream()
+            async with self._cond:
+                self.done = True
+                self._cond.notify_all()
+            if self.on_done:
+                await self.on_done(self)
+
+    async def _close_upstream(self):
+        """Close the provider stream nobody reads any more"""
+        stream = getattr(self.upstream, "completion_stream", None)
+        close = getattr(self.upstream, "aclose", None) or getattr(stream, "aclose", None)
+        if close is not None:
+            try:
+                await close()
+            except Exception as e:
+                logger.debug("single-flight: closing an abandoned stream failed: %s", e)
+
+    async def read(self, position):
+        async with self._cond:
+            await self._cond.wait_for(lambda: position < len(self.chunks) or self.done)
+            if position < len(self.chunks):
+                return copy.deepcopy(self.chunks[position])
+        if self.error is not None:
+            raise self.error
+        raise StopAsyncIteration
+
+    def subscribe(self, logging_obj=None, on_complete=None):
+        """
+        A shallow copy of the leader's stream wrapper whose iteration replays the buffer.
+        on_complete(chunks) runs once with the chunks the subscriber read: at the end of the
+        stream, or when the subscriber is dropped mid-stream (its client disconnected).
+        """
+        self.subscribers += 1
+        self.active += 1
+        subscription = Subscription(on_complete)
+        subscriber = copy.copy(self.upstream)
+        subscriber.__class__ = _fanout_class(type(self.upstream))
+        subscriber._fanout = self
+        subscriber._fanout_subscription = subscription
+        if logging_obj is not None:
+            subscriber.logging_obj = logging_obj
+        weakref.finalize(subscriber, self._loop.call_soon_threadsafe, self.unsubscribe, subscription)
+        return subscriber
+
+    def unsubscribe(self, subscription, log=True):
+        """A subscriber finished or went away; the pump stops once nobody reads any more"""
+        if subscription.closed:
+            return
+        subscription.closed = True
+        self.active -= 1
+        if log and subscription.on_complete is not None:
+            subscription.on_complete(self.chunks[:subscription.position])
+        if self.active == 0 and not self.done:
+            self.abandoned = True
+            self.task.cancel()
+
+
+_fanout_classes = {}
+
+
+def log_follower(acompletion, model, messages, kwargs, response, start_time):
+    """
+    Log a follower on its own logging object the way LiteLLM logs a cache hit, so it gets
+    its spend row, budget accounting and cache_events like a request answered from cache
+    """
+    try:
+        log_cache_hit(acompletion, model, dict(kwargs, model=model, messages=messages), response, start_time)
+    except Exception as e:
+        logger.warning("single-flight: could not log a coalesced request: %s", e)
+
+
+def assemble(chunks, messages):
+    """The response a list of stream chunks adds up to, or None"""
+    if not chunks:
+        return None
+    try:
+        import litellm
+
+        return litellm.stream_chunk_builder(copy.deepcopy(chunks), messages=messages)
+    except Exception as e:
+        logger.warning("single-flight: could not assemble a coalesced stream: %s", e)
+        return None
+
+
+def log_stream_follower(acompletion, model, messages, kwargs, start_time):
+    """on_complete callback for a stream follower: logs the assembled (possibly partial) response"""
+
+    def on_complete(chunks):
+        log_follower(acompletion, model, messages, kwargs, assemble(chunks, messages), start_time)
+
+    return on_complete
+
+
+def replay_stream(acompletion, model, messages, kwargs, response, start_time):
+    """Stream of a response another worker produced (a dict), built and logged the way LiteLLM serves a cached stream"""
+    logging_obj = kwargs["litellm_logging_obj"]
+    from litellm.caching.caching_handler import LLMCachingHandler
+
+    request = dict(kwargs, model=model, messages=messages, stream=True)
+    handler = LLMCachingHandler(acompletion, request, start_time)
+    handler._update_litellm_logging_obj_environment(
+        logging_obj=logging_obj, model=model, kwargs=request, cached_result=response, is_async=True)
+    return handler._convert_cached_stream_response(
+        cached_result=response, call_type="acompletion", logging_obj=logging_obj, model=model)
+
+
+def _fanout_class(stream_class):
+    """Subclass of the stream wrapper type (keeps isinstance checks) that reads from a StreamFanout"""
+    if stream_class not in _fanout_classes:
+        async def __anext__(self):
+            subscription = self._fanout_subscription
+            try:
+                chunk = await self._fanout.read(subscription.position)
+            except StopAsyncIteration:
+                self._fanout.unsubscribe(subscription)
+                raise
+            except BaseException:
+                self._fanout.unsubscribe(subscription, log=False)
+                raise
+            subscription.position += 1
+            return chunk
+
+        _fanout_classes[stream_class] = type(
+            f"Fanout{stream_class.__name__}", (stream_class,),
+            {"__aiter__": lambda self: self, "__anext__": __anext__},
+        )
+    return _fanout_classes[stream_class]
+
+
+class SingleFlight:
+    """In-flight table (this worker) plus the cross-worker Redis lock"""
+
+    def __init__(self, redis_client=None, lock_ttl=DEFAULT_LOCK_TTL, max_wait=None, cross_worker=True,
+                 skip_system=False, result_ttl=DEFAULT_RESULT_TTL):
+        self._redis = redis_client
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.max_wait = lock_ttl if max_wait is None else max_wait
+        self.cross_worker = cross_worker
+        self.skip_system = skip_system
+        self.token = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.inflight = {}  # key -> Future (non-stream) or StreamFanout
+        self.leaders = 0
+        self.local_followers = 0
+        self.remote_waits = 0
+        self.remote_followers = 0
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = async_redis()
+        return self._redis
+
+    def key_for(self, model, messages, stream, kwargs):
+        namespace = "sf-stream" if stream else "sf"
+        return request_cache_key(dict(kwargs, model=model, messages=messages), self.skip_system, namespace=namespace)
+
+    async def _count(self, field):
+        try:
+            await self.redis.hincrby(STATS_KEY, field, 1)
+        except Exception:
+            pass
+
+    async def _acquire(self, key):
+        """True if this worker leads; otherwise waits for the remote leader's lock to clear"""
+        if not self.cross_worker:
+            return True
+        lock = f"{LOCK_PREFIX}:{key}"
+        try:
+            if await self.redis.set(lock, self.token, nx=True, ex=int(self.lock_ttl)):
+                return True
+            self.remote_waits += 1
+            await self._count("remote_waits")
+            delay, waited = 0.05, 0.0
+            while waited < self.max_wait and await self.redis.exists(lock):
+                await asyncio.sleep(delay)
+                waited += delay
+                delay = min(delay * 2, 1.0)
+        except Exception as e:
+            logger.debug("single-flight lock unavailable: %s", e)
+            return True
+        return False
+
+    async def _release(self, key):
+        if not self.cross_worker:
+            return
+        try:
+            await self.redis.eval(RELEASE_SCRIPT, 1, f"{LOCK_PREFIX}:{key}", self.token)
+        except Exception as e:
+            logger.debug("single-flight release failed: %s", e)
+
+    async def _publish(self, key, response):
+        """Leave the leader's response for other workers' followers; called before the lock is released"""
+        if not self.cross_worker or response is None:
+            return
+        try:
+            await self.redis.set(f"{RESULT_PREFIX}:{key}", response.model_dump_json(), ex=int(self.result_ttl))
+        except Exception as e:
+            logger.debug("single-flight: could not publish a result: %s", e)
+
+    async def _remote_result(self, key, kwargs):
+        """
+        The response another worker's leader published for key, as a dict; None when there
+        is none or the request has no logging object to log it on as a cache hit
+        """
+        if kwargs.get("litellm_logging_obj") is None:
+            return None
+        try:
+            value = await self.redis.get(f"{RESULT_PREFIX}:{key}")
+            return json.loads(value) if value else None
+        except Exception as e:
+            logger.debug("single-flight: could not read a result: %s", e)
+            return None
+
+    async def _remote_follower(self):
+        self.remote_followers += 1
+        await self._count("remote_followers")
+
+    async def call(self, acompletion, model, messages, stream, kwargs):
+        """Run acompletion once per key across concurrent identical requests"""
+        start_time = datetime.datetime.now()
+        key = self.key_for(model, messages, stream, kwargs)
+        existing = self.inflight.get(key)
+        while stream and isinstance(existing, asyncio.Future):
+            # the leader is still opening its stream; join the fanout once it exists, replay
+            # the response another worker produced, or fail with the leader's error instead
+            # of retrying upstream one by one
+            served = await asyncio.shield(existing)
+            if served is not None and kwargs.get("litellm_logging_obj") is not None:
+                await self._remote_follower()
+                return replay_stream(acompletion, model, messages, kwargs, served, start_time)
+            existing = self.inflight.get(key)
+        if isinstance(existing, StreamFanout) and not existing.abandoned:
+            self.local_followers += 1
+            await self._count("local_followers")
+            return existing.subscribe(
+                logging_obj=kwargs.get("litellm_logging_obj"),
+                on_complete=log_stream_follower(acompletion, model, messages, kwargs, start_time))
+        if existing is not None:
+            try:
+                response = await asyncio.shield(existing)
+            except asyncio.CancelledError:
+                if not existing.cancelled():
+                    raise
+                # the leader's client went away; take over rather than fail this request
+                return await self.call(acompletion, model, messages, stream, kwargs)
+            self.local_followers += 1
+            await self._count("local_followers")
+            response = copy.deepcopy(response)
+            log_follower(acompletion, model, messages, kwargs, response, start_time)
+            return response
+
+        if stream:
+            return await self._lead_stream(acompletion, key, model, messages, kwargs)
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            if await self._acquire(key):
+                self.leaders += 1
+                response = await acompletion(model, messages, stream=stream, **kwargs)
+                await self._publish(key, response)
+            else:
+                response = await self._follow_remote(acompletion, key, model, messages, kwargs, start_time)
+            future.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody followed
+            raise
+        finally:
+            self.inflight.pop(key, None)
+            await self._release(key)
+
+    async def _follow_remote(self, acompletion, key, model, messages, kwargs, start_time):
+        """Another worker led: its published response, logged as a cache hit, or an upstream call"""
+        data = await self._remote_result(key, kwargs)
+        if data is None:
+            return await acompletion(model, messages, stream=False, **kwargs)
+        import litellm
+
+        response = litellm.ModelResponse(**data)
+        await self._remote_follower()
+        log_follower(acompletion, model, messages, kwargs, response, start_time)
+        return response
+
+    async def _lead_stream(self, acompletion, key, model, messages, kwargs):
+        start_time = datetime.datetime.now()
+        placeholder = asyncio.get_running_loop().create_future()
+        self.inflight[key] = placeholder
+        try:
+            leading = await self._acquire(key)
+            if leading:
+                self.leaders += 1
+            else:
+                data = await self._remote_result(key, kwargs)
+                if data is not None:
+                    # local followers waiting on the placeholder replay the same response
+                    self.inflight.pop(key, None)
+                    placeholder.set_result(data)
+                    await self._remote_follower()
+                    return replay_stream(acompletion, model, messages, kwargs, data, start_time)
+            upstream = await acompletion(model, messages, stream=True, **kwargs)
+        except Exception as e:
+            self.inflight.pop(key, None)
+            placeholder.set_exception(e)
+            placeholder.exception()  # mark retrieved when nobody followed
+            await self._release(key)
+            raise
+        except BaseException:
+            # cancelled: followers take over rather than fail
+            self.inflight.pop(key, None)
+            placeholder.set_result(None)
+            await self._release(key)
+            raise
+        if not hasattr(upstream, "__anext__"):
+            self.inflight.pop(key, None)
+            placeholder.set_result(None)
+            await self._release(key)
+            return upstream
+
+        async def finished(fanout):
+            if self.inflight.get(key) is fanout:
+                self.inflight.pop(key)
+            if leading and fanout.error is None and not fanout.abandoned:
+                response = assemble(fanout.chunks, messages)
+                await self._publish(key, response)
+            await self._release(key)
+
+        fanout = StreamFanout(upstream, on_done=finished)
+        self.inflight[key] = fanout
+        # followers that arrived while the stream was being opened join the fanout
+        placeholder.set_result(None)
+        return fanout.subscribe()
+
+    def stats(self):
+        return {
+            "leaders": self.leaders,
+            "local_followers": self.local_followers,
+            "remote_waits": self.remote_waits,
+            "remote_followers": self.remote_followers,
+            "saved_upstream_calls": self.local_followers + self.remote_followers,
+        }
+
+
+def single_flight_acompletion(flight, acompletion):
+    """Router.acompletion wrapper"""
+
+    async def wrapper(model, messages, stream=False, **kwargs):
+        if (kwargs.get("cache") or {}).get("no-cache") or kwargs.get("n", 1) != 1:
+            return await acompletion(model, messages, stream=stream, **kwargs)
+        return await flight.call(acompletion, model, messages, stream, kwargs)
+
+    return wrapper
+
+
+class SingleFlightHook(CustomLogger):
+    """Wraps the proxy router's acompletion once the router exists"""
+
+    def __init__(self):
+        super().__init__()
+        expect_install("single_flight")
+        settings = litellm_setting("single_flight_params", {}) or {}
+        self.flight = SingleFlight(
+            lock_ttl=int(settings.get("lock_ttl", DEFAULT_LOCK_TTL)),
+            max_wait=settings.get("max_wait"),
+            cross_worker=bool(settings.get("cross_worker", True)),
+            result_ttl=int(settings.get("result_ttl", DEFAULT_RESULT_TTL)),
+            skip_system=bool(cache_params().get("skip_system_message_in_cache_key")),
+        )
+
+    def install(self):
+        router = proxy_router()
+        if router is not None and wrap_method(
+                router, "acompletion", lambda fn: single_flight_acompletion(self.flight, fn), "single_flight"):
+            logger.info("single-flight coalescing installed")
+
+    async def async_pre_call_hook(self, user_api_key_dict, cache, data, call_type):
+        report_hooks_soon()
+        self.install()
+        return data
+
+
+proxy_handler_instance = SingleFlightHook()
+
+
+def main():
+    """Print the cross-worker counters kept in Redis"""
+    stats = {k.decode(): int(v) for k, v in sync_redis().hgetall(STATS_KEY).items()}
+    print("Single-Flight Statistics")
+    print("=" * 40)
+    print(f"upstream calls saved (same worker): {stats.get('local_followers', 0)}")
+    print(f"waits on another worker's leader:   {stats.get('remote_waits', 0)}")
+    print(f"served by another worker's leader:  {stats.get('remote_followers', 0)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Memoized per-message token counting for very large contexts.
+
+Agent clients resend the same ~200k-token history every turn, and LiteLLM tokenizes
+the whole prompt each time (router context-window check, rate limiters, usage and
+cost fallbacks; ~100ms per 250k tokens, most of it on the event loop or holding
+one of the router's few counting threads). litellm.token_counter is replaced with
+a version that counts messages individually and caches each count under
+(tokenizer profile, message digest):
+
+    tokens(messages) = sum(tokens(message) - c) + c
+
+where c is the per-call reply priming, calibrated per model (a model for which this
+identity does not hold is passed through). Only new messages are tokenized, and the
+pre-call hook tokenizes them in a worker thread before any count runs on the loop;
+the tokenizer holds the GIL, but the interpreter switches back to the loop every
+few ms instead of stalling it for the whole prompt.
+
+Enable in the proxy config:
+
+    litellm_settings:
+      token_count_params:
+        max_entries: 500000
+        workers: 1
+      callbacks:
+        - litellm_hooks.token_counts.proxy_handler_instance
+
+Before/after timing on a replayed 260k-token session: python perf/token_count_bench.py
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import litellm
+from litellm.integrations.custom_logger import CustomLogger
+
+from litellm_hooks.cache_keys import message_digest
+from litellm_hooks.common import expect_install, litellm_setting, mark_installed, proxy_router, report_hooks_soon
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 500000
+DEFAULT_WORKERS = 1
+# Calibration messages: the per-call constant comes from the first, additivity is checked on all
+PROBES = (
+    {"role": "user", "content": "calibration probe"},
+    {"role": "system", "content": "You are a helpful assistant."},
+    {"role": "assistant", "content": "ok", "tool_calls": [
+        {"id": "c1", "type": "function", "function": {"name": "f", "arguments": "{\"a\": 1}"}}]},
+    {"role": "tool", "tool_call_id": "c1", "content": "result"},
+    {"role": "user", "name": "alice", "content": "named"},
+)
+
+
+def tokenizer_key(model):
+    """
+    Tokenizer identity for a model, so models sharing an encoding share cache entries.
+    On the OpenAI path the encoding is chosen per model (gpt-4o is o200k_base even
+    though _select_tokenizer reports cl100k_base), so ask token_counter's own helper.
+    """
+    try:
+        from litellm.litellm_core_utils.token_counter import openai_tokenizer_encoding_name
+        from litellm.utils import _select_tokenizer
+        selected = _select_tokenizer(model)
+        if selected["type"] == "openai_tokenizer":
+            return f"openai_tokenizer:{openai_tokenizer_encoding_name(model)}"
+        return f"{selected['type']}:{id(selected['tokenizer'])}"  # selection is lru_cached: one object per tokenizer
+    except Exception:
+        return f"model:{model}"
+
+
+class TokenCountCache:
+    """(counting profile, message digest) -> marginal token count, LRU-bounded; safe to use from worker threads"""
+
+    def __init__(self, count, max_entries=DEFAULT_MAX_ENTRIES):
+        self.count = count  # the original litellm.token_counter
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._profiles = {}  # model -> (profile, c), or (None, None) when counts are not additive
+        self._tools = OrderedDict()  # (model, has system message, tools json) -> tool definition tokens
+        self.hits = 0
+        self.misses = 0
+        self.tokens_from_cache = 0
+        self.evictions = 0
+
+    def profile(self, model):
+        """
+        (profile, c) for a model. Models share entries when they share a tokenizer and
+        per-message overheads (probe counts). None if per-message counts do not add up.
+        """
+        found = self._profiles.get(model)
+        if found is None:
+            try:
+                single = tuple(self.count(model=model, messages=[p]) for p in PROBES)
+                c = 2 * single[0] - self.count(model=model, messages=[PROBES[0], PROBES[0]])
+                additive = self.count(model=model, messages=list(PROBES)) == sum(single) - c * (len(PROBES) - 1)
+                found = ((tokenizer_key(model), single), c) if additive else (None, None)
+            except Exception:
+                found = (None, None)
+            if found[0] is None:
+                logger.info("token count cache disabled for %r: counts are not per-message additive", model)
+            self._profiles[model] = found
+        return found
+
+    def message_tokens(self, model, profile, c, message, **options):
+        key = (profile, tuple(options.items()), message_digest(message))
+        with self._lock:
+            tokens = self._entries.get(key)
+            if tokens is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.tokens_from_cache += tokens
+                return tokens
+        tokens = self.count(model=model, messages=[message], **options) - c
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = tokens
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return tokens
+
+    def tool_tokens(self, model, tools, tool_choice, has_system):
+        """Tokens added by tool definitions (which depend on whether a system message is present)"""
+        key = (model, has_system, json.dumps([tools, tool_choice], sort_keys=True, default=str))
+        with self._lock:
+            tokens = self._tools.get(key)
+        if tokens is None:
+            probe = [PROBES[1] if has_system else PROBES[0]]
+            tokens = (self.count(model=model, messages=probe, tools=tools, tool_choice=tool_choice)
+                      - self.count(model=model, messages=probe))
+            with self._lock:
+                self._tools[key] = tokens
+                if len(self._tools) > 256:
+                    self._tools.popitem(last=False)
+        return tokens
+
+    def messages_tokens(self, model, messages, tools=None, tool_choice=None, **options):
+        """Token count of a message list from per-message entries; None when not cacheable"""
+        profile, c = self.profile(model)
+        if profile is None:
+            return None
+        total = c + sum(self.message_tokens(model, profile, c, m, **options) for m in messages)
+        if tools or tool_choice:
+            has_system = any(m.get("role") == "system" for m in messages)
+            total += self.tool_tokens(model, tools, tool_choice, has_system)
+        return total
+
+    def warm(self, model, messages):
+        """Tokenize uncached messages (run in a worker thread)"""
+        self.messages_tokens(model, messages)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "tokens_from_cache": self.tokens_from_cache,
+            "evictions": self.evictions,
+        }
+
+
+def memoized_token_counter(cache):
+    """Drop-in for litellm.token_counter; anything other than a plain message list goes to the original"""
+    count = cache.count
+
+    def token_counter(model="", custom_tokenizer=None, text=None, messages=None, count_response_tokens=False,
+                      tools=None, tool_choice=None, **options):
+        if (messages and text is None and custom_tokenizer is None and not count_response_tokens
+                and not litellm.disable_token_counter and all(isinstance(m, dict) for m in messages)):
+            try:
+                tokens = cache.messages_tokens(model, messages, tools=tools, tool_choice=tool_choice, **options)
+            except Exception as e:
+                logger.debug("token count cache bypassed: %s", e)
+                tokens = None
+            if tokens is not None:
+                return tokens
+        return count(model=model, custom_tokenizer=custom_tokenizer, text=text, messages=messages,
+                     count_response_tokens=count_response_tokens, tools=tools, tool_choice=tool_choice, **options)
+
+    token_counter._token_count_cache = cache
+    return token_counter
+
+
+def patch_modules(original, replacement):
+    """Point every loaded litellm module that imported token_counter by name at the replacement"""
+    patched = 0
+    for name, module in list(sys.modules.items()):
+        if (name == "litellm" or name.startswith("litellm.")) and getattr(module, "token_counter", None) is original:
+            module.token_counter = replacement
+            mark_installed("token_counts", f"{name}.token_counter")
+            patched += 1
+    return patched
+
+
+def install(max_entries=DEFAULT_MAX_ENTRIES):
+    """
+    Replace token_counter in litellm and in every litellm module that imported it by
+    name (router, cost calculator, streaming usage, rate limiters). Returns the cache.
+    Calling it again patches modules imported since.
+    """
+    existing = getattr(litellm.token_counter, "_token_count_cache", None)
+    if existing is not None:
+        patch_modules(existing.count, litellm.token_counter)
+        return existing
+    cache = TokenCountCache(litellm.token_counter, max_entries=max_entries)
+    patched = patch_modules(litellm.token_counter, memoized_token_counter(cache))
+    logger.info("memoized token counter installed in %s modules (max %s entries)", patched, max_entries)
+    return cache
+
+
+class TokenCountHook(CustomLogger):
+    """Installs the memoized counter and pre-tokenizes new messages off the event loop"""
+
+    def __init__(self):
+        super().__init__()
+        expect_install("token_counts")
+        settings = litellm_setting("token_count_params", {}) or {}
+        self.cache = install(int(settings.get("max_entries", DEFAULT_MAX_ENTRIES)))
+        self.pool = ThreadPoolExecutor(int(settings.get("workers", DEFAULT_WORKERS)), thread_name_prefix="tokens")
+        self.repatched = False
+
+    def models_for(self, model_group):
+        """Model names token_counter will see for this request: the group and its deployments"""
+        models = {model_group}
+        router = proxy_router()
+        if router is not None:
+            for deployment in router.get_model_list(model_name=model_group) or []:
+                models.add((deployment.get("litellm_params") or {}).get("model"))
+        models.add("")  # the router's context-window check counts with the default tokenizer
+        profiles = {self.cache.profile(m)[0]: m for m in models if m is not None}
+        profiles.pop(None, None)
+        return profiles.values()
+
+    async def async_pre_call_hook(self, user_api_key_dict, cache, data, call_type):
+        report_hooks_soon()
+        if not self.repatched:
+            install()  # proxy modules imported after the callbacks were loaded
+            self.repatched = True
+        messages = data.get("messages")
+        if messages and isinstance(messages, list):
+            loop = asyncio.get_running_loop()
+            try:
+                await asyncio.gather(*(loop.run_in_executor(self.pool, self.cache.warm, model, messages)
+                                       for model in self.models_for(data.get("model"))))
+            except Exception as e:
+                logger.debug("token pre-count failed: %s", e)
+        return data
+
+
+proxy_handler_instance = TokenCountHook()
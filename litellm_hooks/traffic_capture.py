@@ -0,0 +1,411 @@
+"""
+Production traffic capture to rotating zstd-compressed JSONL.
+
+One line per request: model, message hashes (optionally the messages and response
+themselves), token counts, latency, TTFT, cache hit and key, tenant. The logging
+callback only draws the sample and copies the fields a record needs (the message
+and response containers too: LiteLLM and later callbacks keep changing the
+originals) into a queue bounded by count and by approximate bytes; a writer thread
+builds the records (hashing, redaction, JSON) and feeds a `zstd` process, so
+compression runs outside the proxy's interpreter. When the disk or zstd falls
+behind and the queue is full, records are dropped and counted, never waited on.
+
+Each worker writes its own files, capture-<start>-<pid>-<n>.jsonl.zst in dir (relative
+to the wrapper directory, not the LiteLLM checkout rp.sh runs from), rotated
+after max_bytes of JSON or max_seconds; the file being written ends in .part until
+it is rotated. Without zstd on PATH the files are plain .jsonl.
+
+Enable in the proxy config:
+
+    litellm_settings:
+      traffic_capture_params:
+        dir: captures
+        sample_rate: 0.05
+        bodies: false               # messages and responses too, not only their hashes
+        redact: [email, phone, api_key, card, ip]
+        redact_patterns: []         # extra regexes, replaced like the built-in ones
+        max_bytes: 268435456        # rotate after this much JSON (uncompressed)
+        max_seconds: 3600
+        queue_size: 10000
+        queue_bytes: 67108864       # approximate size of the queued messages and responses
+        zstd_level: 3
+      callbacks:
+        - litellm_hooks.traffic_capture.proxy_handler_instance
+
+Captured bodies replay as corpora: perf/loadgen.py --corpus captures/,
+perf/semantic_cache_sim.py --corpus captures/, and
+debugging_redis/redis_cache_warmup.py --jsonl captures/.
+Counters across workers: python -m litellm_hooks.traffic_capture
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import re
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from litellm.integrations.custom_logger import CustomLogger
+
+from litellm_hooks.cache_keys import OUTPUT_PARAMS, normalize_message
+from litellm_hooks.common import litellm_setting, sync_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "traffic_capture"
+STATS_KEY = f"{KEY_PREFIX}:stats"
+WRAPPER_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_DIR = "captures"
+DEFAULT_SAMPLE_RATE = 1.0
+DEFAULT_MAX_BYTES = 256 * 2**20
+DEFAULT_MAX_SECONDS = 3600
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_QUEUE_BYTES = 64 * 2**20
+DEFAULT_ZSTD_LEVEL = 3
+DEFAULT_REDACT = ("email", "phone", "api_key", "card", "ip")
+# Seconds between pushes of this worker's counters to STATS_KEY
+STATS_INTERVAL = 10
+
+REDACTIONS = {
+    "email": re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"),
+    "api_key": re.compile(r"\b(?:sk-[\w-]{16,}|AKIA[0-9A-Z]{16}|AIza[\w-]{35}|gh[pous]_\w{36})\b"
+                          r"|(?i:bearer\s+)[\w.~+/-]{16,}=*"),
+    "card": re.compile(r"\b(?:\d[ -]?){12,18}\d\b"),
+    "phone": re.compile(r"(?<![\w+])\+?\d{1,3}[ .-]?\(?\d{2,4}\)?[ .-]?\d{3,4}[ .-]?\d{3,4}\b"),
+    "ip": re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b"),
+}
+
+
+def message_hash(message):
+    """
+    Hex blake2b of a normalized message: the same digest cache_keys.message_digest
+    computes, without its (event-loop owned) memo, so captures join prefix_cache chains.
+    """
+    encoded = json.dumps(normalize_message(message), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(encoded.encode(), digest_size=16).hexdigest()
+
+
+class Redactor:
+    """Replaces matches of the enabled patterns in every string of a JSON value with [<name>]"""
+
+    def __init__(self, names=DEFAULT_REDACT, patterns=()):
+        unknown = set(names) - set(REDACTIONS)
+        if unknown:
+            raise ValueError(f"unknown redactions {sorted(unknown)}; known: {sorted(REDACTIONS)}")
+        # api keys before cards and phones: a key's digits must not be half-replaced first
+        self.rules = [(REDACTIONS[n], f"[{n}]") for n in REDACTIONS if n in names]
+        self.rules += [(re.compile(p), "[redacted]") for p in patterns]
+
+    def __call__(self, value):
+        if isinstance(value, str):
+            for pattern, replacement in self.rules:
+                value = pattern.sub(replacement, value)
+            return value
+        if isinstance(value, list):
+            return [self(v) for v in value]
+        if isinstance(value, dict):
+            return {k: self(v) for k, v in value.items()}
+        return value
+
+
+def detach(value):
+    """
+    (copy, approximate bytes) of a JSON-like value: dicts and lists are copied, strings
+    and numbers shared (they are immutable), pydantic objects dumped
+    """
+    if isinstance(value, str):
+        return value, len(value)
+    if isinstance(value, dict):
+        copy, size = {}, 0
+        for k, v in value.items():
+            copy[k], n = detach(v)
+            size += n + 8
+        return copy, size
+    if isinstance(value, (list, tuple)):
+        copy, size = [], 0
+        for v in value:
+            v, n = detach(v)
+            copy.append(v)
+            size += n + 8
+        return copy, size
+    if hasattr(value, "model_dump"):
+        return detach(value.model_dump())
+    return value, 8
+
+
+def snapshot(kwargs, response_obj, start_time, end_time, error=None, bodies=False):
+    """
+    The fields of one request's record, from a logging callback's arguments (runs on the
+    event loop): scalars, and detached copies of the messages and, with bodies, the
+    response. Returns (fields, approximate bytes).
+    """
+    payload = kwargs.get("standard_logging_object") or {}
+    metadata = payload.get("metadata") or {}
+    params = payload.get("model_parameters") or kwargs.get("optional_params") or {}
+    messages = kwargs.get("messages") or payload.get("messages")
+    messages, size = detach(messages) if isinstance(messages, list) else ([], 0)
+    started = start_time.timestamp() if start_time else payload.get("startTime")
+    latency = (end_time - start_time).total_seconds() if start_time and end_time else None
+    first_token = kwargs.get("completion_start_time")
+    ttft = (first_token - start_time).total_seconds() if first_token and start_time else None
+    fields = {
+        "timestamp": started,
+        "id": payload.get("id") or kwargs.get("litellm_call_id"),
+        "call_type": payload.get("call_type") or kwargs.get("call_type"),
+        "model": payload.get("model_group") or kwargs.get("model"),
+        "deployment": payload.get("model"),
+        "stream": bool(payload.get("stream") or kwargs.get("stream")),
+        "status": "failure" if error else "success",
+        "cache_hit": bool(payload.get("cache_hit") or kwargs.get("cache_hit")),
+        "cache_key": payload.get("cache_key"),
+        "latency": latency,
+        # only streams have a first token distinct from the end
+        "ttft": ttft if ttft is not None and latency is not None and ttft < latency else None,
+        "prompt_tokens": payload.get("prompt_tokens"),
+        "completion_tokens": payload.get("completion_tokens"),
+        "messages": messages,
+        "api_key": metadata.get("user_api_key_hash"),
+        "team_id": metadata.get("user_api_key_team_id"),
+        "organization_id": metadata.get("user_api_key_org_id"),
+    }
+    # top level, as perf/loadgen.py corpora carry them
+    fields.update((p, detach(params[p])[0]) for p in OUTPUT_PARAMS if params.get(p) is not None)
+    if error:
+        fields["error"] = error
+    if bodies:
+        response = payload.get("response")
+        if response is None and response_obj is not None and hasattr(response_obj, "model_dump"):
+            response = response_obj.model_dump()
+        if response is not None:
+            fields["response"], n = detach(response)
+            size += n
+    return {k: v for k, v in fields.items() if v is not None}, size
+
+
+def build_record(fields, bodies=False, redact=None):
+    """The JSONL record of one snapshot: message hashes, redacted bodies (runs on the writer thread)"""
+    record = dict(fields)
+    messages = record.pop("messages", [])
+    response = record.pop("response", None)
+    record["message_hashes"] = [message_hash(m) for m in messages if isinstance(m, dict)]
+    if bodies:
+        redact = redact or (lambda value: value)
+        record["messages"] = redact(messages)
+        if response is not None:
+            record["response"] = redact(response)
+    return record
+
+
+class CaptureFile:
+    """One rotating output file, written through a zstd process when there is one"""
+
+    def __init__(self, directory, level=DEFAULT_ZSTD_LEVEL, seq=0):
+        os.makedirs(directory, exist_ok=True)
+        self.zstd = shutil.which("zstd")
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        # names sort chronologically; seq keeps size rotations within the same second apart
+        self.path = os.path.join(directory, f"capture-{stamp}-{os.getpid()}-{seq:04d}"
+                                            f".jsonl{'.zst' if self.zstd else ''}")
+        self.opened = time.monotonic()
+        self.bytes = 0
+        self._out = open(self.path + ".part", "wb")
+        self._process = None
+        if self.zstd:
+            self._process = subprocess.Popen([self.zstd, "-q", f"-{level}", "-c"], stdin=subprocess.PIPE,
+                                             stdout=self._out)
+            self._stream = self._process.stdin
+        else:
+            self._stream = self._out
+
+    def write(self, data):
+        self._stream.write(data)
+        self.bytes += len(data)
+
+    def close(self):
+        if self._process is not None:
+            self._process.stdin.close()
+            self._process.wait()
+        self._out.close()
+        os.replace(self.path + ".part", self.path)
+        return self.path
+
+
+class TrafficCapture:
+    """Bounded queue in front of a writer thread that owns the capture files"""
+
+    def __init__(self, directory=DEFAULT_DIR, sample_rate=DEFAULT_SAMPLE_RATE, bodies=False, redact=None,
+                 max_bytes=DEFAULT_MAX_BYTES, max_seconds=DEFAULT_MAX_SECONDS, queue_size=DEFAULT_QUEUE_SIZE,
+                 queue_bytes=DEFAULT_QUEUE_BYTES, zstd_level=DEFAULT_ZSTD_LEVEL):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.bodies = bodies
+        self.redact = redact or Redactor()
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.zstd_level = zstd_level
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.queue_bytes = queue_bytes
+        # approximate bytes enqueued (loop only) and written out (writer only): no lock needed
+        self._bytes_in = 0
+        self._bytes_out = 0
+        self.counts = {"captured": 0, "dropped": 0, "sampled_out": 0, "failed": 0, "bytes": 0, "files": 0}
+        self._pushed = dict(self.counts)
+        self._file = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def queued_bytes(self):
+        return self._bytes_in - self._bytes_out
+
+    def offer(self, kwargs, response_obj, start_time, end_time, error=None):
+        """Called on the event loop: sample, snapshot, enqueue or drop; never blocks"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.counts["sampled_out"] += 1
+            return False
+        if self._thread is None:
+            self.start()
+        if self.queued_bytes() >= self.queue_bytes:
+            self.counts["dropped"] += 1
+            return False
+        fields, size = snapshot(kwargs, response_obj, start_time, end_time, error, self.bodies)
+        # one oversized request still goes through an empty queue
+        if size > self.queue_bytes - self.queued_bytes() and not self.queue.empty():
+            self.counts["dropped"] += 1
+            return False
+        try:
+            self.queue.put_nowait((fields, size))
+        except queue.Full:
+            self.counts["dropped"] += 1
+            return False
+        self._bytes_in += size
+        return True
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def close(self):
+        """Flush what is queued and finish the current file (at interpreter exit)"""
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join(timeout=10)
+
+    def _run(self):
+        last_push = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=1.0)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                self._write(item[0])
+                self._bytes_out += item[1]
+            if self._file is not None and time.monotonic() - self._file.opened >= self.max_seconds:
+                self._rotate()
+            if time.monotonic() - last_push >= STATS_INTERVAL:
+                self._push_stats()
+                last_push = time.monotonic()
+        if self._file is not None:
+            self._rotate()
+        self._push_stats()
+
+    def _write(self, fields):
+        try:
+            line = json.dumps(build_record(fields, bodies=self.bodies, redact=self.redact), default=str) + "\n"
+            if self._file is None:
+                self._file = CaptureFile(self.directory, self.zstd_level, seq=self.counts["files"])
+            data = line.encode()
+            self._file.write(data)
+            self.counts["captured"] += 1
+            self.counts["bytes"] += len(data)
+            if self._file.bytes >= self.max_bytes:
+                self._rotate()
+        except Exception as e:
+            self.counts["failed"] += 1
+            logger.debug("traffic capture write failed: %s", e)
+
+    def _rotate(self):
+        try:
+            path = self._file.close()
+            self.counts["files"] += 1
+            logger.info("traffic capture: %s finished (%s bytes of JSON)", path, self._file.bytes)
+        except Exception as e:
+            logger.warning("traffic capture: closing %s failed: %s", self._file.path, e)
+        self._file = None
+
+    def _push_stats(self):
+        """Add this worker's counters since the last push to the shared hash"""
+        deltas = {k: v - self._pushed[k] for k, v in self.counts.items() if v != self._pushed[k]}
+        if not deltas:
+            return
+        try:
+            pipe = sync_redis().pipeline(transaction=False)
+            for name, delta in deltas.items():
+                pipe.hincrby(STATS_KEY, name, delta)
+            pipe.execute()
+            self._pushed.update((k, self.counts[k]) for k in deltas)
+        except Exception as e:
+            logger.debug("traffic capture stats push failed: %s", e)
+
+    def stats(self):
+        return dict(self.counts, queued=self.queue.qsize(), queued_bytes=self.queued_bytes())
+
+
+class TrafficCaptureHook(CustomLogger):
+    """Hands every finished request to the capture queue"""
+
+    def __init__(self):
+        super().__init__()
+        settings = litellm_setting("traffic_capture_params", {}) or {}
+        self.capture = TrafficCapture(
+            directory=str(WRAPPER_DIR / settings.get("dir", DEFAULT_DIR)),
+            sample_rate=float(settings.get("sample_rate", DEFAULT_SAMPLE_RATE)),
+            bodies=bool(settings.get("bodies", False)),
+            redact=Redactor(settings.get("redact", DEFAULT_REDACT), settings.get("redact_patterns") or ()),
+            max_bytes=int(settings.get("max_bytes", DEFAULT_MAX_BYTES)),
+            max_seconds=float(settings.get("max_seconds", DEFAULT_MAX_SECONDS)),
+            queue_size=int(settings.get("queue_size", DEFAULT_QUEUE_SIZE)),
+            queue_bytes=int(settings.get("queue_bytes", DEFAULT_QUEUE_BYTES)),
+            zstd_level=int(settings.get("zstd_level", DEFAULT_ZSTD_LEVEL)),
+        )
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        self.capture.offer(kwargs, response_obj, start_time, end_time)
+
+    async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        error = str(kwargs.get("exception") or "error")[:200]
+        self.capture.offer(kwargs, None, start_time, end_time, error)
+
+
+proxy_handler_instance = TrafficCaptureHook()
+
+
+def main():
+    """Print the cross-worker counters kept in Redis"""
+    conn = sync_redis()
+    stats = {k.decode(): int(v) for k, v in conn.hgetall(STATS_KEY).items()}
+    offered = stats.get("captured", 0) + stats.get("dropped", 0) + stats.get("failed", 0)
+    print("Traffic Capture Statistics")
+    print("=" * 40)
+    for name in ("captured", "dropped", "failed", "sampled_out", "files"):
+        print(f"{name:<12} {stats.get(name, 0)}")
+    if offered:
+        print(f"{'drop rate':<12} {stats.get('dropped', 0) / offered * 100:.2f}%")
+    print(f"{'JSON MiB':<12} {stats.get('bytes', 0) / 2**20:.1f}")
+    print(f"{'as of':<12} {time.strftime('%Y-%m-%d %H:%M:%S')}")
+
+
+if __name__ == "__main__":
+    main()
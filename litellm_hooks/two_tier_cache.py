@@ -0,0 +1,305 @@
+"""
+Two-tier response cache: a bounded in-process exact-match LRU in front of the
+proxy's configured cache (the redis-semantic cache in this repo).
+
+Byte-identical repeats (after normalization, see cache_keys) are answered from
+process memory without an embedding call or vector search. Misses fall through to
+the semantic tier; its hits and every new entry are written to the LRU, and new
+entries are written through to Redis as before.
+
+With adaptive_ttl installed, each LRU entry remembers the Redis entry it came from,
+local hits are reported to AdaptiveTTLStore.hit so that entry's TTL keeps growing,
+and an LRU entry lives no longer than the Redis entry's initial TTL.
+
+Enable in the proxy config, next to cache_params:
+
+    litellm_settings:
+      cache: True
+      cache_params: {...}          # ttl and skip_system_message_in_cache_key are honoured
+      two_tier_cache_params:
+        max_entries: 2048
+        max_bytes: 67108864
+      callbacks:
+        - litellm_hooks.two_tier_cache.proxy_handler_instance
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import litellm
+from litellm.integrations.custom_logger import CustomLogger
+
+from litellm_hooks.cache_keys import request_cache_key
+from litellm_hooks.common import cache_params, expect_install, litellm_setting, mark_installed, report_hooks_soon
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_MAX_BYTES = 64 * 2**20
+DEFAULT_TTL = 300
+
+
+def approx_size(value):
+    """Cheap payload size: LiteLLM caches {"timestamp": ..., "response": <json str>}"""
+    if isinstance(value, dict):
+        return sum(len(v) if isinstance(v, (str, bytes)) else 16 for v in value.values()) + 64
+    if isinstance(value, (str, bytes)):
+        return len(value) + 64
+    if isinstance(value, tuple):
+        return sum(approx_size(v) for v in value if v is not None)
+    return 1024
+
+
+class LRUCache:
+    """Thread-safe LRU bounded by entry count and approximate bytes, with per-entry expiry"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                return None
+            self._data.move_to_end(key)
+            return item[2]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        size = approx_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+
+class TwoTierCache:
+    """
+    Exact-match tier attached to the proxy's cache backend (litellm.cache.cache).
+    The backend's get/set methods are overridden on the instance rather than wrapped
+    in a proxy object, so LiteLLM's isinstance() checks on the backend keep working.
+    get/set calls carry the request kwargs (messages, model, ...) that give the exact-match key.
+    """
+
+    METHODS = ("get_cache", "async_get_cache", "set_cache", "async_set_cache")
+
+    def __init__(self, backend, local, skip_system=False):
+        self.backend = backend
+        self.local = local
+        self.skip_system = skip_system
+        self.local_hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+        self._backend = {name: getattr(backend, name) for name in self.METHODS}
+        self._pending = set()  # hit reports in flight
+
+    def attach(self):
+        for name in self.METHODS:
+            setattr(self.backend, name, getattr(self, name))
+            mark_installed("two_tier_cache", f"{type(self.backend).__name__}.{name}")
+        self.backend._two_tier_cache = self
+        return self
+
+    def _local_key(self, key, kwargs):
+        """
+        LiteLLM's key (under redis-semantic the scope key: model, params and tenant, but no
+        prompt) hashed with the normalized messages / prompt / input. None when the request
+        has none of those: an exact match cannot be told apart, so only the backend is asked.
+        """
+        if all(kwargs.get(field) is None for field in ("messages", "prompt", "input")):
+            return None
+        request = request_cache_key(kwargs, skip_system=self.skip_system, namespace="lru")
+        prompt = kwargs.get("prompt")
+        digest = hashlib.sha256(f"{key}\x00{request}\x00{prompt!r}".encode()).hexdigest()
+        return f"lru:{digest}"
+
+    def _ttl(self, kwargs):
+        ttl = kwargs.get("ttl")
+        ttl = float(ttl) if ttl is not None else None
+        adaptive = getattr(self.backend, "_adaptive_ttl", None)
+        if adaptive is not None:
+            # never outlive the Redis entry; its hits (reported below) extend that one
+            ttl = min(ttl or adaptive.policy.initial_ttl, adaptive.policy.initial_ttl)
+        return ttl
+
+    def _entry_key(self, reset=False):
+        """
+        Redis key of the semantic entry the backend call just hit or stored (adaptive_ttl);
+        reset=True clears it before a backend call so a stale key is never picked up
+        """
+        if getattr(self.backend, "_adaptive_ttl", None) is None:
+            return None
+        from litellm_hooks.adaptive_ttl import entry_key
+
+        if reset:
+            entry_key.set(None)
+            return None
+        return entry_key.get()
+
+    def _local_hit(self, local_key, entry):
+        """Count a local hit; the Redis entry behind it is reported to adaptive_ttl in the background"""
+        self.local_hits += 1
+        adaptive = getattr(self.backend, "_adaptive_ttl", None)
+        if adaptive is None or entry is None:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(adaptive.hit(entry))
+        except RuntimeError:
+            return  # sync caller without a loop: nothing to report from
+        self._pending.add(task)
+        task.add_done_callback(lambda done: self._reported(done, local_key))
+
+    def _reported(self, task, local_key):
+        self._pending.discard(task)
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.debug("two-tier cache: adaptive ttl hit report failed: %s", task.exception())
+        elif task.result() == -1:
+            self.local.delete(local_key)  # evicted from Redis: stop serving the local copy
+
+    def _lookup(self, key, kwargs):
+        local_key = self._local_key(key, kwargs)
+        item = self.local.get(local_key) if local_key else None
+        if item is not None:
+            self._local_hit(local_key, item[1])
+            return local_key, item[0]
+        return local_key, None
+
+    def get_cache(self, key, **kwargs):
+        local_key, value = self._lookup(key, kwargs)
+        if value is not None:
+            return value
+        self._entry_key(reset=True)
+        value = self._backend["get_cache"](key, **kwargs)
+        self._record_backend(local_key, value, kwargs)
+        return value
+
+    async def async_get_cache(self, key, **kwargs):
+        local_key, value = self._lookup(key, kwargs)
+        if value is not None:
+            return value
+        self._entry_key(reset=True)
+        value = await self._backend["async_get_cache"](key, **kwargs)
+        self._record_backend(local_key, value, kwargs)
+        return value
+
+    def _record_backend(self, local_key, value, kwargs):
+        if value is None:
+            self.misses += 1
+        else:
+            self.backend_hits += 1
+            if local_key:
+                self.local.set(local_key, (value, self._entry_key()), self._ttl(kwargs))
+
+    def _store_local(self, key, value, kwargs):
+        local_key = self._local_key(key, kwargs)
+        if local_key:
+            self.local.set(local_key, (value, None), self._ttl(kwargs))
+
+    def set_cache(self, key, value, **kwargs):
+        self._store_local(key, value, kwargs)
+        return self._backend["set_cache"](key, value, **kwargs)
+
+    async def async_set_cache(self, key, value, **kwargs):
+        local_key = self._local_key(key, kwargs)
+        if local_key:
+            self.local.set(local_key, (value, None), self._ttl(kwargs))
+        self._entry_key(reset=True)
+        result = await self._backend["async_set_cache"](key, value, **kwargs)
+        entry = self._entry_key()
+        if local_key and entry is not None:
+            # the Redis key is known once the store has run
+            self.local.set(local_key, (value, entry), self._ttl(kwargs))
+        return result
+
+    def stats(self):
+        lookups = self.local_hits + self.backend_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "backend_hits": self.backend_hits,
+            "misses": self.misses,
+            "local_hit_rate": self.local_hits / lookups if lookups else 0.0,
+            "local_entries": len(self.local),
+            "local_bytes": self.local.bytes,
+            "local_evictions": self.local.evictions,
+        }
+
+
+def install():
+    """Attach the exact-match tier once litellm.cache exists; returns the TwoTierCache or None"""
+    cache = getattr(litellm, "cache", None)
+    if cache is None:
+        return None
+    existing = getattr(cache.cache, "_two_tier_cache", None)
+    if existing is not None:
+        return existing
+    params = cache_params()
+    settings = litellm_setting("two_tier_cache_params", {}) or {}
+    local = LRUCache(
+        max_entries=int(settings.get("max_entries", DEFAULT_MAX_ENTRIES)),
+        max_bytes=int(settings.get("max_bytes", DEFAULT_MAX_BYTES)),
+        ttl=float(settings.get("ttl") or params.get("ttl") or getattr(cache, "ttl", None) or DEFAULT_TTL),
+    )
+    tiers = TwoTierCache(cache.cache, local, skip_system=bool(params.get("skip_system_message_in_cache_key")))
+    logger.info("two-tier cache installed: %s entries / %s bytes in front of %s",
+                local.max_entries, local.max_bytes, type(cache.cache).__name__)
+    return tiers.attach()
+
+
+class TwoTierCacheHook(CustomLogger):
+    """Installs the two-tier cache before the first request reaches the cache lookup"""
+
+    def __init__(self):
+        super().__init__()
+        expect_install("two_tier_cache")
+        self.cache = install()
+
+    async def async_pre_call_hook(self, user_api_key_dict, cache, data, call_type):
+        report_hooks_soon()
+        if self.cache is None:
+            self.cache = install()
+        return data
+
+
+proxy_handler_instance = TwoTierCacheHook()
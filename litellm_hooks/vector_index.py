@@ -0,0 +1,267 @@
+"""
+Vector index parameters for the redis-semantic cache.
+
+LiteLLM creates the semantic index with redisvl's defaults: a FLAT (brute force)
+FLOAT32 vector field. That is exact, but every lookup scans every entry in the
+scope, and each 1536-dim Titan vector holds 6 KiB. With this hook the index is
+created with the parameters from the config instead, e.g. HNSW, which answers in
+roughly log time at a recall cost, and FLOAT16 vectors, which halve the memory:
+
+    litellm_settings:
+      vector_index_params:
+        algorithm: hnsw        # or flat
+        datatype: float32      # or float16 (see below)
+        m: 16
+        ef_construction: 200
+        ef_runtime: 10         # KNN queries only
+        epsilon: 0.01          # the cache's range lookups search HNSW with this
+      callbacks:
+        - litellm_hooks.vector_index.proxy_handler_instance
+
+Pick the values with perf/vector_index_bench.py, which prints this section for
+the fastest variant that keeps recall. An existing index built with other
+parameters is dropped and recreated (without LiteLLM's *_isolated fallback):
+keeping its entries when only the algorithm changed, flushing them when the
+datatype changed, since their stored vectors no longer fit. Current parameters:
+python -m litellm_hooks.vector_index
+
+float16 is only used when redisvl's async lookup (SemanticCache.acheck, which the
+proxy calls) sends its query vector in the index's datatype; redisvl 0.4 to 0.7
+send float32, so every lookup would fail and the hook keeps float32 with a warning.
+
+LiteLLM 1.80 creates the index in RedisSemanticCache.__init__, while the config's
+`cache` setting is applied. The hook then has to be loaded first: `callbacks` must
+come before `cache` in litellm_settings (they are applied in order). Otherwise the
+index keeps LiteLLM's defaults and a warning says so. Once tuned, the index no
+longer matches LiteLLM's default schema, and 1.80 refuses to start its cache
+without this hook; drop the index (FT.DROPINDEX) when removing it.
+"""
+
+import inspect
+import logging
+
+import litellm
+from litellm.integrations.custom_logger import CustomLogger
+
+from litellm_hooks.common import expect_install, litellm_setting, report_hooks_soon, sync_redis, wrap_method
+
+logger = logging.getLogger(__name__)
+
+VECTOR_FIELD = "prompt_vector"
+DEFAULT_INDEX = "litellm_semantic_cache_index"
+DEFAULTS = {"algorithm": "flat", "datatype": "float32", "m": 16, "ef_construction": 200, "ef_runtime": 10,
+            "epsilon": 0.01}
+HNSW_PARAMS = ("m", "ef_construction", "ef_runtime", "epsilon")
+
+
+def index_params(settings):
+    """vector_index_params normalized: lowercase names, HNSW options only for HNSW"""
+    params = {name: settings.get(name, default) for name, default in DEFAULTS.items()}
+    params["algorithm"] = str(params["algorithm"]).lower()
+    params["datatype"] = str(params["datatype"]).lower()
+    if params["algorithm"] not in ("flat", "hnsw"):
+        raise ValueError(f"vector_index_params.algorithm must be flat or hnsw, not {params['algorithm']!r}")
+    if params["algorithm"] == "flat":
+        for name in HNSW_PARAMS:
+            params.pop(name)
+    return params
+
+
+def vector_attrs(params, dims):
+    """redisvl vector field attributes for the cache's prompt_vector"""
+    return {"dims": dims, "distance_metric": "cosine", **params}
+
+
+def tuned_cache_class(semantic_cache_cls, params):
+    """redisvl SemanticCache subclass whose schema carries the configured vector field"""
+
+    class TunedSemanticCache(semantic_cache_cls):
+        _vector_index_params = params
+
+        def _modify_schema(self, schema, filterable_fields=None):
+            from redisvl.schema.fields import FieldFactory
+
+            schema = super()._modify_schema(schema, filterable_fields)
+            dims = schema.fields[VECTOR_FIELD].attrs.dims
+            # replaced in place: the field order is part of redisvl's existing-schema comparison
+            schema.fields[VECTOR_FIELD] = FieldFactory.create_field("vector", VECTOR_FIELD,
+                                                                    attrs=vector_attrs(params, dims))
+            return schema
+
+    return TunedSemanticCache
+
+
+def retire_stale_index(redis_url, index_name, params):
+    """
+    Drop an index whose vector field differs from params, so LiteLLM recreates it under
+    its own name. Entries stay for an algorithm change (they are re-indexed in the
+    background); a datatype change deletes them, their blobs have the old width.
+    """
+    import redis
+    from redisvl.index import SearchIndex
+    from redisvl.schema.fields import FieldFactory
+
+    conn = redis.Redis.from_url(redis_url)
+    if index_name.encode() not in conn.execute_command("FT._LIST"):
+        return False
+    field = SearchIndex.from_existing(index_name, redis_client=conn).schema.fields.get(VECTOR_FIELD)
+    if field is None:
+        return False
+    current = field.attrs.model_dump(mode="json")
+    wanted = FieldFactory.create_field("vector", VECTOR_FIELD,
+                                       attrs=vector_attrs(params, current["dims"])).attrs.model_dump(mode="json")
+    if all(current.get(name) == wanted[name] for name in ("algorithm", "datatype", *HNSW_PARAMS) if name in wanted):
+        return False
+    flush = current["datatype"] != wanted["datatype"]
+    conn.execute_command("FT.DROPINDEX", index_name, *(["DD"] if flush else []))
+    logger.warning("vector index: dropped %s (%s %s) to recreate it as %s%s", index_name, current["algorithm"],
+                   current["datatype"], params, "; its entries were flushed" if flush else "")
+    return True
+
+
+def prepare(params, index_names, redis_url, cache_vectorizer):
+    """Retire indexes built with other parameters, and set the dtype redisvl writes vectors as"""
+    for name in index_names:
+        try:
+            retire_stale_index(redis_url, name, params)
+        except Exception as e:
+            logger.warning("vector index: could not compare %s with the configured parameters: %s", name, e)
+    # the vectorizer's dtype is what redisvl writes the stored and query vectors as
+    cache_vectorizer.dtype = params["datatype"]
+
+
+def tuned_init(params, init):
+    """RedisSemanticCache._init_semantic_cache wrapper: configured datatype and vector field"""
+
+    def wrapper(semantic_cache_cls, index_name, redis_url, cache_vectorizer):
+        # LiteLLM falls back to <name>_isolated on any schema mismatch; that one is checked too
+        prepare(params, (index_name, f"{index_name}_isolated"), redis_url, cache_vectorizer)
+        return init(tuned_cache_class(semantic_cache_cls, params), index_name, redis_url, cache_vectorizer)
+
+    return wrapper
+
+
+def tuned_eager_class(semantic_cache_cls, params):
+    """
+    SemanticCache for LiteLLM 1.80, which constructs it in RedisSemanticCache.__init__
+    (by keyword) and has no _init_semantic_cache to wrap
+    """
+
+    class EagerTunedSemanticCache(tuned_cache_class(semantic_cache_cls, params)):
+        def __init__(self, name=DEFAULT_INDEX, redis_url=None, vectorizer=None, **kwargs):
+            if redis_url is not None and vectorizer is not None:
+                prepare(params, (name,), redis_url, vectorizer)
+            super().__init__(name=name, redis_url=redis_url, vectorizer=vectorizer, **kwargs)
+
+    return EagerTunedSemanticCache
+
+
+def async_lookups_use_dtype(semantic_cache_cls):
+    """Whether SemanticCache.acheck queries with the vectorizer's dtype (redisvl 0.4 to 0.7 send float32)"""
+    try:
+        return "dtype" in inspect.getsource(semantic_cache_cls.acheck)
+    except (OSError, TypeError):
+        return False
+
+
+def supported(params, semantic_cache_cls):
+    """params, with float16 replaced by float32 where the async lookup cannot query a float16 index"""
+    if params["datatype"] == "float32" or async_lookups_use_dtype(semantic_cache_cls):
+        return params
+    logger.warning("vector index: this redisvl's async lookup sends float32 query vectors, which a %s index "
+                   "rejects; keeping float32", params["datatype"])
+    return dict(params, datatype="float32")
+
+
+def install_on(backend, params):
+    """Tune a RedisSemanticCache backend's index; False when it has none or is already built"""
+    if not hasattr(backend, "_init_semantic_cache"):
+        return False
+    if getattr(backend, "_llmcache", None) is not None:
+        logger.warning("vector index: the semantic cache index is already built; parameters apply after a restart")
+        return False
+    return wrap_method(backend, "_init_semantic_cache", lambda init: tuned_init(params, init), "vector_index")
+
+
+def install_before_cache(params):
+    """
+    LiteLLM 1.80, cache not built yet: tune the SemanticCache class RedisSemanticCache.__init__
+    imports from redisvl.extensions.llmcache. False on releases that build it lazily.
+    """
+    from litellm.caching.redis_semantic_cache import RedisSemanticCache
+    if hasattr(RedisSemanticCache, "_init_semantic_cache"):
+        return False
+    import redisvl.extensions.llmcache as llmcache_module
+
+    params = supported(params, llmcache_module.SemanticCache)
+    if wrap_method(llmcache_module, "SemanticCache", lambda cls: tuned_eager_class(cls, params), "vector_index"):
+        logger.info("vector index installed ahead of the semantic cache: %s", params)
+    return True
+
+
+def install(params):
+    """
+    Attach to the configured semantic cache before its index is created: on the first
+    lookup on current LiteLLM, in RedisSemanticCache.__init__ on 1.80. Returns False
+    until there is something to attach to.
+    """
+    backend = getattr(getattr(litellm, "cache", None), "cache", None)
+    if backend is None:
+        try:
+            install_before_cache(params)
+        except ImportError:
+            pass
+        return False
+    if hasattr(backend, "_init_semantic_cache"):
+        from redisvl.extensions.llmcache import SemanticCache
+
+        params = supported(params, SemanticCache)
+        if install_on(backend, params):
+            logger.info("vector index installed: %s", params)
+    elif hasattr(backend, "llmcache"):
+        if getattr(backend.llmcache, "_vector_index_params", None) is None:
+            logger.warning("vector index not applied: LiteLLM built the semantic cache index before this hook "
+                           "loaded; list `callbacks` before `cache` in litellm_settings")
+    else:
+        logger.warning("vector index not installed: %s is not a redis-semantic cache", type(backend).__name__)
+    return True
+
+
+class VectorIndexHook(CustomLogger):
+    """Creates the semantic cache index with vector_index_params"""
+
+    def __init__(self):
+        super().__init__()
+        expect_install("vector_index")
+        self.params = index_params(litellm_setting("vector_index_params", {}) or {})
+        self.installed = install(self.params)
+
+    async def async_pre_call_hook(self, user_api_key_dict, cache, data, call_type):
+        report_hooks_soon()
+        if not self.installed:
+            self.installed = install(self.params)
+        return data
+
+
+proxy_handler_instance = VectorIndexHook()
+
+
+def main():
+    """Print the vector field of the semantic cache index(es) next to the configured parameters"""
+    conn = sync_redis()
+    names = [n.decode() for n in conn.execute_command("FT._LIST")]
+    print("Semantic Cache Vector Index")
+    print("=" * 40)
+    print(f"{'configured':<22} {proxy_handler_instance.params}")
+    for name in (n for n in names if n.startswith(DEFAULT_INDEX)):
+        info = conn.execute_command("FT.INFO", name)
+        fields = dict(zip(info[::2], info[1::2]))
+        for attribute in fields.get(b"attributes") or []:
+            if b"VECTOR" in attribute:
+                print(f"{name:<22} {' '.join(a.decode() if isinstance(a, bytes) else str(a) for a in attribute[6:])}")
+        print(f"{'  docs':<22} {int(fields.get(b'num_docs', 0))}")
+        print(f"{'  vector index MiB':<22} {float(fields.get(b'vector_index_sz_mb', 0)):.1f}")
+
+
+if __name__ == "__main__":
+    main()
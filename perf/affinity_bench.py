@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Model-affinity scheduler benchmark against the mock upstream's swap penalty.
+Sends the same interleaved multi-model workload to a mock that charges
+--swap-penalty seconds per model load, first unscheduled (FIFO, as the proxy does
+today) and then through litellm_hooks.model_affinity.BackendScheduler, and reports
+wall time, latency percentiles, model swaps and the longest queue wait.
+
+Usage:
+    python affinity_bench.py --models 3 --requests 60 --concurrency 6 --swap-penalty 2
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from loadgen import percentile
+from mock_upstream import MockSettings, serve_in_thread
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from litellm_hooks.model_affinity import BackendScheduler  # noqa: E402
+
+
+def workload(models, requests, seed=0):
+    """Randomly interleaved model sequence (the worst case for a single loaded model)"""
+    rng = random.Random(seed)
+    return [rng.choice(models) for _ in range(requests)]
+
+
+async def run(base_url, sequence, concurrency, max_tokens, scheduler=None, arrival_gap=0.0):
+    """Issue every request with at most `concurrency` open; returns (wall, latencies)"""
+    latencies = []
+    gate = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=3600,
+                                 limits=httpx.Limits(max_connections=concurrency * 2)) as client:
+
+        async def one(i, model):
+            await asyncio.sleep(i * arrival_gap)
+            async with gate:
+                start = time.perf_counter()
+                if scheduler is not None:
+                    await scheduler.acquire(model)
+                try:
+                    response = await client.post("/v1/chat/completions", json={
+                        "model": model, "max_tokens": max_tokens,
+                        "messages": [{"role": "user", "content": f"request {i}"}],
+                    })
+                    response.raise_for_status()
+                finally:
+                    if scheduler is not None:
+                        scheduler.release()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i, m) for i, m in enumerate(sequence)))
+        return time.perf_counter() - start, latencies
+
+
+def report(label, wall, latencies, swaps, scheduler=None):
+    line = (f"{label:<12} wall {wall:>7.1f}s  p50 {percentile(latencies, 50):>6.2f}s  "
+            f"p95 {percentile(latencies, 95):>6.2f}s  max {max(latencies):>6.2f}s  swaps {swaps:>4}")
+    if scheduler is not None:
+        line += f"  longest queue wait {scheduler.longest_wait:.1f}s  forced {scheduler.forced}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model-affinity scheduler benchmark against the mock upstream")
+    parser.add_argument("--models", type=int, default=3, help="distinct models sharing the backend")
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=6, help="client-side concurrent requests")
+    parser.add_argument("--swap-penalty", type=float, default=2.0, help="mock seconds per model load")
+    parser.add_argument("--loaded-models", type=int, default=1, help="models the mock keeps loaded")
+    parser.add_argument("--max-concurrency", type=int, default=2, help="scheduler backend concurrency cap")
+    parser.add_argument("--max-wait", type=float, default=30.0, help="scheduler fairness bound (s)")
+    parser.add_argument("--max-tokens", type=int, default=16)
+    parser.add_argument("--tokens-per-s", type=float, default=200.0)
+    parser.add_argument("--arrival-gap", type=float, default=0.0, help="seconds between request arrivals")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    models = [f"mock-model-{i}" for i in range(args.models)]
+    sequence = workload(models, args.requests, args.seed)
+    print(f"{args.requests} requests over {args.models} models, client concurrency {args.concurrency}, "
+          f"swap penalty {args.swap_penalty}s")
+    print("=" * 100)
+
+    results = {}
+    for label in ("fifo", "affinity"):
+        settings = MockSettings(ttft=0.05, tokens_per_s=args.tokens_per_s, max_tokens=args.max_tokens,
+                                swap_penalty=args.swap_penalty, loaded_models=args.loaded_models)
+        server, base_url = serve_in_thread(settings)
+        scheduler = None
+        if label == "affinity":
+            scheduler = BackendScheduler(base_url, max_concurrency=args.max_concurrency, max_wait=args.max_wait)
+        try:
+            wall, latencies = asyncio.run(run(base_url, sequence, args.concurrency, args.max_tokens,
+                                              scheduler, args.arrival_gap))
+        finally:
+            server.shutdown()
+        results[label] = wall
+        report(label, wall, latencies, settings.swaps, scheduler)
+
+    print(f"\nSpeedup: {results['fifo'] / results['affinity']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Embedding micro-batcher benchmark against the mock upstream.
+Fires single-input embedding requests (Letta's pattern) at a fixed concurrency,
+once straight to the mock and once through litellm_hooks.embedding_batcher, and
+reports requests/s, latency percentiles, upstream calls and the throughput gain.
+The mock's --embedding-latency models the per-call overhead that batching amortizes.
+
+Usage:
+    python embedding_batch_bench.py --requests 2000 --concurrency 64 --window-ms 5 --max-batch 64
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from loadgen import percentile
+from mock_upstream import MockSettings, serve_in_thread
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from litellm import EmbeddingResponse  # noqa: E402
+from litellm_hooks.embedding_batcher import EmbeddingBatcher  # noqa: E402
+
+MODEL = "local-bge-small-en-v1-5"
+
+
+def http_aembedding(client):
+    """aembedding(model, input) against an OpenAI-compatible /v1/embeddings"""
+
+    async def aembedding(model, input, **kwargs):
+        response = await client.post("/v1/embeddings", json={"model": model, "input": input})
+        response.raise_for_status()
+        return EmbeddingResponse(**response.json())
+
+    return aembedding
+
+
+async def run(base_url, requests, concurrency, batcher_options=None):
+    """Returns (wall, latencies, batcher or None)"""
+    latencies = []
+    gate = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=600,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        call = http_aembedding(client)
+        batcher = EmbeddingBatcher(call, **batcher_options) if batcher_options is not None else None
+        embed = batcher.embed if batcher else call
+
+        async def one(i):
+            async with gate:
+                start = time.perf_counter()
+                response = await embed(MODEL, f"archival memory passage number {i} about topic {i % 97}")
+                assert len(response.data) == 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        return time.perf_counter() - start, latencies, batcher
+
+
+def report(label, wall, latencies, upstream_calls):
+    print(f"{label:<10} {len(latencies) / wall:>9.1f} req/s  p50 {percentile(latencies, 50) * 1000:>7.1f}ms  "
+          f"p95 {percentile(latencies, 95) * 1000:>7.1f}ms  upstream calls {upstream_calls:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding micro-batcher benchmark against the mock upstream")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--embedding-latency", type=float, default=0.02, help="mock seconds per upstream call")
+    parser.add_argument("--embedding-item-latency", type=float, default=0.0005, help="mock seconds per input")
+    args = parser.parse_args()
+
+    print(f"{args.requests} single-input requests, concurrency {args.concurrency}, window {args.window_ms}ms, "
+          f"max batch {args.max_batch}; mock {args.embedding_latency * 1000:.0f}ms/call + "
+          f"{args.embedding_item_latency * 1000:.1f}ms/input")
+    print("=" * 90)
+    walls = {}
+    for label, options in (("direct", None),
+                           ("batched", {"window": args.window_ms / 1000, "max_batch": args.max_batch})):
+        settings = MockSettings(embedding_latency=args.embedding_latency,
+                                embedding_item_latency=args.embedding_item_latency)
+        server, base_url = serve_in_thread(settings)
+        try:
+            wall, latencies, batcher = asyncio.run(run(base_url, args.requests, args.concurrency, options))
+        finally:
+            server.shutdown()
+        walls[label] = wall
+        report(label, wall, latencies, settings.requests)
+        if batcher:
+            stats = batcher.stats()
+            print(f"{'':<10} average batch {stats['avg_batch']:.1f} inputs, "
+                  f"{stats['upstream_calls_saved']} upstream calls saved")
+
+    print(f"\nThroughput gain: {walls['direct'] / walls['batched']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
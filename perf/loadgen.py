@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Async load generator for the LiteLLM proxy.
+Replays a prompt corpus through a pooled httpx client, either closed-loop at a
+fixed concurrency or open-loop at a Poisson arrival rate, and reports latency
+percentiles, time-to-first-token (streaming), tokens/s and error rates per model.
+
+Usage:
+    python loadgen.py --corpus requests.jsonl --concurrency 8 --requests 200
+    python loadgen.py --corpus requests.jsonl --rate 5 --duration 60 --stream
+    python loadgen.py --corpus ../captures --concurrency 8    # litellm_hooks.traffic_capture files
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+WRAPPER_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_CONFIG = WRAPPER_DIR / "proxy_server_config-local-example.yaml"
+DEFAULT_BASE_URL = os.environ.get("LITELLM_BASE_URL", "http://localhost:4000")
+DEFAULT_API_KEY = os.environ.get("LITELLM_API_KEY", "sk-1234")
+DEFAULT_MODEL = "local-glm-4-5-air-mlx"
+
+
+def load_models(config_path=DEFAULT_CONFIG):
+    """model_name entries from a LiteLLM proxy config, split into (chat, embedding)"""
+    if yaml is None:
+        return [], []
+    with open(config_path) as f:
+        config = yaml.safe_load(f) or {}
+    chat, embedding = [], []
+    for entry in config.get("model_list", []):
+        name = entry["model_name"]
+        target = f"{name} {entry.get('litellm_params', {}).get('model', '')}".lower()
+        (embedding if "embed" in target or "bge" in target else chat).append(name)
+    return chat, embedding
+
+
+def corpus_entry(record, default_model=DEFAULT_MODEL):
+    """Normalize one corpus line: messages, or a prompt/body/text string"""
+    messages = record.get("messages")
+    if not messages:
+        text = record.get("prompt") or record.get("body") or record.get("text") or ""
+        messages = [{"role": "user", "content": text}]
+    entry = {"model": record.get("model") or default_model, "messages": messages}
+    for param in ("max_tokens", "temperature", "timestamp"):
+        if param in record:
+            entry[param] = record[param]
+    return entry
+
+
+def corpus_files(path):
+    """A corpus file, or every finished capture in a directory (litellm_hooks.traffic_capture), oldest first"""
+    path = Path(path)
+    if path.is_dir():
+        return sorted(p for p in path.iterdir() if p.name.endswith((".jsonl", ".jsonl.zst")))
+    return [path]
+
+
+def read_jsonl(path):
+    """Records of a JSONL file or capture directory; .zst files are decompressed by the zstd CLI"""
+    for file in corpus_files(path):
+        if file.suffix == ".zst":
+            with subprocess.Popen(["zstd", "-dc", str(file)], stdout=subprocess.PIPE, text=True) as reader:
+                lines = reader.stdout
+                yield from (json.loads(line) for line in lines if line.strip())
+        else:
+            with open(file) as f:
+                yield from (json.loads(line) for line in f if line.strip())
+
+
+def load_corpus(path, default_model=DEFAULT_MODEL):
+    """Read a JSONL prompt corpus (or a capture directory) into request entries"""
+    return [corpus_entry(record, default_model) for record in read_jsonl(path)]
+
+
+class RequestResult:
+    """Outcome of a single proxy request"""
+
+    __slots__ = ("model", "ok", "status", "latency", "ttft", "completion_tokens", "error", "content", "response", "headers")
+
+    def __init__(self, model):
+        self.model = model
+        self.ok = False
+        self.status = None
+        self.latency = None
+        self.ttft = None
+        self.completion_tokens = 0
+        self.error = None
+        self.content = None
+        self.response = None
+        self.headers = {}
+
+
+def request_body(entry, stream=False, max_tokens=None):
+    """OpenAI chat-completions body for a corpus entry"""
+    body = {
+        "model": entry["model"],
+        "messages": entry["messages"],
+        "temperature": entry.get("temperature", 0.1),
+    }
+    if max_tokens or entry.get("max_tokens"):
+        body["max_tokens"] = max_tokens or entry["max_tokens"]
+    if stream:
+        body["stream"] = True
+        body["stream_options"] = {"include_usage": True}
+    return body
+
+
+def auth_headers(api_key=DEFAULT_API_KEY):
+    return {"Authorization": f"Bearer {api_key}"}
+
+
+async def send_chat(client, entry, stream=False, max_tokens=None):
+    """Send one chat completion and time it; never raises"""
+    result = RequestResult(entry["model"])
+    body = request_body(entry, stream, max_tokens)
+    start = time.perf_counter()
+    try:
+        if stream:
+            await _send_streaming(client, body, result, start)
+        else:
+            response = await client.post("/v1/chat/completions", json=body)
+            result.status = response.status_code
+            result.headers = dict(response.headers)
+            response.raise_for_status()
+            data = response.json()
+            result.response = data
+            result.content = data.get("choices", [{}])[0].get("message", {}).get("content")
+            result.completion_tokens = (data.get("usage") or {}).get("completion_tokens", 0)
+        result.ok = True
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.latency = time.perf_counter() - start
+    return result
+
+
+async def _send_streaming(client, body, result, start):
+    """Consume an SSE stream, recording TTFT on the first content delta"""
+    parts = []
+    chunks = 0
+    async with client.stream("POST", "/v1/chat/completions", json=body) as response:
+        result.status = response.status_code
+        result.headers = dict(response.headers)
+        if response.status_code >= 400:
+            await response.aread()
+            response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == "[DONE]":
+                break
+            chunk = json.loads(payload)
+            if chunk.get("usage"):
+                result.completion_tokens = chunk["usage"].get("completion_tokens", 0)
+            for choice in chunk.get("choices") or []:
+                delta = (choice.get("delta") or {}).get("content")
+                if delta:
+                    if result.ttft is None:
+                        result.ttft = time.perf_counter() - start
+                    parts.append(delta)
+                    chunks += 1
+    result.content = "".join(parts)
+    if not result.completion_tokens:
+        result.completion_tokens = chunks
+
+
+def make_client(base_url=DEFAULT_BASE_URL, api_key=DEFAULT_API_KEY, max_connections=100, timeout=7200):
+    """Pooled async HTTP client for the proxy"""
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return httpx.AsyncClient(base_url=base_url, headers=auth_headers(api_key), limits=limits, timeout=timeout)
+
+
+async def run_closed_loop(client, entries, concurrency, total, stream=False, max_tokens=None):
+    """Keep `concurrency` requests in flight until `total` have completed"""
+    results = []
+    source = itertools.islice(itertools.cycle(entries), total)
+
+    async def worker():
+        for entry in source:
+            results.append(await send_chat(client, entry, stream, max_tokens))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+async def run_open_loop(client, entries, rate, duration, stream=False, max_tokens=None, seed=0):
+    """Launch requests at Poisson arrivals of `rate`/s for `duration` seconds, regardless of completions"""
+    rng = random.Random(seed)
+    tasks = []
+    source = itertools.cycle(entries)
+    deadline = time.perf_counter() + duration
+    next_at = time.perf_counter()
+    while next_at < deadline:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(send_chat(client, next(source), stream, max_tokens)))
+        next_at += rng.expovariate(rate)
+    return await asyncio.gather(*tasks)
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of an unsorted list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(results, wall_time):
+    """Per-model latency/TTFT percentiles, tokens/s and error rate"""
+    by_model = defaultdict(list)
+    for r in results:
+        by_model[r.model].append(r)
+    by_model["ALL"] = list(results)
+
+    summary = {}
+    for model, rs in by_model.items():
+        ok = [r for r in rs if r.ok]
+        latencies = [r.latency for r in ok]
+        ttfts = [r.ttft for r in ok if r.ttft is not None]
+        tokens = sum(r.completion_tokens for r in ok)
+        summary[model] = {
+            "requests": len(rs),
+            "errors": len(rs) - len(ok),
+            "error_rate": (len(rs) - len(ok)) / len(rs) if rs else 0.0,
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "latency_p99": percentile(latencies, 99),
+            "ttft_p50": percentile(ttfts, 50),
+            "ttft_p95": percentile(ttfts, 95),
+            "ttft_p99": percentile(ttfts, 99),
+            "completion_tokens": tokens,
+            "tokens_per_s": tokens / wall_time if wall_time else 0.0,
+            "requests_per_s": len(ok) / wall_time if wall_time else 0.0,
+            "sample_errors": sorted({r.error for r in rs if r.error})[:3],
+        }
+    return summary
+
+
+def _ms(value):
+    return f"{value * 1000:8.1f}" if value is not None else "       -"
+
+
+def print_summary(summary, wall_time, known_models=None):
+    """Table of per-model results"""
+    print(f"\nWall time: {wall_time:.2f}s")
+    print(f"{'model':<36} {'n':>6} {'err%':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'ttft50':>8} {'ttft95':>8} {'ttft99':>8} {'tok/s':>8} {'req/s':>7}")
+    for model, s in summary.items():
+        flag = "" if not known_models or model == "ALL" or model in known_models else " (not in config)"
+        print(f"{(model + flag)[:36]:<36} {s['requests']:>6} {s['error_rate'] * 100:>5.1f}% "
+              f"{_ms(s['latency_p50'])} {_ms(s['latency_p95'])} {_ms(s['latency_p99'])} "
+              f"{_ms(s['ttft_p50'])} {_ms(s['ttft_p95'])} {_ms(s['ttft_p99'])} "
+              f"{s['tokens_per_s']:>8.1f} {s['requests_per_s']:>7.2f}")
+        for error in s["sample_errors"]:
+            print(f"    error: {error[:100]}")
+
+
+async def run_load(entries, concurrency=None, rate=None, requests=100, duration=60, stream=False,
+                   max_tokens=None, base_url=DEFAULT_BASE_URL, api_key=DEFAULT_API_KEY):
+    """Run a closed-loop (concurrency) or open-loop (rate) test; returns (results, wall_time)"""
+    async with make_client(base_url, api_key, max_connections=max(concurrency or 0, 100)) as client:
+        started = time.perf_counter()
+        if rate:
+            results = await run_open_loop(client, entries, rate, duration, stream, max_tokens)
+        else:
+            results = await run_closed_loop(client, entries, concurrency or 1, requests, stream, max_tokens)
+        return results, time.perf_counter() - started
+
+
+# keep-alive clients of chat_completion, one per (base_url, api_key)
+_sync_clients = {}
+
+
+def sync_client(base_url=DEFAULT_BASE_URL, api_key=DEFAULT_API_KEY):
+    client = _sync_clients.get((base_url, api_key))
+    if client is None:
+        client = _sync_clients[(base_url, api_key)] = httpx.Client(base_url=base_url, headers=auth_headers(api_key),
+                                                                   timeout=60)
+    return client
+
+
+def chat_completion(prompt, model=DEFAULT_MODEL, max_tokens=10, temperature=0.1, stream=False,
+                    base_url=DEFAULT_BASE_URL, api_key=DEFAULT_API_KEY):
+    """Blocking single request over a shared keep-alive client (for the debugging scripts)"""
+    client = sync_client(base_url, api_key)
+    entry = {"model": model, "messages": [{"role": "user", "content": prompt}], "temperature": temperature}
+    body = request_body(entry, stream=stream, max_tokens=max_tokens)
+    start = time.perf_counter()
+    if not stream:
+        response = client.post("/v1/chat/completions", json=body)
+        elapsed = time.perf_counter() - start
+        response.raise_for_status()
+        data = response.json()
+        return {
+            "response": data,
+            "headers": dict(response.headers),
+            "model": data.get("model", "unknown"),
+            "content": data.get("choices", [{}])[0].get("message", {}).get("content"),
+            "tokens_used": (data.get("usage") or {}).get("total_tokens", 0),
+            "response_time": elapsed,
+        }
+    parts, usage, model_name, ttft = [], {}, "unknown", None
+    with client.stream("POST", "/v1/chat/completions", json=body) as response:
+        if response.status_code >= 400:
+            response.read()
+            response.raise_for_status()
+        headers = dict(response.headers)
+        for line in response.iter_lines():
+            if not line.startswith("data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == "[DONE]":
+                break
+            chunk = json.loads(payload)
+            model_name = chunk.get("model") or model_name
+            usage = chunk.get("usage") or usage
+            for choice in chunk.get("choices") or []:
+                delta = (choice.get("delta") or {}).get("content")
+                if delta:
+                    ttft = ttft if ttft is not None else time.perf_counter() - start
+                    parts.append(delta)
+    return {
+        "response": None,
+        "headers": headers,
+        "model": model_name,
+        "content": "".join(parts),
+        "tokens_used": usage.get("total_tokens", 0),
+        "response_time": time.perf_counter() - start,
+        "ttft": ttft,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async load generator for the LiteLLM proxy")
+    parser.add_argument("--corpus", help="JSONL prompt corpus (messages or prompt per line)")
+    parser.add_argument("--prompt", default="What is the capital of France? Please respond with just 'Paris'.",
+                        help="single prompt to use when no corpus is given")
+    parser.add_argument("--model", action="append", help="model(s) to target; overrides corpus models, round-robin")
+    parser.add_argument("--config", default=str(DEFAULT_CONFIG), help="proxy config to read model names from")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--concurrency", type=int, help="closed loop: requests kept in flight")
+    mode.add_argument("--rate", type=float, help="open loop: Poisson arrival rate (requests/s)")
+    parser.add_argument("--requests", type=int, default=100, help="closed loop: total requests")
+    parser.add_argument("--duration", type=float, default=60, help="open loop: seconds to generate arrivals")
+    parser.add_argument("--stream", action="store_true", help="stream responses and measure TTFT")
+    parser.add_argument("--max-tokens", type=int, help="override max_tokens")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--api-key", default=DEFAULT_API_KEY)
+    parser.add_argument("--json", help="write the summary to this file")
+    args = parser.parse_args()
+
+    chat_models, _ = load_models(args.config) if Path(args.config).exists() else ([], [])
+    if args.corpus:
+        entries = load_corpus(args.corpus)
+    else:
+        entries = [corpus_entry({"prompt": args.prompt})]
+    if not entries:
+        print(f"Corpus {args.corpus} is empty")
+        sys.exit(1)
+    if args.model:
+        models = itertools.cycle(args.model)
+        entries = [dict(e, model=next(models)) for e in entries for _ in range(len(args.model))]
+
+    print("LiteLLM Proxy Load Generator")
+    print("=" * 70)
+    if args.rate:
+        print(f"Open loop: {args.rate}/s for {args.duration}s against {args.base_url}")
+    else:
+        print(f"Closed loop: concurrency {args.concurrency or 1}, {args.requests} requests against {args.base_url}")
+
+    results, wall_time = asyncio.run(run_load(
+        entries, concurrency=args.concurrency, rate=args.rate, requests=args.requests,
+        duration=args.duration, stream=args.stream, max_tokens=args.max_tokens,
+        base_url=args.base_url, api_key=args.api_key,
+    ))
+    summary = summarize(results, wall_time)
+    print_summary(summary, wall_time, set(chat_models))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"wall_time": wall_time, "models": summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
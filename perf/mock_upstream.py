@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Deterministic OpenAI-compatible mock upstream for offline proxy benchmarks.
+Serves /v1/chat/completions (streaming and non-streaming), /v1/embeddings and
+/v1/models with configurable latency, time-to-first-token, token rate, error
+rate and embedding dimension. Identical requests always produce identical output.
+--swap-penalty simulates LM Studio reloading weights when a request names a model
+that is not among the --loaded-models most recently used ones.
+
+Usage:
+    python mock_upstream.py --port 1235 --ttft 0.2 --tokens-per-s 50
+    python mock_upstream.py --swap-penalty 5 --loaded-models 1
+    python mock_upstream.py --write-overlay ../proxy_server_config-mock.yaml
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+WRAPPER_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_CONFIG = WRAPPER_DIR / "proxy_server_config-local-example.yaml"
+DEFAULT_OVERLAY = WRAPPER_DIR / "proxy_server_config-mock.yaml"
+DEFAULT_PORT = 1235
+
+# Embedding dimension per model-name substring, matching the real models in the config
+DEFAULT_EMBEDDING_DIMS = {"titan": 1536, "nomic": 768, "bge": 384}
+
+VOCABULARY = (
+    "the a cache proxy model token request response latency memory redis local "
+    "cloud embedding vector semantic agent prompt context stream batch queue "
+    "worker result value index query paris france capital answer is of and to"
+).split()
+
+WORD = re.compile(r"\w+")
+
+
+def request_digest(*parts):
+    """Stable sha256 over the JSON encoding of parts"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).digest()
+
+
+def count_tokens(text):
+    """Cheap deterministic token estimate (~4 chars per token)"""
+    return max(1, math.ceil(len(text) / 4))
+
+
+def messages_text(messages):
+    parts = []
+    for message in messages or []:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+        parts.append(content or "")
+    return "\n".join(parts)
+
+
+def completion_tokens(model, messages, n):
+    """Deterministic list of n output tokens for a model + messages"""
+    rng = random.Random(request_digest(model, messages))
+    return [rng.choice(VOCABULARY) + " " for _ in range(n)]
+
+
+def embed_text(text, dim):
+    """
+    Hashed bag-of-words embedding, L2-normalized.
+    Texts sharing words get high cosine similarity, so semantic-cache behaviour is realistic.
+    """
+    vector = [0.0] * dim
+    for word in WORD.findall(text.lower()):
+        h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+        vector[h % dim] += 1.0 if (h >> 63) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm == 0:
+        vector[0], norm = 1.0, 1.0
+    return [v / norm for v in vector]
+
+
+class MockSettings:
+    """Behaviour knobs shared by all handler threads"""
+
+    def __init__(self, latency=0.0, ttft=0.05, tokens_per_s=100.0, max_tokens=64, error_rate=0.0,
+                 embedding_dim=384, embedding_dims=None, embedding_latency=0.0, embedding_item_latency=0.0,
+                 seed=0, models=None, swap_penalty=0.0, loaded_models=1):
+        self.latency = latency
+        self.ttft = ttft
+        self.tokens_per_s = tokens_per_s
+        self.max_tokens = max_tokens
+        self.error_rate = error_rate
+        self.embedding_dim = embedding_dim
+        self.embedding_dims = DEFAULT_EMBEDDING_DIMS if embedding_dims is None else embedding_dims
+        self.embedding_latency = embedding_latency
+        self.embedding_item_latency = embedding_item_latency
+        self.models = models or []
+        self.swap_penalty = swap_penalty
+        self.loaded_models = loaded_models
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded = OrderedDict()
+        self.requests = 0
+        self.errors = 0
+        self.swaps = 0
+        self.swap_seconds = 0.0
+
+    def should_fail(self):
+        """Seeded error draw: deterministic for a given arrival order"""
+        with self._lock:
+            self.requests += 1
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+            self.errors += fail
+            return fail
+
+    def ensure_loaded(self, model):
+        """
+        Simulated weight swap: a model outside the loaded set costs swap_penalty seconds.
+        Loads are serialized and block the backend, as a single LM Studio process does.
+        """
+        if self.swap_penalty <= 0:
+            return 0.0
+        with self._load_lock:
+            if model in self._loaded:
+                self._loaded.move_to_end(model)
+                return 0.0
+            time.sleep(self.swap_penalty)
+            self._loaded[model] = True
+            while len(self._loaded) > self.loaded_models:
+                self._loaded.popitem(last=False)
+            self.swaps += 1
+            self.swap_seconds += self.swap_penalty
+            return self.swap_penalty
+
+    def dim_for(self, model):
+        for fragment, dim in self.embedding_dims.items():
+            if fragment in (model or "").lower():
+                return dim
+        return self.embedding_dim
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings = MockSettings()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("/v1/models", "/models"):
+            self._send_json(200, {"object": "list", "data": [
+                {"id": m, "object": "model", "owned_by": "mock"} for m in self.settings.models
+            ]})
+        elif self.path.rstrip("/") in ("/health", "/v1/health"):
+            self._send_json(200, {"status": "ok", "requests": self.settings.requests,
+                                  "swaps": self.settings.swaps, "swap_seconds": self.settings.swap_seconds})
+        else:
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def do_POST(self):
+        path = self.path.rstrip("/")
+        try:
+            body = self._read_json()
+        except ValueError:
+            return self._send_json(400, {"error": {"message": "invalid JSON"}})
+        if self.settings.should_fail():
+            return self._send_json(500, {"error": {"message": "mock upstream injected error", "type": "server_error"}})
+        if path in ("/v1/chat/completions", "/chat/completions"):
+            self._chat(body)
+        elif path in ("/v1/embeddings", "/embeddings"):
+            self._embeddings(body)
+        else:
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def _chat(self, body):
+        s = self.settings
+        model = body.get("model", "mock")
+        messages = body.get("messages", [])
+        s.ensure_loaded(model)
+        n = min(body.get("max_tokens") or s.max_tokens, s.max_tokens)
+        tokens = completion_tokens(model, messages, n)
+        prompt_tokens = count_tokens(messages_text(messages))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": n, "total_tokens": prompt_tokens + n}
+        completion_id = "chatcmpl-mock-" + request_digest(model, messages).hex()[:24]
+        created = int(time.time())
+        per_token = 1.0 / s.tokens_per_s if s.tokens_per_s > 0 else 0.0
+
+        if not body.get("stream"):
+            time.sleep(s.latency + s.ttft + per_token * n)
+            return self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "length",
+                             "message": {"role": "assistant", "content": "".join(tokens).strip()}}],
+                "usage": usage,
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(s.latency + s.ttft)
+
+        def chunk(delta, finish_reason=None, extra=None):
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                       "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            payload.update(extra or {})
+            self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode())
+
+        chunk({"role": "assistant", "content": tokens[0] if tokens else ""})
+        for token in tokens[1:]:
+            time.sleep(per_token)
+            chunk({"content": token})
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+        chunk({}, "length", {"usage": usage} if include_usage else None)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _embeddings(self, body):
+        s = self.settings
+        model = body.get("model", "mock-embedding")
+        inputs = body.get("input", [])
+        s.ensure_loaded(model)
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        dim = body.get("dimensions") or s.dim_for(model)
+        texts = [x if isinstance(x, str) else " ".join(map(str, x)) for x in inputs]
+        time.sleep(s.embedding_latency + s.embedding_item_latency * len(texts))
+        prompt_tokens = sum(count_tokens(t) for t in texts)
+        self._send_json(200, {
+            "object": "list", "model": model,
+            "data": [{"object": "embedding", "index": i, "embedding": embed_text(t, dim)} for i, t in enumerate(texts)],
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        })
+
+
+def config_models(config_path=DEFAULT_CONFIG):
+    """model_name list from the proxy config"""
+    import yaml
+    with open(config_path) as f:
+        return [entry["model_name"] for entry in (yaml.safe_load(f) or {}).get("model_list", [])]
+
+
+def write_overlay(config_path=DEFAULT_CONFIG, overlay_path=DEFAULT_OVERLAY, port=DEFAULT_PORT):
+    """Write a copy of the proxy config with every deployment pointed at the mock upstream"""
+    import yaml
+    with open(config_path) as f:
+        config = yaml.safe_load(f)
+    for entry in config.get("model_list", []):
+        params = entry.setdefault("litellm_params", {})
+        for key in ("aws_access_key_id", "aws_secret_access_key", "aws_region_name"):
+            params.pop(key, None)
+        params["model"] = f"openai/{entry['model_name']}"
+        params["api_base"] = f"http://localhost:{port}/v1"
+        params["api_key"] = "not-needed"
+        params["custom_llm_provider"] = "openai"
+    header = (
+        f"# Generated by perf/mock_upstream.py --write-overlay from {Path(config_path).name}.\n"
+        f"# Every deployment points at the mock upstream on localhost:{port}; run with:\n"
+        f"#   python perf/mock_upstream.py --port {port} &\n"
+        f"#   LITELLM_CONFIG=\"$WRAPPER_DIR/{Path(overlay_path).name}\" ./rp.sh\n"
+    )
+    with open(overlay_path, "w") as f:
+        f.write(header)
+        yaml.safe_dump(config, f, sort_keys=False)
+    return overlay_path
+
+
+def parse_dims(value):
+    """'titan=1536,bge=384' -> {'titan': 1536, 'bge': 384}"""
+    dims = {}
+    for item in filter(None, value.split(",")):
+        fragment, dim = item.split("=")
+        dims[fragment.strip().lower()] = int(dim)
+    return dims
+
+
+class MockServer(ThreadingHTTPServer):
+    # the default listen backlog (5) resets connections under benchmark concurrency
+    request_queue_size = 1024
+
+
+def make_server(settings, host="127.0.0.1", port=DEFAULT_PORT):
+    """Threaded mock server bound to host:port (port 0 picks a free port)"""
+    handler = type("ConfiguredMockHandler", (MockHandler,), {"settings": settings})
+    server = MockServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve_in_thread(settings, host="127.0.0.1", port=0):
+    """Start the mock on a background thread; returns (server, base_url)"""
+    server = make_server(settings, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic OpenAI-compatible mock upstream")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0.0, help="fixed seconds added before any output")
+    parser.add_argument("--ttft", type=float, default=0.05, help="seconds to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=100.0, help="generation rate after the first token")
+    parser.add_argument("--max-tokens", type=int, default=64, help="cap on completion length")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--embedding-dim", type=int, default=384, help="default embedding dimension")
+    parser.add_argument("--embedding-dims", type=parse_dims, default=DEFAULT_EMBEDDING_DIMS,
+                        help="per-model dimensions by name fragment, e.g. titan=1536,bge=384")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="seconds per embeddings call")
+    parser.add_argument("--embedding-item-latency", type=float, default=0.0, help="additional seconds per input text")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the error draw")
+    parser.add_argument("--swap-penalty", type=float, default=0.0,
+                        help="seconds to 'load' a model that is not currently loaded (0 disables)")
+    parser.add_argument("--loaded-models", type=int, default=1, help="models kept loaded at once")
+    parser.add_argument("--config", default=str(DEFAULT_CONFIG), help="proxy config the served model list comes from")
+    parser.add_argument("--write-overlay", nargs="?", const=str(DEFAULT_OVERLAY),
+                        help="write a proxy config pointing every model at this mock, then exit")
+    args = parser.parse_args()
+
+    if args.write_overlay:
+        print(f"Wrote {write_overlay(args.config, args.write_overlay, args.port)}")
+        return
+
+    models = config_models(args.config) if Path(args.config).exists() else []
+    settings = MockSettings(
+        latency=args.latency, ttft=args.ttft, tokens_per_s=args.tokens_per_s, max_tokens=args.max_tokens,
+        error_rate=args.error_rate, embedding_dim=args.embedding_dim, embedding_dims=args.embedding_dims,
+        embedding_latency=args.embedding_latency, embedding_item_latency=args.embedding_item_latency,
+        seed=args.seed, models=models,
+        swap_penalty=args.swap_penalty, loaded_models=args.loaded_models,
+    )
+    server = make_server(settings, args.host, args.port)
+    print(f"Mock upstream listening on http://{args.host}:{args.port}/v1 ({len(models)} models)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"\nServed {settings.requests} requests ({settings.errors} injected errors, "
+              f"{settings.swaps} model swaps)")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
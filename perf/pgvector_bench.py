@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+pgvector benchmark for Letta's archival memory searches.
+Loads 384-dim vectors (local-bge-small-en-v1-5's size) into a scratch schema of the
+letta database on the local Postgres, growing the table through --sizes, and at each
+size compares an exact sequential scan with HNSW and IVFFlat indexes built the way
+db_maintenance/letta_vector_index.py builds them. Each index is searched at several
+hnsw.ef_search / ivfflat.probes values with Letta's query: the --k nearest passages by
+cosine distance. Per variant and setting it reports:
+
+  build        index build time and size
+  latency      p50/p95/p99 of the search, timed server-side (clock_timestamp around each
+               query in a PL/pgSQL loop, so psql start-up is not in the numbers)
+  recall@k     overlap with the exact top k from NumPy brute force
+  cache        share of the index blocks the searches found in shared_buffers
+
+and ends with the memory the indexes need next to shared_buffers / maintenance_work_mem
+(live and as postgresql/postgresql.conf sets them). Vectors are synthetic clusters, or
+real embeddings from semantic_cache_sim.py's --embedding-cache file (--vectors). The
+scratch schema is dropped at the end unless --keep.
+
+The index variants only apply to a Letta build whose embedding columns are declared
+2000 dimensions or narrower. Stock Letta declares them vector(4096) and zero-pads every
+vector to that width, which pgvector cannot index (see letta_vector_index.py).
+--pad-to 4096 stores the vectors that way and times the sequential scan stock Letta
+runs; the index variants are skipped.
+
+Usage:
+    python pgvector_bench.py --sizes 10000,100000,500000
+    python pgvector_bench.py --variants hnsw:m=16:ef_construction=64,hnsw:m=32,ivfflat --ef-search 40,100,200
+    python pgvector_bench.py --vectors embeddings.npz --sizes 20000 --k 5
+    python pgvector_bench.py --pad-to 4096 --sizes 10000,50000      # stock Letta: seq scan only
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from loadgen import percentile
+from vector_index_bench import captured, normalize, synthetic
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "db_maintenance"))
+from letta_vector_index import DEFAULT_DSN, HNSW_DEFAULTS, LETTA_EMBEDDING_DIMS, MAX_INDEX_DIMS, default_lists, \
+    default_probes, index_sql, pgvector_version, print_memory, run_sql_notices  # noqa: E402
+from spend_log_partitions import format_bytes, psql, query_rows  # noqa: E402
+
+SCHEMA = "vector_bench"
+TABLE = "items"
+DEFAULT_VARIANTS = "hnsw:m=16:ef_construction=64,hnsw:m=32:ef_construction=128,ivfflat"
+COPY_BATCH = 50000
+
+# Times each query of the queries table against the items table; ids nearest first
+RUN_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION {SCHEMA}.run(k int, only_first int DEFAULT NULL)
+RETURNS TABLE (query_id int, ms float8, ids int[]) LANGUAGE plpgsql AS $$
+#variable_conflict use_column
+DECLARE
+    q record;
+    started timestamptz;
+BEGIN
+    FOR q IN SELECT id, embedding FROM {SCHEMA}.queries ORDER BY id LIMIT only_first LOOP
+        started := clock_timestamp();
+        SELECT array_agg(n.id) INTO ids
+        FROM (SELECT i.id FROM {SCHEMA}.{TABLE} i ORDER BY i.embedding <=> q.embedding LIMIT k) n;
+        ms := extract(epoch FROM clock_timestamp() - started) * 1000;
+        query_id := q.id;
+        RETURN NEXT;
+    END LOOP;
+END $$;
+"""
+
+
+def parse_variant(spec):
+    """'hnsw:m=32:ef_construction=128' / 'ivfflat:lists=500' -> (method, options)"""
+    method, *options = spec.strip().split(":")
+    method = method.lower()
+    if method not in ("hnsw", "ivfflat"):
+        raise argparse.ArgumentTypeError(f"unknown method in {spec!r} (hnsw or ivfflat)")
+    parsed = dict(HNSW_DEFAULTS) if method == "hnsw" else {}
+    for option in options:
+        name, _, value = option.partition("=")
+        if name not in (("m", "ef_construction") if method == "hnsw" else ("lists",)):
+            raise argparse.ArgumentTypeError(f"unknown option {name!r} in {spec!r}")
+        parsed[name] = int(value)
+    return method, parsed
+
+
+def label(method, options):
+    return f"{method} " + " ".join(f"{key}={value}" for key, value in options.items())
+
+
+def vector_text(vector):
+    return "[" + ",".join(f"{x:.6g}" for x in vector) + "]"
+
+
+def copy_rows(dsn, table, vectors, first_id):
+    """COPY vectors in with ids from first_id, through psql's stdin"""
+    for start in range(0, len(vectors), COPY_BATCH):
+        chunk = vectors[start:start + COPY_BATCH]
+        data = "".join(f"{first_id + start + i}\t{vector_text(v)}\n" for i, v in enumerate(chunk))
+        result = subprocess.run(psql(dsn, "-c", f"\\copy {SCHEMA}.{table} (id, embedding) FROM STDIN"),
+                                input=data, text=True, capture_output=True)
+        if result.returncode != 0:
+            sys.exit(f"COPY failed: {result.stderr.strip()}")
+
+
+def setup(dsn, dim, query_vectors):
+    run_sql_notices(dsn, f"""
+DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+CREATE SCHEMA {SCHEMA};
+CREATE TABLE {SCHEMA}.{TABLE} (id int PRIMARY KEY, embedding vector({dim}) NOT NULL);
+CREATE TABLE {SCHEMA}.queries (id int PRIMARY KEY, embedding vector({dim}) NOT NULL);
+{RUN_FUNCTION}""")
+    copy_rows(dsn, "queries", query_vectors, 0)
+
+
+def search_sql(k, setting, only_first, columns):
+    prefix = f"SET {setting[0]} = {setting[1]}; " if setting else ""
+    limit = only_first if only_first is not None else "NULL"
+    return f"{prefix}SELECT {columns} FROM {SCHEMA}.run({k}, {limit})"
+
+
+def warm_up(dsn, k, setting=None, only_first=None):
+    """One untimed pass, so the measured one runs on whatever the cache can hold"""
+    query_rows(dsn, search_sql(k, setting, only_first, "count(*)"))
+
+
+def run_queries(dsn, k, setting=None, only_first=None):
+    """[(ms, ids)] per query"""
+    rows = query_rows(dsn, search_sql(k, setting, only_first, "ms, ids") + " ORDER BY query_id")
+    return [(float(ms), [int(i) for i in ids.strip("{}").split(",") if i]) for ms, ids in rows]
+
+
+def index_cache_ratio(dsn, name, before):
+    """Share of the index's block reads served from shared_buffers since the `before` (hit, read) counters"""
+    hit, read = index_blocks(dsn, name)
+    hit, read = hit - before[0], read - before[1]
+    return hit / (hit + read) if hit + read else None
+
+
+def index_blocks(dsn, name):
+    rows = query_rows(dsn, f"SELECT coalesce(idx_blks_hit, 0), coalesce(idx_blks_read, 0) "
+                           f"FROM pg_statio_all_indexes WHERE schemaname = '{SCHEMA}' AND indexrelname = '{name}'")
+    return tuple(int(x) for x in rows[0]) if rows else (0, 0)
+
+
+def exact_top_k(data, query_vectors, k, chunk=256):
+    """Brute-force nearest k by cosine distance (the vectors are unit length)"""
+    truth = []
+    for start in range(0, len(query_vectors), chunk):
+        similarity = query_vectors[start:start + chunk] @ data.T
+        top = np.argpartition(-similarity, min(k, data.shape[0] - 1), axis=1)[:, :k]
+        order = np.take_along_axis(similarity, top, axis=1).argsort(axis=1)[:, ::-1]
+        truth.extend(np.take_along_axis(top, order, axis=1))
+    return truth
+
+
+def summarize(results, truth, k):
+    latencies = [ms for ms, _ in results]
+    recall = [len(set(ids) & set(expected.tolist())) / k for (_, ids), expected in zip(results, truth)]
+    return {"p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99), "recall": float(np.mean(recall)) if recall else None}
+
+
+def bench_size(dsn, n, data, query_vectors, args, variants):
+    """Seq scan, then each index variant at each search setting, over the first n vectors"""
+    truth = exact_top_k(data[:n], query_vectors, args.k)
+    rows = []
+    warm_up(dsn, args.k, only_first=args.exact_queries)
+    exact = run_queries(dsn, args.k, only_first=args.exact_queries)
+    rows.append({"n": n, "variant": "seq scan", "setting": "-", "build_s": 0.0, "index_bytes": 0,
+                 "cache_hit": None, **summarize(exact, truth[:len(exact)], args.k)})
+    print(f"  seq scan: p50 {rows[-1]['p50_ms']:.1f} ms", file=sys.stderr)
+    for method, options in variants:
+        options = dict(options)
+        if method == "ivfflat":
+            options.setdefault("lists", default_lists(n))
+        name = f"bench_{method}"
+        sql = (f"SET search_path = {SCHEMA}, public;\n"
+               f"SET maintenance_work_mem = '{args.maintenance_work_mem}';\n"
+               f"SET max_parallel_maintenance_workers = {args.workers};\n"
+               + index_sql(TABLE, "embedding", method, options, name=name, concurrently=False))
+        started = time.perf_counter()
+        notices = run_sql_notices(dsn, sql)
+        build = time.perf_counter() - started
+        size = int(query_rows(dsn, f"SELECT pg_relation_size('{SCHEMA}.{name}')")[0][0])
+        spilled = any("maintenance_work_mem" in notice for notice in notices)
+        print(f"  {label(method, options)}: built in {build:.1f}s, {format_bytes(size)}"
+              + (" (graph outgrew maintenance_work_mem)" if spilled else ""), file=sys.stderr)
+        if method == "hnsw":
+            settings = [("hnsw.ef_search", value) for value in args.ef_search if value >= args.k]
+        else:
+            settings = [("ivfflat.probes", value) for value in (args.probes or sorted(
+                {1, default_probes(options["lists"]), 2 * default_probes(options["lists"])}))
+                if value <= options["lists"]]
+        for setting in settings:
+            warm_up(dsn, args.k, setting)
+            before = index_blocks(dsn, name)
+            results = run_queries(dsn, args.k, setting)
+            rows.append({"n": n, "variant": label(method, options), "setting": f"{setting[0]}={setting[1]}",
+                         "build_s": build, "index_bytes": size, "spilled": spilled,
+                         "cache_hit": index_cache_ratio(dsn, name, before), **summarize(results, truth, args.k)})
+        run_sql_notices(dsn, f"DROP INDEX {SCHEMA}.{name};\n")
+    return rows
+
+
+def print_results(rows, k):
+    print(f"\npgvector search, top {k} by cosine distance")
+    print("=" * 118)
+    print(f"{'N':>8} {'variant':<32} {'setting':<20} {'build s':>8} {'index':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'recall':>7} {'cached':>7}")
+    for r in rows:
+        cached = f"{r['cache_hit'] * 100:.0f}%" if r["cache_hit"] is not None else "-"
+        recall = f"{r['recall'] * 100:.1f}%" if r["recall"] is not None else "-"
+        print(f"{r['n']:>8} {r['variant']:<32} {r['setting']:<20} {r['build_s']:>8.1f} "
+              f"{format_bytes(r['index_bytes']):>9} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{recall:>7} {cached:>7}")
+
+
+def recommend(rows, min_recall):
+    """Fastest index setting at the largest size that keeps min_recall, as an install command"""
+    largest = max(r["n"] for r in rows)
+    good = [r for r in rows if r["n"] == largest and r["variant"] != "seq scan" and r["recall"] is not None
+            and r["recall"] >= min_recall]
+    if not good:
+        print(f"\nno index setting reached {min_recall * 100:.1f}% recall at N={largest}")
+        return
+    best = min(good, key=lambda r: r["p95_ms"])
+    method, *options = best["variant"].split()
+    flags = " ".join(f"--{option.replace('_', '-').replace('=', ' ')}" for option in options)
+    name, value = best["setting"].split("=")
+    flag = "--ef-search" if name == "hnsw.ef_search" else "--probes"
+    print(f"\nfastest p95 at N={largest} with recall >= {min_recall * 100:.1f}%: {best['variant']}, {best['setting']}")
+    print(f"  python db_maintenance/letta_vector_index.py install --method {method} {flags} {flag} {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW vs IVFFlat vs seq scan for Letta's embedding searches")
+    parser.add_argument("--dsn", default=DEFAULT_DSN, help="Postgres URL (default: $LETTA_DATABASE_URL or letta)")
+    parser.add_argument("--sizes", default="10000,50000,200000", help="comma-separated table sizes, loaded in turn")
+    parser.add_argument("--dim", type=int, default=384, help="synthetic vector dimension (bge-small: 384)")
+    parser.add_argument("--vectors", help="embedding .npz from semantic_cache_sim.py --embedding-cache")
+    parser.add_argument("--pad-to", type=int, help=f"zero-pad the vectors to this width, as Letta stores them "
+                                                  f"({LETTA_EMBEDDING_DIMS}); past {MAX_INDEX_DIMS} only the "
+                                                  f"seq scan runs")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--exact-queries", type=int, default=50, help="queries timed for the seq scan baseline")
+    parser.add_argument("--k", type=int, default=10, help="passages returned per search")
+    parser.add_argument("--variants", default=DEFAULT_VARIANTS,
+                        help="comma-separated hnsw[:m=M][:ef_construction=E] | ivfflat[:lists=L]")
+    parser.add_argument("--ef-search", default="20,40,100,200", help="hnsw.ef_search values (>= k)")
+    parser.add_argument("--probes", help="ivfflat.probes values (default: 1, sqrt(lists), 2*sqrt(lists))")
+    parser.add_argument("--maintenance-work-mem", default="1GB")
+    parser.add_argument("--workers", type=int, default=2, help="max_parallel_maintenance_workers for builds")
+    parser.add_argument("--clusters", type=int, default=200, help="synthetic topic clusters")
+    parser.add_argument("--spread", type=float, default=0.8, help="synthetic within-cluster noise")
+    parser.add_argument("--min-recall", type=float, default=0.95, help="recall the recommended setting must keep")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help=f"leave the {SCHEMA} schema in place")
+    parser.add_argument("--json", help="write the result rows to this file")
+    args = parser.parse_args()
+    args.ef_search = [int(x) for x in args.ef_search.split(",")]
+    args.probes = [int(x) for x in args.probes.split(",")] if args.probes else None
+
+    variants = [parse_variant(v) for v in args.variants.split(",") if v.strip()]
+    sizes = sorted(int(x) for x in args.sizes.split(","))
+    version = pgvector_version(args.dsn)
+    if version < (0, 5) and any(method == "hnsw" for method, _ in variants):
+        sys.exit(f"HNSW needs pgvector 0.5 or later (installed: {'.'.join(map(str, version))})")
+    rng = np.random.default_rng(args.seed)
+    if args.vectors:
+        data, query_vectors = captured(args.vectors, sizes[-1], args.queries, rng)
+    else:
+        data, query_vectors, _ = synthetic(sizes[-1], args.queries, args.dim, args.clusters, args.spread,
+                                           (0.2, 1.0), 0.1, rng)
+    data, query_vectors = normalize(data), normalize(query_vectors)
+    if args.pad_to and args.pad_to > data.shape[1]:
+        # zeros change no cosine distance, only what each row stores and the scan reads
+        data = np.pad(data, ((0, 0), (0, args.pad_to - data.shape[1])))
+        query_vectors = np.pad(query_vectors, ((0, 0), (0, args.pad_to - query_vectors.shape[1])))
+    if data.shape[1] > MAX_INDEX_DIMS and variants:
+        print(f"{data.shape[1]} dims: pgvector indexes at most {MAX_INDEX_DIMS}, so only the seq scan runs",
+              file=sys.stderr)
+        variants = []
+
+    print(f"pgvector {'.'.join(map(str, version))}, {data.shape[1]} dims, sizes {sizes}", file=sys.stderr)
+    setup(args.dsn, data.shape[1], query_vectors)
+    rows, loaded = [], 0
+    try:
+        for n in sizes:
+            started = time.perf_counter()
+            copy_rows(args.dsn, TABLE, data[loaded:n], loaded)
+            loaded = n
+            run_sql_notices(args.dsn, f"VACUUM ANALYZE {SCHEMA}.{TABLE};\n")
+            table = int(query_rows(args.dsn, f"SELECT pg_total_relation_size('{SCHEMA}.{TABLE}')")[0][0])
+            print(f"N={n}: loaded in {time.perf_counter() - started:.1f}s, table {format_bytes(table)}",
+                  file=sys.stderr)
+            rows.extend(bench_size(args.dsn, n, data, query_vectors, args, variants))
+    finally:
+        if not args.keep:
+            run_sql_notices(args.dsn, f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;\n")
+
+    print_results(rows, args.k)
+    if variants:
+        recommend(rows, args.min_recall)
+    else:
+        print(f"\nno index variants: at {data.shape[1]} dims the sequential scan above is what every search costs")
+    largest = [r for r in rows if r["n"] == sizes[-1]]
+    hnsw = max((r["index_bytes"] for r in largest if r["variant"].startswith("hnsw")), default=0)
+    print_memory(args.dsn, max(r["index_bytes"] for r in largest), build_bytes=hnsw or None)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"\nwrote {os.path.abspath(args.json)}")
+
+
+if __name__ == "__main__":
+    main()
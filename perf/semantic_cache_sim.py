@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Offline semantic-cache hit-rate simulator.
+Embeds a recorded prompt corpus in batches and replays it against a simulated
+redis-semantic cache, sweeping similarity thresholds and TTLs in a single pass
+(one matrix-vector product per request shared by every threshold/TTL pair).
+--adaptive also replays litellm_hooks.adaptive_ttl's policy (initial TTL extended on
+hits, LFU eviction over --budget-mib) for comparison with the fixed TTLs.
+
+Usage:
+    python semantic_cache_sim.py --corpus requests.jsonl --embedder http://localhost:1235 \\
+        --thresholds 0.7,0.8,0.9,0.95 --ttls 60,300,3600 --embedding-cache embeddings.npz
+    python semantic_cache_sim.py --corpus requests.jsonl --embedding-cache embeddings.npz \\
+        --thresholds 0.8 --ttls 300,3600 --adaptive 60:86400 --budget-mib 256
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from loadgen import DEFAULT_CONFIG, WRAPPER_DIR, corpus_entry, read_jsonl
+
+# Rough per-entry Redis overhead (hash fields, key, dict entry) on top of vector + payload
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def prompt_text(messages):
+    """Text the semantic cache embeds: every message's content, newline joined"""
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+        parts.append(content or "")
+    return "\n".join(parts)
+
+
+def _timestamp(value, fallback):
+    if value is None:
+        return fallback
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+def load_replay(path, interval=1.0):
+    """Corpus lines -> list of {text, model, time, response}, sorted by time"""
+    records = []
+    for i, raw in enumerate(read_jsonl(path)):
+        entry = corpus_entry(raw)
+        response = raw.get("response")
+        records.append({
+            "text": prompt_text(entry["messages"]),
+            "model": entry["model"],
+            "time": _timestamp(entry.get("timestamp"), i * interval),
+            "response": json.dumps(response, sort_keys=True) if response is not None else None,
+        })
+    records.sort(key=lambda r: r["time"])
+    return records
+
+
+class HttpEmbedder:
+    """Batch embeddings through an OpenAI-compatible endpoint (mock upstream or the proxy)"""
+
+    def __init__(self, base_url, model, api_key="not-needed", batch_size=256):
+        import httpx
+        self.client = httpx.Client(base_url=base_url.rstrip("/"), timeout=600,
+                                   headers={"Authorization": f"Bearer {api_key}"})
+        self.model = model
+        self.batch_size = batch_size
+
+    def embed(self, texts):
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            response = self.client.post("/v1/embeddings", json={"model": self.model, "input": batch})
+            response.raise_for_status()
+            data = sorted(response.json()["data"], key=lambda d: d["index"])
+            vectors.extend(d["embedding"] for d in data)
+            print(f"\r  embedded {len(vectors)}/{len(texts)}", end="", flush=True)
+        print()
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class CachedEmbedder:
+    """Content-hash keyed .npz embedding file in front of another embedder (or on its own)"""
+
+    def __init__(self, path, inner=None):
+        self.path = path
+        self.inner = inner
+        self.vectors = {}
+        if os.path.exists(path):
+            with np.load(path) as data:
+                self.vectors = dict(zip(data["keys"].tolist(), data["vectors"]))
+
+    @staticmethod
+    def key(text):
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def embed(self, texts):
+        keys = [self.key(t) for t in texts]
+        missing = sorted({k: t for k, t in zip(keys, texts) if k not in self.vectors}.items())
+        if missing:
+            if self.inner is None:
+                raise SystemExit(f"{len(missing)} prompts are not in {self.path} and no --embedder was given")
+            fresh = self.inner.embed([t for _, t in missing])
+            self.vectors.update(zip((k for k, _ in missing), fresh))
+            np.savez(self.path, keys=np.array(list(self.vectors)), vectors=np.stack(list(self.vectors.values())))
+        return np.stack([self.vectors[k] for k in keys]).astype(np.float32)
+
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def entry_sizes(records, dim, response_bytes=1024):
+    """Approximate Redis bytes of each record's cache entry"""
+    return np.array([
+        dim * 4 * 2  # vector in the hash + its copy in the index
+        + len(r["text"].encode()) + (len(r["response"]) if r["response"] else response_bytes)
+        + ENTRY_OVERHEAD_BYTES
+        for r in records
+    ], dtype=np.float64)
+
+
+def classify_hit(records, i, j):
+    """exact, paraphrase, or the reason a hit served the wrong answer (model / response)"""
+    if records[j]["text"] == records[i]["text"] and records[j]["model"] == records[i]["model"]:
+        return "exact"
+    if records[j]["model"] != records[i]["model"]:
+        return "model"
+    if records[i]["response"] is not None and records[j]["response"] is not None \
+            and records[i]["response"] != records[j]["response"]:
+        return "response"
+    return "paraphrase"
+
+
+def simulate(records, embeddings, thresholds, ttls, response_bytes=1024, per_model=False, examples=5):
+    """
+    Replay records against a simulated semantic cache for every (threshold, ttl) pair at once.
+    A request hits when the most similar live entry is >= threshold; misses are stored.
+    """
+    E = normalize(embeddings)
+    n, dim = E.shape
+    times = np.array([r["time"] for r in records])
+    models = np.array([r["model"] for r in records])
+    texts = [r["text"] for r in records]
+    configs = [(th, ttl) for ttl in ttls for th in thresholds]
+    th_arr = np.array([c[0] for c in configs], dtype=np.float32)[:, None]
+    ttl_arr = np.array([c[1] for c in configs], dtype=np.float64)[:, None]
+    C = len(configs)
+
+    stored = np.zeros((C, n), dtype=bool)
+    stored_at = np.full((C, n), -np.inf)
+    hits = np.zeros(C, dtype=np.int64)
+    exact = np.zeros(C, dtype=np.int64)
+    false_hits = np.zeros(C, dtype=np.int64)
+    peak_live = np.zeros(C, dtype=np.int64)
+    peak_bytes = np.zeros(C, dtype=np.float64)
+    total_bytes = np.zeros(C, dtype=np.float64)
+    false_examples = [[] for _ in range(C)]
+    entry_bytes = entry_sizes(records, dim, response_bytes)
+    max_ttl = max(ttls)
+    window_start = 0
+
+    for i in range(n):
+        while times[i] - times[window_start] > max_ttl:
+            window_start += 1
+        lo = window_start
+        if i > lo:
+            sims = E[lo:i] @ E[i]
+            alive = stored[:, lo:i] & (times[i] - stored_at[:, lo:i] <= ttl_arr)
+            if per_model:
+                alive &= (models[lo:i] == models[i])[None, :]
+            masked = np.where(alive, sims[None, :], -np.inf)
+            best = masked.argmax(axis=1)
+            best_sim = masked[np.arange(C), best]
+            is_hit = best_sim >= th_arr[:, 0]
+            live_counts = alive.sum(axis=1)
+            live_bytes = (alive * entry_bytes[lo:i][None, :]).sum(axis=1)
+        else:
+            is_hit = np.zeros(C, dtype=bool)
+            live_counts = np.zeros(C, dtype=np.int64)
+            live_bytes = np.zeros(C)
+
+        peak_live = np.maximum(peak_live, live_counts + ~is_hit)
+        peak_bytes = np.maximum(peak_bytes, live_bytes + (~is_hit) * entry_bytes[i])
+        total_bytes += live_bytes
+        for c in np.nonzero(is_hit)[0]:
+            j = lo + best[c]
+            hits[c] += 1
+            kind = classify_hit(records, i, j)
+            if kind == "exact":
+                exact[c] += 1
+            elif kind != "paraphrase":
+                false_hits[c] += 1
+                if len(false_examples[c]) < examples:
+                    false_examples[c].append((float(best_sim[c]), i, j, kind))
+        miss = ~is_hit
+        stored[miss, i] = True
+        stored_at[miss, i] = times[i]
+
+    return [{
+        "threshold": th,
+        "ttl": ttl,
+        "requests": n,
+        "hits": int(hits[c]),
+        "hit_rate": hits[c] / n if n else 0.0,
+        "exact_hits": int(exact[c]),
+        "paraphrase_hits": int(hits[c] - exact[c] - false_hits[c]),
+        "false_hits": int(false_hits[c]),
+        "peak_entries": int(peak_live[c]),
+        "peak_bytes": float(peak_bytes[c]),
+        "mean_bytes": float(total_bytes[c] / n) if n else 0.0,
+        "false_examples": [
+            {"similarity": s, "query": texts[i][:120], "matched": texts[j][:120],
+             "query_model": str(models[i]), "matched_model": str(models[j]), "reason": reason}
+            for s, i, j, reason in false_examples[c]
+        ],
+    } for c, (th, ttl) in enumerate(configs)]
+
+
+def simulate_adaptive(records, embeddings, thresholds, policy, max_bytes=None, response_bytes=1024,
+                      per_model=False):
+    """
+    Replay records against adaptive_ttl's policy, one threshold at a time: a miss is stored
+    for policy.ttl(0), each hit extends its entry to policy.ttl(hits), and over max_bytes
+    the lowest LFU-with-aging score is evicted down to 95% (as the hook's Lua scripts do).
+    """
+    E = normalize(embeddings)
+    n, dim = E.shape
+    times = np.array([r["time"] for r in records])
+    models = np.array([r["model"] for r in records])
+    entry_bytes = entry_sizes(records, dim, response_bytes)
+    results = []
+    for threshold in thresholds:
+        expires = np.full(n, -np.inf)
+        entry_hits = np.zeros(n, dtype=np.int64)
+        score = np.zeros(n)
+        live = np.zeros(0, dtype=np.int64)
+        age = 0.0
+        counts = {"hits": 0, "exact": 0, "false": 0, "extensions": 0, "expirations": 0, "evictions": 0}
+        peak_live = peak_bytes = total_bytes = 0.0
+        for i in range(n):
+            now = times[i]
+            still = expires[live] > now
+            counts["expirations"] += int((~still).sum())
+            live = live[still]
+            best = -1
+            if len(live):
+                candidates = live[models[live] == models[i]] if per_model else live
+                if len(candidates):
+                    sims = E[candidates] @ E[i]
+                    k = int(sims.argmax())
+                    if sims[k] >= threshold:
+                        best = int(candidates[k])
+            if best >= 0:
+                counts["hits"] += 1
+                kind = classify_hit(records, i, best)
+                counts["exact"] += kind == "exact"
+                counts["false"] += kind not in ("exact", "paraphrase")
+                entry_hits[best] += 1
+                score[best] += 1
+                extended = now + policy.ttl(entry_hits[best])
+                if extended > expires[best]:
+                    expires[best] = extended
+                    counts["extensions"] += 1
+            else:
+                expires[i] = now + policy.ttl(0)
+                score[i] = age + 1
+                live = np.append(live, i)
+                if max_bytes and entry_bytes[live].sum() > max_bytes:
+                    order = live[np.lexsort((live, score[live]))]
+                    cumulative = entry_bytes[live].sum() - np.cumsum(entry_bytes[order])
+                    cut = int(np.searchsorted(-cumulative, -max_bytes * 0.95)) + 1
+                    evicted = order[:cut]
+                    age = float(score[evicted[-1]])
+                    expires[evicted] = -np.inf
+                    live = live[expires[live] > now]
+                    counts["evictions"] += len(evicted)
+            live_bytes = entry_bytes[live].sum()
+            peak_live = max(peak_live, len(live))
+            peak_bytes = max(peak_bytes, live_bytes)
+            total_bytes += live_bytes
+        results.append({
+            "threshold": threshold,
+            "ttl": f"{policy.initial_ttl}..{policy.max_ttl}",
+            "requests": n,
+            "hits": counts["hits"],
+            "hit_rate": counts["hits"] / n if n else 0.0,
+            "exact_hits": counts["exact"],
+            "paraphrase_hits": counts["hits"] - counts["exact"] - counts["false"],
+            "false_hits": counts["false"],
+            "peak_entries": int(peak_live),
+            "peak_bytes": float(peak_bytes),
+            "mean_bytes": total_bytes / n if n else 0.0,
+            "extensions": counts["extensions"],
+            "expirations": counts["expirations"],
+            "evictions": counts["evictions"],
+            "false_examples": [],
+        })
+    return results
+
+
+def cache_params(config_path=DEFAULT_CONFIG):
+    """(similarity_threshold, ttl) from the proxy config's cache_params"""
+    try:
+        import yaml
+        with open(config_path) as f:
+            params = (yaml.safe_load(f).get("litellm_settings") or {}).get("cache_params") or {}
+        return params.get("similarity_threshold"), params.get("ttl")
+    except (ImportError, OSError):
+        return None, None
+
+
+def print_results(results, configured=(None, None)):
+    print(f"\n{'threshold':>9} {'ttl':>12} {'hit%':>7} {'exact':>7} {'para':>7} {'false':>7} "
+          f"{'peak n':>8} {'peak MiB':>9} {'mean MiB':>9}")
+    for r in results:
+        mark = " <- config" if (r["threshold"], r["ttl"]) == configured else ""
+        if "evictions" in r:
+            mark = f" adaptive: {r['extensions']} extensions, {r['evictions']} evictions"
+        print(f"{r['threshold']:>9.3f} {r['ttl']:>12} {r['hit_rate'] * 100:>6.1f}% {r['exact_hits']:>7} "
+              f"{r['paraphrase_hits']:>7} {r['false_hits']:>7} {r['peak_entries']:>8} "
+              f"{r['peak_bytes'] / 2**20:>9.2f} {r['mean_bytes'] / 2**20:>9.2f}{mark}")
+    shown = set()
+    for r in results:
+        if not r["false_examples"] or r["threshold"] in shown:
+            continue
+        shown.add(r["threshold"])
+        print(f"\nFalse-hit examples at threshold {r['threshold']} (ttl {r['ttl']}):")
+        for ex in r["false_examples"]:
+            print(f"  sim={ex['similarity']:.3f} [{ex['reason']}] {ex['query_model']} -> {ex['matched_model']}")
+            print(f"    query:   {ex['query']!r}")
+            print(f"    matched: {ex['matched']!r}")
+
+
+def _floats(value):
+    return [float(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline semantic-cache hit-rate simulator")
+    parser.add_argument("--corpus", required=True, help="JSONL corpus (messages/prompt, optional model/timestamp/response)")
+    parser.add_argument("--embedder", help="OpenAI-compatible base URL to embed with (mock upstream or proxy)")
+    parser.add_argument("--embedding-model", default="bedrock/amazon.titan-embed-text-v1")
+    parser.add_argument("--api-key", default=os.environ.get("LITELLM_API_KEY", "not-needed"))
+    parser.add_argument("--embedding-cache", help=".npz file of content-hash keyed vectors (read and updated)")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--thresholds", type=_floats, default=[0.7, 0.75, 0.8, 0.85, 0.9, 0.95])
+    parser.add_argument("--ttls", type=_floats, default=[60, 300, 900, 3600])
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between requests without timestamps")
+    parser.add_argument("--response-bytes", type=int, default=1024, help="cached payload size when no response is recorded")
+    parser.add_argument("--per-model", action="store_true", help="only match entries of the same model")
+    parser.add_argument("--adaptive", help="also replay adaptive_ttl with INITIAL:MAX[:GROWTH] seconds")
+    parser.add_argument("--budget-mib", type=float, help="adaptive_ttl max_bytes, in MiB (default: unbounded)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if not args.embedder and not args.embedding_cache:
+        parser.error("need --embedder and/or --embedding-cache")
+    embedder = HttpEmbedder(args.embedder, args.embedding_model, args.api_key, args.batch_size) if args.embedder else None
+    if args.embedding_cache:
+        embedder = CachedEmbedder(args.embedding_cache, embedder)
+
+    records = load_replay(args.corpus, args.interval)
+    if not records:
+        print(f"Corpus {args.corpus} is empty")
+        sys.exit(1)
+    print("Semantic Cache Hit-Rate Simulation")
+    print("=" * 70)
+    print(f"Embedding {len(records)} prompts...")
+    embeddings = embedder.embed([r["text"] for r in records])
+    print(f"Replaying against {len(args.thresholds)} thresholds x {len(args.ttls)} TTLs "
+          f"(dim {embeddings.shape[1]})...")
+    ttls = [int(t) if float(t).is_integer() else t for t in args.ttls]
+    results = simulate(records, embeddings, args.thresholds, ttls, args.response_bytes, args.per_model)
+    if args.adaptive:
+        sys.path.insert(0, str(WRAPPER_DIR))
+        from litellm_hooks.adaptive_ttl import DEFAULT_GROWTH, AdaptiveTTLPolicy  # needs litellm
+        initial, maximum, *growth = (float(v) for v in args.adaptive.split(":"))
+        policy = AdaptiveTTLPolicy(int(initial), int(maximum), growth[0] if growth else DEFAULT_GROWTH)
+        max_bytes = args.budget_mib * 2**20 if args.budget_mib else None
+        results += simulate_adaptive(records, embeddings, args.thresholds, policy, max_bytes,
+                                     args.response_bytes, args.per_model)
+    print_results(results, cache_params())
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
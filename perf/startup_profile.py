@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Proxy cold start, import time and memory by config variant.
+Launches the proxy (python -X importtime -m litellm.proxy.proxy_cli, as rp.sh would with
+the same config) once per variant and run, samples the RSS (and USS where available) of
+its process tree every --interval until the first request has been served, and reports:
+
+- seconds to the first successful health check and to the first served request
+- RSS/USS once the first request is served, and the peak over --settle seconds after it
+- import time by top-level package (self time from -X importtime; stdlib grouped)
+
+Variants are the configs given with --config, plus --toggles derived from the first
+one, so the table shows what each feature costs on its own:
+
+    no-ui         DISABLE_ADMIN_UI=True
+    no-db         no database_url / DATABASE_URL (no Prisma client, no spend logs)
+    no-cache      no litellm_settings.cache (no redis-semantic cache)
+    no-bedrock    no bedrock/ deployments (no boto3)
+    no-callbacks  no litellm_settings.callbacks (no litellm_hooks)
+
+Toggles combine with "+", e.g. no-ui+no-db+no-cache. Run against the mock upstream so
+the first request does not depend on LM Studio or the cloud:
+
+Usage:
+    python mock_upstream.py --port 1235 &
+    python startup_profile.py --config ../proxy_server_config-mock.yaml \\
+        --toggles no-ui,no-db,no-cache,no-callbacks,no-ui+no-db+no-cache+no-callbacks --runs 3
+    python startup_profile.py --config a.yaml --config b.yaml --json startup.json
+    python startup_profile.py --load startup.json --config ../proxy_server_config-mock.yaml
+"""
+
+import argparse
+import copy
+import json
+import os
+import re
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+from loadgen import DEFAULT_API_KEY, DEFAULT_MODEL, WRAPPER_DIR, auth_headers
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)")
+STDLIB = frozenset(sys.stdlib_module_names)
+
+
+def without_ui(config, env):
+    env["DISABLE_ADMIN_UI"] = "True"
+
+
+def without_db(config, env):
+    general = config.get("general_settings") or {}
+    for key in ("database_url", "store_model_in_db", "store_prompts_in_spend_logs", "database_connection_pool_limit"):
+        general.pop(key, None)
+    env.pop("DATABASE_URL", None)
+
+
+def without_cache(config, env):
+    settings = config.get("litellm_settings") or {}
+    settings.pop("cache", None)
+    settings.pop("cache_params", None)
+
+
+def without_bedrock(config, env):
+    config["model_list"] = [entry for entry in config.get("model_list") or []
+                            if not str((entry.get("litellm_params") or {}).get("model", "")).startswith("bedrock/")]
+
+
+def without_callbacks(config, env):
+    (config.get("litellm_settings") or {}).pop("callbacks", None)
+
+
+TOGGLES = {
+    "no-ui": without_ui,
+    "no-db": without_db,
+    "no-cache": without_cache,
+    "no-bedrock": without_bedrock,
+    "no-callbacks": without_callbacks,
+}
+
+
+def proxy_env(config_path):
+    """The environment rp.sh gives the proxy"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, (str(WRAPPER_DIR), env.get("PYTHONPATH"))))
+    env["LITELLM_CONFIG"] = str(config_path)
+    env["EXPERIMENTAL_MULTI_INSTANCE_RATE_LIMITING"] = "True"
+    return env
+
+
+def variants(configs, toggles, workdir):
+    """[(name, config path, env)]: each config as is, then each toggle applied to the first"""
+    result = [(Path(path).stem, Path(path).resolve(), proxy_env(Path(path).resolve())) for path in configs]
+    if toggles:
+        if yaml is None:
+            sys.exit("--toggles needs PyYAML")
+        base_path = result[0][1]
+        base = yaml.safe_load(base_path.read_text()) or {}
+        for name in toggles:
+            config, env = copy.deepcopy(base), proxy_env(base_path)
+            for toggle in name.split("+"):
+                if toggle not in TOGGLES:
+                    sys.exit(f"unknown toggle {toggle!r} (known: {', '.join(TOGGLES)})")
+                TOGGLES[toggle](config, env)
+            path = Path(workdir) / f"{base_path.stem}.{name}.yaml"
+            path.write_text(yaml.safe_dump(config, sort_keys=False))
+            env["LITELLM_CONFIG"] = str(path)
+            result.append((name, path, env))
+    return result
+
+
+# --- memory -----------------------------------------------------------------------------------------------
+
+def process_tree(pid):
+    """pid and its descendants, and each one's RSS in bytes, from ps (macOS and Linux)"""
+    output = subprocess.run(["ps", "-A", "-o", "pid=,ppid=,rss="], capture_output=True, text=True).stdout
+    children, rss = defaultdict(list), {}
+    for line in output.splitlines():
+        child, parent, kb = (int(field) for field in line.split())
+        children[parent].append(child)
+        rss[child] = kb * 1024
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending += children.get(current, [])
+    return tree, rss
+
+
+def proc_uss(pids):
+    """Private (unshared) bytes from /proc/<pid>/smaps_rollup; None where /proc does not exist"""
+    total = 0
+    for pid in pids:
+        try:
+            text = Path(f"/proc/{pid}/smaps_rollup").read_text()
+        except OSError:
+            return None
+        total += sum(int(line.split()[1]) for line in text.splitlines()
+                     if line.startswith(("Private_Clean:", "Private_Dirty:"))) * 1024
+    return total
+
+
+def tree_memory(pid):
+    """(RSS, USS or None) of a process and its children (uvicorn workers)"""
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return 0, None
+        rss, uss = 0, 0
+        for process in processes:
+            try:
+                info = process.memory_full_info()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            rss += info.rss
+            uss = uss + info.uss if uss is not None and hasattr(info, "uss") else None
+        return rss, uss
+    tree, rss = process_tree(pid)
+    return sum(rss.get(p, 0) for p in tree), proc_uss(tree)
+
+
+# --- one run ----------------------------------------------------------------------------------------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_times(stderr_text):
+    """Self import time in seconds by top-level package (stdlib modules grouped)"""
+    totals = defaultdict(float)
+    for line in stderr_text.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            top = match.group(3).split(".")[0]
+            totals["(stdlib)" if top in STDLIB else top] += int(match.group(1)) / 1e6
+    return dict(totals)
+
+
+def stop(process):
+    """SIGTERM the proxy's process group, SIGKILL after 10s"""
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+    except ProcessLookupError:
+        pass
+
+
+def profile_once(args, config_path, env):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    command = [args.python, "-X", "importtime", "-m", "litellm.proxy.proxy_cli",
+               "--config", str(config_path), "--host", "127.0.0.1", "--port", str(port), *args.proxy_args]
+    with tempfile.TemporaryFile("w+") as stderr:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=args.cwd, env=env, stdout=subprocess.DEVNULL, stderr=stderr,
+                                   start_new_session=True)
+        samples = []  # (seconds, rss, uss)
+        ready = served = None
+        served_memory = (0, None)
+        headers = auth_headers(args.api_key)
+        body = {"model": args.model, "messages": [{"role": "user", "content": "startup probe"}], "max_tokens": 5}
+        try:
+            with httpx.Client(base_url=base_url, headers=headers, timeout=30) as client:
+                while True:
+                    now = time.perf_counter() - start
+                    samples.append((now, *tree_memory(process.pid)))
+                    if process.poll() is not None:
+                        stderr.seek(0)
+                        tail = "\n".join(stderr.read().splitlines()[-20:])
+                        raise RuntimeError(f"proxy exited with {process.returncode}:\n{tail}")
+                    if served is not None and now >= served + args.settle:
+                        break
+                    if now > args.timeout:
+                        raise RuntimeError(f"no served request within {args.timeout}s")
+                    try:
+                        if ready is None and client.get(args.health_path).status_code == 200:
+                            ready = time.perf_counter() - start
+                        if ready is not None and served is None:
+                            if args.model is None or client.post("/v1/chat/completions", json=body).status_code == 200:
+                                served = time.perf_counter() - start
+                                served_memory = tree_memory(process.pid)
+                    except httpx.HTTPError:
+                        pass
+                    time.sleep(args.interval)
+        finally:
+            stop(process)
+        stderr.seek(0)
+        imports = import_times(stderr.read())
+    return {
+        "ready_s": ready,
+        "served_s": served,
+        "rss_served": served_memory[0],
+        "uss_served": served_memory[1],
+        "rss_peak": max(rss for _, rss, _ in samples),
+        "import_s": sum(imports.values()),
+        "imports": imports,
+        "samples": samples,
+    }
+
+
+def median_run(runs):
+    """Per-field median over runs (import times per package)"""
+    result = {}
+    for key in ("ready_s", "served_s", "rss_served", "uss_served", "rss_peak", "import_s"):
+        values = [run[key] for run in runs if run[key] is not None]
+        result[key] = statistics.median(values) if values else None
+    packages = {package for run in runs for package in run["imports"]}
+    result["imports"] = {package: statistics.median(run["imports"].get(package, 0.0) for run in runs)
+                         for package in packages}
+    result["samples"] = runs[-1]["samples"]
+    return result
+
+
+# --- report -----------------------------------------------------------------------------------------------
+
+def mib(value):
+    return "-" if value is None else f"{value / 1048576:.0f}MiB"
+
+
+def seconds(value):
+    return "-" if value is None else f"{value:.2f}s"
+
+
+def delta(value, base, unit):
+    if value is None or base is None:
+        return "-"
+    change = value - base
+    return f"{change / 1048576:+.0f}MiB" if unit == "bytes" else f"{change:+.2f}s"
+
+
+COLUMNS = (("ready", "ready_s", "s"), ("served", "served_s", "s"), ("RSS", "rss_served", "bytes"),
+           ("USS", "uss_served", "bytes"), ("peak RSS", "rss_peak", "bytes"), ("imports", "import_s", "s"))
+
+
+def report(results, top):
+    names = list(results)
+    width = max(12, *(len(name) for name in names)) + 2
+    print(f"{'variant':<{width}}" + "".join(f"{label:>11}" for label, _, _ in COLUMNS))
+    for name in names:
+        print(f"{name:<{width}}" + "".join(
+            f"{(mib if unit == 'bytes' else seconds)(results[name][key]):>11}" for _, key, unit in COLUMNS))
+    base_name = names[0]
+    base = results[base_name]
+    if len(names) > 1:
+        print(f"\nDifference from {base_name}")
+        for name in names[1:]:
+            print(f"{name:<{width}}" + "".join(
+                f"{delta(results[name][key], base[key], unit):>11}" for _, key, unit in COLUMNS))
+
+    packages = sorted({package for result in results.values() for package in result["imports"]},
+                      key=lambda package: -max(result["imports"].get(package, 0.0) for result in results.values()))
+    print(f"\nImport time by package (ms, self time; top {top})")
+    column = max(10, *(len(name) for name in names)) + 1
+    print(f"{'package':<28}" + "".join(f"{name[:column - 1]:>{column}}" for name in names))
+    for package in packages[:top]:
+        print(f"{package[:27]:<28}" + "".join(
+            f"{results[name]['imports'].get(package, 0.0) * 1000:>{column}.0f}" for name in names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proxy cold start, import time and memory by config variant")
+    parser.add_argument("--config", action="append", default=[], help="proxy config (repeat for more variants)")
+    parser.add_argument("--toggles", default="", help=f"variants derived from the first config: {', '.join(TOGGLES)}"
+                                                      " (comma-separated; '+' combines)")
+    parser.add_argument("--runs", type=int, default=1, help="runs per variant (the median is reported)")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="model for the first request ('' to stop at ready)")
+    parser.add_argument("--api-key", default=DEFAULT_API_KEY)
+    parser.add_argument("--health-path", default="/health/readiness",
+                        help="polled until 200 (/health also checks every deployment)")
+    parser.add_argument("--python", default=None, help="interpreter with litellm (default: $LITELLM_DIR/.venv)")
+    parser.add_argument("--interval", type=float, default=0.1, help="seconds between polls and memory samples")
+    parser.add_argument("--settle", type=float, default=2.0, help="seconds sampled after the first request")
+    parser.add_argument("--timeout", type=float, default=180.0)
+    parser.add_argument("--top", type=int, default=25, help="packages shown in the import table")
+    parser.add_argument("--json", help="write the results (with memory samples) to this file")
+    parser.add_argument("--load", action="append", default=[], help="earlier --json results to compare against")
+    parser.add_argument("proxy_args", nargs="*", help="extra proxy_cli arguments, after --")
+    args = parser.parse_args()
+    args.model = args.model or None
+
+    litellm_dir = os.environ.get("LITELLM_DIR")
+    venv_python = Path(litellm_dir or "", ".venv", "bin", "python")
+    args.python = args.python or (str(venv_python) if litellm_dir and venv_python.exists() else sys.executable)
+    args.cwd = litellm_dir if litellm_dir and Path(litellm_dir).is_dir() else str(WRAPPER_DIR)
+
+    results = {}
+    for path in args.load:
+        for name, result in json.loads(Path(path).read_text()).items():
+            results[f"{Path(path).stem}:{name}"] = result
+    if not args.config and not results:
+        args.config = [str(WRAPPER_DIR / "proxy_server_config-mock.yaml")]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, config_path, env in variants(args.config, [t for t in args.toggles.split(",") if t], workdir):
+            runs = []
+            for run in range(args.runs):
+                print(f"{name}: run {run + 1}/{args.runs} ...", file=sys.stderr)
+                try:
+                    runs.append(profile_once(args, config_path, env))
+                except RuntimeError as e:
+                    print(f"{name}: {e}", file=sys.stderr)
+            if runs:
+                results[name] = median_run(runs)
+
+    if not results:
+        sys.exit("no variant started")
+    print(f"Proxy startup ({args.python}, {args.runs} run(s) per variant, "
+          f"{'psutil' if psutil else 'ps'} memory sampling)")
+    print("=" * 90)
+    report(results, args.top)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=1))
+
+
+if __name__ == "__main__":
+    main()
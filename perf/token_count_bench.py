@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Per-request tokenization time on a replayed agent session.
+Builds a multi-turn session that grows to --tokens prompt tokens (system prompt,
+user turns, tool calls and large tool results), then replays it request by
+request the way an agent client resends its whole history. Each request is
+counted with the stock litellm.token_counter, with litellm_hooks.token_counts
+(new messages tokenized inline), and with the hook's pre-count (new messages
+tokenized in a worker thread, so only the cached lookup runs on the event loop).
+Counts are checked to be identical.
+
+Usage:
+    python token_count_bench.py --tokens 260000 --model gpt-4o
+    python token_count_bench.py --session session.json   # {"messages": [...]} from a real agent
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from loadgen import percentile
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import litellm  # noqa: E402
+
+STOCK_TOKEN_COUNTER = litellm.token_counter  # importing the hook module installs the memoized one
+from litellm_hooks.token_counts import TokenCountCache, memoized_token_counter  # noqa: E402
+
+
+
+def synthetic_session(target_tokens, seed=7):
+    """
+    A growing agent conversation of roughly target_tokens prompt tokens. Text is cut
+    from the Python standard library sources (code and docs tokenize like real tool
+    results; randomly drawn words from a small vocabulary would make BPE look cheap).
+    """
+    rng = random.Random(seed)
+    corpus = "".join(path.read_text(errors="replace") for path in sorted(Path(os.__file__).parent.glob("*.py")))
+    position = 0
+
+    def text(tokens):
+        nonlocal position
+        chars = int(tokens * 4.2)
+        if position + chars > len(corpus):
+            position = 0
+        position += chars
+        return corpus[position - chars:position]
+
+    messages = [{"role": "system", "content": text(1500)}]
+    tokens = 1500
+    turn = 0
+    while tokens < target_tokens:
+        turn += 1
+        result_tokens = rng.choice((200, 800, 3000))
+        messages += [
+            {"role": "user", "content": text(rng.randint(20, 120))},
+            {"role": "assistant", "content": None, "tool_calls": [{
+                "id": f"call_{turn}", "type": "function",
+                "function": {"name": "archival_memory_search", "arguments": json.dumps({"query": text(8)})}}]},
+            {"role": "tool", "tool_call_id": f"call_{turn}", "content": text(result_tokens)},
+            {"role": "assistant", "content": text(rng.randint(50, 300))},
+        ]
+        tokens += result_tokens + 250
+    return messages
+
+
+def request_points(messages):
+    """Request boundaries: the history up to and including each user turn"""
+    return [i + 1 for i, m in enumerate(messages) if m.get("role") == "user"]
+
+
+def replay(messages, count, precount=None):
+    """Per-request seconds spent in token_counter on the caller's thread, and the counts"""
+    seconds, counts = [], []
+    for end in request_points(messages):
+        request = messages[:end]
+        if precount is not None:
+            precount(request)
+        start = time.perf_counter()
+        counts.append(count(model=replay.model, messages=request))
+        seconds.append(time.perf_counter() - start)
+    return seconds, counts
+
+
+def report(label, seconds):
+    print(f"{label:<22} total {sum(seconds):>7.3f}s  mean {sum(seconds) / len(seconds) * 1000:>8.2f}ms  "
+          f"p95 {percentile(seconds, 95) * 1000:>8.2f}ms  last {seconds[-1] * 1000:>8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request tokenization time on a replayed agent session")
+    parser.add_argument("--tokens", type=int, default=260000, help="synthetic session size in prompt tokens")
+    parser.add_argument("--session", help='JSON file with {"messages": [...]} to replay instead')
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.session:
+        messages = json.loads(Path(args.session).read_text())["messages"]
+    else:
+        messages = synthetic_session(args.tokens)
+    original = STOCK_TOKEN_COUNTER
+    replay.model = args.model
+    requests = request_points(messages)
+    print(f"{len(requests)} requests, {len(messages)} messages, "
+          f"{original(model=args.model, messages=messages)} tokens in the last request ({args.model})")
+    print("=" * 90)
+
+    baseline, expected = replay(messages, original)
+    report("stock", baseline)
+
+    cache = TokenCountCache(original)
+    inline, counts = replay(messages, memoized_token_counter(cache))
+    assert counts == expected, "memoized counts differ from litellm.token_counter"
+    report("memoized", inline)
+
+    cache = TokenCountCache(original)
+    pool = ThreadPoolExecutor(args.workers)
+
+    def precount(request):
+        async def warm():
+            await asyncio.get_running_loop().run_in_executor(pool, cache.warm, args.model, request)
+        asyncio.run(warm())
+
+    on_loop, counts = replay(messages, memoized_token_counter(cache), precount)
+    assert counts == expected, "pre-counted counts differ from litellm.token_counter"
+    report("memoized + pre-count", on_loop)
+    print(f"{'':<22} on-loop time only; {cache.stats()['entries']} cached messages")
+
+    print(f"\nPer-request speedup (mean): memoized {sum(baseline) / sum(inline):.1f}x, "
+          f"on-loop with pre-count {sum(baseline) / sum(on_loop):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Vector index benchmark for the redis-semantic cache.
+Loads the same N vectors into one RediSearch index per variant (FLAT or HNSW with
+its M / EF_CONSTRUCTION / EF_RUNTIME / EPSILON, FLOAT32 or FLOAT16) on a local
+redis-stack, then runs the lookup the cache runs: a VECTOR_RANGE query at the
+configured similarity_threshold, filtered on the litellm_cache_key scope tag,
+nearest first. Reports build time, index memory, query latency percentiles, and
+recall against brute force in NumPy:
+
+  recall@1     queries with a match within the threshold that got the true nearest
+  lost hits    queries that have a match but the index returned none (cache misses it
+               should not have)
+  flipped      hit/miss decision differs from brute force either way (FLOAT16 rounding
+               can move a distance across the threshold)
+
+The range query searches HNSW with EPSILON, not EF_RUNTIME (that one only applies to
+KNN queries, --query knn). Vectors are synthetic clusters at --dim (Titan is 1536),
+or real prompt embeddings from semantic_cache_sim.py's --embedding-cache file.
+The fastest variant within --min-recall is printed as vector_index_params for the
+proxy config (litellm_hooks.vector_index creates the cache index with them).
+
+Usage:
+    python vector_index_bench.py --n 10000,100000 --queries 1000
+    python vector_index_bench.py --vectors embeddings.npz --variants flat,hnsw:m=16,hnsw:m=32:epsilon=0.05
+    python vector_index_bench.py --query knn --variants hnsw:ef_runtime=10,hnsw:ef_runtime=100
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from loadgen import DEFAULT_CONFIG, percentile
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "debugging_redis"))
+from redis_cache_inspector import format_bytes, get_connection  # noqa: E402
+from redis_memory_profiler import get_index_info  # noqa: E402
+
+INDEX_PREFIX = "vecbench"
+VECTOR_FIELD = "prompt_vector"
+SCOPE_FIELD = "litellm_cache_key"
+DTYPES = {"float32": np.float32, "float16": np.float16}
+HNSW_DEFAULTS = {"m": 16, "ef_construction": 200, "ef_runtime": 10, "epsilon": 0.01}
+DEFAULT_VARIANTS = ("flat,hnsw:m=16,hnsw:m=32,hnsw:m=16:epsilon=0.05,hnsw:m=32:ef_construction=400")
+LOAD_BATCH = 1000
+
+
+def parse_variant(spec):
+    """'hnsw:m=32:epsilon=0.05' -> {'algorithm': 'hnsw', 'm': 32, ...} (HNSW defaults filled in)"""
+    algorithm, *options = spec.strip().split(":")
+    algorithm = algorithm.lower()
+    if algorithm not in ("flat", "hnsw"):
+        raise argparse.ArgumentTypeError(f"unknown algorithm in {spec!r} (flat or hnsw)")
+    variant = {"algorithm": algorithm, **(HNSW_DEFAULTS if algorithm == "hnsw" else {})}
+    for option in options:
+        name, _, value = option.partition("=")
+        if name not in HNSW_DEFAULTS or algorithm != "hnsw":
+            raise argparse.ArgumentTypeError(f"unknown option {name!r} in {spec!r}")
+        variant[name] = float(value) if name == "epsilon" else int(value)
+    return variant
+
+
+def variant_label(variant, dtype):
+    if variant["algorithm"] == "flat":
+        return f"FLAT {dtype}"
+    return (f"HNSW {dtype} M={variant['m']} efC={variant['ef_construction']} "
+            f"efR={variant['ef_runtime']} eps={variant['epsilon']:g}")
+
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def synthetic(n, queries, dim, clusters, spread, query_noise, novel, rng):
+    """
+    Clustered unit vectors, and queries that are noisy copies of stored vectors (similarity
+    spread across the threshold) or, for a `novel` fraction, points near no stored vector.
+    Also returns each query's source vector, whose scope the query is asked in.
+    """
+    centers = normalize(rng.standard_normal((clusters, dim)))
+    data = normalize(centers[rng.integers(clusters, size=n)] + spread * rng.standard_normal((n, dim)) / np.sqrt(dim))
+    sources = rng.integers(n, size=queries)
+    noise = rng.uniform(*query_noise, size=(queries, 1))
+    query_vectors = normalize(data[sources] + noise * rng.standard_normal((queries, dim)) / np.sqrt(dim))
+    fresh = rng.random(queries) < novel
+    query_vectors[fresh] = normalize(rng.standard_normal((int(fresh.sum()), dim)))
+    return data.astype(np.float32), query_vectors.astype(np.float32), sources
+
+
+def captured(path, n, queries, rng):
+    """Stored and held-out query vectors from a semantic_cache_sim.py --embedding-cache file"""
+    with np.load(path) as f:
+        vectors = normalize(f["vectors"].astype(np.float32))
+    vectors = vectors[rng.permutation(len(vectors))]
+    if len(vectors) < n + queries:
+        sys.exit(f"{path} holds {len(vectors)} vectors; --n {n} plus --queries {queries} needs more")
+    return vectors[:n], vectors[n:n + queries]
+
+
+def ground_truth(data, scopes, query_vectors, query_scopes, max_distance):
+    """Brute-force nearest stored vector in the query's scope: (index or -1 when beyond max_distance, distance)"""
+    nearest = np.full(len(query_vectors), -1)
+    distances = np.full(len(query_vectors), np.inf)
+    for scope in np.unique(query_scopes):
+        members = np.flatnonzero(scopes == scope)
+        asking = np.flatnonzero(query_scopes == scope)
+        if not len(members):
+            continue
+        similarity = query_vectors[asking] @ data[members].T
+        best = similarity.argmax(axis=1)
+        distances[asking] = 1.0 - similarity[np.arange(len(asking)), best]
+        nearest[asking] = np.where(distances[asking] <= max_distance, members[best], -1)
+    return nearest, distances
+
+
+def create_index(conn, name, variant, dtype, dim):
+    attributes = ["TYPE", dtype.upper(), "DIM", dim, "DISTANCE_METRIC", "COSINE"]
+    if variant["algorithm"] == "hnsw":
+        attributes += ["M", variant["m"], "EF_CONSTRUCTION", variant["ef_construction"],
+                       "EF_RUNTIME", variant["ef_runtime"], "EPSILON", variant["epsilon"]]
+    conn.execute_command("FT.CREATE", name, "ON", "HASH", "PREFIX", 1, f"{name}:", "SCHEMA",
+                         SCOPE_FIELD, "TAG", VECTOR_FIELD, "VECTOR", variant["algorithm"].upper(),
+                         len(attributes), *attributes)
+
+
+def wait_indexed(conn, name, timeout=3600):
+    """Block until the background indexer has caught up with the loaded hashes"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        info = conn.execute_command("FT.INFO", name)
+        fields = {info[i].decode() if isinstance(info[i], bytes) else info[i]: info[i + 1]
+                  for i in range(0, len(info) - 1, 2)}
+        if int(fields.get("indexing", 0)) == 0 and float(fields.get("percent_indexed", 1)) >= 1:
+            return
+        time.sleep(0.05)
+    raise RuntimeError(f"{name} still indexing after {timeout}s")
+
+
+def load(conn, name, data, scopes, dtype):
+    """Pipelined HSETs of every vector; returns seconds until the index has them all"""
+    started = time.perf_counter()
+    blobs = data.astype(DTYPES[dtype])
+    for start in range(0, len(data), LOAD_BATCH):
+        pipe = conn.pipeline(transaction=False)
+        for i in range(start, min(start + LOAD_BATCH, len(data))):
+            pipe.hset(f"{name}:{i}", mapping={VECTOR_FIELD: blobs[i].tobytes(), SCOPE_FIELD: f"s{scopes[i]}"})
+        pipe.execute()
+    wait_indexed(conn, name)
+    return time.perf_counter() - started
+
+
+def search(conn, name, vector, scope, max_distance, variant, mode):
+    """The cache's lookup (range, nearest first) or a KNN 1; returns (doc index or -1, distance)"""
+    if mode == "range":
+        runtime = f"; $EPSILON: {variant['epsilon']}" if variant["algorithm"] == "hnsw" else ""
+        query = (f"(@{VECTOR_FIELD}:[VECTOR_RANGE $radius $vec]=>{{$YIELD_DISTANCE_AS: distance{runtime}}}"
+                 f" @{SCOPE_FIELD}:{{s{scope}}})")
+        params = ["radius", max_distance, "vec", vector]
+    else:
+        runtime = f" EF_RUNTIME {variant['ef_runtime']}" if variant["algorithm"] == "hnsw" else ""
+        query = f"(@{SCOPE_FIELD}:{{s{scope}}})=>[KNN 1 @{VECTOR_FIELD} $vec{runtime} AS distance]"
+        params = ["vec", vector]
+    reply = conn.execute_command("FT.SEARCH", name, query, "PARAMS", len(params), *params, "SORTBY", "distance",
+                                 "LIMIT", 0, 1, "RETURN", 1, "distance", "DIALECT", 2)
+    if not reply or reply[0] == 0:
+        return -1, None
+    key, fields = reply[1].decode(), reply[2]
+    distance = float(fields[fields.index(b"distance") + 1])
+    if mode == "knn" and distance > max_distance:
+        return -1, distance
+    return int(key.rsplit(":", 1)[1]), distance
+
+
+def run_variant(conn, variant, dtype, data, scopes, query_vectors, query_scopes, truth, max_distance, mode):
+    name = f"{INDEX_PREFIX}:{len(data)}"
+    if name.encode() in conn.execute_command("FT._LIST"):
+        conn.execute_command("FT.DROPINDEX", name, "DD")
+    memory_before = int(conn.info("memory")["used_memory"])
+    create_index(conn, name, variant, dtype, data.shape[1])
+    try:
+        build = load(conn, name, data, scopes, dtype)
+        info = get_index_info(conn, name) or {}
+        memory = int(conn.info("memory")["used_memory"]) - memory_before
+        blobs = query_vectors.astype(DTYPES[dtype])
+        latencies, found = [], []
+        for vector, scope in zip(blobs, query_scopes):
+            started = time.perf_counter()
+            found.append(search(conn, name, vector.tobytes(), scope, max_distance, variant, mode))
+            latencies.append(time.perf_counter() - started)
+    finally:
+        conn.execute_command("FT.DROPINDEX", name, "DD")
+
+    nearest, distances = truth
+    got = np.array([doc for doc, _ in found])
+    got_distance = np.array([d if d is not None else np.inf for _, d in found])
+    hits = nearest >= 0
+    # ties (duplicate vectors) and rounding: a result as close as the true nearest counts
+    correct = hits & ((got == nearest) | (np.abs(got_distance - distances) <= 2e-3))
+    return {
+        "variant": variant, "dtype": dtype, "label": variant_label(variant, dtype), "n": len(data),
+        "build_s": build, "vectors_per_s": len(data) / build if build else None,
+        "index_bytes": info.get("sizes", {}).get("vector_index_sz", 0),
+        "memory_bytes": memory,
+        "p50_ms": percentile(latencies, 50) * 1000, "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "queries": len(found), "true_hits": int(hits.sum()),
+        "recall": float(correct.sum() / hits.sum()) if hits.any() else None,
+        "lost_hits": int((hits & (got < 0)).sum()),
+        "flipped": int(((got >= 0) != hits).sum()),
+    }
+
+
+def print_results(rows, mode, threshold):
+    print(f"\nSemantic cache index variants ({mode} query, similarity >= {threshold})")
+    print("=" * 124)
+    print(f"{'variant':<46} {'N':>8} {'build s':>8} {'vec/s':>8} {'index':>9} {'B/vec':>6} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'recall':>7} {'lost':>5} {'flip':>5}")
+    for r in rows:
+        recall = f"{r['recall'] * 100:.1f}%" if r["recall"] is not None else "-"
+        print(f"{r['label']:<46} {r['n']:>8} {r['build_s']:>8.1f} {r['vectors_per_s'] or 0:>8.0f} "
+              f"{format_bytes(r['index_bytes']):>9} {r['memory_bytes'] / r['n']:>6.0f} "
+              f"{r['p50_ms']:>7.2f} {r['p95_ms']:>7.2f} {r['p99_ms']:>7.2f} {recall:>7} "
+              f"{r['lost_hits']:>5} {r['flipped']:>5}")
+
+
+def recommend(rows, min_recall):
+    """Fastest variant at the largest N whose recall holds, as a proxy config snippet"""
+    largest = max(r["n"] for r in rows)
+    good = [r for r in rows if r["n"] == largest and (r["recall"] is None or r["recall"] >= min_recall)]
+    if not good:
+        print(f"\nno variant reached {min_recall * 100:.1f}% recall at N={largest}; keep the default FLAT index")
+        return
+    best = min(good, key=lambda r: (r["p95_ms"], r["memory_bytes"]))
+    print(f"\nfastest p95 at N={largest} with recall >= {min_recall * 100:.1f}%: {best['label']}")
+    print("  litellm_settings:\n    vector_index_params:")
+    for name, value in dict(best["variant"], datatype=best["dtype"]).items():
+        print(f"      {name}: {value}")
+    if best["dtype"] == "float16":
+        # the bench queries in the index's datatype; redisvl's async SemanticCache.acheck does not
+        print("  (float16 needs a redisvl whose async lookup sends float16 query vectors; 0.4-0.7 do not, and "
+              "litellm_hooks.vector_index keeps float32 there)")
+
+
+def similarity_threshold(config_path):
+    try:
+        import yaml
+        with open(config_path) as f:
+            params = ((yaml.safe_load(f) or {}).get("litellm_settings") or {}).get("cache_params") or {}
+        return float(params.get("similarity_threshold", 0.8))
+    except (ImportError, OSError):
+        return 0.8
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FLAT vs HNSW, FLOAT32 vs FLOAT16 for the semantic cache index")
+    parser.add_argument("--url", help="redis-stack URL (default: $REDIS_URL or redis://localhost:6379/0)")
+    parser.add_argument("--n", default="10000,50000", help="comma-separated index sizes")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=1536, help="synthetic vector dimension (Titan v1: 1536)")
+    parser.add_argument("--vectors", help="embedding .npz from semantic_cache_sim.py --embedding-cache")
+    parser.add_argument("--variants", default=DEFAULT_VARIANTS,
+                        help="comma-separated flat | hnsw[:m=M][:ef_construction=E][:ef_runtime=R][:epsilon=X]")
+    parser.add_argument("--dtypes", default="float32,float16")
+    parser.add_argument("--query", choices=("range", "knn"), default="range",
+                        help="range: the cache's VECTOR_RANGE lookup; knn: KNN 1 (uses EF_RUNTIME)")
+    parser.add_argument("--threshold", type=float, help="similarity threshold (default: the config's)")
+    parser.add_argument("--scopes", type=int, default=4, help="distinct litellm_cache_key values (tenants x models)")
+    parser.add_argument("--clusters", type=int, default=200, help="synthetic topic clusters")
+    parser.add_argument("--spread", type=float, default=0.8, help="synthetic within-cluster noise")
+    parser.add_argument("--query-noise", default="0.2,0.8", help="min,max noise of queries around stored vectors")
+    parser.add_argument("--novel", type=float, default=0.3, help="fraction of queries near no stored vector")
+    parser.add_argument("--min-recall", type=float, default=0.99, help="recall the recommended variant must keep")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--config", default=str(DEFAULT_CONFIG))
+    parser.add_argument("--json", help="write the result rows to this file")
+    args = parser.parse_args()
+
+    variants = [parse_variant(v) for v in args.variants.split(",") if v.strip()]
+    dtypes = [d.strip().lower() for d in args.dtypes.split(",") if d.strip()]
+    if set(dtypes) - set(DTYPES):
+        sys.exit(f"--dtypes must be among {', '.join(DTYPES)}")
+    threshold = args.threshold or similarity_threshold(args.config)
+    max_distance = 1.0 - threshold
+    conn = get_connection(args.url)
+    try:
+        conn.execute_command("FT._LIST")
+    except Exception as e:
+        sys.exit(f"RediSearch is not available on this Redis ({e}); run it against redis-stack")
+
+    rows = []
+    for n in (int(x) for x in args.n.split(",")):
+        rng = np.random.default_rng(args.seed)
+        if args.vectors:
+            data, query_vectors = captured(args.vectors, n, args.queries, rng)
+            sources = None
+        else:
+            low, high = (float(x) for x in args.query_noise.split(","))
+            data, query_vectors, sources = synthetic(n, args.queries, args.dim, args.clusters, args.spread, (low, high),
+                                            args.novel, rng)
+        scopes = rng.integers(args.scopes, size=n)
+        query_scopes = rng.integers(args.scopes, size=len(query_vectors)) if sources is None else scopes[sources]
+        truth = ground_truth(data, scopes, query_vectors, query_scopes, max_distance)
+        print(f"N={n}: {int((truth[0] >= 0).sum())}/{len(query_vectors)} queries have a match "
+              f"within distance {max_distance:.2f}", file=sys.stderr)
+        for dtype in dtypes:
+            for variant in variants:
+                print(f"  {variant_label(variant, dtype)} ...", file=sys.stderr)
+                rows.append(run_variant(conn, variant, dtype, data, scopes, query_vectors, query_scopes, truth,
+                                        max_distance, args.query))
+
+    print_results(rows, args.query, threshold)
+    recommend(rows, args.min_recall)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"\nwrote {os.path.abspath(args.json)}")
+
+
+if __name__ == "__main__":
+    main()
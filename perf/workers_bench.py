@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Proxy throughput with 1 and N workers.
+Starts the proxy through rp.sh --workers N (so worker sizing and the Postgres pool split
+are the ones rp.sh would use) on the mock config, warms it up, then drives it closed-loop
+at --concurrency with loadgen and reports requests/s, latency percentiles, errors and
+the RSS of the whole process tree. The mock answers instantly by default, so the numbers
+are the proxy's own per-request cost (parsing, routing, callbacks, logging).
+
+Run inside the nix shell (rp.sh needs poetry, psql and Redis). The mock is started on
+port 1235 unless something already listens there; with many workers a single mock
+process can become the bottleneck, so check its CPU before trusting the top end.
+
+Usage:
+    python workers_bench.py                        # 1 worker vs rp.sh --workers auto
+    python workers_bench.py --workers 1,2,4,8 --concurrency 128 --requests 5000
+    python workers_bench.py --stream --ttft 0.05 --tokens-per-s 200
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from loadgen import DEFAULT_API_KEY, DEFAULT_MODEL, WRAPPER_DIR, run_load, summarize
+from startup_profile import free_port, stop, tree_memory
+
+MOCK_PORT = 1235
+WORKERS_RE = re.compile(r"^(?:Workers: (\d+)|Workers cut to (\d+)|Postgres: (\d+) workers)", re.M)
+
+
+def port_open(port):
+    with socket.socket() as s:
+        return s.connect_ex(("127.0.0.1", port)) == 0
+
+
+def start_mock(args):
+    """The mock upstream on MOCK_PORT, unless one is already running; returns the process or None"""
+    if port_open(MOCK_PORT):
+        print(f"using the mock already listening on {MOCK_PORT}", file=sys.stderr)
+        return None
+    process = subprocess.Popen(
+        [sys.executable, str(WRAPPER_DIR / "perf" / "mock_upstream.py"), "--port", str(MOCK_PORT),
+         "--ttft", str(args.ttft), "--tokens-per-s", str(args.tokens_per_s), "--max-tokens", str(args.max_tokens)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.monotonic() + 10
+    while not port_open(MOCK_PORT):
+        if time.monotonic() > deadline:
+            stop(process)
+            sys.exit("mock upstream did not start")
+        time.sleep(0.1)
+    return process
+
+
+def wait_ready(process, base_url, log, timeout):
+    deadline = time.monotonic() + timeout
+    with httpx.Client(base_url=base_url, timeout=5) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                log.seek(0)
+                tail = "\n".join(log.read().splitlines()[-20:])
+                raise RuntimeError(f"rp.sh exited with {process.returncode}:\n{tail}")
+            try:
+                if client.get("/health/readiness").status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+    raise RuntimeError(f"proxy not ready within {timeout}s")
+
+
+def bench(args, workers):
+    """One proxy start with `workers` (a number or auto); returns (workers started, summary, wall, rss)"""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, PORT=str(port), LITELLM_CONFIG=str(args.config))
+    with tempfile.TemporaryFile("w+") as log:
+        process = subprocess.Popen([str(WRAPPER_DIR / "rp.sh"), "--workers", str(workers)], cwd=WRAPPER_DIR,
+                                   env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+        try:
+            wait_ready(process, base_url, log, args.timeout)
+            entries = [{"model": args.model, "messages": [{"role": "user", "content": f"benchmark prompt {i}"}]}
+                       for i in range(args.prompts)]
+            common = dict(stream=args.stream, max_tokens=args.max_tokens, base_url=base_url, api_key=args.api_key)
+            asyncio.run(run_load(entries, concurrency=args.concurrency, requests=args.warmup, **common))
+            results, wall = asyncio.run(run_load(entries, concurrency=args.concurrency, requests=args.requests,
+                                                 **common))
+            rss, _ = tree_memory(process.pid)
+        finally:
+            stop(process)
+        log.seek(0)
+        matches = [next(filter(None, m)) for m in WORKERS_RE.findall(log.read())]
+    started = int(matches[-1]) if matches else workers
+    return started, summarize(results, wall)["ALL"], wall, rss
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proxy throughput with 1 and N workers (rp.sh --workers)")
+    parser.add_argument("--workers", default="1,auto", help="comma-separated worker counts ('auto' as in rp.sh)")
+    parser.add_argument("--config", default=str(WRAPPER_DIR / "proxy_server_config-mock.yaml"))
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--api-key", default=DEFAULT_API_KEY)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests per worker count")
+    parser.add_argument("--warmup", type=int, default=200, help="unmeasured requests after startup")
+    parser.add_argument("--prompts", type=int, default=1000,
+                        help="distinct prompts cycled through (fewer means more cache hits)")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--max-tokens", type=int, default=16)
+    parser.add_argument("--ttft", type=float, default=0.0, help="mock seconds to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=100000.0, help="mock generation rate")
+    parser.add_argument("--timeout", type=float, default=180.0, help="seconds to wait for the proxy to start")
+    args = parser.parse_args()
+
+    mock = start_mock(args)
+    rows = []
+    try:
+        for workers in args.workers.split(","):
+            print(f"--workers {workers} ...", file=sys.stderr)
+            try:
+                rows.append(bench(args, workers.strip()))
+            except RuntimeError as e:
+                print(f"--workers {workers}: {e}", file=sys.stderr)
+    finally:
+        if mock is not None:
+            stop(mock)
+    if not rows:
+        sys.exit("no run completed")
+
+    base = rows[0][1]["requests_per_s"]
+    print(f"\nProxy throughput, {args.concurrency} concurrent, {args.requests} requests, "
+          f"{'streaming' if args.stream else 'non-streaming'}")
+    print("=" * 78)
+    print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'err%':>6} {'RSS':>9}")
+    for workers, summary, wall, rss in rows:
+        print(f"{workers:>7} {summary['requests_per_s']:>9.1f} "
+              f"{summary['requests_per_s'] / base if base else 0:>7.2f}x "
+              f"{summary['latency_p50'] * 1000 if summary['latency_p50'] else 0:>8.1f} "
+              f"{summary['latency_p95'] * 1000 if summary['latency_p95'] else 0:>8.1f} "
+              f"{summary['latency_p99'] * 1000 if summary['latency_p99'] else 0:>8.1f} "
+              f"{summary['error_rate'] * 100:>5.1f}% {rss / 1048576:>6.0f}MiB")
+        for error in summary["sample_errors"]:
+            print(f"    error: {error[:100]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,11 @@
 #!/bin/bash
 
+# Usage:
+#   ./rp.sh                   one worker (or LITELLM_WORKERS)
+#   ./rp.sh --workers auto    one worker per core, as far as memory and Postgres connections allow
+#   ./rp.sh --workers 4
+#   ./rp.sh restart           rolling restart of a running multi-worker proxy, one worker at a time
+
 source ./.env
 
 # cd $LITELLM_DIR && \
@@ -7,11 +13,157 @@ source ./.env
 #         --config "$WRAPPER_DIR/proxy_server_config-local-example.yaml" \
 #         --host localhost
 
+# LITELLM_CONFIG selects another config, e.g. proxy_server_config-mock.yaml for offline benchmarks
+export LITELLM_CONFIG="${LITELLM_CONFIG:-$WRAPPER_DIR/proxy_server_config-local-example.yaml}"
+CONFIG_FILE="$LITELLM_CONFIG"
+
+PID_FILE="$WRAPPER_DIR/.rp.pid"
+WORKERS="${LITELLM_WORKERS:-1}"
+# resident memory of one worker (perf/startup_profile.py measures it), and memory kept free
+# for everything else: LM Studio loads models on demand
+WORKER_MB="${LITELLM_WORKER_MB:-600}"
+MEMORY_RESERVE_MB="${LITELLM_MEMORY_RESERVE_MB:-4096}"
+# Postgres connections left for Letta, pgAdmin, psql and db_maintenance
+DB_HEADROOM="${LITELLM_DB_HEADROOM:-20}"
+# longest a replacement worker may take to start during a rolling restart
+WORKER_BOOT_S="${LITELLM_WORKER_BOOT_S:-60}"
+
+cpu_count() {
+    getconf _NPROCESSORS_ONLN 2>/dev/null || sysctl -n hw.ncpu
+}
+
+available_mb() {
+    if [ -r /proc/meminfo ]; then
+        awk '/^MemAvailable:/ { print int($2 / 1024) }' /proc/meminfo
+    else
+        # macOS: free, inactive and speculative pages can be handed out without swapping
+        vm_stat | awk '/page size of/ { size = $8 }
+                       /^Pages (free|inactive|speculative):/ { sub(/\./, "", $NF); pages += $NF }
+                       END { print int(pages * size / 1048576) }'
+    fi
+}
+
+# uvicorn workers: the supervisor's multiprocessing children, excluding its resource tracker
+worker_pids() {
+    ps -A -o pid=,ppid=,command= | awk -v root="$1" '
+        { parent[$1] = $2; command[$1] = $0 }
+        END {
+            for (pid in parent) {
+                if (command[pid] !~ /spawn_main/) continue
+                for (p = parent[pid]; p > 1; p = parent[p]) if (p == root) { print pid; break }
+            }
+        }'
+}
+
+rss_kb() {
+    ps -o rss= -p "$1" 2>/dev/null | tr -d ' '
+}
+
+rolling_restart() {
+    read -r PID RUNNING_WORKERS < "$PID_FILE" 2>/dev/null
+    if [ -z "$PID" ] || ! kill -0 "$PID" 2>/dev/null; then
+        echo "No running proxy found ($PID_FILE)" >&2
+        exit 1
+    fi
+    if [ "${RUNNING_WORKERS:-1}" -le 1 ]; then
+        echo "The proxy runs a single worker; restart it instead (there is nothing to roll over to)" >&2
+        exit 1
+    fi
+    # Workers are replaced one at a time: the old one drains its in-flight requests and exits,
+    # uvicorn's supervisor spawns a replacement, and the next worker is only stopped once the
+    # replacement has grown to the size of its siblings (imports done, config loaded).
+    # The others keep serving from the shared socket throughout.
+    for OLD in $(worker_pids "$PID"); do
+        SIBLINGS=$(worker_pids "$PID" | grep -vx "$OLD")
+        TARGET_KB=$(for S in $SIBLINGS; do rss_kb "$S"; done | sort -n | head -n 1)
+        echo "Restarting worker $OLD ..."
+        kill -TERM "$OLD"
+        while kill -0 "$OLD" 2>/dev/null; do sleep 0.5; done
+        START=$SECONDS
+        NEW=""
+        while [ $((SECONDS - START)) -lt "$WORKER_BOOT_S" ]; do
+            NEW=$(worker_pids "$PID" | grep -vx "$OLD" | grep -vxF "$SIBLINGS" | head -n 1)
+            if [ -n "$NEW" ] && [ "$(rss_kb "$NEW")" -ge $(( ${TARGET_KB:-0} * 9 / 10 )) ]; then
+                break
+            fi
+            sleep 1
+        done
+        echo "  replaced by ${NEW:-?} after $((SECONDS - START))s"
+    done
+    echo "Rolling restart done"
+}
+
+while [ $# -gt 0 ]; do
+    case "$1" in
+        restart) rolling_restart; exit 0 ;;
+        --workers) WORKERS="$2"; shift 2 ;;
+        *) echo "Usage: $0 [--workers N|auto] | restart" >&2; exit 1 ;;
+    esac
+done
+
+# proxy hooks in ./litellm_hooks import each other as a package
+export PYTHONPATH="$WRAPPER_DIR${PYTHONPATH:+:$PYTHONPATH}"
+
+# db_maintenance/spend_log_partitions.py re-keys the partitioned spend-log table on
+# (request_id, "startTime"); Prisma's startup schema push would try to revert that, so it
+# is disabled and LiteLLM's pending migrations are applied here instead. Startup stops
+# when they cannot be (e.g. litellmVer changed and a migration touches the key).
+if [ "$(psql -U postgres -d mylitellm -tAc "SELECT relkind FROM pg_class WHERE relname = 'LiteLLM_SpendLogs'" 2>/dev/null)" = "p" ]; then
+    export DISABLE_SCHEMA_UPDATE="True"
+    if ! (cd "$LITELLM_DIR" && poetry run python "$WRAPPER_DIR/db_maintenance/spend_log_partitions.py" migrate); then
+        echo "LiteLLM_SpendLogs is partitioned and LiteLLM's schema migrations were not applied; not starting" >&2
+        exit 1
+    fi
+fi
+
+if [ "$WORKERS" = "auto" ]; then
+    CORES=$(cpu_count)
+    AVAILABLE_MB=$(available_mb)
+    BY_MEMORY=$(( (AVAILABLE_MB - MEMORY_RESERVE_MB) / WORKER_MB ))
+    WORKERS=$(( CORES < BY_MEMORY ? CORES : BY_MEMORY ))
+    [ "$WORKERS" -ge 1 ] || WORKERS=1
+    echo "Workers: $WORKERS ($CORES cores, ${AVAILABLE_MB}MB available, ${WORKER_MB}MB each, ${MEMORY_RESERVE_MB}MB reserved)"
+fi
+
+if [ "$WORKERS" -gt 1 ]; then
+    # Each worker holds its own Prisma pool of database_connection_pool_limit connections,
+    # so the pools are shrunk (and if need be the workers cut) to fit max_connections
+    BUDGET=$(psql -U postgres -d mylitellm -tAc "SELECT current_setting('max_connections')::int
+        - current_setting('superuser_reserved_connections')::int - $DB_HEADROOM" 2>/dev/null)
+    if grep -Eq '^[[:space:]]*database_url:' "$CONFIG_FILE" && [ -n "$BUDGET" ]; then
+        POOL=$(awk '/^[[:space:]]*database_connection_pool_limit:/ { print $2 }' "$CONFIG_FILE")
+        POOL="${POOL:-10}"
+        if [ $((WORKERS * 2)) -gt "$BUDGET" ]; then
+            WORKERS=$(( BUDGET / 2 > 1 ? BUDGET / 2 : 1 ))
+            echo "Workers cut to $WORKERS: Postgres allows $BUDGET connections for the proxy"
+        fi
+        if [ $((WORKERS * POOL)) -gt "$BUDGET" ]; then
+            POOL=$(( BUDGET / WORKERS ))
+            WORKER_CONFIG="${TMPDIR:-/tmp}/litellm-rp-$$.yaml"
+            awk -v pool="$POOL" '
+                /^[[:space:]]*database_connection_pool_limit:/ { next }
+                { print }
+                /^general_settings:/ { print "  database_connection_pool_limit: " pool }
+            ' "$CONFIG_FILE" > "$WORKER_CONFIG"
+            CONFIG_FILE="$WORKER_CONFIG"
+            export LITELLM_CONFIG="$WORKER_CONFIG"
+        fi
+        echo "Postgres: $WORKERS workers x $POOL connections (budget $BUDGET)"
+    fi
+fi
+
+echo "$$ $WORKERS" > "$PID_FILE"
+# litellm reads --num_workers from NUM_WORKERS too; exported so hooks with per-worker state
+# (model_affinity's backend slots) can split their limits between the workers
+export NUM_WORKERS="$WORKERS"
+
 # align with:
 # https://github.com/BerriAI/litellm/blob/main/CONTRIBUTING.md?plain=1#L228
+# exec keeps this pid (poetry run execs too), so ./rp.sh restart finds uvicorn's supervisor
 cd $LITELLM_DIR && \
-    EXPERIMENTAL_MULTI_INSTANCE_RATE_LIMITING="True" poetry run litellm \
-        --config "$WRAPPER_DIR/proxy_server_config-local-example.yaml" \
-        --host 0.0.0.0
-        
-#localhost
\ No newline at end of file
+    EXPERIMENTAL_MULTI_INSTANCE_RATE_LIMITING="True" exec poetry run litellm \
+        --config "$CONFIG_FILE" \
+        --host 0.0.0.0 \
+        --num_workers "$WORKERS"
+
+#localhost
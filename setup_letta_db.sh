@@ -19,3 +19,7 @@ fi
 
 echo "Enabling pgvector extension in 'letta' database..."
 psql -U postgres -d letta -c "CREATE EXTENSION IF NOT EXISTS vector;"
+
+echo "Once Letta has created its tables (first start), index its embeddings with:"
+echo "  python db_maintenance/letta_vector_index.py install"
+echo "(stock Letta declares them vector(4096), past pgvector's 2000-dim index limit; install then reports and exits)"
@@ -0,0 +1,7 @@
+import os
+import sys
+from pathlib import Path
+
+# the hooks import litellm, which otherwise fetches the model cost map at import time
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,67 @@
+"""Regression tests for adaptive expiry: it attaches to the redisvl cache LiteLLM 1.80 builds in __init__"""
+
+import asyncio
+import types
+
+import litellm
+
+from litellm_hooks import adaptive_ttl
+from litellm_hooks.adaptive_ttl import AdaptiveTTLPolicy, AdaptiveTTLStore
+
+
+class FakeRedis:
+    def __init__(self):
+        self.scripts = []
+
+    async def eval(self, script, numkeys, *args):
+        self.scripts.append(args[0])
+        return 0
+
+    async def hincrby(self, key, field, amount):
+        pass
+
+
+class FakeSemanticCache:
+    def __init__(self):
+        self.ttls = []
+
+    async def astore(self, prompt, response, vector=None, ttl=None):
+        self.ttls.append(ttl)
+        return "entry:1"
+
+    async def acheck(self, prompt=None, vector=None, num_results=1):
+        return [{"key": "entry:1", "response": "cached"}]
+
+
+class EagerSemanticBackend:
+    """LiteLLM 1.80's RedisSemanticCache: llmcache is built in __init__, there is no _build_llmcache"""
+
+    def __init__(self):
+        self.llmcache = FakeSemanticCache()
+
+
+def test_installs_on_an_eagerly_built_semantic_cache(monkeypatch):
+    backend = EagerSemanticBackend()
+    monkeypatch.setattr(litellm, "cache", types.SimpleNamespace(cache=backend))
+    redis = FakeRedis()
+    store = AdaptiveTTLStore(AdaptiveTTLPolicy(initial_ttl=60, max_ttl=3600, growth=2.0), redis_client=redis)
+
+    assert adaptive_ttl.install(store)
+    assert backend._adaptive_ttl is store
+
+    async def run():
+        await backend.llmcache.astore("q", "a", vector=[0.1], ttl=86400)
+        await backend.llmcache.acheck(prompt="q")
+
+    asyncio.run(run())
+    assert backend.llmcache.ttls == [60]
+    assert redis.scripts == ["entry:1", "entry:1"]  # stored, then hit
+
+
+def test_other_caches_are_left_alone(monkeypatch):
+    backend = types.SimpleNamespace()
+    monkeypatch.setattr(litellm, "cache", types.SimpleNamespace(cache=backend))
+    store = AdaptiveTTLStore(AdaptiveTTLPolicy(initial_ttl=60, max_ttl=3600, growth=2.0), redis_client=FakeRedis())
+
+    assert adaptive_ttl.install(store)
+    assert not hasattr(backend, "_adaptive_ttl")
@@ -0,0 +1,18 @@
+"""Regression tests for the install report: a configured hook that patched nothing is named"""
+
+import logging
+import types
+
+from litellm_hooks import common
+
+
+def test_report_names_hooks_that_did_not_install(monkeypatch, caplog):
+    monkeypatch.setattr(common, "expected_hooks", {"single_flight", "prefix_cache"})
+    monkeypatch.setattr(common, "installed_hooks", {})
+    router = types.SimpleNamespace(acompletion=lambda **kwargs: None)
+
+    assert common.wrap_method(router, "acompletion", lambda fn: fn, "single_flight")
+    with caplog.at_level(logging.INFO, logger=common.__name__):
+        assert common.report_hooks() == ["prefix_cache"]
+    assert "hook single_flight installed on SimpleNamespace.acompletion" in caplog.text
+    assert "not installed (check the LiteLLM version): prefix_cache" in caplog.text
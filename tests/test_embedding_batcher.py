@@ -0,0 +1,104 @@
+"""Regression tests for batched embeddings: the upstream call carries no caller's identity"""
+
+import asyncio
+import datetime
+
+import litellm
+from litellm import EmbeddingResponse, Usage
+from litellm.integrations.custom_logger import CustomLogger
+from litellm.litellm_core_utils.litellm_logging import Logging
+
+from litellm_hooks.embedding_batcher import EmbeddingBatcher
+
+
+class RecordingLoggingObj:
+    def __init__(self):
+        self.environment = None
+        self.logged = []
+
+    def update_environment_variables(self, **kwargs):
+        self.environment = kwargs
+
+    async def async_success_handler(self, result, start_time, end_time):
+        pass
+
+    def handle_sync_success_callbacks_for_async_calls(self, result, start_time, end_time):
+        self.logged.append(result)
+
+
+def test_batched_callers_are_logged_on_their_own_logging_objects():
+    upstream = []
+
+    async def aembedding(model, input, **kwargs):
+        upstream.append(kwargs)
+        return EmbeddingResponse(
+            model="bge", data=[{"object": "embedding", "index": i, "embedding": [float(i)]} for i in range(len(input))],
+            usage=Usage(prompt_tokens=3 * len(input), completion_tokens=0, total_tokens=3 * len(input)),
+            hidden_params={"litellm_model_name": "openai/bge", "custom_llm_provider": "openai", "model_id": "d1"})
+
+    batcher = EmbeddingBatcher(aembedding, window=0.01)
+    loggers = [RecordingLoggingObj() for _ in range(3)]
+
+    async def run():
+        return await asyncio.gather(*(
+            batcher.embed("bge", f"text {i}", litellm_logging_obj=obj, metadata={"user_api_key_hash": f"k{i}"})
+            for i, obj in enumerate(loggers)))
+
+    responses = asyncio.run(run())
+    assert len(upstream) == 1
+    assert "litellm_logging_obj" not in upstream[0] and "metadata" not in upstream[0]
+    for i, (obj, response) in enumerate(zip(loggers, responses)):
+        assert response.data[0]["embedding"] == [float(i)] and response.usage.prompt_tokens == 3
+        assert obj.logged == [response]
+        assert obj.environment["litellm_params"]["metadata"]["user_api_key_hash"] == f"k{i}"
+        assert obj.environment["input"] == [f"text {i}"]
+
+
+def test_single_caller_keeps_its_own_kwargs():
+    upstream = []
+
+    async def aembedding(model, input, **kwargs):
+        upstream.append(kwargs)
+        return EmbeddingResponse(model="bge", data=[{"object": "embedding", "index": 0, "embedding": [1.0]}])
+
+    obj = RecordingLoggingObj()
+    asyncio.run(EmbeddingBatcher(aembedding, window=0.01).embed("bge", "solo", litellm_logging_obj=obj))
+    assert upstream[0]["litellm_logging_obj"] is obj
+    assert obj.logged == []  # LiteLLM logs the call itself
+
+
+class SpendRows(CustomLogger):
+    """Counts success events, one per spend row the proxy would write"""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        self.rows.append((kwargs.get("litellm_params") or {}).get("metadata") or {})
+
+
+def test_batched_callers_are_charged_exactly_once_each(monkeypatch):
+    rows = SpendRows()
+    monkeypatch.setattr(litellm, "callbacks", [rows])
+
+    async def aembedding(model, input, **kwargs):
+        return await litellm.aembedding(model="openai/bge", input=input, mock_response=[0.5], **kwargs)
+
+    batcher = EmbeddingBatcher(aembedding, window=0.01)
+
+    async def run():
+        await aembedding("bge", ["warm up"])  # registers the callbacks with LiteLLM
+        await asyncio.sleep(0.2)
+        rows.rows.clear()
+        now = datetime.datetime.now()
+        await asyncio.gather(*(
+            batcher.embed("bge", f"text {i}", metadata={"user_api_key_hash": f"k{i}"},
+                          litellm_logging_obj=Logging(model="bge", messages=[], stream=False, call_type="aembedding",
+                                                      start_time=now, litellm_call_id=f"c{i}", function_id="f"))
+            for i in range(4)))
+        for _ in range(20):
+            await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert sorted(row.get("user_api_key_hash") or "" for row in rows.rows) == ["k0", "k1", "k2", "k3"]
@@ -0,0 +1,60 @@
+"""Regression tests for the embedding memo: requests answered from the memo are logged as cache hits"""
+
+import asyncio
+
+from litellm import EmbeddingResponse
+
+from litellm_hooks.embedding_memo import memoized_aembedding
+
+
+class FakeMemo:
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.saved_calls = 0
+
+    async def get_many(self, keys):
+        return [self.vectors.get(i) for i in range(len(keys))]
+
+    async def set_many(self, items):
+        pass
+
+
+class RecordingLoggingObj:
+    def __init__(self):
+        self.environment = None
+        self.successes = []
+
+    def update_environment_variables(self, **kwargs):
+        self.environment = kwargs
+
+    async def async_success_handler(self, result, start_time, end_time, cache_hit):
+        pass
+
+    def handle_sync_success_callbacks_for_async_calls(self, result, start_time, end_time, cache_hit):
+        self.successes.append((result, cache_hit))
+
+
+async def upstream(model, input, **kwargs):
+    return EmbeddingResponse(model=model, data=[{"object": "embedding", "index": i, "embedding": [9.0]}
+                                                for i in range(len(input))])
+
+
+def test_memo_hit_is_logged_as_a_cache_hit():
+    obj = RecordingLoggingObj()
+    wrapper = memoized_aembedding(FakeMemo({0: [1.0], 1: [2.0]}), upstream)
+    response = asyncio.run(wrapper("bge", ["a", "b"], litellm_logging_obj=obj, metadata={"user_api_key_hash": "k"}))
+
+    assert [d["embedding"] for d in response.data] == [[1.0], [2.0]]
+    assert obj.successes == [(response, True)]
+    assert obj.environment["input"] == ["a", "b"]
+    assert obj.environment["litellm_params"]["metadata"]["user_api_key_hash"] == "k"
+    assert response._hidden_params["cache_hit"] is True
+
+
+def test_partial_hit_is_left_to_litellm():
+    obj = RecordingLoggingObj()
+    wrapper = memoized_aembedding(FakeMemo({0: [1.0]}), upstream)
+    response = asyncio.run(wrapper("bge", ["a", "b"], litellm_logging_obj=obj))
+
+    assert [d["embedding"] for d in response.data] == [[1.0], [9.0]]
+    assert obj.successes == []  # the upstream call for the miss is logged by LiteLLM
@@ -0,0 +1,66 @@
+"""Regression tests for the scheduler gate: only requests that go upstream take a backend slot"""
+
+import asyncio
+
+from litellm.caching.caching_handler import CachingHandlerResponse
+
+from litellm_hooks.model_affinity import ModelAffinity, slot_after_cache_miss
+
+BACKEND = "http://localhost:1234/v1"
+MODEL_LIST = [
+    {"model_name": "a", "litellm_params": {"model": "openai/a", "api_base": BACKEND}},
+    {"model_name": "b", "litellm_params": {"model": "openai/b", "api_base": BACKEND}},
+]
+
+
+def router_call(cache):
+    """Stand-in for Router.acompletion: the cache lookup, then the upstream call on a miss"""
+
+    async def get_cache(handler, prompt):
+        return CachingHandlerResponse(cached_result=cache.get(prompt))
+
+    lookup = slot_after_cache_miss(get_cache)
+
+    async def acompletion(model, prompt):
+        response = await lookup(None, prompt)
+        if response.cached_result is not None:
+            return response.cached_result
+        await asyncio.sleep(0.01)
+        cache[prompt] = f"{model}: {prompt}"
+        return cache[prompt]
+
+    return acompletion
+
+
+def test_cache_hits_do_not_wait_for_a_busy_backend():
+    affinity = ModelAffinity({"backends": {BACKEND: {"max_concurrency": 1}}})
+    scheduler = affinity.configure(MODEL_LIST)[BACKEND]
+    call = affinity.wrap(router_call({"cached": "a: cached"}))
+
+    async def run():
+        await scheduler.acquire("openai/b")  # another model is generating
+        hit = await asyncio.wait_for(call("a", "cached"), 1)
+        miss = asyncio.ensure_future(call("a", "new"))
+        await asyncio.sleep(0.05)
+        waiting = not miss.done()
+        scheduler.release()
+        return hit, waiting, await miss
+
+    hit, waiting, miss = asyncio.run(run())
+    assert hit == "a: cached"
+    assert waiting and miss == "a: new"
+    assert scheduler.active == 0 and scheduler.dispatched == 2
+
+
+def test_unscheduled_models_pass_through():
+    affinity = ModelAffinity({"backends": {BACKEND: {}}})
+    affinity.configure(MODEL_LIST)
+    call = affinity.wrap(router_call({}))
+    assert asyncio.run(call("other", "q")) == "other: q"
+
+
+def test_max_concurrency_is_split_between_workers():
+    affinity = ModelAffinity({"backends": {BACKEND: {"max_concurrency": 4}}, "workers": 2})
+    assert affinity.configure(MODEL_LIST)[BACKEND].max_concurrency == 2
+    affinity = ModelAffinity({"backends": {BACKEND: {"max_concurrency": 2}}, "workers": 8})
+    assert affinity.configure(MODEL_LIST)[BACKEND].max_concurrency == 1
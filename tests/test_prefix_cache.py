@@ -0,0 +1,77 @@
+"""Regression tests for prefix-aware keys: histories with the same tail never share a semantic entry"""
+
+import asyncio
+
+from litellm_hooks.prefix_cache import PrefixCacheKeys
+
+
+class FakeSemanticCache:
+    """redisvl SemanticCache stand-in: every stored prompt is an exact vector match"""
+
+    def __init__(self):
+        self.entries = []
+
+    def store(self, prompt, response, vector=None, metadata=None, ttl=None):
+        raise NotImplementedError
+
+    def check(self, prompt=None, vector=None, num_results=1, **kwargs):
+        raise NotImplementedError
+
+    async def astore(self, prompt, response, vector=None, metadata=None, ttl=None):
+        self.entries.append({"key": f"e{len(self.entries)}", "prompt": prompt, "response": response,
+                             "vector_distance": 0.0, "metadata": metadata})
+        return self.entries[-1]["key"]
+
+    async def acheck(self, prompt=None, vector=None, num_results=1, **kwargs):
+        return [dict(entry) for entry in reversed(self.entries) if entry["prompt"] == prompt][:num_results]
+
+
+class FakeSemanticBackend:
+    """LiteLLM 1.80's RedisSemanticCache: built eagerly, and the lookup ignores the key"""
+
+    def __init__(self):
+        self.llmcache = FakeSemanticCache()
+
+    @staticmethod
+    def prompt(messages):
+        return "".join(m["content"] for m in messages)
+
+    def get_cache(self, key, **kwargs):
+        raise NotImplementedError
+
+    def set_cache(self, key, value, **kwargs):
+        raise NotImplementedError
+
+    async def async_set_cache(self, key, value, **kwargs):
+        await self.llmcache.astore(self.prompt(kwargs["messages"]), value)
+
+    async def async_get_cache(self, key, **kwargs):
+        results = await self.llmcache.acheck(prompt=self.prompt(kwargs["messages"]))
+        return results[0]["response"] if results else None
+
+
+def conversation(history):
+    return [
+        {"role": "system", "content": "You are an agent."},
+        {"role": "user", "content": history},
+        {"role": "assistant", "content": "Noted."},
+        {"role": "user", "content": "What should I do next?"},
+    ]
+
+
+def test_histories_sharing_a_tail_do_not_cross_hit():
+    backend = FakeSemanticBackend()
+    layer = PrefixCacheKeys(backend).attach()
+
+    async def run():
+        await backend.async_set_cache("k", "answer for A", messages=conversation("history A"))
+        return (await backend.async_get_cache("k", messages=conversation("history B")),
+                await backend.async_get_cache("k", messages=conversation("history A")),
+                await backend.async_get_cache("k", messages=conversation("history A")[-1:]))
+
+    other, same, short = asyncio.run(run())
+    assert other is None
+    assert same == "answer for A"
+    assert short is None  # a conversation too short to split never matches an agent entry
+    assert backend.llmcache.entries[0]["metadata"]["prefix_chain"]
+    assert layer.stats()["agent_hits"] == 1
@@ -0,0 +1,42 @@
+"""Regression tests for the spend-log listings: rows leave the proxy with their messages expanded"""
+
+import asyncio
+import json
+
+from litellm_hooks.prompt_store import expand_spend_logs
+
+REFS = {"litellm_prompt_refs": ["d1"]}
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class FakePrisma:
+    """prisma_client stand-in whose prompt_store.expand() resolves every reference to MESSAGES"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db = self
+
+    async def query_raw(self, query, values):
+        self.queries += 1
+        return [{"value": json.dumps(MESSAGES if "litellm_prompt_refs" in value else value)}
+                for value in json.loads(values)]
+
+
+def test_a_page_of_rows_is_expanded_in_one_query():
+    prisma = FakePrisma()
+    page = {"data": [{"request_id": "a", "messages": json.dumps(REFS), "proxy_server_request": {"messages": REFS}},
+                     {"request_id": "b", "messages": MESSAGES, "proxy_server_request": {}}],
+            "total": 2}
+
+    result = asyncio.run(expand_spend_logs(prisma, page))
+    assert prisma.queries == 1
+    assert result["total"] == 2
+    assert result["data"][0]["messages"] == MESSAGES
+    assert result["data"][1] is page["data"][1]
+
+
+def test_rows_without_references_skip_the_database():
+    prisma = FakePrisma()
+    rows = [{"request_id": "b", "messages": MESSAGES}]
+    assert asyncio.run(expand_spend_logs(prisma, rows)) is rows
+    assert prisma.queries == 0
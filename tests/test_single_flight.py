@@ -0,0 +1,188 @@
+"""Regression tests for coalescing: followers are logged, leader errors reach stream followers"""
+
+import asyncio
+import gc
+
+import litellm
+
+from litellm_hooks import single_flight
+from litellm_hooks.single_flight import SingleFlight, StreamFanout
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class RecordingLoggingObj:
+    def __init__(self):
+        self.environment = None
+        self.successes = []
+
+    def update_environment_variables(self, **kwargs):
+        self.environment = kwargs
+
+    async def async_success_handler(self, result, start_time, end_time, cache_hit):
+        pass
+
+    def handle_sync_success_callbacks_for_async_calls(self, result, start_time, end_time, cache_hit):
+        self.successes.append((result, cache_hit))
+
+
+class FakeRedis:
+    """The commands SingleFlight uses, shared by the SingleFlight of each simulated worker"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return False
+        self.data[key] = value
+        return True
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def exists(self, key):
+        return key in self.data
+
+    async def eval(self, script, numkeys, key, token):
+        if self.data.get(key) == token:
+            del self.data[key]
+
+    async def hincrby(self, key, field, amount):
+        pass
+
+
+class EndlessStream:
+    """A provider stream that never ends on its own"""
+
+    def __init__(self):
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(0.01)
+        return litellm.ModelResponseStream(choices=[{"index": 0, "delta": {"role": "assistant", "content": "x"}}])
+
+    async def aclose(self):
+        self.closed = True
+
+
+def response():
+    return litellm.ModelResponse(choices=[{"message": {"role": "assistant", "content": "hello"}}])
+
+
+def test_followers_are_logged_on_their_own_logging_object():
+    flight = SingleFlight(cross_worker=False)
+    calls = []
+
+    async def acompletion(model, messages, stream=False, **kwargs):
+        calls.append(kwargs["litellm_logging_obj"])
+        await asyncio.sleep(0.05)
+        return response()
+
+    async def run():
+        loggers = [RecordingLoggingObj() for _ in range(3)]
+        results = await asyncio.gather(*(
+            flight.call(acompletion, "m", MESSAGES, False,
+                        {"litellm_logging_obj": obj, "metadata": {"user_api_key_hash": f"k{i}"}})
+            for i, obj in enumerate(loggers)))
+        return loggers, results
+
+    loggers, results = asyncio.run(run())
+    assert len(calls) == 1 and flight.leaders == 1
+    for i, obj in enumerate(loggers):
+        if obj is calls[0]:
+            continue
+        assert obj.successes and obj.successes[0][1] is True
+        assert obj.environment["litellm_params"]["metadata"]["user_api_key_hash"] == f"k{i}"
+        assert obj.environment["input"] == MESSAGES
+    assert calls[0].successes == []  # the leader is logged by LiteLLM itself
+    assert all(r.choices[0].message.content == "hello" for r in results)
+
+
+def test_leaders_counted_only_with_the_lock():
+    flight = SingleFlight(cross_worker=True)
+
+    async def not_leading(key):
+        return False
+
+    async def release(key):
+        pass
+
+    async def no_result(key, kwargs):
+        return None
+
+    flight._acquire, flight._release, flight._remote_result = not_leading, release, no_result
+
+    async def acompletion(model, messages, stream=False, **kwargs):
+        return response()
+
+    asyncio.run(flight.call(acompletion, "m", MESSAGES, False, {}))
+    asyncio.run(flight.call(acompletion, "m", MESSAGES, True, {}))
+    assert flight.leaders == 0
+
+
+def test_stream_followers_share_the_leaders_error(monkeypatch):
+    flight = SingleFlight(cross_worker=False)
+    attempts = []
+
+    async def acompletion(model, messages, stream=False, **kwargs):
+        attempts.append(1)
+        await asyncio.sleep(0.05)
+        raise litellm.RateLimitError("slow down", llm_provider="openai", model="m")
+
+    async def run():
+        return await asyncio.gather(
+            *(flight.call(acompletion, "m", MESSAGES, True, {}) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert len(attempts) == 1
+    assert all(isinstance(r, litellm.RateLimitError) for r in results)
+
+
+def test_remote_followers_get_the_result_published_before_the_lock_is_released():
+    redis = FakeRedis()
+    workers = [SingleFlight(redis_client=redis) for _ in range(2)]
+    calls = []
+
+    async def acompletion(model, messages, stream=False, **kwargs):
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return response()
+
+    async def run():
+        obj = RecordingLoggingObj()
+        leader = asyncio.create_task(workers[0].call(acompletion, "m", MESSAGES, False, {}))
+        await asyncio.sleep(0.02)
+        follower = await workers[1].call(acompletion, "m", MESSAGES, False, {"litellm_logging_obj": obj})
+        return await leader, follower, obj
+
+    leader, follower, obj = asyncio.run(run())
+    assert len(calls) == 1
+    assert follower.choices[0].message.content == "hello"
+    assert obj.successes and obj.successes[0][1] is True
+    assert workers[1].stats()["saved_upstream_calls"] == 1
+
+
+def test_stream_stops_when_every_reader_is_gone_and_partial_readers_are_logged():
+    upstream = EndlessStream()
+
+    async def run():
+        fanout = StreamFanout(upstream)
+        obj = RecordingLoggingObj()
+        leader = fanout.subscribe()
+        follower = fanout.subscribe(on_complete=lambda chunks: obj.successes.append(len(chunks)))
+        await leader.__anext__()
+        await follower.__anext__()
+        await follower.__anext__()
+        del leader, follower
+        gc.collect()
+        await asyncio.sleep(0.05)
+        return fanout, obj
+
+    fanout, obj = asyncio.run(run())
+    assert fanout.abandoned and fanout.done
+    assert upstream.closed
+    assert obj.successes == [2]
@@ -0,0 +1,49 @@
+"""Regression tests for the capture queue: records are snapshots, the queue is bounded by bytes"""
+
+import datetime
+import json
+
+from litellm_hooks.traffic_capture import TrafficCapture, build_record, snapshot
+
+
+def request(text):
+    now = datetime.datetime.now()
+    kwargs = {
+        "model": "m",
+        "messages": [{"role": "user", "content": [{"type": "text", "text": text}]}],
+        "standard_logging_object": {"id": "r1", "response": {"choices": [{"message": {"content": "answer"}}]}},
+    }
+    return kwargs, None, now, now + datetime.timedelta(seconds=1)
+
+
+def test_snapshot_does_not_follow_later_changes_to_the_request():
+    kwargs, response_obj, start_time, end_time = request("question")
+    fields, size = snapshot(kwargs, response_obj, start_time, end_time, bodies=True)
+
+    kwargs["messages"][0]["content"][0]["text"] = "changed"
+    kwargs["messages"].append({"role": "assistant", "content": "later"})
+    kwargs["standard_logging_object"]["response"]["choices"][0]["message"]["content"] = "changed"
+
+    record = build_record(fields, bodies=True)
+    assert record["messages"] == [{"role": "user", "content": [{"type": "text", "text": "question"}]}]
+    assert record["response"]["choices"][0]["message"]["content"] == "answer"
+    assert len(record["message_hashes"]) == 1
+    assert size >= len("question") + len("answer")
+
+
+def test_queue_is_bounded_by_approximate_bytes(tmp_path, monkeypatch):
+    capture = TrafficCapture(directory=str(tmp_path), bodies=True, queue_bytes=1000)
+    monkeypatch.setattr(capture, "start", lambda: None)
+
+    # an oversized request still passes an empty queue, and then fills it
+    assert capture.offer(*request("x" * 2000))
+    assert not capture.offer(*request("small"))
+    assert capture.counts["dropped"] == 1
+    assert capture.queued_bytes() > 2000
+
+    fields, size = capture.queue.get_nowait()
+    capture._bytes_out += size
+    assert capture.offer(*request("small"))
+    assert capture.offer(*request("small"))
+    assert 0 < capture.queued_bytes() < 1000
+    assert json.dumps(build_record(fields, bodies=True))
@@ -0,0 +1,125 @@
+"""Regression tests for the exact-match tier: lookups must never cross prompts, models or tenants"""
+
+import asyncio
+import time
+
+from litellm_hooks.two_tier_cache import LRUCache, TwoTierCache
+
+
+class ScopeKeyedBackend:
+    """
+    Stand-in for the redis-semantic backend: entries are stored under LiteLLM's scope key,
+    which covers model, params and tenant but not the prompt, and lookups match on it alone.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.lookups = 0
+
+    def get_cache(self, key, **kwargs):
+        self.lookups += 1
+        return self.entries.get((key, str(kwargs.get("messages") or kwargs.get("prompt") or kwargs.get("input"))))
+
+    async def async_get_cache(self, key, **kwargs):
+        return self.get_cache(key, **kwargs)
+
+    def set_cache(self, key, value, **kwargs):
+        self.entries[(key, str(kwargs.get("messages") or kwargs.get("prompt") or kwargs.get("input")))] = value
+
+    async def async_set_cache(self, key, value, **kwargs):
+        self.set_cache(key, value, **kwargs)
+
+
+def two_tier():
+    backend = ScopeKeyedBackend()
+    return TwoTierCache(backend, LRUCache()).attach(), backend
+
+
+def test_prompts_under_one_scope_key_do_not_collide():
+    tiers, _ = two_tier()
+    tiers.set_cache("scope", {"response": "4"}, prompt="What is 2+2?")
+    assert tiers.get_cache("scope", prompt="What is 2+2?") == {"response": "4"}
+    assert tiers.get_cache("scope", prompt="Write a haiku about cats") is None
+    tiers.set_cache("scope", {"response": "resp"}, input="What is 2+2?")
+    assert tiers.get_cache("scope", input="Write a haiku about cats") is None
+
+
+def test_backend_hit_for_one_model_is_not_served_to_another():
+    tiers, backend = two_tier()
+    messages = [{"role": "user", "content": "hello"}]
+    backend.set_cache("scope-model-a", {"response": "from a"}, messages=messages)
+    assert asyncio.run(tiers.async_get_cache("scope-model-a", messages=messages, model="a")) == {"response": "from a"}
+    # the sync path passes only messages and metadata; the model is in the scope key
+    assert tiers.get_cache("scope-model-b", messages=messages, metadata={}) is None
+
+
+def test_tenants_with_the_same_messages_do_not_share_entries():
+    tiers, _ = two_tier()
+    messages = [{"role": "user", "content": "hello"}]
+    tiers.set_cache("scope-team-a", {"response": "team a"}, messages=messages, metadata={"user_api_key_team_id": "a"})
+    assert tiers.get_cache("scope-team-b", messages=messages, metadata={"user_api_key_team_id": "b"}) is None
+    assert tiers.local_hits == 0
+
+
+def test_requests_without_content_skip_the_local_tier():
+    tiers, backend = two_tier()
+    tiers.set_cache("scope", {"response": "x"})
+    assert len(tiers.local) == 0
+    tiers.get_cache("scope")
+    assert backend.lookups == 1 and tiers.local_hits == 0
+
+
+class FakeAdaptiveStore:
+    """Stand-in for AdaptiveTTLStore: records hits, reports entries as evicted on request"""
+
+    class policy:
+        initial_ttl = 60
+
+    def __init__(self):
+        self.hits = []
+        self.evicted = set()
+
+    async def hit(self, key):
+        self.hits.append(key)
+        return -1 if key in self.evicted else 120
+
+
+class AdaptiveBackend(ScopeKeyedBackend):
+    """Backend whose hits and stores name their Redis entry, as the adaptive_ttl wrappers do"""
+
+    async def async_get_cache(self, key, **kwargs):
+        from litellm_hooks.adaptive_ttl import entry_key
+
+        value = self.get_cache(key, **kwargs)
+        if value is not None:
+            entry_key.set(f"entry:{key}")
+        return value
+
+    async def async_set_cache(self, key, value, **kwargs):
+        from litellm_hooks.adaptive_ttl import entry_key
+
+        self.set_cache(key, value, **kwargs)
+        entry_key.set(f"entry:{key}")
+
+
+def test_local_hits_are_reported_to_adaptive_ttl():
+    backend, store = AdaptiveBackend(), FakeAdaptiveStore()
+    backend._adaptive_ttl = store
+    tiers = TwoTierCache(backend, LRUCache(ttl=300)).attach()
+    messages = [{"role": "user", "content": "hi"}]
+
+    async def run():
+        await tiers.async_set_cache("scope", {"response": "hello"}, messages=messages, ttl=300)
+        # no longer than the Redis entry's initial TTL, whatever cache_params.ttl says
+        assert all(expires - time.monotonic() <= 60 for expires, _, _ in tiers.local._data.values())
+        for _ in range(2):
+            assert await tiers.async_get_cache("scope", messages=messages) == {"response": "hello"}
+        await asyncio.sleep(0)
+        store.evicted.add("entry:scope")
+        await tiers.async_get_cache("scope", messages=messages)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert tiers.local_hits == 3 and backend.lookups == 0
+    assert store.hits == ["entry:scope"] * 3
+    assert len(tiers.local) == 0  # the Redis entry was evicted, so the local copy went too
@@ -0,0 +1,20 @@
+"""Regression tests for the index parameters: float16 only where the cache's async lookup can query it"""
+
+from litellm_hooks.vector_index import index_params, supported
+
+
+class Float32Lookups:
+    async def acheck(self, prompt=None, vector=None):
+        return RangeQuery(vector=vector)  # noqa: F821 - never run
+
+
+class DtypeLookups:
+    async def acheck(self, prompt=None, vector=None):
+        return RangeQuery(vector=vector, dtype=self._vectorizer.dtype)  # noqa: F821 - never run
+
+
+def test_float16_is_kept_out_of_an_index_queried_with_float32_vectors():
+    params = index_params({"algorithm": "hnsw", "datatype": "float16"})
+    assert supported(params, Float32Lookups)["datatype"] == "float32"
+    assert supported(params, Float32Lookups)["algorithm"] == "hnsw"
+    assert supported(params, DtypeLookups) is params